@@ -29,6 +29,9 @@ class AccountingDB(DB):
         self.dbCatalog = {}
         self.dbBucketsLength = {}
         self.__keysCache = {}
+        self.__ingestStatsLock = threading.Lock()
+        self.__ingestStats = {"Records": 0, "Buckets": 0, "Failed": 0, "Time": 0.0}
+        self.__lastIngestStats = (time.time(), dict(self.__ingestStats))
         maxParallelInsertions = self.getCSOption("ParallelRecordInsertions", 10)
         self.__threadPool = ThreadPool(1, maxParallelInsertions)
         self.__threadPool.daemonize()
@@ -231,9 +234,40 @@ class AccountingDB(DB):
             if recordsToProcess:
                 self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable, args=(recordsToProcess,))
         self.log.info("[PENDING] Got %s records requests for all types" % pending)
+        self.__logIngestRate()
         self.__doingPendingLockTime = 0
         return S_OK()
 
+    def getIngestStats(self):
+        """
+        Get the counters of the records inserted from the in tables since the start: number of
+        records inserted (Records) and failed (Failed), buckets written (Buckets) and time spent (Time)
+        """
+        with self.__ingestStatsLock:
+            return S_OK(dict(self.__ingestStats))
+
+    def __logIngestRate(self):
+        """
+        Log the ingest rate since the previous call
+        """
+        now = time.time()
+        stats = self.getIngestStats()["Value"]
+        lastTime, lastStats = self.__lastIngestStats
+        self.__lastIngestStats = (now, stats)
+        records = stats["Records"] - lastStats["Records"]
+        self.log.info(
+            "[PENDING] Ingest rate",
+            "%d records (%d failed) in %d buckets in the last %d seconds: %.1f records/s, %.1f records/s of insertion"
+            % (
+                records,
+                stats["Failed"] - lastStats["Failed"],
+                stats["Buckets"] - lastStats["Buckets"],
+                now - lastTime,
+                records / max(now - lastTime, 1),
+                records / max(stats["Time"] - lastStats["Time"], 0.001),
+            ),
+        )
+
     def __addToCatalog(self, typeName, keyFields, valueFields, bucketsLength):
         """
         Add type to catalog
@@ -601,18 +635,155 @@ class AccountingDB(DB):
     def __insertFromINTable(self, recordTuples):
         """
         Do the real insert and delete from the in buffer table
+
+        The records of each type are inserted together (see __insertBundle). If it fails,
+        they are inserted one by one, so that a bad record does not block the others.
         """
         self.log.verbose("Received bundle to process", "of %s elements" % len(recordTuples))
+        recordsPerType = {}
         for record in recordTuples:
-            iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
-            result = self.insertRecordDirectly(typeName, startTime, endTime, valuesList)
-            if not result["OK"]:
-                self._update("UPDATE `{}` SET taken=0 WHERE id={}".format(_getTableName("in", typeName), iD))
-                self.log.error("Can't insert row", result["Message"])
+            recordsPerType.setdefault(record[1], []).append(record)
+        for typeName, records in recordsPerType.items():
+            bundleStart = time.time()
+            result = self.__insertBundle(typeName, records)
+            if result["OK"]:
+                self.__updateIngestStats(len(records), result["Value"], 0, time.time() - bundleStart)
                 continue
-            result = self._update("DELETE FROM `{}` WHERE id={}".format(_getTableName("in", typeName), iD))
+            self.log.warn("Can't insert bundle, inserting records one by one", result["Message"])
+            failed = 0
+            for record in records:
+                iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
+                result = self.insertRecordDirectly(typeName, startTime, endTime, list(valuesList))
+                if not result["OK"]:
+                    self._update("UPDATE `{}` SET taken=0 WHERE id={}".format(_getTableName("in", typeName), iD))
+                    self.log.error("Can't insert row", result["Message"])
+                    failed += 1
+                    continue
+                result = self._update("DELETE FROM `{}` WHERE id={}".format(_getTableName("in", typeName), iD))
+                if not result["OK"]:
+                    self.log.error("Can't delete row from the IN table", result["Message"])
+            self.__updateIngestStats(len(records) - failed, 0, failed, time.time() - bundleStart)
+
+    def __updateIngestStats(self, records, buckets, failed, elapsed):
+        with self.__ingestStatsLock:
+            self.__ingestStats["Records"] += records
+            self.__ingestStats["Buckets"] += buckets
+            self.__ingestStats["Failed"] += failed
+            self.__ingestStats["Time"] += elapsed
+
+    def __insertBundle(self, typeName, records):
+        """
+        Insert records of the same type coming from the in table
+
+        The values of the records are summed up in memory per bucket, so that each bucket is
+        written only once. The raw records, the buckets and the deletion from the in table
+        are done in a single transaction.
+
+        :param str typeName: type of the records
+        :param list records: tuples (id, typeName, startTime, endTime, valuesList, insertionEpoch)
+        :return: S_OK(number of buckets written)/S_ERROR()
+        """
+        if self.__readOnly:
+            return S_ERROR("ReadOnly mode enabled. No modification allowed")
+        if typeName not in self.dbCatalog:
+            return S_ERROR("Type %s has not been defined in the db" % typeName)
+        numKeys = len(self.dbCatalog[typeName]["keys"])
+        typeRows = []
+        for _iD, _typeName, startTime, endTime, valuesList, _insertionEpoch in records:
+            valuesList = list(valuesList)
+            # Discover key indexes
+            for keyPos, keyName in enumerate(self.dbCatalog[typeName]["keys"]):
+                retVal = self.__addKeyValue(typeName, keyName, valuesList[keyPos])
+                if not retVal["OK"]:
+                    return retVal
+                valuesList[keyPos] = retVal["Value"]
+            typeRows.append((startTime, endTime, valuesList))
+        buckets = self.aggregateInBuckets(typeName, typeRows)
+
+        rowsValues = []
+        for startTime, endTime, valuesList in typeRows:
+            retVal = self._escapeValues(valuesList + [startTime, endTime])
+            if not retVal["OK"]:
+                return retVal
+            rowsValues.append("(%s)" % ", ".join(retVal["Value"]))
+        typeCmd = "INSERT INTO `{}` ({}) VALUES {}".format(
+            _getTableName("type", typeName),
+            ", ".join("`%s`" % field for field in self.dbCatalog[typeName]["typeFields"]),
+            ", ".join(rowsValues),
+        )
+        deleteCmd = "DELETE FROM `{}` WHERE id in ({})".format(
+            _getTableName("in", typeName), ", ".join(str(record[0]) for record in records)
+        )
+
+        retVal = self._getConnection()
+        if not retVal["OK"]:
+            return retVal
+        connObj = retVal["Value"]
+        for _i in range(max(1, self.__deadLockRetries)):
+            retVal = self.__startTransaction(connObj)
+            if not retVal["OK"]:
+                return retVal
+            retVal = self._update(typeCmd, conn=connObj)
+            if retVal["OK"]:
+                retVal = self.__writeAggregatedBuckets(typeName, buckets, numKeys, connObj)
+            if retVal["OK"]:
+                retVal = self._update(deleteCmd, conn=connObj)
+            if retVal["OK"]:
+                retVal = self.__commitTransaction(connObj)
+            if retVal["OK"]:
+                return S_OK(len(buckets))
+            self.__rollbackTransaction(connObj)
+            # If failed because of dead lock try restarting
+            if "try restarting transaction" not in retVal["Message"]:
+                break
+        return retVal
+
+    def aggregateInBuckets(self, typeName, typeRows, nowEpoch=False):
+        """
+        Split records in buckets, summing up the values of the records falling in the same bucket
+
+        :param str typeName: type of the records
+        :param list typeRows: tuples (startTime, endTime, valuesList), the key values being ids
+        :return: dict (bucketStartTime, bucketLength, key1, ..., keyN) -> [value1, ..., valueN, entriesInBucket]
+        """
+        if not nowEpoch:
+            nowEpoch = int(TimeUtilities.toEpoch())
+        numKeys = len(self.dbCatalog[typeName]["keys"])
+        buckets = {}
+        for startTime, endTime, valuesList in typeRows:
+            keyValues = tuple(valuesList[:numKeys])
+            values = [float(value) for value in valuesList[numKeys:]]
+            for bStartTime, bProportion, bLength in self.calculateBuckets(typeName, startTime, endTime, nowEpoch):
+                bucketValues = buckets.setdefault((bStartTime, bLength) + keyValues, [0.0] * (len(values) + 1))
+                for pos, value in enumerate(values):
+                    bucketValues[pos] += value * bProportion
+                bucketValues[-1] += bProportion
+        return buckets
+
+    def __writeAggregatedBuckets(self, typeName, buckets, numKeys, connObj):
+        """
+        Insert or update buckets aggregated by aggregateInBuckets, with one statement per 1000 buckets
+        """
+        sqlFields = ["`startTime`", "`bucketLength`", "`entriesInBucket`"]
+        sqlFields += ["`%s`" % keyField for keyField in self.dbCatalog[typeName]["keys"]]
+        sqlUpData = ["`entriesInBucket`=`entriesInBucket`+VALUES(`entriesInBucket`)"]
+        for valueField in self.dbCatalog[typeName]["values"]:
+            valueField = "`%s`" % valueField
+            sqlFields.append(valueField)
+            sqlUpData.append(f"{valueField}={valueField}+VALUES({valueField})")
+        valuesGroups = []
+        for bucketKey, bucketValues in buckets.items():
+            sqlValues = list(bucketKey[:2]) + [repr(bucketValues[-1])] + list(bucketKey[2 : 2 + numKeys])
+            sqlValues += [repr(value) for value in bucketValues[:-1]]
+            valuesGroups.append("( %s )" % ",".join(str(val) for val in sqlValues))
+        for valuesChunk in List.breakListIntoChunks(valuesGroups, 1000):
+            cmd = "INSERT INTO `{}` ( {} ) ".format(_getTableName("bucket", typeName), ", ".join(sqlFields))
+            cmd += "VALUES %s " % ", ".join(valuesChunk)
+            cmd += "ON DUPLICATE KEY UPDATE %s" % ", ".join(sqlUpData)
+            result = self._update(cmd, conn=connObj)
             if not result["OK"]:
-                self.log.error("Can't delete row from the IN table", result["Message"])
+                return result
+        return S_OK()
 
     def insertRecordDirectly(self, typeName, startTime, endTime, valuesList):
         """
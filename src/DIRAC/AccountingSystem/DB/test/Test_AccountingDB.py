@@ -3,9 +3,11 @@
 # pylint: disable=protected-access
 
 # imports
+import time
 import unittest
 from unittest.mock import MagicMock
 
+from DIRAC import S_OK, S_ERROR
 import DIRAC.AccountingSystem.DB.AccountingDB as moduleTested
 
 
@@ -417,6 +419,72 @@ ORDER BY startTime"
         self.assertEqual(retVal, expectedQuery)
 
 
+class InsertBundle(TestCase):
+    """testing the insertion of the records from the in table"""
+
+    def setUp(self):
+        super().setUp()
+        self.module = self.testClass()
+        self.module.dbCatalog = {
+            "Job": {
+                "keys": ["User", "Site"],
+                "values": ["CPUTime", "DiskSpace"],
+                "typeFields": ["User", "Site", "CPUTime", "DiskSpace", "startTime", "endTime"],
+            }
+        }
+        self.module.dbBucketsLength["Job"] = [(86400 * 8, 3600)]
+        self.module._AccountingDB__keysCache = {"Job": {"User": {"alice": 1, "bob": 2}, "Site": {"A": 10}}}
+        now = int(time.time())
+        self.start = now - now % 3600 - 7200
+        self.records = [
+            (1, "Job", self.start, self.start + 1800, ["alice", "A", 10, 20], now),
+            # Across two buckets
+            (2, "Job", self.start + 1800, self.start + 5400, ["alice", "A", 30, 40], now),
+            (3, "Job", self.start, self.start, ["bob", "A", 1, 2], now),
+        ]
+
+    def test_aggregateInBuckets(self):
+        """The values of the records in the same bucket are summed up"""
+        typeRows = [
+            (record[2], record[3], [1 if record[4][0] == "alice" else 2, 10] + record[4][2:]) for record in self.records
+        ]
+        buckets = self.module.aggregateInBuckets("Job", typeRows)
+        self.assertEqual(
+            buckets,
+            {
+                (self.start, 3600, 1, 10): [25.0, 40.0, 1.5],
+                (self.start + 3600, 3600, 1, 10): [15.0, 20.0, 0.5],
+                (self.start, 3600, 2, 10): [1.0, 2.0, 1.0],
+            },
+        )
+
+    def test_insertBundle(self):
+        """A bundle is inserted with one statement per table, in one transaction"""
+        self.module._getConnection = MagicMock(return_value=S_OK("conn"))
+        self.module._query = MagicMock(return_value=S_OK())
+        self.module._update = MagicMock(return_value=S_OK(1))
+        self.module._escapeValues = lambda values: S_OK([str(value) for value in values])
+
+        result = self.module._AccountingDB__insertBundle("Job", self.records)
+        self.assertTrue(result["OK"], result)
+        self.assertEqual(result["Value"], 3)
+        transaction = [call.args[0] for call in self.module._query.call_args_list]
+        self.assertEqual(transaction, ["START TRANSACTION", "COMMIT"])
+        typeCmd, bucketsCmd, deleteCmd = [call.args[0] for call in self.module._update.call_args_list]
+        self.assertTrue(typeCmd.startswith("INSERT INTO `ac_type_Job`"))
+        self.assertEqual(typeCmd.count("("), 4)
+        self.assertTrue(bucketsCmd.startswith("INSERT INTO `ac_bucket_Job`"))
+        self.assertIn("( %s,3600,1.5,1,10,25.0,40.0 )" % self.start, bucketsCmd)
+        self.assertEqual(deleteCmd, "DELETE FROM `ac_in_Job` WHERE id in (1, 2, 3)")
+
+        # If a key can't be inserted, nothing is written
+        self.module._escapeString = MagicMock(return_value=S_ERROR("Fail"))
+        self.module._query.reset_mock()
+        self.records[0][4][0] = "carol"
+        self.assertFalse(self.module._AccountingDB__insertBundle("Job", self.records)["OK"])
+        self.module._query.assert_not_called()
+
+
 #############################################################################
 # Test Suite run
 #############################################################################
@@ -425,4 +493,5 @@ ORDER BY startTime"
 if __name__ == "__main__":
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestCase)
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MakeQuery))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(InsertBundle))
     testResult = unittest.TextTestRunner(verbosity=2).run(suite)
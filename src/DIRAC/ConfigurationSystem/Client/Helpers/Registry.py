@@ -1,10 +1,17 @@
 """ Helper for /Registry section
+
+    The reverse lookups (DN -> user, user -> groups, VO -> groups, ...) are served by an index
+    of the /Registry section, built once per configuration: it is rebuilt when the merged
+    configuration is regenerated, e.g. when the Refresher loads a new version of the CS.
 """
 import errno
 
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities import List
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import getVO
+from DIRAC.ConfigurationSystem.private.Refresher import gRefresher
 
 ID_DN_PREFIX = "/O=DIRAC/CN="
 
@@ -13,6 +20,99 @@ ID_DN_PREFIX = "/O=DIRAC/CN="
 gBaseRegistrySection = "/Registry"
 
 
+class _RegistryIndex:
+    """Lookup tables of the /Registry section of a configuration"""
+
+    # Section -> list options to load for each of its entries
+    indexedOptions = {"Users": ("DN",), "Hosts": ("DN",), "Groups": ("Users", "VO", "Properties")}
+
+    def __init__(self, cfg):
+        """Build all the tables in one pass over the /Registry section
+
+        :param cfg: merged configuration the index is built from
+        """
+        self.cfg = cfg
+        registryCFG = self.__getSection(cfg, gBaseRegistrySection.strip("/"))
+        # Section -> ordered entry names (None if there is no section)
+        self.entries = {}
+        # Section -> entry name -> option -> list of values (only the defined options)
+        self.options = {}
+        for sectionName, optionNames in self.indexedOptions.items():
+            sectionCFG = self.__getSection(registryCFG, sectionName)
+            self.entries[sectionName] = sectionCFG.listSections(True) if sectionCFG else None
+            self.options[sectionName] = {}
+            for entryName in self.entries[sectionName] or []:
+                entryOptions = self.options[sectionName][entryName] = {}
+                entryCFG = sectionCFG[entryName]
+                for optionName in optionNames:
+                    if optionName in entryCFG.listOptions():
+                        entryOptions[optionName] = List.fromChar(entryCFG[optionName], ",")
+
+        # DN -> first user/host having it, like a scan of the sections would give
+        self.usernameForDN = self.__reverse("Users", "DN")
+        self.hostnameForDN = self.__reverse("Hosts", "DN")
+        # Group option -> value -> sorted groups
+        self.groupsWithAttr = {}
+        for attrName in self.indexedOptions["Groups"]:
+            groupsForValue = self.groupsWithAttr[attrName] = {}
+            for group in self.entries["Groups"] or []:
+                for value in set(self.options["Groups"][group].get(attrName, [])):
+                    groupsForValue.setdefault(value, []).append(group)
+            for groups in groupsForValue.values():
+                groups.sort()
+
+    @staticmethod
+    def __getSection(cfg, sectionName):
+        if cfg and sectionName in cfg.listSections():
+            return cfg[sectionName]
+        return None
+
+    def __reverse(self, sectionName, optionName):
+        reverseDict = {}
+        for entryName in self.entries[sectionName] or []:
+            for value in self.options[sectionName][entryName].get(optionName, []):
+                reverseDict.setdefault(value, entryName)
+        return reverseDict
+
+    def getOption(self, sectionName, entryName, optionName, defaultValue):
+        """Same as gConfig.getValue( /Registry/<sectionName>/<entryName>/<optionName>, defaultValue )
+        for a list defaultValue
+        """
+        if not isinstance(defaultValue, list):
+            return gConfig.getValue(f"{gBaseRegistrySection}/{sectionName}/{entryName}/{optionName}", defaultValue)
+        values = self.options[sectionName].get(entryName, {}).get(optionName)
+        return defaultValue if values is None else list(values)
+
+    def getEntries(self, sectionName):
+        """Same as gConfig.getSections( /Registry/<sectionName> )"""
+        if self.entries[sectionName] is None:
+            return S_ERROR(f"Path {gBaseRegistrySection}/{sectionName} does not exist or it's not a section")
+        return S_OK(list(self.entries[sectionName]))
+
+
+_registryIndex = None
+
+
+def _getRegistryIndex():
+    """Get the index of the current configuration, building it if the configuration changed
+
+    :return: _RegistryIndex
+    """
+    global _registryIndex
+    gRefresher.refreshConfigurationIfNeeded()
+    mergedCFG = gConfigurationData.mergedCFG
+    registryIndex = _registryIndex
+    if registryIndex is None or registryIndex.cfg is not mergedCFG:
+        gConfigurationData.dangerZoneStart()
+        try:
+            registryIndex = _RegistryIndex(mergedCFG)
+        finally:
+            gConfigurationData.dangerZoneEnd()
+        # The index is replaced as a whole, the threads using the previous one are not disturbed
+        _registryIndex = registryIndex
+    return registryIndex
+
+
 def getUsernameForDN(dn, usersList=None):
     """Find DIRAC user for DN
 
@@ -22,13 +122,16 @@ def getUsernameForDN(dn, usersList=None):
     :return: S_OK(str)/S_ERROR()
     """
     dn = dn.strip()
+    registryIndex = _getRegistryIndex()
     if not usersList:
-        result = gConfig.getSections("%s/Users" % gBaseRegistrySection)
+        result = registryIndex.getEntries("Users")
         if not result["OK"]:
             return result
-        usersList = result["Value"]
+        if dn in registryIndex.usernameForDN:
+            return S_OK(registryIndex.usernameForDN[dn])
+        return S_ERROR("No username found for dn %s" % dn)
     for username in usersList:
-        if dn in gConfig.getValue(f"{gBaseRegistrySection}/Users/{username}/DN", []):
+        if dn in registryIndex.getOption("Users", username, "DN", []):
             return S_OK(username)
     return S_ERROR("No username found for dn %s" % dn)
 
@@ -40,7 +143,7 @@ def getDNForUsername(username):
 
     :return: S_OK(str)/S_ERROR()
     """
-    dnList = gConfig.getValue(f"{gBaseRegistrySection}/Users/{username}/DN", [])
+    dnList = _getRegistryIndex().getOption("Users", username, "DN", [])
     return S_OK(dnList) if dnList else S_ERROR("No DN found for user %s" % username)
 
 
@@ -51,7 +154,7 @@ def getDNForHost(host):
 
     :return: S_OK(list)/S_ERROR() -- list of DNs
     """
-    dnList = gConfig.getValue(f"{gBaseRegistrySection}/Hosts/{host}/DN", [])
+    dnList = _getRegistryIndex().getOption("Hosts", host, "DN", [])
     return S_OK(dnList) if dnList else S_ERROR("No DN found for host %s" % host)
 
 
@@ -77,15 +180,11 @@ def __getGroupsWithAttr(attrName, value):
 
     :return: S_OK(list)/S_ERROR() -- contain list of groups
     """
-    result = gConfig.getSections("%s/Groups" % gBaseRegistrySection)
+    registryIndex = _getRegistryIndex()
+    result = registryIndex.getEntries("Groups")
     if not result["OK"]:
         return result
-    groupsList = result["Value"]
-    groups = []
-    for group in groupsList:
-        if value in gConfig.getValue(f"{gBaseRegistrySection}/Groups/{group}/{attrName}", []):
-            groups.append(group)
-    groups.sort()
+    groups = list(registryIndex.groupsWithAttr[attrName].get(value, []))
     return S_OK(groups) if groups else S_ERROR(f"No groups found for {attrName}={value}")
 
 
@@ -107,7 +206,7 @@ def getGroupsForVO(vo):
     :return: S_OK(list)/S_ERROR()
     """
     if getVO():  # tries to get default VO in /DIRAC/VirtualOrganization
-        return gConfig.getSections("%s/Groups" % gBaseRegistrySection)
+        return _getRegistryIndex().getEntries("Groups")
     if not vo:
         return S_ERROR("No VO requested")
     return __getGroupsWithAttr("VO", vo)
@@ -131,13 +230,12 @@ def getHostnameForDN(dn):
     :return: S_OK()/S_ERROR()
     """
     dn = dn.strip()
-    result = gConfig.getSections("%s/Hosts" % gBaseRegistrySection)
+    registryIndex = _getRegistryIndex()
+    result = registryIndex.getEntries("Hosts")
     if not result["OK"]:
         return result
-    hostList = result["Value"]
-    for hostname in hostList:
-        if dn in gConfig.getValue(f"{gBaseRegistrySection}/Hosts/{hostname}/DN", []):
-            return S_OK(hostname)
+    if dn in registryIndex.hostnameForDN:
+        return S_OK(registryIndex.hostnameForDN[dn])
     return S_ERROR("No hostname found for dn %s" % dn)
 
 
@@ -187,7 +285,7 @@ def getAllUsers():
 
     :return: list
     """
-    result = gConfig.getSections("%s/Users" % gBaseRegistrySection)
+    result = _getRegistryIndex().getEntries("Users")
     return result["Value"] if result["OK"] else []
 
 
@@ -196,7 +294,7 @@ def getAllGroups():
 
     :return: list
     """
-    result = gConfig.getSections("%s/Groups" % gBaseRegistrySection)
+    result = _getRegistryIndex().getEntries("Groups")
     return result["Value"] if result["OK"] else []
 
 
@@ -208,8 +306,7 @@ def getUsersInGroup(groupName, defaultValue=None):
 
     :return: list
     """
-    option = f"{gBaseRegistrySection}/Groups/{groupName}/Users"
-    return gConfig.getValue(option, [] if defaultValue is None else defaultValue)
+    return _getRegistryIndex().getOption("Groups", groupName, "Users", [] if defaultValue is None else defaultValue)
 
 
 def getUsersInVO(vo, defaultValue=None):
@@ -269,8 +366,9 @@ def getPropertiesForGroup(groupName, defaultValue=None):
 
     :return: defaultValue or list
     """
-    option = f"{gBaseRegistrySection}/Groups/{groupName}/Properties"
-    return gConfig.getValue(option, [] if defaultValue is None else defaultValue)
+    return _getRegistryIndex().getOption(
+        "Groups", groupName, "Properties", [] if defaultValue is None else defaultValue
+    )
 
 
 def getPropertiesForHost(hostName, defaultValue=None):
@@ -0,0 +1,139 @@
+""" Test the Registry helper lookups, served by the index of the /Registry section
+"""
+import pytest
+from diraccfg import CFG
+
+from DIRAC import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+testRegistryCFG = """
+Registry
+{
+  Users
+  {
+    userA
+    {
+      DN = /DN/userA, /DN/userA/other
+    }
+    userB
+    {
+      DN = /DN/userB
+    }
+    userNoDN
+    {
+      Email = nobody@cern.ch
+    }
+  }
+  Hosts
+  {
+    host.cern.ch
+    {
+      DN = /DN/host.cern.ch
+      Properties = TrustedHost
+    }
+  }
+  Groups
+  {
+    vo_user
+    {
+      Users = userA, userB
+      VO = vo
+      Properties = NormalUser
+    }
+    vo_admin
+    {
+      Users = userA
+      VO = vo
+      Properties = NormalUser, JobAdministrator
+    }
+    other_user
+    {
+      Users = userB
+      VO = other
+    }
+  }
+}
+"""
+
+
+@pytest.fixture
+def registryCFG():
+    """Load the test registry in the local configuration"""
+    localCFG = gConfigurationData.localCFG
+    gConfigurationData.localCFG = CFG()
+    cfg = CFG()
+    cfg.loadFromBuffer(testRegistryCFG)
+    gConfig.loadCFG(cfg)
+    yield
+    gConfigurationData.localCFG = localCFG
+    gConfigurationData.sync()
+
+
+def test_lookups(registryCFG):
+    assert Registry.getUsernameForDN("/DN/userA/other") == {"OK": True, "Value": "userA"}
+    assert Registry.getUsernameForDN(" /DN/userB ")["Value"] == "userB"
+    assert not Registry.getUsernameForDN("/DN/unknown")["OK"]
+    assert Registry.getUsernameForDN("/DN/userB", usersList=["userA"])["OK"] is False
+    assert Registry.getDNForUsername("userA")["Value"] == ["/DN/userA", "/DN/userA/other"]
+    assert not Registry.getDNForUsername("userNoDN")["OK"]
+    assert Registry.getHostnameForDN("/DN/host.cern.ch")["Value"] == "host.cern.ch"
+    assert Registry.getDNForHost("host.cern.ch")["Value"] == ["/DN/host.cern.ch"]
+
+    assert Registry.getGroupsForDN("/DN/userA")["Value"] == ["vo_admin", "vo_user"]
+    assert Registry.getGroupsForUser("userB")["Value"] == ["other_user", "vo_user"]
+    assert not Registry.getGroupsForUser("userNoDN")["OK"]
+    assert Registry.getGroupsWithProperty("JobAdministrator")["Value"] == ["vo_admin"]
+    assert Registry.getGroupsForVO("vo")["Value"] == ["vo_admin", "vo_user"]
+
+    assert Registry.getAllUsers() == ["userA", "userB", "userNoDN"]
+    assert Registry.getAllGroups() == ["vo_user", "vo_admin", "other_user"]
+    assert Registry.getUsersInGroup("vo_user") == ["userA", "userB"]
+    assert Registry.getUsersInGroup("unknown", ["default"]) == ["default"]
+    assert sorted(Registry.getDNsInVO("vo")) == [
+        "/DN/userA",
+        "/DN/userA",
+        "/DN/userA/other",
+        "/DN/userA/other",
+        "/DN/userB",
+    ]
+    assert Registry.getPropertiesForGroup("vo_admin") == ["NormalUser", "JobAdministrator"]
+    assert Registry.getPropertiesForGroup("other_user") == []
+
+
+def test_returnedListsAreCopies(registryCFG):
+    """Modifying a returned list does not corrupt the index"""
+    Registry.getGroupsForUser("userA")["Value"].append("bad")
+    Registry.getUsersInGroup("vo_user").append("bad")
+    assert Registry.getGroupsForUser("userA")["Value"] == ["vo_admin", "vo_user"]
+    assert Registry.getUsersInGroup("vo_user") == ["userA", "userB"]
+
+
+def test_indexFollowsConfiguration(registryCFG):
+    """The index is rebuilt when the configuration changes"""
+    assert Registry.getUsernameForDN("/DN/userC")["OK"] is False
+    registryIndex = Registry._getRegistryIndex()
+    assert Registry._getRegistryIndex() is registryIndex
+
+    gConfigurationData.setOptionInCFG("/Registry/Users/userC/DN", "/DN/userC")
+    gConfigurationData.setOptionInCFG("/Registry/Groups/vo_user/Users", "userA, userB, userC")
+
+    assert Registry._getRegistryIndex() is not registryIndex
+    assert Registry.getUsernameForDN("/DN/userC")["Value"] == "userC"
+    assert Registry.getGroupsForDN("/DN/userC")["Value"] == ["vo_user"]
+
+
+def test_noRegistry():
+    """Without /Registry section, the errors are the ones of gConfig"""
+    localCFG = gConfigurationData.localCFG
+    gConfigurationData.localCFG = CFG()
+    gConfigurationData.sync()
+    try:
+        result = Registry.getUsernameForDN("/DN/userA")
+        assert not result["OK"]
+        assert "/Registry/Users does not exist" in result["Message"]
+        assert Registry.getAllGroups() == []
+        assert Registry.getUsersInGroup("vo_user") == []
+    finally:
+        gConfigurationData.localCFG = localCFG
+        gConfigurationData.sync()
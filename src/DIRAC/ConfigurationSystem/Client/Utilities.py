@@ -436,6 +436,13 @@ def getDBParameters(fullname):
         dbPort = int(result["Value"])
     parameters["Port"] = dbPort
 
+    # Optional maximum number of connections, the default is the one of the MySQL module
+    result = gConfig.getOption(cs_path + "/MaxConnections")
+    if not result["OK"]:
+        result = gConfig.getOption("/Systems/Databases/MaxConnections")
+    if result["OK"]:
+        parameters["MaxConnections"] = int(result["Value"])
+
     return S_OK(parameters)
 
 
@@ -16,6 +16,11 @@ from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
+# Maximum number of entries of the lookup cache, it is emptied when reached
+MAX_PATH_CACHE_SIZE = 100000
+# Cached lookup result meaning that the path does not exist
+_NOT_FOUND = object()
+
 
 class ConfigurationData:
     def __init__(self, loadDefaultCFG=True):
@@ -35,6 +40,8 @@ class ConfigurationData:
         self.localCFG = CFG()
         self.remoteCFG = CFG()
         self.mergedCFG = CFG()
+        # Results of the lookups in mergedCFG: ( mergedCFG, { (lookup, path): result } )
+        self.__pathCache = (self.mergedCFG, {})
         self.remoteServerList = []
         if loadDefaultCFG:
             defaultCFGFile = os.path.join(DIRAC.rootPath, "etc", "dirac.cfg")
@@ -63,6 +70,49 @@ class ConfigurationData:
             self.remoteServerList.extend(List.fromChar(remoteServers, ","))
         self.remoteServerList = List.uniqueElements(self.remoteServerList)
         self.__compressedConfigurationData = None
+        self.__pathCache = (self.mergedCFG, {})
+
+    def __getPathCache(self):
+        """Get the lookup cache of the current mergedCFG
+
+        The cache is replaced as a whole when mergedCFG is, so that a lookup done in a previous
+        mergedCFG can never end up in the cache of the current one.
+
+        :return: tuple (mergedCFG, cache dictionary)
+        """
+        pathCache = self.__pathCache
+        if pathCache[0] is not self.mergedCFG:
+            pathCache = (self.mergedCFG, {})
+            self.__pathCache = pathCache
+        return pathCache
+
+    def __cachedLookup(self, lookupName, path, lookupFunc, ordered=None, disableDangerZones=False):
+        """Lookup in mergedCFG through the cache. A hit does not need the danger zone
+
+        :param str lookupName: name of the lookup, part of the cache key
+        :param str path: path, as given by the caller
+        :param lookupFunc: function (cfg, path) -> result or _NOT_FOUND, called in the danger zone
+        :return: result or _NOT_FOUND
+        """
+        cfg, cache = self.__getPathCache()
+        key = (lookupName, path, ordered)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        if not disableDangerZones:
+            self.dangerZoneStart()
+        try:
+            result = lookupFunc(cfg, path)
+        except Exception:
+            result = _NOT_FOUND
+        finally:
+            if not disableDangerZones:
+                self.dangerZoneEnd()
+        if len(cache) >= MAX_PATH_CACHE_SIZE:
+            cache.clear()
+        cache[key] = result
+        return result
 
     def loadFile(self, fileName):
         try:
@@ -124,9 +174,18 @@ class ConfigurationData:
             pass
         return self.dangerZoneEnd(None)
 
+    @staticmethod
+    def __walkToSection(cfg, path):
+        for section in [level.strip() for level in path.split("/") if level.strip() != ""]:
+            cfg = cfg[section]
+        return cfg
+
     def getSectionsFromCFG(self, path, cfg=False, ordered=False):
         if not cfg:
-            cfg = self.mergedCFG
+            result = self.__cachedLookup(
+                "sections", path, lambda cfg, path: self.__walkToSection(cfg, path).listSections(ordered), ordered
+            )
+            return None if result is _NOT_FOUND else list(result)
         self.dangerZoneStart()
         try:
             levelList = [level.strip() for level in path.split("/") if level.strip() != ""]
@@ -139,7 +198,10 @@ class ConfigurationData:
 
     def getOptionsFromCFG(self, path, cfg=False, ordered=False):
         if not cfg:
-            cfg = self.mergedCFG
+            result = self.__cachedLookup(
+                "options", path, lambda cfg, path: self.__walkToSection(cfg, path).listOptions(ordered), ordered
+            )
+            return None if result is _NOT_FOUND else list(result)
         self.dangerZoneStart()
         try:
             levelList = [level.strip() for level in path.split("/") if level.strip() != ""]
@@ -150,9 +212,23 @@ class ConfigurationData:
             pass
         return self.dangerZoneEnd(None)
 
+    @staticmethod
+    def __extractOption(cfg, path):
+        levelList = [level.strip() for level in path.split("/") if level.strip() != ""]
+        for section in levelList[:-1]:
+            cfg = cfg[section]
+        if levelList[-1] in cfg.listOptions():
+            return cfg[levelList[-1]]
+        return _NOT_FOUND
+
     def extractOptionFromCFG(self, path, cfg=False, disableDangerZones=False):
+        """Get the value of an option, None if it does not exist
+
+        The lookups in mergedCFG (no cfg given) are cached until mergedCFG changes
+        """
         if not cfg:
-            cfg = self.mergedCFG
+            result = self.__cachedLookup("option", path, self.__extractOption, disableDangerZones=disableDangerZones)
+            return None if result is _NOT_FOUND else result
         if not disableDangerZones:
             self.dangerZoneStart()
         try:
@@ -353,6 +429,7 @@ class ConfigurationData:
 
     def setRemoteCFG(self, cfg, disableSync=False):
         self.remoteCFG = cfg.clone()
+        self.__pathCache = (self.mergedCFG, {})
         if not disableSync:
             self.sync()
 
@@ -0,0 +1,102 @@
+""" Test the lookups of ConfigurationData, and their cache
+"""
+import pytest
+from diraccfg import CFG
+
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+
+remoteCFG = """
+DIRAC
+{
+  Configuration
+  {
+    Version = 1
+  }
+  Setup = Remote
+}
+Systems
+{
+  WorkloadManagement
+  {
+    Agents
+    {
+      JobAgent
+      {
+        PollingTime = 20
+      }
+      PushJobAgent
+      {
+      }
+    }
+  }
+}
+"""
+
+
+@pytest.fixture
+def configurationData():
+    confData = ConfigurationData(loadDefaultCFG=False)
+    cfg = CFG()
+    cfg.loadFromBuffer(remoteCFG)
+    confData.setRemoteCFG(cfg)
+    yield confData
+
+
+def test_lookups(configurationData):
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") == "Remote"
+    assert configurationData.extractOptionFromCFG("DIRAC/Setup/") == "Remote"
+    assert configurationData.extractOptionFromCFG("/DIRAC/Unknown") is None
+    assert configurationData.extractOptionFromCFG("/Unknown/Setup") is None
+    assert configurationData.extractOptionFromCFG("/DIRAC") is None
+    assert configurationData.extractOptionFromCFG("") is None
+    agentsPath = "/Systems/WorkloadManagement/Agents"
+    assert configurationData.getSectionsFromCFG(agentsPath, ordered=True) == ["JobAgent", "PushJobAgent"]
+    assert configurationData.getOptionsFromCFG(f"{agentsPath}/JobAgent") == ["PollingTime"]
+    assert configurationData.getSectionsFromCFG("/Systems/Unknown") is None
+    assert configurationData.getOptionsFromCFG("/DIRAC/Setup") is None
+
+
+def test_cacheInvalidation(configurationData):
+    """The cached lookups follow the changes of the configuration"""
+    agentsPath = "/Systems/WorkloadManagement/Agents"
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") == "Remote"
+    assert configurationData.extractOptionFromCFG("/DIRAC/NewOption") is None
+    assert configurationData.getSectionsFromCFG(agentsPath) == ["JobAgent", "PushJobAgent"]
+
+    # Local configuration
+    configurationData.setOptionInCFG("/DIRAC/Setup", "Local")
+    configurationData.setOptionInCFG("/DIRAC/NewOption", "New")
+    configurationData.setOptionInCFG(f"{agentsPath}/NewAgent/PollingTime", "10")
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") == "Local"
+    assert configurationData.extractOptionFromCFG("/DIRAC/NewOption") == "New"
+    assert configurationData.getSectionsFromCFG(agentsPath) == ["JobAgent", "PushJobAgent", "NewAgent"]
+
+    configurationData.deleteOptionInCFG("/DIRAC/Setup")
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") == "Remote"
+
+    # New remote version
+    cfg = CFG()
+    cfg.loadFromBuffer(remoteCFG.replace("Remote", "Remote2"))
+    configurationData.setRemoteCFG(cfg)
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") == "Remote2"
+
+    # Configuration replaced without sync
+    configurationData.mergedCFG = CFG()
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") is None
+
+
+def test_returnedListsAreCopies(configurationData):
+    agentsPath = "/Systems/WorkloadManagement/Agents"
+    configurationData.getSectionsFromCFG(agentsPath).append("Bad")
+    configurationData.getOptionsFromCFG(f"{agentsPath}/JobAgent").append("Bad")
+    assert configurationData.getSectionsFromCFG(agentsPath) == ["JobAgent", "PushJobAgent"]
+    assert configurationData.getOptionsFromCFG(f"{agentsPath}/JobAgent") == ["PollingTime"]
+
+
+def test_explicitCFGIsNotCached(configurationData):
+    cfg = CFG()
+    cfg.loadFromBuffer("DIRAC\n{\n  Setup = Other\n}\n")
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup", cfg) == "Other"
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup") == "Remote"
+    cfg.setOption("DIRAC/Setup", "Other2")
+    assert configurationData.extractOptionFromCFG("/DIRAC/Setup", cfg) == "Other2"
@@ -16,6 +16,7 @@ from DIRAC.Core.Utilities.File import mkDir
 from DIRAC.Core.Utilities import Network, TimeUtilities
 from DIRAC.Core.Utilities.Shifter import setupShifterProxyInEnv
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
+from DIRAC.Core.Utilities.ServerUtils import getDBConnectionsMonitoringFields
 from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
@@ -376,16 +377,16 @@ class AgentModule:
             if self.activityMonitoring:
                 # Here we record the data about the cycle duration along with some basic details about the
                 # agent and right now it isn't committed to the ES backend.
-                self.activityMonitoringReporter.addRecord(
-                    {
-                        "AgentName": self.agentName,
-                        "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
-                        "Host": Network.getFQDN(),
-                        "MemoryUsage": mem,
-                        "CpuPercentage": cpuPercentage,
-                        "CycleDuration": elapsedTime,
-                    }
-                )
+                record = {
+                    "AgentName": self.agentName,
+                    "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
+                    "Host": Network.getFQDN(),
+                    "MemoryUsage": mem,
+                    "CpuPercentage": cpuPercentage,
+                    "CycleDuration": elapsedTime,
+                }
+                record.update(getDBConnectionsMonitoringFields())
+                self.activityMonitoringReporter.addRecord(record)
         else:
             self.log.warn(" Cycle had an error:", cycleResult["Message"])
         self.log.notice("-" * 40)
@@ -2,7 +2,7 @@
     It uniforms the way the database objects are constructed
 """
 from DIRAC.Core.Base.DIRACDB import DIRACDB
-from DIRAC.Core.Utilities.MySQL import MySQL
+from DIRAC.Core.Utilities.MySQL import MySQL, MAXCONNECTIONS
 from DIRAC.ConfigurationSystem.Client.Utilities import getDBParameters
 
 
@@ -31,6 +31,7 @@ class DB(DIRACDB, MySQL):
             dbName=self.dbName,
             port=self.dbPort,
             debug=debug,
+            maxConnections=dbParameters.get("MaxConnections", MAXCONNECTIONS),
             parentLogger=parentLogger,
         )
 
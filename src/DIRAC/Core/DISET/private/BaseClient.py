@@ -14,7 +14,8 @@ from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServiceFailoverURL
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import skipCACheck
-from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool, getGlobalIdleTransportPool
+from DIRAC.Core.DISET.private.Transports.SSL.M2Utils import getM2CredentialsKey
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 
@@ -38,6 +39,7 @@ class BaseClient:
     KW_PROXY_CHAIN = "proxyChain"
     KW_SKIP_CA_CHECK = "skipCACheck"
     KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+    KW_KEEP_CONNECTION = "keepConnection"
 
     __threadConfig = ThreadConfig()
 
@@ -58,6 +60,7 @@ class BaseClient:
         :param proxyChain: Specify the proxy chain
         :param skipCACheck: Do not check the CA
         :param keepAliveLapse: Duration for keepAliveLapse (heartbeat like)
+        :param keepConnection: Reuse the connections kept open by the services between RPCs (default True)
         """
 
         if not isinstance(serviceName, str):
@@ -436,13 +439,24 @@ and this is thread {}
             gLogger.error("DISET client thread safety error", msgTxt)
             # raise Exception( msgTxt )
 
-    def _connect(self):
+    def _getConnectionKey(self):
+        """Identify the destination and the credentials of the connections of this client,
+        to reuse the connections kept open by the services
+
+        :return: hashable tuple
+        """
+        return (self.serviceURL, self.kwargs.get(self.KW_TIMEOUT)) + getM2CredentialsKey(**self.kwargs)
+
+    def _connect(self, reuseConnection=False):
         """Establish the connection.
         It uses the URL discovered in __discoverURL.
         In case the connection cannot be established, __discoverURL
         is called again, and _connect calls itself.
         We stop after trying self.__nbOfRetry * self.__nbOfUrls
 
+        :param bool reuseConnection: take a connection kept open by the service, if any.
+                                     In this case, the returned structure has "reusedConnection" set to True
+
         :return: S_OK()/S_ERROR()
         """
         # Check if the useServerCertificate configuration changed
@@ -465,6 +479,14 @@ and this is thread {}
         if self.__enableThreadCheck:
             self.__checkThreadID()
 
+        if reuseConnection and self.kwargs.get(self.KW_KEEP_CONNECTION, True):
+            transport = getGlobalIdleTransportPool().get(self._getConnectionKey())
+            if transport:
+                gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+                result = S_OK((getGlobalTransportPool().add(transport), transport))
+                result["reusedConnection"] = True
+                return result
+
         gLogger.debug("Trying to connect to: %s" % self.serviceURL)
         try:
             # Calls the transport method of the apropriate protocol.
@@ -526,11 +548,19 @@ and this is thread {}
 
         return S_OK((trid, transport))
 
-    def _disconnect(self, trid):
+    def _disconnect(self, trid, keepTime=0):
         """Disconnect the connection.
 
         :param str trid: Transport ID in the transportPool
+        :param int keepTime: number of seconds the service keeps the connection open.
+                             If set, the connection is kept for the next calls instead of being closed
         """
+        if keepTime and self.kwargs.get(self.KW_KEEP_CONNECTION, True):
+            transport = getGlobalTransportPool().get(trid)
+            getGlobalTransportPool().remove(trid)
+            if transport:
+                getGlobalIdleTransportPool().put(self._getConnectionKey(), transport, keepTime)
+            return
         getGlobalTransportPool().close(trid)
 
     @staticmethod
@@ -542,7 +572,7 @@ and this is thread {}
 
         return serializedTuple
 
-    def _proposeAction(self, transport, action):
+    def _proposeAction(self, transport, action, keepConnection=False):
         """Proposes an action by sending a tuple containing
 
           * System/Component
@@ -550,6 +580,8 @@ and this is thread {}
           * VO
           * action
           * extraCredentials
+          * DIRAC version
+          * whether the connection should be kept open for further proposals (if asked)
 
         It is kind of a handshake.
 
@@ -560,6 +592,8 @@ and this is thread {}
         :param action: tuple (<action type>, <action name>). It depends on the
                        subclasses of BaseClient. <action type> can be for example
                        'RPC' or 'FileTransfer'
+        :param bool keepConnection: ask the service to keep the connection open after the action.
+                                    If it accepts, it answers with S_OK({"keepConnection": <seconds>})
 
         :return: whatever the server sent back
 
@@ -567,6 +601,8 @@ and this is thread {}
         if not self.__initStatus["OK"]:
             return self.__initStatus
         stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo), action, self.__extraCredentials, DIRAC.version)
+        if keepConnection and self.kwargs.get(self.KW_KEEP_CONNECTION, True):
+            stConnectionInfo += (True,)
 
         # Send the connection info and get the answer back
         retVal = transport.sendData(S_OK(BaseClient._serializeStConnectionInfo(stConnectionInfo)))
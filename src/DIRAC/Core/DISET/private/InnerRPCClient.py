@@ -1,6 +1,7 @@
 """ This module hosts the logic for executing an RPC call.
 """
 from DIRAC.Core.DISET.private.BaseClient import BaseClient
+from DIRAC.Core.DISET.private.TransportPool import getGlobalIdleTransportPool
 from DIRAC.Core.Utilities.ReturnValues import S_OK
 from DIRAC.Core.Utilities.DErrno import cmpError, ENOAUTH
 
@@ -9,11 +10,11 @@ class InnerRPCClient(BaseClient):
     """This class instruments the BaseClient to perform RPC calls.
     At every RPC call, this class:
 
-      * connects
+      * connects, or reuses a connection kept open by the service
       * proposes the action
       * sends the method parameters
       * retrieve the result
-      * disconnect
+      * disconnect, or keeps the connection for the next calls if the service accepted it
     """
 
     # Number of times we retry the call.
@@ -31,7 +32,7 @@ class InnerRPCClient(BaseClient):
 
 
         """
-        retVal = self._connect()
+        retVal = self._connect(reuseConnection=True)
 
         # Generate the stub which contains all the connection and call options
         # JSON: cast args to list for serialization purposes
@@ -39,15 +40,22 @@ class InnerRPCClient(BaseClient):
         if not retVal["OK"]:
             retVal["rpcStub"] = stub
             return retVal
+        reusedConnection = retVal.get("reusedConnection", False)
         # Get the transport connection ID as well as the Transport object
         trid, transport = retVal["Value"]
+        keepTime = 0
         try:
             # Handshake to perform the RPC call for functionName
-            retVal = self._proposeAction(transport, ("RPC", functionName))
+            retVal = self._proposeAction(transport, ("RPC", functionName), keepConnection=True)
             if not retVal["OK"]:
                 if cmpError(retVal, ENOAUTH):  # This query is unauthorized
                     retVal["rpcStub"] = stub
                     return retVal
+                elif reusedConnection:
+                    # The service closed the connection it kept open: the other ones are likely closed as well.
+                    # As the arguments were not sent, the call can safely be done again on a new connection
+                    getGlobalIdleTransportPool().clear(self._getConnectionKey())
+                    return self.executeRPC(functionName, args)
                 else:  # we have network problem or the service is not responding
                     if self.__retry < 3:
                         self.__retry += 1
@@ -55,6 +63,9 @@ class InnerRPCClient(BaseClient):
                     else:
                         retVal["rpcStub"] = stub
                         return retVal
+            # Did the service accept to keep the connection open after the call
+            if isinstance(retVal.get("Value"), dict):
+                keepTime = retVal["Value"].get("keepConnection", 0)
 
             # Send the arguments to the function
             # Note: we need to convert the arguments to list
@@ -73,4 +84,5 @@ class InnerRPCClient(BaseClient):
                 receivedData["rpcStub"] = stub
             return receivedData
         finally:
-            self._disconnect(trid)
+            # Only a connection on which the whole exchange went through can be reused
+            self._disconnect(trid, keepTime=keepTime if transport.isInSync() else 0)
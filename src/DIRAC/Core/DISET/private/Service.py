@@ -8,12 +8,18 @@
 # pylint: skip-file
 # __searchInitFunctions gives RuntimeError: maximum recursion depth exceeded
 
+import errno
 import os
 import time
 import datetime
 import threading
 import psutil
 
+try:
+    import selectors
+except ImportError:
+    import selectors2 as selectors
+
 from concurrent.futures import ThreadPoolExecutor
 
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
@@ -26,12 +32,17 @@ from DIRAC.Core.DISET.private.MessageBroker import MessageBroker, MessageSender
 from DIRAC.Core.DISET.AuthManager import AuthManager
 from DIRAC.Core.DISET.RequestHandler import getServiceOption
 from DIRAC.Core.Utilities import Network, TimeUtilities
-from DIRAC.Core.Utilities.DErrno import ENOAUTH
+from DIRAC.Core.Utilities.DErrno import ENOAUTH, cmpError
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
+from DIRAC.Core.Utilities.ServerUtils import getDBConnectionsMonitoringFields
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.FrameworkSystem.Client.SecurityLogClient import SecurityLogClient
 
 
+# Period at which a thread waiting on a kept connection checks whether other connections wait for a thread
+KEEP_CONNECTION_POLL = 0.1
+
+
 class Service:
 
     SVC_VALID_ACTIONS = {"RPC": "export", "FileTransfer": "transfer", "Message": "msg", "Connection": "Message"}
@@ -244,20 +255,20 @@ class Service:
         pendingQueries = self._threadPool._work_queue.qsize()
         activeQuereies = len(self._threadPool._threads)
         percentage = self.__endReportToMonitoring(initialWallTime, initialCPUTime)
-        self.activityMonitoringReporter.addRecord(
-            {
-                "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
-                "Host": Network.getFQDN(),
-                "ServiceName": "_".join(self._name.split("/")),
-                "Location": self._cfg.getURL(),
-                "MemoryUsage": mem,
-                "CpuPercentage": percentage,
-                "PendingQueries": pendingQueries,
-                "ActiveQueries": activeQuereies,
-                "RunningThreads": threading.active_count(),
-                "MaxFD": self.__maxFD,
-            }
-        )
+        record = {
+            "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
+            "Host": Network.getFQDN(),
+            "ServiceName": "_".join(self._name.split("/")),
+            "Location": self._cfg.getURL(),
+            "MemoryUsage": mem,
+            "CpuPercentage": percentage,
+            "PendingQueries": pendingQueries,
+            "ActiveQueries": activeQuereies,
+            "RunningThreads": threading.active_count(),
+            "MaxFD": self.__maxFD,
+        }
+        record.update(getDBConnectionsMonitoringFields())
+        self.activityMonitoringReporter.addRecord(record)
         self.__maxFD = 0
 
     def getConfig(self):
@@ -335,26 +346,44 @@ class Service:
             trid = self._transportPool.add(clientTransport)
             if not trid:
                 return
-            # Receive and check proposal
-            result = self._receiveAndCheckProposal(trid)
-            if not result["OK"]:
-                self._transportPool.sendAndClose(trid, result)
-                return
-            proposalTuple = result["Value"]
-            # Instantiate handler
-            result = self._instantiateHandler(trid, proposalTuple)
-            if not result["OK"]:
-                self._transportPool.sendAndClose(trid, result)
-                return
-            handlerObj = result["Value"]
-            # Execute the action
-            result = self._processProposal(trid, proposalTuple, handlerObj)
-            # Close the connection if required
-            if result["closeTransport"] or not result["OK"]:
+            # Credentials of the handshake, which each proposal on a kept connection starts from
+            handshakeCredentials = dict(clientTransport.getConnectingCredentials())
+            keptConnection = False
+            while True:
+                if keptConnection:
+                    clientTransport.peerCredentials = dict(handshakeCredentials)
+                # Receive and check proposal
+                result = self._receiveAndCheckProposal(trid, keptConnection=keptConnection)
                 if not result["OK"]:
-                    gLogger.error("Error processing proposal", result["Message"])
-                self._transportPool.close(trid)
-            return result
+                    if keptConnection and cmpError(result, errno.ECONNRESET):
+                        self._transportPool.close(trid)
+                    else:
+                        self._transportPool.sendAndClose(trid, result)
+                    return
+                proposalTuple = result["Value"]
+                # Instantiate handler
+                result = self._instantiateHandler(trid, proposalTuple)
+                if not result["OK"]:
+                    self._transportPool.sendAndClose(trid, result)
+                    return
+                handlerObj = result["Value"]
+                # Execute the action
+                keepTime = self._getKeepConnectionTime(proposalTuple)
+                result = self._processProposal(trid, proposalTuple, handlerObj, keepConnection=keepTime)
+                # Close the connection if required
+                if result["closeTransport"] or not result["OK"]:
+                    if not result["OK"]:
+                        gLogger.error("Error processing proposal", result["Message"])
+                    self._transportPool.close(trid)
+                    return result
+                # Connections for messages are handled by the message broker
+                if not keepTime:
+                    return result
+                # Serve the next proposal of the client on the same connection
+                if not self._waitForNextProposal(clientTransport, keepTime):
+                    self._transportPool.close(trid)
+                    return result
+                keptConnection = True
         finally:
             self._lockManager.unlockGlobal()
             if monReport:
@@ -385,13 +414,52 @@ class Service:
         proposalTuple = tuple(tuple(x) if isinstance(x, list) else x for x in serializedProposal)
         return proposalTuple
 
-    def _receiveAndCheckProposal(self, trid):
+    def _getKeepConnectionTime(self, proposalTuple):
+        """Number of seconds to keep the connection open after an RPC, if the client asked for it
+        (fifth element of the proposal). 0 means that the connection is closed after the action
+        """
+        if len(proposalTuple) > 4 and proposalTuple[4] and proposalTuple[1][0] == "RPC":
+            return max(0, self._cfg.getKeepConnectionTime())
+        return 0
+
+    def _waitForNextProposal(self, clientTransport, keepTime):
+        """Wait for the client to send another proposal on a kept connection.
+
+        The wait is given up as soon as other connections wait for a thread,
+        so that idle clients do not starve the others.
+
+        :param clientTransport: transport of the kept connection
+        :param int keepTime: maximum number of seconds to wait
+
+        :return: True if the client sent something
+        """
+        endTime = time.time() + keepTime
+        sel = selectors.DefaultSelector()
+        try:
+            sel.register(clientTransport.getSocket(), selectors.EVENT_READ)
+            while not self._threadPool._work_queue.qsize():
+                timeLeft = endTime - time.time()
+                if timeLeft <= 0:
+                    return False
+                if sel.select(timeout=min(timeLeft, KEEP_CONNECTION_POLL)):
+                    return True
+            return False
+        except Exception:
+            return False
+        finally:
+            sel.close()
+
+    def _receiveAndCheckProposal(self, trid, keptConnection=False):
         clientTransport = self._transportPool.get(trid)
         # Get the peer credentials
         credDict = clientTransport.getConnectingCredentials()
         # Receive the action proposal
         retVal = clientTransport.receiveData(1024)
         if not retVal["OK"]:
+            if keptConnection:
+                # Clients close the connections kept open when they do not need them anymore
+                gLogger.debug("Kept connection closed", self._createIdentityString(credDict, clientTransport))
+                return S_ERROR(errno.ECONNRESET, "Connection closed by the client")
             gLogger.error(
                 "Invalid action proposal",
                 "{} {}".format(self._createIdentityString(credDict, clientTransport), retVal["Message"]),
@@ -509,9 +577,17 @@ class Service:
             return S_ERROR("Server error while loading handler")
         return S_OK(handlerInstance)
 
-    def _processProposal(self, trid, proposalTuple, handlerObj):
+    def _processProposal(self, trid, proposalTuple, handlerObj, keepConnection=0):
+        """Execute the proposed action
+
+        :param int keepConnection: number of seconds the connection is kept open after an RPC,
+                                   which is announced to the client. 0 to close it.
+        """
         # Notify the client we're ready to execute the action
-        retVal = self._transportPool.send(trid, S_OK())
+        if keepConnection:
+            retVal = self._transportPool.send(trid, S_OK({"keepConnection": keepConnection}))
+        else:
+            retVal = self._transportPool.send(trid, S_OK())
         if not retVal["OK"]:
             return retVal
 
@@ -542,7 +618,7 @@ class Service:
             if not result["OK"]:
                 self._msgBroker.removeTransport(trid)
 
-        result["closeTransport"] = not messageConnection or not result["OK"]
+        result["closeTransport"] = not (messageConnection or keepConnection) or not result["OK"]
         return result
 
     def _mbConnect(self, trid, handlerObj=None):
@@ -68,6 +68,12 @@ class ServiceConfiguration:
         except Exception:
             return 20
 
+    def getKeepConnectionTime(self):
+        try:
+            return int(self.getOption("KeepConnectionTime"))
+        except Exception:
+            return 10
+
     def getMaxThreadsForMethod(self, actionType, method):
         try:
             return int(self.getOption(f"ThreadLimit/{actionType}/{method}"))
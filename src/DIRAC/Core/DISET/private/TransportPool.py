@@ -1,5 +1,12 @@
+import os
 import time
 import threading
+
+try:
+    import selectors
+except ImportError:
+    import selectors2 as selectors
+
 from DIRAC import gLogger, S_ERROR
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 
@@ -154,7 +161,137 @@ class TransportPool:
             self.__modLock.release()
 
 
+class IdleTransportPool:
+    """Client side pool of the connections that the services keep open after an RPC,
+    indexed by destination and credentials, so that the next RPCs do not pay for a new handshake.
+
+    A transport is handed out to a single caller at a time. It is not reused once the keep time
+    announced by the service is over, nor if the service closed it in the meantime.
+    """
+
+    # Transports are given up that many seconds before the service closes them
+    KEEP_MARGIN = 1
+    # Maximum number of idle transports per destination and credentials
+    MAX_IDLE = 10
+
+    def __init__(self, maxIdle=MAX_IDLE):
+        self.__maxIdle = maxIdle
+        self.__lock = threading.Lock()
+        # key -> list of (expiration time, transport), the most recently used last
+        self.__idle = {}
+        self.__pid = os.getpid()
+        self.__stats = {"Kept": 0, "Reused": 0, "Discarded": 0}
+        result = gThreadScheduler.addPeriodicTask(10, self.purge)
+        if not result["OK"]:
+            gLogger.fatal("Cannot add task to thread scheduler", result["Message"])
+
+    def __checkFork(self):
+        """The connections of the parent process can not be shared with a forked child.
+        They are forgotten without being closed, as closing them would affect the parent. Needs the lock
+        """
+        if self.__pid != os.getpid():
+            self.__pid = os.getpid()
+            self.__idle = {}
+
+    @staticmethod
+    def __isUsable(transport):
+        """A kept connection must not have anything to read: the service only sends data
+        when answering, so anything readable means it closed the connection
+        """
+        if not transport.isInSync() or not transport.getSocket():
+            return False
+        sel = selectors.DefaultSelector()
+        try:
+            sel.register(transport.getSocket(), selectors.EVENT_READ)
+            return not sel.select(timeout=0)
+        except Exception:
+            return False
+        finally:
+            sel.close()
+
+    def __discard(self, transports):
+        """Close transports which are not kept. Must be called without the lock"""
+        with self.__lock:
+            self.__stats["Discarded"] += len(transports)
+        for transport in transports:
+            try:
+                transport.close()
+            except Exception:
+                pass
+
+    def get(self, key):
+        """Take an idle transport to reuse
+
+        :param key: destination and credentials
+        :return: transport or None
+        """
+        now = time.time()
+        discarded = []
+        transport = None
+        with self.__lock:
+            self.__checkFork()
+            idleList = self.__idle.get(key, [])
+            while idleList:
+                expiration, candidate = idleList.pop()
+                if expiration > now and self.__isUsable(candidate):
+                    transport = candidate
+                    self.__stats["Reused"] += 1
+                    break
+                discarded.append(candidate)
+        self.__discard(discarded)
+        return transport
+
+    def put(self, key, transport, keepTime):
+        """Keep a transport that the service will keep open for keepTime seconds
+
+        :param key: destination and credentials
+        :param transport: transport, done with its last exchange
+        :param int keepTime: number of seconds the service keeps the connection open
+        """
+        expiration = time.time() + keepTime - self.KEEP_MARGIN
+        with self.__lock:
+            self.__checkFork()
+            idleList = self.__idle.setdefault(key, [])
+            if expiration > time.time() and len(idleList) < self.__maxIdle:
+                idleList.append((expiration, transport))
+                self.__stats["Kept"] += 1
+                return
+        self.__discard([transport])
+
+    def clear(self, key=None):
+        """Close the idle transports to a destination, or all of them"""
+        with self.__lock:
+            self.__checkFork()
+            if key is None:
+                idleLists = list(self.__idle.values())
+                self.__idle = {}
+            else:
+                idleLists = [self.__idle.pop(key, [])]
+        self.__discard([transport for idleList in idleLists for _, transport in idleList])
+
+    def purge(self):
+        """Close the transports which expired"""
+        now = time.time()
+        discarded = []
+        with self.__lock:
+            self.__checkFork()
+            for key in list(self.__idle):
+                discarded.extend(transport for expiration, transport in self.__idle[key] if expiration <= now)
+                self.__idle[key] = [entry for entry in self.__idle[key] if entry[0] > now]
+                if not self.__idle[key]:
+                    del self.__idle[key]
+        self.__discard(discarded)
+
+    def getStats(self):
+        """Counters of the kept, reused and discarded transports, and number of idle ones"""
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["Idle"] = sum(len(idleList) for idleList in self.__idle.values())
+        return stats
+
+
 gTransportPool = None
+gIdleTransportPool = None
 
 
 def getGlobalTransportPool():
@@ -162,3 +299,10 @@ def getGlobalTransportPool():
     if not gTransportPool:
         gTransportPool = TransportPool()
     return gTransportPool
+
+
+def getGlobalIdleTransportPool():
+    global gIdleTransportPool
+    if not gIdleTransportPool:
+        gIdleTransportPool = IdleTransportPool()
+    return gIdleTransportPool
@@ -18,7 +18,6 @@ Client <- RequestHandler : Response
 Client <- Service        : Close
 """
 import time
-from io import BytesIO
 from hashlib import md5
 
 import selectors
@@ -54,6 +53,8 @@ class BaseTransport:
         self.sentKeepAlives = 0
         self.waitingForKeepAlivePong = False
         self.__keepAliveLapse = 0
+        # False while a message is partially sent or received
+        self.__inSync = True
         self.oSocket = None
         if "keepAliveLapse" in kwargs:
             try:
@@ -73,6 +74,12 @@ class BaseTransport:
     def getKeepAliveLapse(self):
         return self.__keepAliveLapse
 
+    def isInSync(self):
+        """Did the last send and receive go through completely, so that both ends agree
+        on where the next message starts (i.e. can the connection be used for another exchange)
+        """
+        return self.__inSync and not self.byteStream and not self.receivedMessages
+
     def handshake(self):
         """This method is overwritten by SSLTransport if we use a secured transport."""
         return S_OK()
@@ -159,34 +166,73 @@ class BaseTransport:
     def _write(self, buf):
         return S_OK(self.oSocket.send(buf))
 
+    def __sendPacket(self, packet):
+        """Write a whole packet to the peer, handling partial writes
+
+        :param packet: bytes-like object to send
+
+        :returns: S_OK()/S_ERROR()
+        """
+        packView = memoryview(packet)
+        packSentBytes = 0
+        while packSentBytes < len(packView):
+            try:
+                result = self._write(packView[packSentBytes:])
+                if not result["OK"]:
+                    return result
+                sentBytes = result["Value"]
+            except Exception as e:
+                return S_ERROR("Exception while sending data: %s" % e)
+            if sentBytes == 0:
+                return S_ERROR("Connection closed by peer")
+            packSentBytes += sentBytes
+        return S_OK()
+
     def sendData(self, uData, prefix=b""):
+        """Encode and send uData to the peer
+
+        The encoded tokens are streamed in packets of ``packetSize`` bytes,
+        so the full payload (with its length prefix) is never joined in memory.
+        """
         self.__updateLastActionTimestamp()
-        sCodedData = MixedEncode.encode(uData)
-        if isinstance(sCodedData, str):
-            sCodedData = sCodedData.encode()
-        dataToSend = b"".join([prefix, str(len(sCodedData)).encode(), b":", sCodedData])
-        for index in range(0, len(dataToSend), self.packetSize):
-            bytesToSend = min(self.packetSize, len(dataToSend) - index)
-            packSentBytes = 0
-            while packSentBytes < bytesToSend:
-                try:
-                    result = self._write(dataToSend[index + packSentBytes : index + bytesToSend])
-                    if not result["OK"]:
-                        return result
-                    sentBytes = result["Value"]
-                except Exception as e:
-                    return S_ERROR("Exception while sending data: %s" % e)
-                if sentBytes == 0:
-                    return S_ERROR("Connection closed by peer")
-                packSentBytes += sentBytes
-        del sCodedData
-        sCodedData = None
+        self.__inSync = False
+        tokens = MixedEncode.encodeTokens(uData)
+        dataSize = sum(len(token) for token in tokens)
+        # Small tokens are grouped until they fill a packet
+        pending = [prefix, b"%d:" % dataSize]
+        pendingSize = sum(len(token) for token in pending)
+        for token in tokens:
+            if len(token) < self.packetSize:
+                pending.append(token)
+                pendingSize += len(token)
+                if pendingSize < self.packetSize:
+                    continue
+                token = b""
+            if pending:
+                result = self.__sendPacket(b"".join(pending))
+                if not result["OK"]:
+                    return result
+                pending = []
+                pendingSize = 0
+            # Large tokens are sent straight from their own buffer
+            tokenView = memoryview(token)
+            for index in range(0, len(tokenView), self.packetSize):
+                result = self.__sendPacket(tokenView[index : index + self.packetSize])
+                if not result["OK"]:
+                    return result
+        del tokens
+        if pending:
+            result = self.__sendPacket(b"".join(pending))
+            if not result["OK"]:
+                return result
+        self.__inSync = True
         return S_OK()
 
     def receiveData(self, maxBufferSize=0, blockAfterKeepAlive=True, idleReceive=False):
         self.__updateLastActionTimestamp()
         if self.receivedMessages:
             return self.receivedMessages.pop(0)
+        self.__inSync = False
         # Buffer size can't be less than 0
         maxBufferSize = max(maxBufferSize, 0)
         try:
@@ -220,6 +266,9 @@ class BaseTransport:
             # From here it must be a real message!
             # Process the size and remove the msg length from the bytestream
             pkgSize = int(self.byteStream[:iSeparatorPosition])
+            # Do not trust the announced size before allocating for it
+            if maxBufferSize and pkgSize > maxBufferSize:
+                return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
             pkgData = self.byteStream[iSeparatorPosition + 1 :]
             readSize = len(pkgData)
             if readSize >= pkgSize:
@@ -227,33 +276,31 @@ class BaseTransport:
                 data = pkgData[:pkgSize]
                 self.byteStream = pkgData[pkgSize:]
             else:
-                # If we still need to read stuff
-                pkgMem = BytesIO()
-                pkgMem.write(pkgData)
+                # If we still need to read stuff, grow the buffer with the data actually received:
+                # the announced size is not trusted for allocating it, nor for the size of the reads
+                data = bytearray(pkgData)
+                self.byteStream = b""
+                del pkgData
                 # Receive while there's still data to be received
-                while readSize < pkgSize:
-                    retVal = self._read(pkgSize - readSize, skipReadyCheck=True)
+                while len(data) < pkgSize:
+                    retVal = self._read(min(pkgSize - len(data), self.packetSize), skipReadyCheck=True)
                     if not retVal["OK"]:
                         return retVal
                     if not retVal["Value"]:
                         return S_ERROR("Peer closed connection")
                     rcvData = retVal["Value"]
-                    readSize += len(rcvData)
-                    pkgMem.write(rcvData)
-                    if maxBufferSize and readSize > maxBufferSize:
+                    # Never more than pkgSize - len(data) is requested, but be defensive
+                    missingSize = pkgSize - len(data)
+                    data += rcvData[:missingSize]
+                    if missingSize < len(rcvData):
+                        self.byteStream = rcvData[missingSize:]
+                    if maxBufferSize and len(data) > maxBufferSize:
                         return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
-                # Data is here! take it out from the bytestream, dencode and return
-                if readSize == pkgSize:
-                    data = pkgMem.getvalue()
-                    self.byteStream = b""
-                else:  # readSize > pkgSize:
-                    pkgMem.seek(0, 0)
-                    data = pkgMem.read(pkgSize)
-                    self.byteStream = pkgMem.read()
             try:
                 data = MixedEncode.decode(data)[0]
             except Exception as e:
                 return S_ERROR("Could not decode received data: %s" % str(e))
+            self.__inSync = True
             if idleReceive:
                 self.receivedMessages.append(data)
                 return S_OK()
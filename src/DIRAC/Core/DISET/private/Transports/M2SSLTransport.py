@@ -4,12 +4,15 @@ M2Crypto SSLTransport Library
 """
 import os
 import socket
-from M2Crypto import SSL, threading as M2Threading
+import threading
+import time
+from M2Crypto import SSL, m2, threading as M2Threading
 from M2Crypto.SSL.Checker import SSLVerificationError
+from M2Crypto.SSL.Session import Session
 
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
-from DIRAC.Core.DISET.private.Transports.SSL.M2Utils import getM2SSLContext, getM2PeerInfo
+from DIRAC.Core.DISET.private.Transports.SSL.M2Utils import getM2SSLContext, getM2PeerInfo, getM2CredentialsKey
 
 from DIRAC.Core.DISET import DEFAULT_CONNECTION_TIMEOUT, DEFAULT_RPC_TIMEOUT
 
@@ -24,6 +27,23 @@ M2Threading.init()
 
 # TODO: Log useful messages to the logger
 
+# Maximum number of seconds during which a client tries to resume a TLS session,
+# whatever the lifetime granted by the server
+SESSION_CACHE_LIFETIME = 600
+
+# Client side cache of the TLS sessions, so that reconnecting to a server
+# does not require a full handshake: (host, port, credentials key) -> (expiration, session)
+_sessionCache = {}
+_sessionCacheLock = threading.Lock()
+
+# Server side cache of the peer credentials, as the certificate chain of the clients is not
+# available when they resume their session: peer certificate fingerprint -> (expiration, credentials)
+_peerInfoCache = {}
+_peerInfoCacheLock = threading.Lock()
+_peerInfoCachePurgeTime = 0
+# Period at which the expired credentials are removed from the cache
+PEER_INFO_CACHE_PURGE = 60
+
 
 class SSLTransport(BaseTransport):
     """SSL Transport implementation using the M2Crypto library."""
@@ -105,6 +125,55 @@ class SSLTransport(BaseTransport):
         """
         self.__timeout = timeout
 
+    def __getCachedSession(self):
+        """Get the TLS session to resume with this server and credentials, if any"""
+        with _sessionCacheLock:
+            expiration, session = _sessionCache.get(self.__sessionKey, (0, None))
+            if expiration < time.time():
+                _sessionCache.pop(self.__sessionKey, None)
+                return None
+        return session
+
+    def __cacheSession(self):
+        """Keep the session of this (client) connection, to resume it at the next connection"""
+        try:
+            # SSL.Connection.get_session does not take a reference on the session it frees later,
+            # so take one explicitly, which the Session object releases
+            sessionPtr = m2.ssl_get1_session(self.oSocket.ssl)
+            if not sessionPtr:
+                return
+            session = Session(sessionPtr, _pyfree=1)
+            lifeTime = min(m2.ssl_session_get_timeout(sessionPtr), SESSION_CACHE_LIFETIME)
+        except Exception:
+            return
+        with _sessionCacheLock:
+            _sessionCache[self.__sessionKey] = (time.time() + lifeTime, session)
+
+    def __getPeerInfo(self):
+        """Get the credentials of the peer (server side).
+
+        When a client resumes its TLS session, only its certificate is known, not the chain
+        it was verified with: the credentials obtained at the full handshake are then used.
+        """
+        peerCert = self.oSocket.get_peer_cert()
+        if peerCert is not None and self.oSocket.get_peer_cert_chain() is None:
+            with _peerInfoCacheLock:
+                expiration, peerInfo = _peerInfoCache.get(peerCert.get_fingerprint("sha256"), (0, None))
+            if expiration > time.time():
+                return dict(peerInfo)
+        peerInfo = getM2PeerInfo(self.oSocket)
+        if peerCert is not None:
+            global _peerInfoCachePurgeTime
+            now = time.time()
+            with _peerInfoCacheLock:
+                # The credentials are kept at least as long as the session can be resumed
+                _peerInfoCache[peerCert.get_fingerprint("sha256")] = (now + self.__ctx.get_session_timeout(), peerInfo)
+                if now - _peerInfoCachePurgeTime > PEER_INFO_CACHE_PURGE:
+                    _peerInfoCachePurgeTime = now
+                    for fingerprint in [fp for fp, (exp, _) in _peerInfoCache.items() if exp < now]:
+                        del _peerInfoCache[fingerprint]
+        return dict(peerInfo)
+
     def initAsClient(self):
         """Prepare this client socket for use."""
         if self.serverMode():
@@ -112,6 +181,7 @@ class SSLTransport(BaseTransport):
 
         error = None
         host, port = self.stServerAddress
+        self.__sessionKey = (host, port) + getM2CredentialsKey(**self.__kwargs)
 
         # The following piece of code was inspired by the python socket documentation
         # as well as the implementation of M2Crypto.httpslib.HTTPSConnection
@@ -136,6 +206,12 @@ class SSLTransport(BaseTransport):
                 # set SNI server name since we know it at this point
                 self.oSocket.set_tlsext_host_name(host)
 
+                # Resume the TLS session of a previous connection to this server, if any.
+                # The server falls back to a full handshake if it does not know it anymore
+                session = self.__getCachedSession()
+                if session:
+                    self.oSocket.set_session(session)
+
                 self.oSocket.connect((host, port))
 
                 # Once the connection is established, we can use the timeout
@@ -183,6 +259,10 @@ class SSLTransport(BaseTransport):
         """Close this socket."""
 
         if self.oSocket:
+            # Keep the TLS session of the client connections for the next ones
+            if not self.serverMode() and self.remoteAddress:
+                self.__cacheSession()
+
             # TL;DR:
             # Do NOT touch that method
             #
@@ -327,7 +407,7 @@ class SSLTransport(BaseTransport):
                 if not check(self.oSocket.get_peer_cert(), self.oSocket.addr[0]):
                     raise SSL.Checker.SSLVerificationError("post connection check failed")
 
-            self.peerCredentials = getM2PeerInfo(self.oSocket)
+            self.peerCredentials = self.__getPeerInfo()
 
             # Now that the handshake has been performed on the server
             # we can set the timeout for the RPC operations.
@@ -359,7 +439,7 @@ class SSLTransport(BaseTransport):
 
         self.oSocket = oSocket
         self.remoteAddress = self.oSocket.getpeername()
-        self.peerCredentials = getM2PeerInfo(self.oSocket)
+        self.peerCredentials = self.__getPeerInfo()
 
     def setClientSocket_multipleSteps(self, oSocket):
         """Set the inner socket (i.e. SSL.Connection object) of this instance
@@ -2,6 +2,7 @@
 """
 Utilities for using M2Crypto SSL with DIRAC.
 """
+import hashlib
 import os
 import tempfile
 from M2Crypto import SSL, m2, X509
@@ -12,6 +13,8 @@ from DIRAC.Core.Security.m2crypto.X509Chain import X509Chain
 
 # Verify depth of peer certs
 VERIFY_DEPTH = 50
+# Not exposed by all the M2Crypto versions, but part of the stable OpenSSL API
+SSL_OP_NO_TICKET = getattr(m2, "SSL_OP_NO_TICKET", 0x00004000)
 DEBUG_M2CRYPTO = os.getenv("DIRAC_DEBUG_M2CRYPTO", "No").lower() in ("yes", "true")
 
 
@@ -61,6 +64,31 @@ def ssl_verify_callback_print_error(ok, store):
     return ok
 
 
+def getM2CredentialsKey(**kwargs):
+    """Identify the credentials that getM2SSLContext would load for a client
+    given the same DIRAC connection keywords.
+
+    The proxy file is identified by its path and modification time, so that
+    the key changes when the proxy is renewed or replaced by another one.
+
+    Returns a hashable tuple.
+    """
+    if kwargs.get("useCertificates", False):
+        credentials = ("hostcert",)
+    elif kwargs.get("proxyString", None):
+        proxyString = kwargs["proxyString"]
+        if isinstance(proxyString, str):
+            proxyString = proxyString.encode()
+        credentials = ("proxyString", hashlib.sha256(proxyString).hexdigest())
+    else:
+        proxyPath = kwargs.get("proxyLocation", None) or Locations.getProxyLocation()
+        try:
+            credentials = ("proxy", proxyPath, os.stat(proxyPath).st_mtime if proxyPath else None)
+        except OSError:
+            credentials = ("proxy", proxyPath, None)
+    return credentials + (bool(kwargs.get("skipCACheck", False)),)
+
+
 def getM2SSLContext(ctx=None, **kwargs):
     """Gets an M2Crypto.SSL.Context configured using the standard
     DIRAC connection keywords from kwargs. The keywords are:
@@ -77,6 +105,8 @@ def getM2SSLContext(ctx=None, **kwargs):
                             cipher format, e.g. "SSLv3:TLSv1".
       - sslCiphers: String, OpenSSL style cipher string of ciphers to allow
                             on this connection.
+      - SSLSessionTimeout: Integer, number of seconds during which a server
+                           accepts to resume a TLS session.
 
     If an existing context "ctx" is provided, it is just reconfigured with
     the selected arguments.
@@ -155,6 +185,14 @@ def getM2SSLContext(ctx=None, **kwargs):
     ciphers = kwargs.get("sslCiphers", DEFAULT_SSL_CIPHERS)
     ctx.set_cipher_list(ciphers)
 
+    if kwargs.get("bServerMode", False):
+        # Lifetime of the sessions that the clients can resume
+        if kwargs.get("SSLSessionTimeout"):
+            ctx.set_session_timeout(int(kwargs["SSLSessionTimeout"]))
+        # Sessions are only resumed from the session cache of the process which created them (and knows
+        # the credentials of the client), not from tickets which any clone of the service could decrypt
+        ctx.set_options(SSL_OP_NO_TICKET)
+
     # log the debug messages
     if DEBUG_M2CRYPTO:
         ctx.set_info_callback()
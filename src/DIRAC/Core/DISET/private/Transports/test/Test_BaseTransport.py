@@ -0,0 +1,101 @@
+""" Test the streaming send/receive of BaseTransport """
+import socket
+import threading
+import tracemalloc
+
+from pytest import fixture, mark
+
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+parametrize = mark.parametrize
+
+# A payload a few times bigger than the packet size used in the tests
+BIG_PAYLOAD = {"OK": True, "Value": {f"/vo/data/file_{i}": {"Size": i, "SE": ["SE-1", "SE-2"]} for i in range(5000)}}
+
+
+@fixture
+def transportPair():
+    """Two connected PlainTransport objects with a small packet size"""
+    serverSocket, clientSocket = socket.socketpair()
+    transports = []
+    for oSocket in (serverSocket, clientSocket):
+        transport = PlainTransport(("", 0))
+        transport.oSocket = oSocket
+        transport.packetSize = 4096
+        transports.append(transport)
+    yield transports
+    for transport in transports:
+        transport.oSocket.close()
+
+
+@parametrize("useJSON", ["Yes", "No"])
+@parametrize("payload", ["small", BIG_PAYLOAD, ["x" * 20000, "y" * 10]])
+def test_sendReceive(transportPair, monkeypatch, useJSON, payload):
+    """Whatever the payload size, what is received is what was sent"""
+    monkeypatch.setenv("DIRAC_USE_JSON_ENCODE", useJSON)
+    sender, receiver = transportPair
+    result = {}
+
+    # The socket buffer is smaller than the payload, so send from another thread
+    thread = threading.Thread(target=lambda: result.update(sender.sendData(payload)))
+    thread.start()
+    received = receiver.receiveData()
+    thread.join()
+
+    assert result["OK"], result
+    assert received == payload
+
+
+def test_consecutiveMessages(transportPair):
+    """Several messages sent back to back are received separately"""
+    sender, receiver = transportPair
+    messages = [BIG_PAYLOAD, "second", {"third": [1, 2, 3]}]
+
+    def sendAll():
+        for message in messages:
+            assert sender.sendData(message)["OK"]
+
+    thread = threading.Thread(target=sendAll)
+    thread.start()
+    received = [receiver.receiveData() for _ in messages]
+    thread.join()
+
+    assert received == messages
+
+
+def test_inSync(transportPair):
+    """A transport is in sync only between complete messages"""
+    sender, receiver = transportPair
+    assert sender.sendData("first")["OK"]
+    assert sender.isInSync()
+    assert receiver.receiveData() == "first"
+    assert receiver.isInSync()
+    # The end of the message is missing
+    sender.oSocket.send(b"10:[")
+    receiver.oSocket.settimeout(0.1)
+    assert not receiver.receiveData()["OK"]
+    assert not receiver.isInSync()
+
+
+def test_announcedSizeOverLimit(transportPair):
+    """A message announcing more than the read limit is refused before reading or allocating it"""
+    sender, receiver = transportPair
+    sender.oSocket.send(b"999999999:[")
+    result = receiver.receiveData(1024)
+    assert not result["OK"]
+    assert "Read limit exceeded" in result["Message"]
+
+
+def test_announcedSizeNotAllocated(transportPair):
+    """Without read limit, only the data actually received is allocated, whatever the announced size"""
+    sender, receiver = transportPair
+    sender.oSocket.send(b"500000000:[" + b"1," * 10000)
+    sender.oSocket.close()
+    tracemalloc.start()
+    try:
+        result = receiver.receiveData()
+        peakSize = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert not result["OK"]
+    assert peakSize < 1024 * 1024
@@ -0,0 +1,160 @@
+""" Test the RPC connections kept open between calls, on a local service using the PlainTransport
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.TransportPool import IdleTransportPool, getGlobalIdleTransportPool, getGlobalTransportPool
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+
+class EchoService(Service):
+    """Service answering its arguments, without handler nor authorization"""
+
+    def __init__(self, keepConnectionTime):
+        self._name = "Test/Echo"
+        self._validNames = [self._name]
+        self._cfg = MagicMock()
+        self._cfg.getKeepConnectionTime.return_value = keepConnectionTime
+        self._lockManager = MagicMock()
+        self._transportPool = getGlobalTransportPool()
+        self._threadPool = ThreadPoolExecutor(4)
+        self._Service__maxFD = 0
+        self._Service__monitorLastStatsUpdate = time.time()
+        self.activityMonitoring = False
+        self.proposals = 0
+
+    def _authorizeProposal(self, actionTuple, trid, credDict):
+        return S_OK()
+
+    def _instantiateHandler(self, trid, proposalTuple=None):
+        return S_OK(None)
+
+    def _executeAction(self, trid, proposalTuple, handlerObj):
+        self.proposals += 1
+        args = self._transportPool.receive(trid)["Value"]
+        return self._transportPool.send(trid, S_OK(args))
+
+
+class EchoServer:
+    """Accept the connections and serve them with an EchoService"""
+
+    def __init__(self, keepConnectionTime):
+        self.service = EchoService(keepConnectionTime)
+        self.listener = PlainTransport(("", 0), bServerMode=True)
+        assert self.listener.initAsServer()["OK"]
+        self.port = self.listener.getSocket().getsockname()[1]
+        self.connections = 0
+        self.__alive = True
+        self.__thread = threading.Thread(target=self.__serve)
+        self.__thread.start()
+
+    def __serve(self):
+        self.listener.getSocket().settimeout(0.1)
+        while self.__alive:
+            try:
+                result = self.listener.acceptConnection()
+            except OSError:
+                continue
+            if result["OK"]:
+                self.connections += 1
+                self.service._threadPool.submit(self.service._processInThread, result["Value"])
+
+    def stop(self):
+        self.__alive = False
+        self.__thread.join()
+        self.listener.close()
+        self.service._threadPool.shutdown()
+
+
+@pytest.fixture
+def echoServer(request):
+    getGlobalIdleTransportPool().clear()
+    server = EchoServer(getattr(request, "param", 10))
+    yield server
+    getGlobalIdleTransportPool().clear()
+    server.stop()
+
+
+def callEcho(server, nbCalls, **kwargs):
+    client = InnerRPCClient(f"dip://127.0.0.1:{server.port}/Test/Echo", **kwargs)
+    for i in range(nbCalls):
+        result = client.executeRPC("echo", (i, "value"))
+        assert result["OK"], result
+        assert result["Value"] == [i, "value"]
+
+
+def test_connectionReused(echoServer):
+    """Consecutive calls, even from different clients, go through a single connection"""
+    callEcho(echoServer, 5)
+    callEcho(echoServer, 5)
+    assert echoServer.service.proposals == 10
+    assert echoServer.connections == 1
+
+
+def test_noKeepConnection(echoServer):
+    """Clients can refuse to keep the connections"""
+    callEcho(echoServer, 3, keepConnection=False)
+    assert echoServer.connections == 3
+
+
+@pytest.mark.parametrize("echoServer", [0], indirect=True)
+def test_serviceNotKeeping(echoServer):
+    """Services can refuse to keep the connections"""
+    callEcho(echoServer, 3)
+    assert echoServer.connections == 3
+    assert getGlobalIdleTransportPool().getStats()["Idle"] == 0
+
+
+@pytest.mark.parametrize("echoServer", [1], indirect=True)
+def test_connectionClosedByService(echoServer, monkeypatch):
+    """The connections closed by the service are not reused"""
+    # Keep the connections longer than the service does
+    monkeypatch.setattr(IdleTransportPool, "KEEP_MARGIN", -5)
+    callEcho(echoServer, 1)
+    time.sleep(1.5)
+    callEcho(echoServer, 1)
+    assert echoServer.connections == 2
+
+
+@pytest.mark.parametrize("echoServer", [1], indirect=True)
+def test_retryAfterClosedConnection(echoServer, monkeypatch):
+    """If the service closed a connection just before it is reused, the call is made on a new connection"""
+    monkeypatch.setattr(IdleTransportPool, "KEEP_MARGIN", -5)
+    monkeypatch.setattr(IdleTransportPool, "_IdleTransportPool__isUsable", staticmethod(lambda transport: True))
+    callEcho(echoServer, 1)
+    time.sleep(1.5)
+    callEcho(echoServer, 1)
+    assert echoServer.service.proposals == 2
+    assert echoServer.connections == 2
+
+
+def test_idleTransportPool():
+    """Transports are handed out once, and not after their expiration"""
+    pool = IdleTransportPool(maxIdle=2)
+    transports = [MagicMock() for _ in range(4)]
+    for transport in transports:
+        transport.isInSync.return_value = True
+        transport.getSocket.return_value = MagicMock(fileno=MagicMock(return_value=-1))
+    # The sockets can not be selected, so check the pool logic only
+    pool._IdleTransportPool__isUsable = lambda transport: True
+
+    pool.put("key", transports[0], 10)
+    pool.put("key", transports[1], 10)
+    pool.put("key", transports[2], 10)
+    transports[2].close.assert_called_once()
+    assert pool.get("other") is None
+    assert pool.get("key") is transports[1]
+    assert pool.get("key") is transports[0]
+    assert pool.get("key") is None
+
+    # Not worth keeping if the service closes it before the margin
+    pool.put("key", transports[3], IdleTransportPool.KEEP_MARGIN)
+    transports[3].close.assert_called_once()
+    assert pool.getStats() == {"Kept": 2, "Reused": 2, "Discarded": 2, "Idle": 0}
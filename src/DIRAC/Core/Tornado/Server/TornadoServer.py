@@ -5,7 +5,10 @@ It may work better with TornadoClient but as it accepts HTTPS you can create you
 
 import time
 import os
+import signal
+import sys
 import asyncio
+import multiprocessing
 import psutil
 
 import M2Crypto
@@ -19,12 +22,15 @@ tornado.iostream.SSLIOStream.configure(
 import tornado.platform.asyncio
 import tornado.ioloop
 from tornado.httpserver import HTTPServer
-from tornado.web import Application, RequestHandler
+from tornado.netutil import bind_sockets
+from tornado.web import Application, RequestHandler, URLSpec
 
 from DIRAC import gConfig, gLogger, S_OK
 from DIRAC.Core.Security import Locations
 from DIRAC.Core.Utilities import Network, TimeUtilities
+from DIRAC.Core.Utilities.ServerUtils import getDBConnectionsMonitoringFields
 from DIRAC.Core.Tornado.Server.HandlerManager import HandlerManager
+from DIRAC.Core.Tornado.Server.private.BaseRequestHandler import BaseRequestHandler, EXECUTION_STATS
 from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
@@ -56,6 +62,18 @@ class TornadoServer:
     * Loaded from the CS ``/Systems/Tornado/<instance>/Port``
     * Default to 8443
 
+    The number of processes serving the requests is either:
+
+    * Given as parameter
+    * Loaded from the CS ``/Systems/Tornado/<instance>/Processes``
+    * Default to 1
+
+    With several processes, the handlers are loaded and the listening sockets are bound
+    before forking the worker processes, which share the sockets.
+    The first process supervises the workers, restarts the ones which die,
+    and reports the monitoring of all of them.
+    As the handlers are initialized at their first request, each worker has its own database connections.
+
 
     Example 1: Easy way to start tornado::
 
@@ -74,7 +92,12 @@ class TornadoServer:
 
     """
 
-    def __init__(self, services=True, endpoints=False, port=None):
+    # A worker dying within this time (in secs) after its start counts as a failed start
+    MIN_WORKER_LIFETIME = 10
+    # Give up if all the workers failed to start this number of times in a row
+    MAX_FAILED_STARTS = 5
+
+    def __init__(self, services=True, endpoints=False, port=None, processes=None):
         """C'r
 
         :param list services: (default True) List of service handlers to load.
@@ -85,6 +108,8 @@ class TornadoServer:
             If ``False``, do not load endpoints
         :param int port: Port to listen to.
             If ``None``, the port is resolved following the logic described in the class documentation
+        :param int processes: Number of processes serving the requests.
+            If ``None``, the number is resolved following the logic described in the class documentation
         """
         self.__startTime = time.time()
         # Application metadata, routes and settings mapping on the ports
@@ -93,6 +118,14 @@ class TornadoServer:
         if port is None:
             port = gConfig.getValue("/Systems/Tornado/%s/Port" % PathFinder.getSystemInstance("Tornado"), 8443)
         self.port = port
+        if processes is None:
+            processes = gConfig.getValue("/Systems/Tornado/%s/Processes" % PathFinder.getSystemInstance("Tornado"), 1)
+        self.processes = max(1, int(processes))
+        # Worker index by pid, only filled in the supervisor process
+        self.__workers = {}
+        # Requests counters and execution statistics of the handlers, shared by the worker processes
+        self.__requestsCounters = {}
+        self.__executionStats = {}
 
         # Handler manager initialization with default settings
         self.handlerManager = HandlerManager(services, endpoints)
@@ -196,23 +229,31 @@ class TornadoServer:
             "sslDebug": DEBUG_M2CRYPTO,  # Set to true if you want to see the TLS debug messages
         }
 
-        # Init monitoring
-        if self.activityMonitoring:
-            from DIRAC.MonitoringSystem.Client.MonitoringReporter import MonitoringReporter
-
-            self.activityMonitoringReporter = MonitoringReporter(monitoringType="ServiceMonitoring")
-            self.__monitorLastStatsUpdate = time.time()
-            self.__report = self.__startReportToMonitoringLoop()
-            # Response time
-            # Starting monitoring, IOLoop waiting time in ms, __monitoringLoopDelay is defined in seconds
-            tornado.ioloop.PeriodicCallback(
-                self.__reportToMonitoring(self.__elapsedTime), self.__monitoringLoopDelay * 1000
-            ).start()
+        # Bind the sockets before forking, so that all the workers accept the connections
+        sockets = {}
+        for port in self.__appsSettings:
+            try:
+                sockets[port] = bind_sockets(int(port))
+            except Exception as e:  # pylint: disable=broad-except
+                sLog.exception("Exception binding port", e)
+                raise
+        self.__initRequestsCounters()
 
         # If we are running with python3, Tornado will use asyncio,
         # and we have to convince it to let us run in a different thread
         asyncio.set_event_loop_policy(tornado.platform.asyncio.AnyThreadEventLoopPolicy())
 
+        if self.processes > 1:
+            # Only returns in the workers, the supervisor reports the monitoring
+            workerIndex = self.__startWorkers()
+            sLog.always("Worker started", f"{workerIndex} (pid {os.getpid()})")
+            # An event loop may have been created before the fork, and must not be shared with the supervisor
+            asyncio.set_event_loop(asyncio.new_event_loop())
+        elif self.activityMonitoring:
+            self.__initMonitoring()
+            # Starting monitoring, IOLoop waiting time in ms, __monitoringLoopDelay is defined in seconds
+            tornado.ioloop.PeriodicCallback(self.__reportToMonitoring, self.__monitoringLoopDelay * 1000).start()
+
         for port, app in self.__appsSettings.items():
             sLog.debug(" - %s" % "\n - ".join([f"{k} = {ssl_options[k]}" for k in ssl_options]))
 
@@ -224,16 +265,123 @@ class TornadoServer:
             # Start server
             router = Application(app["routes"], default_handler_class=NotFoundHandler, **settings)
             server = HTTPServer(router, ssl_options=ssl_options, decompress_request=True)
-            try:
-                server.listen(int(port))
-            except Exception as e:  # pylint: disable=broad-except
-                sLog.exception("Exception starting HTTPServer", e)
-                raise
+            server.add_sockets(sockets[port])
             sLog.always("Listening on port %s" % port)
 
         tornado.ioloop.IOLoop.current().start()
 
-    def __reportToMonitoring(self, responseTime):
+    def __initRequestsCounters(self):
+        """Give each DIRAC handler a requests counter, and execution statistics for each of its target methods,
+        shared by the worker processes
+        """
+        for app in self.__appsSettings.values():
+            for route in app["routes"]:
+                handler = route.target if isinstance(route, URLSpec) else route[1]
+                if not (isinstance(handler, type) and issubclass(handler, BaseRequestHandler)):
+                    continue
+                if handler not in self.__requestsCounters:
+                    handler._requestsCounter = multiprocessing.Value("L", 0)
+                    self.__requestsCounters[handler] = handler._requestsCounter
+                    # The statistics of the methods of a handler share one lock
+                    lock = multiprocessing.RLock()
+                    handler._executionStats = {
+                        methodName: multiprocessing.Array("d", len(EXECUTION_STATS), lock=lock)
+                        for methodName in handler._getTargetMethodNames()
+                    }
+                    self.__executionStats[handler] = handler._executionStats
+
+    def __startWorkers(self):
+        """Fork the worker processes, then supervise them.
+
+        The supervisor restarts the workers which die, and reports the monitoring of all of them.
+        It exits after stopping the workers when receiving SIGTERM or SIGINT,
+        or when the workers keep dying at start.
+
+        :returns: the index of the worker, only in the worker processes
+        """
+        for workerIndex in range(self.processes):
+            if self.__forkWorker(workerIndex):
+                return workerIndex
+        sLog.always("Supervising the workers", f"{self.processes} processes")
+
+        stopSignals = []
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, _frame: stopSignals.append(signum))
+        if self.activityMonitoring:
+            self.__initMonitoring()
+        nextReport = time.time() + self.__monitoringLoopDelay
+        failedStarts = 0
+
+        while not stopSignals:
+            time.sleep(1)
+            while self.__workers:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if not pid:
+                    break
+                if pid not in self.__workers:
+                    continue
+                workerIndex, startTime = self.__workers.pop(pid)
+                sLog.error(
+                    "Worker died, restarting it",
+                    f"{workerIndex} (pid {pid}, exit code {os.waitstatus_to_exitcode(status)})",
+                )
+                if time.time() - startTime < self.MIN_WORKER_LIFETIME:
+                    failedStarts += 1
+                    if failedStarts >= self.MAX_FAILED_STARTS * self.processes:
+                        sLog.fatal("The workers keep dying at start, stopping")
+                        self.__stopWorkers()
+                        sys.exit(1)
+                else:
+                    failedStarts = 0
+                if self.__forkWorker(workerIndex):
+                    return workerIndex
+            if self.activityMonitoring and time.time() >= nextReport:
+                self.__reportToMonitoring()
+                nextReport = time.time() + self.__monitoringLoopDelay
+
+        sLog.always("Stopping the workers", f"signal {stopSignals[0]}")
+        self.__stopWorkers()
+        sys.exit(0)
+
+    def __forkWorker(self, workerIndex):
+        """Fork a worker process
+
+        :param int workerIndex: index of the worker, kept when it is restarted
+
+        :returns: True in the worker, False in the supervisor
+        """
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            self.__workers = {}
+            return True
+        self.__workers[pid] = (workerIndex, time.time())
+        return False
+
+    def __stopWorkers(self):
+        """Terminate the worker processes and wait for them"""
+        for pid in self.__workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in self.__workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.__workers = {}
+
+    def __initMonitoring(self):
+        """Create the reporter and take the first snapshot of the resources"""
+        from DIRAC.MonitoringSystem.Client.MonitoringReporter import MonitoringReporter
+
+        self.activityMonitoringReporter = MonitoringReporter(monitoringType="ServiceMonitoring")
+        self.__monitorLastStatsUpdate = time.time()
+        self.__report = self.__startReportToMonitoringLoop()
+
+    def __reportToMonitoring(self):
         """
         Periodically reports to Monitoring
         """
@@ -241,53 +389,123 @@ class TornadoServer:
         # Calculate CPU usage by comparing realtime and cpu time since last report
         percentage = self.__endReportToMonitoringLoop(self.__report[0], self.__report[1])
         # Send record to Monitoring
-        self.activityMonitoringReporter.addRecord(
-            {
-                "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
-                "Host": Network.getFQDN(),
-                "ServiceName": "Tornado",
-                "MemoryUsage": self.__report[2],
-                "CpuPercentage": percentage,
-                "ResponseTime": responseTime,
-            }
-        )
+        record = {
+            "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
+            "Host": Network.getFQDN(),
+            "ServiceName": "Tornado",
+            "MemoryUsage": self.__report[2],
+            "CpuPercentage": percentage,
+            "ResponseTime": self.__elapsedTime,
+        }
+        record.update(getDBConnectionsMonitoringFields())
+        self.activityMonitoringReporter.addRecord(record)
+        # Requests served by each handler, in all the workers
+        for handler, counter in self.__requestsCounters.items():
+            with counter.get_lock():
+                queries, counter.value = counter.value, 0
+            serviceName = "_".join(getattr(handler, "_fullComponentName", handler.__name__).split("/"))
+            self.activityMonitoringReporter.addRecord(
+                {
+                    "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
+                    "Host": Network.getFQDN(),
+                    "ServiceName": serviceName,
+                    "Location": "Tornado",
+                    "Queries": queries,
+                }
+            )
+            # Execution statistics of each method called since the last report
+            for methodName, executionStats in sorted(self.__executionStats[handler].items()):
+                if not (fields := self.__getExecutionMonitoringFields(executionStats)):
+                    continue
+                record = {
+                    "timestamp": int(TimeUtilities.toEpochMilliSeconds()),
+                    "Host": Network.getFQDN(),
+                    "ServiceName": serviceName,
+                    "MethodName": methodName,
+                    "Location": "Tornado",
+                }
+                record.update(fields)
+                self.activityMonitoringReporter.addRecord(record)
         self.activityMonitoringReporter.commit()
         # Save memory usage and save realtime/CPU time for next call
         self.__report = self.__startReportToMonitoringLoop()
 
+    @staticmethod
+    def __getExecutionMonitoringFields(executionStats):
+        """Get the execution statistics of a method since the last report as monitoring fields, and reset them:
+        number of rejected requests (RejectedQueries), mean and maximum time waiting for a thread
+        (WaitTime, MaxWaitTime) and mean execution time (ExecutionTime), in ms
+
+        :param executionStats: shared array of the statistics, see BaseRequestHandler._executionStats
+        :returns: dict, empty if the method was not called
+        """
+        with executionStats.get_lock():
+            stats = dict(zip(EXECUTION_STATS, executionStats[:]))
+            executionStats[:] = [0.0] * len(EXECUTION_STATS)
+        if not stats["Executed"] and not stats["Rejected"]:
+            return {}
+        executed = max(stats["Executed"], 1)
+        return {
+            "RejectedQueries": int(stats["Rejected"]),
+            "WaitTime": int(1000 * stats["WaitTime"] / executed),
+            "MaxWaitTime": int(1000 * stats["MaxWaitTime"]),
+            "ExecutionTime": int(1000 * stats["ExecutionTime"] / executed),
+        }
+
+    def __getMonitoredProcesses(self):
+        """The processes serving the requests: the workers if any, the current process otherwise
+
+        :returns: list of psutil.Process
+        """
+        if not self.__workers:
+            return [psutil.Process()]
+        processes = []
+        for pid in self.__workers:
+            try:
+                processes.append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                pass
+        return processes
+
+    def __getResourceUsage(self):
+        """CPU time (in secs) and memory (in MB) used by the processes serving the requests
+
+        :returns: tuple (cpuTime, memory)
+        """
+        cpuTime = 0.0
+        memory = 0.0
+        for process in self.__getMonitoredProcesses():
+            try:
+                cpuTimes = process.cpu_times()
+                cpuTime += cpuTimes.user + cpuTimes.system
+                memory += process.memory_info().rss / (1024.0 * 1024.0)
+            except psutil.NoSuchProcess:
+                pass
+        return cpuTime, memory
+
     def __startReportToMonitoringLoop(self):
         """
         Snapshot of resources to be taken at the beginning
         of a monitoring cycle.
-        Also sends memory snapshot to the monitoring.
+        With several processes, the resources of all the workers are summed.
 
-        This is basically copy/paste of Service.py
-
-        :returns: tuple (<time.time(), cpuTime )
+        :returns: tuple (<time.time(), cpuTime, memory)
 
         """
         now = time.time()  # Used to calulate a delta
-        stats = os.times()
-        cpuTime = stats[0] + stats[2]
-        if now - self.__monitorLastStatsUpdate < 0:
-            return (now, cpuTime)
-        # Send CPU consumption mark
         self.__monitorLastStatsUpdate = now
-        # Send Memory consumption mark
-        mem = psutil.Process().memory_info().rss / (1024.0 * 1024.0)
-        return (now, cpuTime, mem)
+        cpuTime, memory = self.__getResourceUsage()
+        return (now, cpuTime, memory)
 
     def __endReportToMonitoringLoop(self, initialWallTime, initialCPUTime):
         """
         Snapshot of resources to be taken at the end
         of a monitoring cycle.
 
-        This is basically copy/paste of Service.py
-
-        Determines CPU usage by comparing walltime and cputime and send it to monitor
+        Determines CPU usage by comparing walltime and cputime and send it to monitor.
+        The CPU time of the workers restarted during the cycle is lost, hence the percentage is at least 0.
         """
         wallTime = time.time() - initialWallTime
-        stats = os.times()
-        cpuTime = stats[0] + stats[2] - initialCPUTime
-        percentage = cpuTime / wallTime * 100.0
+        cpuTime = self.__getResourceUsage()[0] - initialCPUTime
+        percentage = max(0.0, cpuTime / wallTime * 100.0)
         return percentage
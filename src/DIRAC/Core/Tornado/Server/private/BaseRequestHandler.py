@@ -26,9 +26,14 @@ from DIRAC.Core.DISET.AuthManager import AuthManager
 from DIRAC.Core.Utilities.JEncode import decode, encode
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
 from DIRAC.Core.Security.X509Chain import X509Chain  # pylint: disable=import-error
+from DIRAC.Core.Tornado.Server.private.BoundedExecutor import BoundedExecutor, ExecutorFullError
 from DIRAC.Resources.IdProvider.Utilities import getProvidersForInstance
 from DIRAC.Resources.IdProvider.IdProviderFactory import IdProviderFactory
 
+# Fields of the execution statistics of a method: number of executed and of rejected requests,
+# total and maximum time spent waiting for a thread, total execution time, in seconds
+EXECUTION_STATS = ("Executed", "Rejected", "WaitTime", "MaxWaitTime", "ExecutionTime")
+
 
 def set_attribute(attr, val):
     """Decorator to determine target method settings. Set method attribute.
@@ -259,7 +264,7 @@ class BaseRequestHandler(RequestHandler):
     If all goes well, then a method is executed,
     the name of which coincides with the name of the request method (e.g.: :py:meth:`get`) which does:
 
-        - execute the target method in an executor a separate thread.
+        - execute the target method in an executor a separate thread, see :py:meth:`__getExecutor`.
         - defines the arguments of the target method, see :py:meth:`_getMethodArgs`.
         - initialization of the each request, see :py:meth:`initializeRequest`.
         - the result of the target method is processed in the main thread and returned to the client, see :py:meth:`__execute`.
@@ -277,6 +282,16 @@ class BaseRequestHandler(RequestHandler):
 
     # The variable that will contain the result of the request, see __execute method
     __result = None
+    # Time spent by the request waiting for a thread of the executor, see __execute method
+    __waitTime = None
+
+    # Executors of the handler and of its methods, see __getExecutor
+    __executor = None
+    __executors = {}
+    __executorsLock = threading.Lock()
+
+    # Seconds after which the clients may retry the requests rejected because the executor is full
+    RETRY_AFTER = 1
 
     # Below are variables that the developer can OVERWRITE as needed
 
@@ -316,6 +331,12 @@ class BaseRequestHandler(RequestHandler):
     encode = staticmethod(encode)
     decode = staticmethod(decode)
 
+    # Requests counter shared by the worker processes and reported by the TornadoServer
+    _requestsCounter = None
+    # Execution statistics of each target method, shared by the worker processes and reported by the TornadoServer:
+    # method core name -> array indexed by the EXECUTION_STATS fields, see __recordExecutionStats
+    _executionStats = None
+
     @classmethod
     def __pre_initialize(cls) -> list:
         """This method is run by the Tornado server to prepare the handler for launch,
@@ -469,12 +490,83 @@ class BaseRequestHandler(RequestHandler):
 
             cls._componentInfoDict = cls._getComponentInfoDict(cls._fullComponentName, absoluteUrl)
 
+            cls.__initExecutors()
+
             cls.initializeHandler(cls._componentInfoDict)
 
             cls.__init_done = True
 
             return S_OK()
 
+    @classmethod
+    def __initExecutors(cls):
+        """Create the executor of the handler, if ``MaxThreads`` is defined in its CS section.
+        It queues at most ``MaxWaitingPetitions`` (default 100) requests waiting for a thread.
+        Otherwise, the methods are executed in the default executor of the IOLoop, shared by all the handlers.
+        """
+        cls.__executors = {}
+        cls.__executor = None
+        if (maxThreads := cls.srv_getCSOption("MaxThreads", 0)) > 0:
+            cls.__executor = BoundedExecutor(maxThreads, cls.srv_getCSOption("MaxWaitingPetitions", 100), cls.__name__)
+
+    @classmethod
+    def __getExecutor(cls, methodName: str):
+        """Get the executor of a method.
+
+        The methods with ``ThreadLimit/<method>`` defined in the CS section of the handler have their own executor,
+        which queues at most ``WaitingPetitionsLimit/<method>`` requests (default ``MaxWaitingPetitions``),
+        so that slow methods can not delay the others.
+        Otherwise, the executor of the handler is used.
+
+        :param methodName: target method core name
+
+        :returns: executor, None for the default executor of the IOLoop
+        """
+        with cls.__executorsLock:
+            if methodName not in cls.__executors:
+                executor = cls.__executor
+                if (maxThreads := cls.srv_getCSOption(f"ThreadLimit/{methodName}", 0)) > 0:
+                    maxWaiting = cls.srv_getCSOption(
+                        f"WaitingPetitionsLimit/{methodName}", cls.srv_getCSOption("MaxWaitingPetitions", 100)
+                    )
+                    executor = BoundedExecutor(maxThreads, maxWaiting, f"{cls.__name__}.{methodName}")
+                cls.__executors[methodName] = executor
+            return cls.__executors[methodName]
+
+    @classmethod
+    def _getTargetMethodNames(cls) -> set:
+        """Get the core names of the target methods of the handler, before any request, see :py:meth:`_getMethod`
+
+        :returns: set of method names
+        """
+        prefixes = tuple([cls.METHOD_PREFIX] if cls.METHOD_PREFIX else [f"{m.lower()}_" for m in cls.SUPPORTED_METHODS])
+        return {
+            name[name.find("_") + 1 :]
+            for name, _ in inspect.getmembers(cls, callable)
+            if name.startswith(prefixes) and not hasattr(RequestHandler, name)
+        }
+
+    @classmethod
+    def __recordExecutionStats(cls, methodName: str, waitTime: float = 0.0, executionTime: float = 0.0, rejected=False):
+        """Record the execution of a method in :py:attr:`_executionStats`, if the TornadoServer reports them
+
+        :param methodName: target method core name
+        :param waitTime: seconds spent waiting for a thread of the executor
+        :param executionTime: seconds spent executing the method
+        :param rejected: True if the request was rejected because the executor was full
+        """
+        if cls._executionStats is None or (stats := cls._executionStats.get(methodName)) is None:
+            return
+        with stats.get_lock():
+            if rejected:
+                stats[EXECUTION_STATS.index("Rejected")] += 1
+                return
+            stats[EXECUTION_STATS.index("Executed")] += 1
+            stats[EXECUTION_STATS.index("WaitTime")] += waitTime
+            maxWaitTime = EXECUTION_STATS.index("MaxWaitTime")
+            stats[maxWaitTime] = max(stats[maxWaitTime], waitTime)
+            stats[EXECUTION_STATS.index("ExecutionTime")] += executionTime
+
     @classmethod
     def initializeHandler(cls, componentInfo: dict):
         """This method for handler initializaion. This method is called only one time,
@@ -525,6 +617,9 @@ class BaseRequestHandler(RequestHandler):
         CAN be implemented by developer.
         """
         self._stats["requests"] += 1
+        if self._requestsCounter is not None:
+            with self._requestsCounter.get_lock():
+                self._requestsCounter.value += 1
 
     def _getMethod(self):
         """Parse method name from incoming request.
@@ -653,6 +748,21 @@ class BaseRequestHandler(RequestHandler):
                 raise
             raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
 
+    def __executeMethodTimed(self, submitTime: float, args: list, kwargs: dict):
+        """Execute the requested method with :py:meth:`_executeMethod`,
+        recording the time spent waiting for a thread and executing.
+
+        :param submitTime: time at which the method was submitted to the executor
+        :param args: target method arguments
+        :param kwargs: target method keyword arguments
+        """
+        startTime = time.time()
+        self.__waitTime = startTime - submitTime
+        try:
+            return self._executeMethod(args, kwargs)
+        finally:
+            self.__recordExecutionStats(self.__methodName, self.__waitTime, time.time() - startTime)
+
     def on_finish(self):
         """
         Called after the end of HTTP request.
@@ -661,6 +771,11 @@ class BaseRequestHandler(RequestHandler):
         elapsedTime = 1000.0 * self.request.request_time()
         credentials = self.srv_getFormattedRemoteCredentials()
 
+        if self.__waitTime is not None:
+            elapsedTime = f"{elapsedTime:.2f} ms, waited {1000.0 * self.__waitTime:.2f} ms"
+        else:
+            elapsedTime = f"{elapsedTime:.2f} ms"
+
         argsString = f"OK {self._status_code}"
         # Finish with DIRAC result
         if isReturnStructure(self.__result):
@@ -674,9 +789,7 @@ class BaseRequestHandler(RequestHandler):
         if self._status_code >= 400:
             argsString = f"ERROR {self._status_code}: {self._reason}"
 
-        self.log.notice(
-            "Returning response", f"{credentials} {self._fullComponentName} ({elapsedTime:.2f} ms) {argsString}"
-        )
+        self.log.notice("Returning response", f"{credentials} {self._fullComponentName} ({elapsedTime}) {argsString}")
 
     def _gatherPeerCredentials(self, grants: list = None) -> dict:
         """Return a dictionary designed to work with the :py:class:`AuthManager <DIRAC.Core.DISET.AuthManager.AuthManager>`,
@@ -924,7 +1037,22 @@ class BaseRequestHandler(RequestHandler):
         # https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
         # However, we can still rely on instance attributes to store what should
         # be sent back (reminder: there is an instance of this class created for each request)
-        self.__result = await IOLoop.current().run_in_executor(None, partial(self._executeMethod, args, kwargs))
+        # The method is executed in the executor of the handler or of the method, if they are defined.
+        # If too many requests are already pending, reject the request right away with a retryable status,
+        # rather than letting it wait behind the others.
+        try:
+            future = IOLoop.current().run_in_executor(
+                self.__getExecutor(self.__methodName),
+                partial(self.__executeMethodTimed, time.time(), args, kwargs),
+            )
+        except ExecutorFullError as e:
+            self.__recordExecutionStats(self.__methodName, rejected=True)
+            self.log.warn("Too many pending requests", f"{self._fullComponentName}: {self.__methodName} ({e})")
+            self.set_status(HTTPStatus.SERVICE_UNAVAILABLE)
+            self.set_header("Retry-After", str(self.RETRY_AFTER))
+            self.finish(f"Too many pending requests for {self._fullComponentName}/{self.__methodName}")
+            return
+        self.__result = await future
 
         # Strip the exception/callstack info from S_ERROR responses
         if isinstance(self.__result, dict):
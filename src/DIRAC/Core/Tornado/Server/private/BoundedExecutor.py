@@ -0,0 +1,52 @@
+"""Thread pool executor with a bounded queue, used by the Tornado handlers to isolate their methods.
+
+Submitting to a full executor raises :py:class:`ExecutorFullError` right away, instead of queueing the call:
+the handler then rejects the request with a retryable HTTP 503.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorFullError(RuntimeError):
+    """Raised when submitting to an executor which already has too many pending calls"""
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor accepting at most ``maxThreads + maxWaiting`` pending calls
+
+    :param int maxThreads: number of threads executing the calls
+    :param int maxWaiting: number of calls waiting for a thread
+    :param str name: prefix of the threads name
+    """
+
+    def __init__(self, maxThreads, maxWaiting, name=""):
+        super().__init__(max_workers=maxThreads, thread_name_prefix=name)
+        self.maxThreads = maxThreads
+        self.maxWaiting = maxWaiting
+        self.__pending = 0
+        self.__pendingLock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Submit a call, see :py:meth:`concurrent.futures.Executor.submit`
+
+        :raises ExecutorFullError: if there are already too many pending calls
+        """
+        with self.__pendingLock:
+            if self.__pending >= self.maxThreads + self.maxWaiting:
+                raise ExecutorFullError(f"{self.__pending} pending calls")
+            self.__pending += 1
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            self.__release()
+            raise
+        future.add_done_callback(self.__release)
+        return future
+
+    def __release(self, _future=None):
+        with self.__pendingLock:
+            self.__pending -= 1
+
+    def getPending(self):
+        """Number of calls running or waiting for a thread"""
+        return self.__pending
@@ -0,0 +1,32 @@
+""" Test the executor rejecting the calls beyond its queue depth
+"""
+import threading
+
+import pytest
+
+from DIRAC.Core.Tornado.Server.private.BoundedExecutor import BoundedExecutor, ExecutorFullError
+
+
+def test_boundedExecutor():
+    executor = BoundedExecutor(maxThreads=2, maxWaiting=1)
+    release = threading.Event()
+    futures = [executor.submit(release.wait) for _ in range(3)]
+    assert executor.getPending() == 3
+    with pytest.raises(ExecutorFullError):
+        executor.submit(release.wait)
+
+    release.set()
+    for future in futures:
+        assert future.result(timeout=5)
+    executor.shutdown()
+    # The calls are released once done, so the executor accepts new ones
+    assert executor.getPending() == 0
+
+
+def test_failedSubmission():
+    """A call which can not be submitted is not counted as pending"""
+    executor = BoundedExecutor(maxThreads=1, maxWaiting=0)
+    executor.shutdown()
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+    assert executor.getPending() == 0
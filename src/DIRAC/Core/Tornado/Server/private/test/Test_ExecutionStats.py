@@ -0,0 +1,53 @@
+""" Test the execution statistics of the handler methods, shared by the worker processes
+"""
+# pylint: disable=protected-access
+import multiprocessing
+
+from DIRAC.Core.Tornado.Server.private.BaseRequestHandler import BaseRequestHandler, EXECUTION_STATS
+
+
+class DummyHandler(BaseRequestHandler):
+    def export_ping(self):
+        pass
+
+    def export_getJobPageSummaryWeb(self):
+        pass
+
+
+def test_getTargetMethodNames():
+    assert DummyHandler._getTargetMethodNames() == {"ping", "getJobPageSummaryWeb"}
+
+
+def test_recordExecutionStats():
+    recordExecutionStats = DummyHandler._BaseRequestHandler__recordExecutionStats
+    # Nothing is recorded if the server does not report the statistics
+    recordExecutionStats("ping", 0.5, 2.0)
+
+    DummyHandler._executionStats = {
+        methodName: multiprocessing.Array("d", len(EXECUTION_STATS))
+        for methodName in DummyHandler._getTargetMethodNames()
+    }
+    try:
+        recordExecutionStats("getJobPageSummaryWeb", 0.5, 2.0)
+        recordExecutionStats("getJobPageSummaryWeb", 0.1, 1.0)
+        recordExecutionStats("getJobPageSummaryWeb", rejected=True)
+        recordExecutionStats("ping", 0.0, 0.25)
+        # Not a target method
+        recordExecutionStats("unknown", 1.0, 1.0)
+        stats = {
+            methodName: dict(zip(EXECUTION_STATS, executionStats[:]))
+            for methodName, executionStats in DummyHandler._executionStats.items()
+        }
+        assert stats == {
+            "getJobPageSummaryWeb": {
+                "Executed": 2,
+                "Rejected": 1,
+                "WaitTime": 0.6,
+                "MaxWaitTime": 0.5,
+                "ExecutionTime": 3.0,
+            },
+            "ping": {"Executed": 1, "Rejected": 0, "WaitTime": 0.0, "MaxWaitTime": 0.0, "ExecutionTime": 0.25},
+        }
+        assert BaseRequestHandler._executionStats is None
+    finally:
+        DummyHandler._executionStats = None
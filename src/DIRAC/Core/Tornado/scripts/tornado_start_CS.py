@@ -54,7 +54,8 @@ def main():
     except TypeError:
         csPort = None
 
-    serverToLaunch = TornadoServer(services=["Configuration/Server"], port=csPort)
+    # The master CS holds the configuration in memory, so it runs in a single process
+    serverToLaunch = TornadoServer(services=["Configuration/Server"], port=csPort, processes=1)
     serverToLaunch.startTornado()
 
 
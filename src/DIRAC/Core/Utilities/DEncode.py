@@ -222,6 +222,9 @@ _timeType = type(_dateTimeObject.time())
 g_dEncodeFunctions = {}
 g_dDecodeFunctions = {}
 
+# Byte value closing ints, lists, tuples and dicts, looked up once rather than in every loop
+_END_BYTE = _ord("e")
+
 
 def encodeInt(iValue, eList):
     """Encoding ints"""
@@ -318,12 +321,8 @@ def decodeString(data, i):
     """Decoding strings"""
     i += 1
     colon = data.index(b":", i)
-    value = int(data[i:colon].decode())
-    colon += 1
-    end = colon + value
-    retVal = data[colon:end]
-    retVal = retVal.decode(errors="surrogateescape")
-    return (retVal, end)
+    end = colon + 1 + int(data[i:colon])
+    return (data[colon + 1 : end].decode(errors="surrogateescape"), end)
 
 
 g_dEncodeFunctions[types.StringType] = encodeString
@@ -436,7 +435,7 @@ def decodeList(data, i):
 
     oL = []
     i += 1
-    while data[i] != _ord("e"):
+    while data[i] != _END_BYTE:
         ob, i = g_dDecodeFunctions[data[i]](data, i)
         oL.append(ob)
     return (oL, i + 1)
@@ -492,7 +491,7 @@ def decodeDict(data, i):
 
     oD = {}
     i += 1
-    while data[i] != _ord("e"):
+    while data[i] != _END_BYTE:
 
         if DIRAC_DEBUG_DENCODE_CALLSTACK:
             # If we have numbers as keys
@@ -511,18 +510,35 @@ g_dDecodeFunctions[_ord("d")] = decodeDict
 # Encode function
 def encode(uObject):
     """Generic encoding function"""
+    return b"".join(encodeTokens(uObject))
+
+
+def encodeTokens(uObject):
+    """Encode an object without joining the result
+
+    This is useful to stream the encoded data without ever building the full
+    payload in memory (see :py:meth:`~DIRAC.Core.DISET.private.Transports.BaseTransport.BaseTransport.sendData`)
+
+    :param uObject: object to encode
+
+    :returns: list of bytes tokens, whose concatenation is ``encode(uObject)``
+    """
     eList = []
     # print("ENCODE FUNCTION : %s" % g_dEncodeFunctions[ type( uObject ) ])
     g_dEncodeFunctions[type(uObject)](uObject, eList)
-    return b"".join(eList)
+    return eList
 
 
 def decode(data):
-    """Generic decoding function"""
+    """Generic decoding function
+
+    :param data: bytes or bytearray to decode. A bytearray is decoded in place,
+                 without copying the whole buffer first.
+    """
     if not data:
         return data
     # print("DECODE FUNCTION : %s" % g_dDecodeFunctions[ sStream [ iIndex ] ])
-    if not isinstance(data, bytes):
+    if not isinstance(data, (bytes, bytearray)):
         raise NotImplementedError("This should never happen")
     return g_dDecodeFunctions[data[0]](data, 0)
 
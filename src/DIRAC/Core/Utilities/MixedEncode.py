@@ -17,10 +17,25 @@ def encode(inData):
     return DEncode.encode(inData)
 
 
+def encodeTokens(inData):
+    """Encode the input data as a list of bytes tokens
+
+    The tokens are not joined, so that the caller can stream them
+    without holding a second copy of the whole payload.
+
+    :param inData: data to be encoded
+
+    :return: list of bytes, whose concatenation is the encoded data
+    """
+    if os.getenv("DIRAC_USE_JSON_ENCODE", "Yes").lower() in ("yes", "true"):
+        return [JEncode.encode(inData).encode()]
+    return DEncode.encodeTokens(inData)
+
+
 def decode(encodedData):
     """Decode the encoded string
 
-    :param encodedData: encoded string
+    :param encodedData: encoded string (bytes or bytearray)
 
     :return: the decoded objects, encoded object length
 
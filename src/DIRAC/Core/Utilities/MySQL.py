@@ -1,18 +1,17 @@
 """ DIRAC Basic MySQL Class
     It provides access to the basic MySQL methods in a multithread-safe mode
-    keeping used connections in a python Queue for further reuse.
+    keeping used connections in a bounded pool for further reuse.
 
     These are the coded methods:
 
 
-    __init__( host, user, passwd, name, [maxConnsInQueue=10] )
+    __init__( host, user, passwd, name, [port=3306], [maxConnections=100] )
 
-    Initializes the Queue and tries to connect to the DB server,
+    Initializes the connection pool and tries to connect to the DB server,
     using the _connect method.
-    "maxConnsInQueue" defines the size of the Queue of open connections
-    that are kept for reuse. It also defined the maximum number of open
-    connections available from the object.
-    maxConnsInQueue = 0 means unlimited and it is not supported.
+    "maxConnections" defines the maximum number of open connections of the pool,
+    which is shared by all the objects using the same server and credentials.
+    maxConnections = 0 means unlimited.
 
 
     _except( methodName, exception, errorMessage )
@@ -32,20 +31,20 @@
     _query( cmd, [conn=conn] )
 
     Executes SQL command "cmd".
-    Gets a connection from the Queue (or open a new one if none is available),
-    the used connection is  back into the Queue.
+    Gets a connection from the pool (or open a new one if none is available),
+    the used connection is put back into the pool.
     If a connection to the the DB is passed as second argument this connection
-    is used and is not  in the Queue.
+    is used and is not put back in the pool.
     Returns S_OK with fetchall() out in Value or S_ERROR upon failure.
 
 
     _update( cmd, [conn=conn] )
 
     Executes SQL command "cmd" and issue a commit
-    Gets a connection from the Queue (or open a new one if none is available),
-    the used connection is  back into the Queue.
+    Gets a connection from the pool (or open a new one if none is available),
+    the used connection is put back into the pool.
     If a connection to the the DB is passed as second argument this connection
-    is used and is not  in the Queue
+    is used and is not put back in the pool
     Returns S_OK with number of updated registers in Value or S_ERROR upon failure.
 
 
@@ -56,10 +55,10 @@
 
     _getConnection()
 
-    Gets a connection from the Queue (or open a new one if none is available)
+    Gets the connection pinned to the current thread (or pins one from the pool)
     Returns S_OK with connection in Value or S_ERROR
-    the calling method is responsible for closing this connection once it is no
-    longer needed.
+    The connection stays with the thread as long as the caller holds it,
+    and goes back to the pool when it is no longer referenced.
 
 
 
@@ -152,6 +151,7 @@ import json
 import os
 import time
 import threading
+import weakref
 import MySQLdb
 
 from DIRAC import gLogger
@@ -162,6 +162,12 @@ from DIRAC.Core.Utilities import DErrno
 gInstancesCount = 0
 MAXCONNECTRETRY = 10
 RETRY_SLEEP_DURATION = 5
+# Maximum number of connections of a ConnectionPool
+MAXCONNECTIONS = 100
+# Seconds to wait for a free connection
+WAIT_TIMEOUT = 60
+# Connections used within the last PING_INTERVAL seconds are not pinged
+PING_INTERVAL = 10
 
 
 def _checkFields(inFields, inValues):
@@ -323,21 +329,81 @@ def captureOptimizerTraces(meth):
         return meth
 
 
+def getConnectionPoolsMonitoringFields():
+    """Usage of the connection pools of the process, as fields of the activity monitoring records
+    (ServiceMonitoring and AgentMonitoring). The created/closed connections and the wait time (in ms)
+    are counted since the start of the process.
+    """
+    stats = MySQL.getConnectionPoolsStats()
+    return {
+        "DBConnectionsInUse": stats.get("InUse", 0),
+        "DBConnectionsIdle": stats.get("Idle", 0),
+        "DBConnectionsWaiting": stats.get("Waiting", 0),
+        "DBConnectionsCreated": stats.get("Created", 0),
+        "DBConnectionsClosed": stats.get("Closed", 0),
+        "DBConnectionsWaitTime": int(stats.get("WaitTime", 0) * 1000),
+    }
+
+
+class _PinnedConnection:
+    """Connection pinned to a thread by :py:meth:`ConnectionPool.get`, it behaves as the MySQLdb connection"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
 class ConnectionPool:
     """
-    Management of connections per thread
+    Bounded pool of MySQL connections
+
+    Connections are either handed out for a single operation (:py:meth:`acquire` / :py:meth:`release`),
+    or pinned to the calling thread (:py:meth:`get`), which is needed whenever several statements have to
+    be executed in the same session (transactions, LAST_INSERT_ID, LOCK TABLES...). While a thread holds a
+    pinned connection, all its operations use it. A pinned connection goes back to the pool as soon as the
+    object returned by :py:meth:`get` is no longer referenced, except during a transaction, where it stays
+    pinned until the commit or the rollback. The connections of the threads which ended are also given back.
+    Idle connections are closed after graceTime seconds.
+
+    At most maxConnections connections are open at the same time (0 means no limit). The threads waiting
+    for a connection are served in FIFO order, and give up after WAIT_TIMEOUT seconds.
+    Connections are only pinged if they have not been used for PING_INTERVAL seconds.
     """
 
-    def __init__(self, host, user, passwd, port=3306, graceTime=600):
+    def __init__(self, host, user, passwd, port=3306, graceTime=600, maxConnections=MAXCONNECTIONS):
         self.__host = host
         self.__user = user
         self.__passwd = passwd
         self.__port = port
         self.__graceTime = graceTime
-        self.__spares = collections.deque()
-        self.__maxSpares = 10
-        self.__lastClean = 0
+        self.__maxConnections = maxConnections
+        # Reentrant, the pinned connections are given back when garbage collected
+        self.__lock = threading.RLock()
+        # Each entry is [ connection, dbName, lastUse ]
+        self.__idle = collections.deque()
         self.__assigned = {}
+        # Weak references to the _PinnedConnection held by the threads
+        self.__pinnedConns = {}
+        # _PinnedConnection of the threads in a transaction
+        self.__transactions = {}
+        self.__leased = {}
+        # Each waiter is [ threading.Event, entry handed over ]
+        self.__waiters = collections.deque()
+        # Open connections, plus the ones being opened
+        self.__numConnections = 0
+        self.__lastClean = 0
+        self.__stats = {
+            "Created": 0,
+            "Closed": 0,
+            "Requests": 0,
+            "Waits": 0,
+            "WaitTime": 0.0,
+            "MaxWaitTime": 0.0,
+            "Timeouts": 0,
+            "Pings": 0,
+        }
 
     @property
     def __thid(self):
@@ -357,98 +423,237 @@ class ConnectionPool:
         return res
 
     def get(self, dbName, retries=10):
+        """Get the connection pinned to the current thread, pinning one if needed
+
+        The connection is unpinned once the returned object is no longer referenced, or at the end
+        of the transaction.
+
+        :param str dbName: database to select
+        :param int retries: number of attempts to open a connection
+        :return: S_OK(connection)/S_ERROR()
+        """
+        retries = max(0, min(MAXCONNECTRETRY, retries))
+        self.clean()
+        return self.__getWithRetry(dbName, retries, retries, pin=True)
+
+    def acquire(self, dbName, retries=10):
+        """Get a connection for a single operation, it has to be given back with :py:meth:`release`
+
+        If the current thread has a pinned connection, it is returned.
+
+        :param str dbName: database to select
+        :param int retries: number of attempts to open a connection
+        :return: S_OK(connection)/S_ERROR()
+        """
         retries = max(0, min(MAXCONNECTRETRY, retries))
         self.clean()
-        return self.__getWithRetry(dbName, retries, retries)
+        return self.__getWithRetry(dbName, retries, retries, pin=False)
 
-    def __getWithRetry(self, dbName, totalRetries, retriesLeft):
+    def release(self, conn):
+        """Give back a connection obtained with :py:meth:`acquire`
+
+        :param conn: the connection
+        """
+        with self.__lock:
+            entry = self.__leased.pop(id(conn), None)
+            if entry is None:
+                # Pinned connection, it stays with its thread
+                return
+            entry[2] = time.time()
+            self.__putBack(entry)
+
+    def __getWithRetry(self, dbName, totalRetries, retriesLeft, pin):
         sleepTime = RETRY_SLEEP_DURATION * (totalRetries - retriesLeft)
         if sleepTime > 0:
             time.sleep(sleepTime)
+        result = self.__innerGet(pin)
+        if not result["OK"]:
+            return result
+        entry, pinned = result["Value"]
         try:
-            conn, lastName, thid = self.__innerGet()
+            if entry[0] is None:
+                entry[0] = self.__newConn()
+                entry[2] = time.time()
+                with self.__lock:
+                    self.__stats["Created"] += 1
         except MySQLdb.MySQLError as excp:
+            self.__discard(entry)
             if retriesLeft > 0:
-                return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
+                return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1, pin)
             return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % excp)
 
-        if not self.__ping(conn):
-            try:
-                self.__assigned.pop(thid)
-            except KeyError:
-                pass
+        conn = entry[0]
+        # Some callers close the connection they got, it is replaced
+        if not conn.open or (time.time() - entry[2] > PING_INTERVAL and not self.__ping(conn)):
+            self.__discard(entry)
             if retriesLeft > 0:
-                return self.__getWithRetry(dbName, totalRetries, retriesLeft)
+                return self.__getWithRetry(dbName, totalRetries, retriesLeft, pin)
             return S_ERROR(DErrno.EMYSQL, "Could not connect")
 
-        if lastName != dbName:
+        if entry[1] != dbName:
             try:
                 conn.select_db(dbName)
             except MySQLdb.MySQLError as excp:
+                self.__discard(entry)
                 if retriesLeft > 0:
-                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
+                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1, pin)
                 return S_ERROR(DErrno.EMYSQL, f"Could not select db {dbName}: {excp}")
-            try:
-                self.__assigned[thid][1] = dbName
-            except KeyError:
-                if retriesLeft > 0:
-                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
-                return S_ERROR(DErrno.EMYSQL, "Could not connect")
+            entry[1] = dbName
+        entry[2] = time.time()
+        if not pinned:
+            with self.__lock:
+                self.__leased[id(conn)] = entry
+        elif pin:
+            return S_OK(self.__getPinnedConn(entry))
         return S_OK(conn)
 
+    def __getPinnedConn(self, entry):
+        """Get the _PinnedConnection through which the current thread holds its pinned connection"""
+        thid = self.__thid
+        with self.__lock:
+            pinnedConnRef = self.__pinnedConns.get(thid)
+            pinnedConn = pinnedConnRef() if pinnedConnRef else None
+            if pinnedConn is None or pinnedConn._conn is not entry[0]:
+                pinnedConn = _PinnedConnection(entry[0])
+                self.__pinnedConns[thid] = weakref.ref(pinnedConn)
+                weakref.finalize(pinnedConn, self.__unpin, thid, entry).atexit = False
+        return pinnedConn
+
+    def __unpin(self, thid, entry):
+        """Give back the connection pinned to a thread, once it is no longer referenced"""
+        with self.__lock:
+            if self.__assigned.get(thid) is entry:
+                entry[2] = time.time()
+                self.__pop(thid)
+
     def __ping(self, conn):
+        with self.__lock:
+            self.__stats["Pings"] += 1
         try:
             conn.ping(True)
             return True
         except Exception:
             return False
 
-    def __innerGet(self):
+    def __innerGet(self, pin):
+        """Take a connection entry for the current thread
+
+        The connection of the returned entry is None if a new connection has to be opened.
+
+        :return: S_OK((entry, pinned))/S_ERROR() after WAIT_TIMEOUT seconds without free connection
+        """
         thid = self.__thid
-        now = time.time()
-        if thid in self.__assigned:
-            data = self.__assigned[thid]
-            conn = data[0]
-            data[2] = now
-            return data[0], data[1], thid
-        # Not cached
-        try:
-            conn, dbName = self.__spares.pop()
-        except IndexError:
-            conn = self.__newConn()
-            dbName = ""
+        with self.__lock:
+            self.__stats["Requests"] += 1
+            if thid in self.__assigned:
+                return S_OK((self.__assigned[thid], True))
+            entry = None
+            if self.__idle:
+                # Most recently used first, so that it can skip the ping
+                entry = self.__idle.pop()
+            elif not self.__maxConnections or self.__numConnections < self.__maxConnections:
+                self.__numConnections += 1
+                entry = [None, "", 0]
+            else:
+                waiter = [threading.Event(), None]
+                self.__waiters.append(waiter)
+                self.__stats["Waits"] += 1
+        if entry is None:
+            start = time.time()
+            waiter[0].wait(WAIT_TIMEOUT)
+            waitTime = time.time() - start
+            with self.__lock:
+                self.__stats["WaitTime"] += waitTime
+                self.__stats["MaxWaitTime"] = max(self.__stats["MaxWaitTime"], waitTime)
+                entry = waiter[1]
+                if entry is None:
+                    self.__waiters.remove(waiter)
+                    self.__stats["Timeouts"] += 1
+                    return S_ERROR(DErrno.EMYSQL, "No free connection after %s seconds" % WAIT_TIMEOUT)
+        if pin:
+            with self.__lock:
+                self.__assigned[thid] = entry
+        return S_OK((entry, pin))
+
+    def __putBack(self, entry):
+        """Hand over a connection entry to the first waiting thread, or make it idle.
+        Needs to be called with the lock held
+        """
+        if self.__waiters:
+            waiter = self.__waiters.popleft()
+            waiter[1] = entry
+            waiter[0].set()
+        elif entry[0] is None:
+            self.__numConnections -= 1
+        else:
+            self.__idle.append(entry)
 
-        self.__assigned[thid] = [conn, dbName, now]
-        return conn, dbName, thid
+    def __close(self, conn):
+        try:
+            conn.close()
+        except MySQLdb.ProgrammingError as exc:
+            gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
+        except Exception as exc:
+            gLogger.warn("Exception while closing MySQL connection: %s" % exc)
+
+    def __discard(self, entry):
+        """Close the connection of an entry, and free its slot"""
+        if entry[0] is not None and entry[0].open:
+            self.__close(entry[0])
+        with self.__lock:
+            for thid, assigned in list(self.__assigned.items()):
+                if assigned is entry:
+                    del self.__assigned[thid]
+                    self.__pinnedConns.pop(thid, None)
+                    self.__transactions.pop(thid, None)
+            if entry[0] is not None:
+                self.__leased.pop(id(entry[0]), None)
+                self.__stats["Closed"] += 1
+            # The slot is given to a waiting thread, which will open a new connection
+            self.__putBack([None, "", 0])
 
     def __pop(self, thid):
-        try:
-            data = self.__assigned.pop(thid)
-            if len(self.__spares) < self.__maxSpares:
-                self.__spares.append((data[0], data[1]))
-            else:
-                try:
-                    data[0].close()
-                except MySQLdb.ProgrammingError as exc:
-                    gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
-                except Exception as exc:
-                    gLogger.warn("Exception while closing MySQL connection: %s" % exc)
-        except KeyError:
-            pass
+        """Unpin the connection of a thread. Needs to be called with the lock held"""
+        self.__pinnedConns.pop(thid, None)
+        self.__transactions.pop(thid, None)
+        entry = self.__assigned.pop(thid, None)
+        if entry is not None:
+            self.__putBack(entry)
 
     def clean(self, now=False):
         if not now:
             now = time.time()
-        self.__lastClean = now
-        for thid in list(self.__assigned):
-            if not thid.is_alive():
-                self.__pop(thid)
-            try:
-                data = self.__assigned[thid]
-            except KeyError:
-                continue
-            if now - data[2] > self.__graceTime:
-                self.__pop(thid)
+        toClose = []
+        with self.__lock:
+            self.__lastClean = now
+            for thid in list(self.__assigned):
+                if not thid.is_alive():
+                    self.__pop(thid)
+            while self.__idle and now - self.__idle[0][2] > self.__graceTime:
+                toClose.append(self.__idle.popleft()[0])
+            self.__numConnections -= len(toClose)
+            self.__stats["Closed"] += len(toClose)
+        for conn in toClose:
+            self.__close(conn)
+
+    def getStats(self):
+        """Get the usage of the pool
+
+        :return: dict with the current number of connections (Connections, InUse, Pinned, Idle), of waiting
+                 threads (Waiting), the maximum number of connections (MaxConnections) and the counters since
+                 the creation of the pool: connections opened (Created) and closed (Closed), connection requests
+                 (Requests), requests which had to wait (Waits) and timed out (Timeouts), total and maximum
+                 wait time in seconds (WaitTime, MaxWaitTime) and pings (Pings)
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["MaxConnections"] = self.__maxConnections
+            stats["Connections"] = self.__numConnections
+            stats["Pinned"] = len(self.__assigned)
+            stats["Idle"] = len(self.__idle)
+            stats["InUse"] = len(self.__assigned) + len(self.__leased)
+            stats["Waiting"] = len(self.__waiters)
+        return stats
 
     def transactionStart(self, dbName):
         result = self.get(dbName)
@@ -456,9 +661,13 @@ class ConnectionPool:
             return result
         conn = result["Value"]
         try:
-            return S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+            result = S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not begin transaction: %s" % excp)
+        # The connection stays pinned until the commit or the rollback
+        with self.__lock:
+            self.__transactions[self.__thid] = conn
+        return result
 
     def transactionCommit(self, dbName):
         result = self.get(dbName)
@@ -470,6 +679,8 @@ class ConnectionPool:
             return S_OK(result)
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not commit transaction: %s" % excp)
+        finally:
+            self.__endTransaction()
 
     def transactionRollback(self, dbName):
         result = self.get(dbName)
@@ -481,6 +692,13 @@ class ConnectionPool:
             return S_OK(result)
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not rollback transaction: %s" % excp)
+        finally:
+            self.__endTransaction()
+
+    def __endTransaction(self):
+        """Let the connection of the current thread go back to the pool once its user drops it"""
+        with self.__lock:
+            self.__transactions.pop(self.__thid, None)
 
 
 class MySQL:
@@ -492,11 +710,23 @@ class MySQL:
 
     __connectionPools = {}
 
-    def __init__(self, hostName="localhost", userName="dirac", passwd="dirac", dbName="", port=3306, debug=False):
+    def __init__(
+        self,
+        hostName="localhost",
+        userName="dirac",
+        passwd="dirac",
+        dbName="",
+        port=3306,
+        debug=False,
+        maxConnections=MAXCONNECTIONS,
+    ):
         """
         set MySQL connection parameters and try to connect
 
         :param debug: unused
+        :param int maxConnections: maximum number of connections of the pool, which is shared by all the
+                                   instances using the same server and credentials (0 for no limit).
+                                   The value given by the first instance is used.
         """
         global gInstancesCount
         gInstancesCount += 1
@@ -518,7 +748,7 @@ class MySQL:
         self.__port = port
         cKey = (self.__hostName, self.__userName, self.__passwd, self.__port)
         if cKey not in MySQL.__connectionPools:
-            MySQL.__connectionPools[cKey] = ConnectionPool(*cKey)
+            MySQL.__connectionPools[cKey] = ConnectionPool(*cKey, maxConnections=maxConnections)
         self.__connectionPool = MySQL.__connectionPools[cKey]
 
         self.__initialized = True
@@ -570,10 +800,13 @@ class MySQL:
         It also includes quotation marks " around the given string
         """
         if connection is None:
-            retDict = self._getConnection()
+            retDict = self.__acquireConnection()
             if not retDict["OK"]:
                 return retDict
-            connection = retDict["Value"]
+            try:
+                return self.__escapeString(myString, connection=retDict["Value"])
+            finally:
+                self.__connectionPool.release(retDict["Value"])
 
         if isinstance(myString, bytes):
             myString = myString.decode()
@@ -647,16 +880,21 @@ class MySQL:
         Escapes all strings in the list of values provided
         """
         # self.log.debug('_escapeValues:', inValues)
-        retDict = self._getConnection()
+        if not inValues:
+            return S_OK([])
+
+        retDict = self.__acquireConnection()
         if not retDict["OK"]:
             return retDict
         connection = retDict["Value"]
+        try:
+            return self.__escapeValues(inValues, connection)
+        finally:
+            self.__connectionPool.release(connection)
 
+    def __escapeValues(self, inValues, connection):
         inEscapeValues = []
 
-        if not inValues:
-            return S_OK(inEscapeValues)
-
         for value in inValues:
             if isinstance(value, str):
                 retDict = self.__escapeString(value, connection=connection)
@@ -702,9 +940,10 @@ class MySQL:
             return S_OK()
 
         # Test the connection to the DB
-        retDict = self._getConnection()
+        retDict = self.__acquireConnection()
         if not retDict["OK"]:
             return retDict
+        self.__connectionPool.release(retDict["Value"])
         self._connected = True
         return S_OK()
 
@@ -725,7 +964,7 @@ class MySQL:
         if conn:
             connection = conn
         else:
-            retDict = self._getConnection()
+            retDict = self.__acquireConnection()
             if not retDict["OK"]:
                 return retDict
             connection = retDict["Value"]
@@ -753,6 +992,8 @@ class MySQL:
             cursor.close()
         except Exception:
             pass
+        if not conn:
+            self.__connectionPool.release(connection)
 
         return retDict
 
@@ -770,7 +1011,7 @@ class MySQL:
         if conn:
             connection = conn
         else:
-            retDict = self._getConnection()
+            retDict = self.__acquireConnection()
             if not retDict["OK"]:
                 return retDict
             connection = retDict["Value"]
@@ -788,6 +1029,8 @@ class MySQL:
             cursor.close()
         except Exception:
             pass
+        if not conn:
+            self.__connectionPool.release(connection)
 
         return retDict
 
@@ -806,7 +1049,7 @@ class MySQL:
         # # get connection
         connection = conn
         if not connection:
-            retDict = self._getConnection()
+            retDict = self.__acquireConnection()
             if not retDict["OK"]:
                 return retDict
             connection = retDict["Value"]
@@ -818,14 +1061,18 @@ class MySQL:
             for cmd in cmdList:
                 cmdRet.append((cmd, cursor.execute(cmd)))
             connection.commit()
+            # # close cursor
+            cursor.close()
+            retDict = S_OK(cmdRet)
         except Exception as error:
             self.logger.exception(error)
-            # # rollback, put back connection to the pool
+            # # rollback
             connection.rollback()
-            return S_ERROR(DErrno.EMYSQL, error)
-        # # close cursor, put back connection to the pool
-        cursor.close()
-        return S_OK(cmdRet)
+            retDict = S_ERROR(DErrno.EMYSQL, error)
+        # # put back connection to the pool
+        if not conn:
+            self.__connectionPool.release(connection)
+        return retDict
 
     def _createViews(self, viewsDict, force=False):
         """create view based on query
@@ -1039,10 +1286,12 @@ class MySQL:
         return str(param[0])
 
     def _getConnection(self, retries=MAXCONNECTRETRY):
-        """Return  a new connection to the DB,
+        """Return the connection of the current thread to the DB
 
-        Try the Queue, if it is empty add a newConnection to the Queue and retry
-        it will retry MAXCONNECTRETRY to open a new connection and will return
+        The connection is pinned to the thread as long as it is referenced (see :py:class:`ConnectionPool`),
+        so that it can be used for several statements of the same session, and it is also used meanwhile by
+        the calls of this thread which do not pass a connection.
+        It will retry MAXCONNECTRETRY to open a new connection and will return
         an error if it fails.
 
         :param int retries: Number of time it will retry to open a connection
@@ -1056,6 +1305,33 @@ class MySQL:
 
         return self.__connectionPool.get(self.__dbName, retries)
 
+    def __acquireConnection(self):
+        """Get a connection for a single operation, to be given back with ConnectionPool.release"""
+        if not self.__initialized:
+            error = "DB not properly initialized"
+            gLogger.error(error)
+            return S_ERROR(DErrno.EMYSQL, error)
+
+        return self.__connectionPool.acquire(self.__dbName)
+
+    def getConnectionPoolStats(self):
+        """Get the usage of the connection pool of this DB, see :py:meth:`ConnectionPool.getStats`"""
+        return S_OK(self.__connectionPool.getStats())
+
+    @classmethod
+    def getConnectionPoolsStats(cls):
+        """Get the usage of all the connection pools of the process, summed up
+
+        :return: dict, see :py:meth:`ConnectionPool.getStats`
+        """
+        stats = collections.Counter()
+        for pool in cls.__connectionPools.values():
+            poolStats = pool.getStats()
+            maxWaitTime = max(stats["MaxWaitTime"], poolStats.pop("MaxWaitTime"))
+            stats.update(poolStats)
+            stats["MaxWaitTime"] = maxWaitTime
+        return dict(stats)
+
     ########################################################################################
     #
     #  Transaction functions
@@ -1614,7 +1890,7 @@ class MySQL:
         if conn:
             connection = conn
         else:
-            conDict = self._getConnection()
+            conDict = self.__acquireConnection()
             if not conDict["OK"]:
                 return conDict
 
@@ -1636,6 +1912,8 @@ class MySQL:
             cursor.close()
         except Exception:
             pass
+        if not conn:
+            self.__connectionPool.release(connection)
         return retDict
 
     # For the procedures that execute a select without storing the result
@@ -1644,7 +1922,7 @@ class MySQL:
         if conn:
             connection = conn
         else:
-            conDict = self._getConnection()
+            conDict = self.__acquireConnection()
             if not conDict["OK"]:
                 return conDict
 
@@ -1667,5 +1945,7 @@ class MySQL:
             cursor.close()
         except Exception:
             pass
+        if not conn:
+            self.__connectionPool.release(connection)
 
         return retDict
@@ -4,6 +4,7 @@
   There's a pretty big assumption here: that DB and Handler expose the same calls, with identical signatures.
   This is not always the case.
 """
+import sys
 
 
 def getDBOrClient(DB, serverName):
@@ -22,3 +23,17 @@ def getDBOrClient(DB, serverName):
 
     gLogger.info(f"Can not connect to DB will use {serverName}")
     return Client(url=serverName)
+
+
+def getDBConnectionsMonitoringFields():
+    """Usage of the MySQL connection pools of the process, as fields of the activity monitoring records
+    (see :py:func:`DIRAC.Core.Utilities.MySQL.getConnectionPoolsMonitoringFields`)
+
+    The MySQL module is only looked up, so that the processes not using it do not need MySQLdb.
+
+    :return: dict, empty if the process does not use MySQL
+    """
+    mysqlModule = sys.modules.get("DIRAC.Core.Utilities.MySQL")
+    if mysqlModule is None:
+        return {}
+    return mysqlModule.getConnectionPoolsMonitoringFields()
@@ -0,0 +1,199 @@
+""" Test the connection pool of DIRAC.Core.Utilities.MySQL, without MySQL server
+"""
+import threading
+import time
+
+import pytest
+
+from DIRAC.Core.Utilities import MySQL
+
+
+class FakeCursor:
+    lastrowid = None
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, cmd):
+        self.conn.executed.append(cmd)
+        return 0
+
+    def fetchall(self):
+        return ()
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connection recording the statements and the pings"""
+
+    def __init__(self, **kwargs):
+        self.executed = []
+        self.pings = 0
+        self.open = 1
+        self.dbName = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect):
+        self.pings += 1
+
+    def select_db(self, dbName):
+        self.dbName = dbName
+
+    def close(self):
+        self.open = 0
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(MySQL.MySQLdb, "connect", FakeConnection, raising=False)
+    monkeypatch.setattr(MySQL, "WAIT_TIMEOUT", 2)
+    return MySQL.ConnectionPool("host", "user", "passwd", maxConnections=2)
+
+
+def test_acquireRelease(pool):
+    """Connections acquired for an operation are reused, and not pinged if recently used"""
+    conn = pool.acquire("DB1")["Value"]
+    assert conn.dbName == "DB1"
+    assert pool.getStats()["InUse"] == 1
+    pool.release(conn)
+    stats = pool.getStats()
+    assert (stats["InUse"], stats["Idle"], stats["Created"]) == (0, 1, 1)
+
+    assert pool.acquire("DB2")["Value"] is conn
+    assert conn.dbName == "DB2"
+    assert conn.pings == 0
+    pool.release(conn)
+
+
+def test_ping(pool, monkeypatch):
+    """Connections not used for PING_INTERVAL seconds are pinged, and replaced if the ping fails"""
+    conn = pool.acquire("DB")["Value"]
+    pool.release(conn)
+    monkeypatch.setattr(MySQL, "PING_INTERVAL", -1)
+    assert pool.acquire("DB")["Value"] is conn
+    assert conn.pings == 1
+    pool.release(conn)
+
+    def failedPing(reconnect):
+        raise Exception("Gone away")
+
+    conn.ping = failedPing
+    newConn = pool.acquire("DB")["Value"]
+    assert newConn is not conn
+    assert not conn.open
+    stats = pool.getStats()
+    assert (stats["Connections"], stats["Created"], stats["Closed"]) == (1, 2, 1)
+
+
+def test_closedByUser(pool):
+    """A pinned connection closed by its user is replaced, even if recently used"""
+    conn = pool.get("DB")["Value"]
+    conn.close()
+    newConn = pool.get("DB")["Value"]
+    assert newConn is not conn
+    assert newConn.open
+    assert conn.pings == 0
+    assert pool.getStats()["Pinned"] == 1
+
+
+def test_pinned(pool):
+    """The pinned connection of a thread is used for all its operations, as long as it is held"""
+    conn = pool.get("DB")["Value"]
+    assert pool.acquire("DB")["Value"] is conn._conn
+    pool.release(conn._conn)
+    assert pool.get("DB")["Value"] is conn
+    stats = pool.getStats()
+    assert (stats["InUse"], stats["Pinned"], stats["Idle"]) == (1, 1, 0)
+
+    # Another thread gets another connection
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.get("DB")["Value"]))
+    thread.start()
+    thread.join()
+    assert other[0]._conn is not conn._conn
+
+    # The connection of a thread which ended goes back to the pool
+    pool.clean()
+    stats = pool.getStats()
+    assert (stats["Pinned"], stats["Idle"]) == (1, 1)
+
+    # As well as the connection no longer referenced
+    del conn
+    stats = pool.getStats()
+    assert (stats["InUse"], stats["Pinned"], stats["Idle"]) == (0, 0, 2)
+
+
+def test_transaction(pool):
+    """The connection stays pinned from the start of a transaction to its end"""
+    assert pool.transactionStart("DB")["OK"]
+    conn = pool.acquire("DB")["Value"]
+    assert conn.executed == ["SET AUTOCOMMIT=1", "START TRANSACTION WITH CONSISTENT SNAPSHOT"]
+    pool.release(conn)
+    assert pool.getStats()["Pinned"] == 1
+    assert pool.transactionCommit("DB")["OK"]
+    assert conn.executed[-1] == "COMMIT"
+    stats = pool.getStats()
+    assert (stats["Pinned"], stats["Idle"]) == (0, 1)
+
+
+def test_bounded(pool):
+    """When all the connections are in use, the requests wait in FIFO order, or time out"""
+    conns = [pool.acquire("DB")["Value"] for _ in range(2)]
+    served = []
+
+    def waiter(name):
+        conn = pool.acquire("DB")["Value"]
+        served.append(name)
+        time.sleep(0.1)
+        pool.release(conn)
+
+    threads = []
+    for name in ("first", "second"):
+        threads.append(threading.Thread(target=waiter, args=(name,)))
+        threads[-1].start()
+        while pool.getStats()["Waiting"] < len(threads):
+            time.sleep(0.01)
+    pool.release(conns[0])
+    for thread in threads:
+        thread.join()
+    assert served == ["first", "second"]
+    stats = pool.getStats()
+    assert (stats["Created"], stats["Waits"], stats["Timeouts"]) == (2, 2, 0)
+    assert stats["WaitTime"] > 0
+
+    # The remaining connection is still in use
+    pool.acquire("DB")
+    result = pool.acquire("DB")
+    assert not result["OK"]
+    assert pool.getStats()["Timeouts"] == 1
+
+
+def test_operations(monkeypatch):
+    """The operations without connection give it back to the pool"""
+    monkeypatch.setattr(MySQL.MySQLdb, "connect", FakeConnection, raising=False)
+    db = MySQL.MySQL("test_operations", "user", "passwd", "DB", maxConnections=1)
+    assert db._query("SELECT 1")["OK"]
+    assert db._update("UPDATE T SET A = 1")["OK"]
+    assert db._transaction(["START TRANSACTION", "UPDATE T SET A = 2"])["OK"]
+    stats = db.getConnectionPoolStats()["Value"]
+    assert (stats["Created"], stats["InUse"], stats["Idle"]) == (1, 0, 1)
+    assert MySQL.MySQL.getConnectionPoolsStats()["Created"] >= 1
+    assert MySQL.getConnectionPoolsMonitoringFields()["DBConnectionsInUse"] == 0
+
+    # The connection held by the thread is used by its operations, until it is dropped
+    conn = db._getConnection()["Value"]
+    assert db._update("UPDATE T SET A = 3")["OK"]
+    assert conn.executed[-1] == "UPDATE T SET A = 3"
+    assert db.getConnectionPoolStats()["Value"]["Pinned"] == 1
+    del conn
+    assert db.getConnectionPoolStats()["Value"]["Pinned"] == 0
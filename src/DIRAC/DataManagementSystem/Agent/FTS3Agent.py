@@ -12,14 +12,13 @@ It is in charge of submitting and monitoring all the transfers. It can be duplic
   :caption: FTS3Agent options
 
 """
+import asyncio
 import errno
+import threading
 import time
-
-# from threading import current_thread
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing.pool import ThreadPool
-
-# We use the dummy module because we use the ThreadPool
-from multiprocessing.dummy import current_process
 from socket import gethostname
 
 from DIRAC import S_OK, S_ERROR
@@ -36,6 +35,7 @@ from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getDNForUsername
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 from DIRAC.FrameworkSystem.Client.ProxyManagerClient import gProxyManager
 from DIRAC.DataManagementSystem.private import FTS3Utilities
+from DIRAC.DataManagementSystem.private.FTS3AsyncClient import FTS3AsyncClient
 from DIRAC.DataManagementSystem.DB.FTS3DB import FTS3DB
 from DIRAC.DataManagementSystem.Client.FTS3Job import FTS3Job
 from DIRAC.RequestManagementSystem.Client.ReqClient import ReqClient
@@ -87,6 +87,10 @@ class FTS3Agent(AgentModule):
         self.operationBulkSize = self.am_getOption("OperationBulkSize", 20)
         # Number of Jobs we treat in one loop
         self.jobBulkSize = self.am_getOption("JobBulkSize", 20)
+        # Number of Jobs whose status is queried in a single request to an FTS server
+        self.monitoringBulkSize = self.am_getOption("MonitoringBulkSize", 20)
+        # Number of requests in flight per FTS server when monitoring
+        self.maxRequestsPerServer = self.am_getOption("MaxRequestsPerServer", 10)
         self.maxFilesPerJob = self.am_getOption("MaxFilesPerJob", 100)
         self.maxAttemptsPerFile = self.am_getOption("MaxAttemptsPerFile", 256)
         self.kickDelay = self.am_getOption("KickAssignedHours", 1)
@@ -103,7 +107,11 @@ class FTS3Agent(AgentModule):
 
         :return: S_OK()/S_ERROR()
         """
-        self._globalContextCache = {}
+        # fts3 contexts shared by all the threads, per (user, group, server)
+        self._globalContextCache = DictCache()
+        # Locks making sure that a context is created only once
+        self._contextLocks = defaultdict(threading.Lock)
+        self._contextLocksLock = threading.Lock()
 
         # name that will be used in DB for assignment tag
         self.assignmentTag = gethostname().split(".")[0]
@@ -113,7 +121,8 @@ class FTS3Agent(AgentModule):
         # We multiply by two because of the two threadPools
         self.fts3db = FTS3DB(pool_size=2 * self.maxNumberOfThreads)
 
-        self.jobsThreadPool = ThreadPool(self.maxNumberOfThreads)
+        # The jobs are monitored from an asyncio event loop, and the DB is updated in these threads
+        self.jobsExecutor = ThreadPoolExecutor(self.maxNumberOfThreads, thread_name_prefix="FTS3Monitoring")
         self.opsThreadPool = ThreadPool(self.maxNumberOfThreads)
 
         return res
@@ -126,10 +135,10 @@ class FTS3Agent(AgentModule):
         self.dataOpSender = DataOperationSender()
         return self.__readConf()
 
-    def getFTS3Context(self, username, group, ftsServer, threadID):
+    def getFTS3Context(self, username, group, ftsServer):
         """Returns an fts3 context for a given user, group and fts server
 
-        The context pool is per thread, and there is one context
+        The context pool is shared by all the threads, and there is one context
         per tuple (user, group, server).
         We dump the proxy of a user to a file (shared by all the threads),
         and use it to make the context.
@@ -141,7 +150,6 @@ class FTS3Agent(AgentModule):
         :param str username: name of the user
         :param str group: group of the user
         :param str ftsServer: address of the server
-        :param str threadID: thread ID
 
         :returns: S_OK with the context object
 
@@ -149,14 +157,24 @@ class FTS3Agent(AgentModule):
 
         log = gLogger.getSubLogger("getFTS3Context")
 
-        contextes = self._globalContextCache.setdefault(threadID, DictCache())
-
         idTuple = (username, group, ftsServer)
         log.debug(f"Getting context for {idTuple}")
 
         # We keep a context in the cache for 45 minutes
         # (so it needs to be valid at least 15 since we add it for one hour)
-        if not contextes.exists(idTuple, 15 * 60):
+        context = self._globalContextCache.get(idTuple, 15 * 60)
+        if context:
+            return S_OK(context)
+
+        with self._contextLocksLock:
+            contextLock = self._contextLocks[idTuple]
+
+        # Only one thread creates the context, the others wait for it
+        with contextLock:
+            context = self._globalContextCache.get(idTuple, 15 * 60)
+            if context:
+                return S_OK(context)
+
             res = getDNForUsername(username)
             if not res["OK"]:
                 return res
@@ -191,34 +209,42 @@ class FTS3Agent(AgentModule):
                 return res
             context = res["Value"]
 
-            # we add it to the cache for this thread for 1h
-            contextes.add(idTuple, 3600, context)
+            # we add it to the cache for 1h
+            self._globalContextCache.add(idTuple, 3600, context)
 
-        return S_OK(contextes.get(idTuple))
+        return S_OK(context)
 
-    def _monitorJob(self, ftsJob):
-        """* query the FTS servers
+    def _monitorJob(self, ftsJob, jobStatus=None):
+        """* query the FTS servers, unless the status of the job is given
         * update the FTSFile status
         * update the FTSJob status
 
         :param ftsJob: FTS job
+        :param jobStatus: S_OK(status of the job)/S_ERROR, as returned by FTS3AsyncClient.getJobsStatus
 
         :return: ftsJob, S_OK()/S_ERROR()
         """
         # General try catch to avoid that the tread dies
         try:
-            threadID = current_process().name
             log = gLogger.getLocalSubLogger("_monitorJob/%s" % ftsJob.jobID)
 
-            res = self.getFTS3Context(ftsJob.username, ftsJob.userGroup, ftsJob.ftsServer, threadID=threadID)
+            if jobStatus is None:
+                res = self.getFTS3Context(ftsJob.username, ftsJob.userGroup, ftsJob.ftsServer)
 
-            if not res["OK"]:
-                log.error("Error getting context", res)
-                return ftsJob, res
+                if not res["OK"]:
+                    log.error("Error getting context", res)
+                    return ftsJob, res
 
-            context = res["Value"]
+                context = res["Value"]
 
-            res = ftsJob.monitor(context=context)
+                res = ftsJob.monitor(context=context)
+            elif jobStatus["OK"]:
+                res = ftsJob.processStatus(jobStatus["Value"])
+            else:
+                res = jobStatus
+                # Like FTS3Job.monitor
+                if cmpError(res, errno.ESRCH):
+                    ftsJob.status = "Failed"
 
             if not res["OK"]:
                 log.error("Error monitoring job", res)
@@ -276,13 +302,27 @@ class FTS3Agent(AgentModule):
 
     def monitorJobsLoop(self):
         """* fetch the active FTSJobs from the DB
-        * spawn a thread to monitor each of them
+        * query their status on the FTS servers from an asyncio event loop
+        * update the DB in the threads of self.jobsExecutor
+
+        :return: S_OK()/S_ERROR()
+        """
+        return asyncio.run(self._monitorJobsAsync())
+
+    async def _monitorJobsAsync(self):
+        """Monitor the active jobs, see monitorJobsLoop
+
+        The status of the jobs of each (user, group, server) is queried in bulk, and the next batch of jobs
+        is fetched from the DB while the previous ones are monitored.
 
         :return: S_OK()/S_ERROR()
         """
 
         log = gLogger.getSubLogger("monitorJobs")
-        log.debug("Size of the context cache %s" % len(self._globalContextCache))
+        log.debug("Size of the context cache %s" % len(self._globalContextCache.getKeys()))
+
+        loop = asyncio.get_running_loop()
+        ftsClient = FTS3AsyncClient(bulkSize=self.monitoringBulkSize, maxRequestsPerServer=self.maxRequestsPerServer)
 
         # Find the number of loops
         nbOfLoops, mod = divmod(self.jobBulkSize, JOB_MONITORING_BATCH_SIZE)
@@ -291,48 +331,81 @@ class FTS3Agent(AgentModule):
 
         log.debug("Getting active jobs")
 
-        for loopId in range(nbOfLoops):
+        # Monitoring of the jobs of each batch and each context
+        monitoringTasks = []
+        try:
+            for loopId in range(nbOfLoops):
+
+                log.info("Getting next batch of jobs to monitor", f"{loopId}/{nbOfLoops}")
+                # get jobs from DB
+                res = await loop.run_in_executor(
+                    self.jobsExecutor,
+                    lambda: self.fts3db.getActiveJobs(
+                        limit=JOB_MONITORING_BATCH_SIZE, jobAssignmentTag=self.assignmentTag
+                    ),
+                )
 
-            log.info("Getting next batch of jobs to monitor", f"{loopId}/{nbOfLoops}")
-            # get jobs from DB
-            res = self.fts3db.getActiveJobs(limit=JOB_MONITORING_BATCH_SIZE, jobAssignmentTag=self.assignmentTag)
+                if not res["OK"]:
+                    log.error("Could not retrieve ftsJobs from the DB", res)
+                    return res
 
-            if not res["OK"]:
-                log.error("Could not retrieve ftsJobs from the DB", res)
-                return res
+                activeJobs = res["Value"]
+                log.info("Jobs queued for monitoring", len(activeJobs))
 
-            activeJobs = res["Value"]
-            log.info("Jobs queued for monitoring", len(activeJobs))
+                # The jobs sharing the same context are monitored together
+                jobsPerContext = defaultdict(list)
+                for ftsJob in activeJobs:
+                    jobsPerContext[(ftsJob.username, ftsJob.userGroup, ftsJob.ftsServer)].append(ftsJob)
 
-            # We store here the AsyncResult object on which we are going to wait
-            applyAsyncResults = []
+                for idTuple, ftsJobs in jobsPerContext.items():
+                    monitoringTasks.append(
+                        asyncio.ensure_future(self._monitorJobsOfContext(ftsClient, idTuple, ftsJobs))
+                    )
 
-            # Starting the monitoring threads
-            for ftsJob in activeJobs:
-                log.debug("Queuing executing of ftsJob %s" % ftsJob.jobID)
-                # queue the execution of self._monitorJob( ftsJob ) in the thread pool
-                # The returned value is passed to _monitorJobCallback
-                applyAsyncResults.append(
-                    self.jobsThreadPool.apply_async(self._monitorJob, (ftsJob,), callback=self._monitorJobCallback)
-                )
+                # If we got less to monitor than what we asked,
+                # stop looping
+                if len(activeJobs) < JOB_MONITORING_BATCH_SIZE:
+                    break
 
             log.debug("All execution queued")
 
             # Waiting for all the monitoring to finish
-            while not all([r.ready() for r in applyAsyncResults]):
-                log.debug("Not all the tasks are finished")
-                time.sleep(0.5)
-
-            # If we got less to monitor than what we asked,
-            # stop looping
-            if len(activeJobs) < JOB_MONITORING_BATCH_SIZE:
-                break
+            await asyncio.gather(*monitoringTasks)
+        finally:
+            ftsClient.close()
+
         # Commit records after each loop
         self.dataOpSender.concludeSending()
 
         log.debug("All the tasks have completed")
         return S_OK()
 
+    async def _monitorJobsOfContext(self, ftsClient, idTuple, ftsJobs):
+        """Query the status of jobs sharing the same context, and update them in the DB
+
+        :param ftsClient: FTS3AsyncClient
+        :param tuple idTuple: (username, group, ftsServer) of the jobs
+        :param list ftsJobs: FTS jobs
+        """
+        loop = asyncio.get_running_loop()
+        log = gLogger.getSubLogger("monitorJobs")
+
+        # The context may have to be created, which is blocking
+        res = await loop.run_in_executor(self.jobsExecutor, self.getFTS3Context, *idTuple)
+        if not res["OK"]:
+            log.error("Error getting context", res)
+            return
+        context = res["Value"]
+
+        ftsGUIDs = [ftsJob.ftsGUID for ftsJob in ftsJobs if ftsJob.ftsGUID]
+        jobsStatus = await ftsClient.getJobsStatus(context, ftsGUIDs)
+
+        def monitorJob(ftsJob):
+            jobStatus = jobsStatus.get(ftsJob.ftsGUID, S_ERROR("FTSGUID not set, FTS job not submitted?"))
+            self._monitorJobCallback(self._monitorJob(ftsJob, jobStatus=jobStatus))
+
+        await asyncio.gather(*(loop.run_in_executor(self.jobsExecutor, monitorJob, ftsJob) for ftsJob in ftsJobs))
+
     @staticmethod
     def _treatOperationCallback(returnedValue):
         """Callback when an operation has been treated
@@ -358,7 +431,6 @@ class FTS3Agent(AgentModule):
         :return: operation, S_OK()/S_ERROR()
         """
         try:
-            threadID = current_process().name
             log = gLogger.getLocalSubLogger("treatOperation/%s" % operation.operationID)
 
             # If the operation is totally processed
@@ -418,9 +490,7 @@ class FTS3Agent(AgentModule):
                             log.info("Canceling the associated FTS3 jobs")
 
                             for ftsJob in operation.ftsJobs:
-                                res = self.getFTS3Context(
-                                    ftsJob.username, ftsJob.userGroup, ftsJob.ftsServer, threadID=threadID
-                                )
+                                res = self.getFTS3Context(ftsJob.username, ftsJob.userGroup, ftsJob.ftsServer)
                                 if not res["OK"]:
                                     log.error("Error getting context", res)
                                     continue
@@ -454,7 +524,7 @@ class FTS3Agent(AgentModule):
 
                         ftsJob.ftsServer = ftsServer
 
-                        res = self.getFTS3Context(ftsJob.username, ftsJob.userGroup, ftsServer, threadID=threadID)
+                        res = self.getFTS3Context(ftsJob.username, ftsJob.userGroup, ftsServer)
 
                         if not res["OK"]:
                             log.error("Could not get context", res)
@@ -601,12 +671,11 @@ class FTS3Agent(AgentModule):
         # Joining all the ThreadPools
         log = gLogger.getSubLogger("Finalize")
 
-        log.debug("Closing jobsThreadPool")
+        log.debug("Shutting down jobsExecutor")
 
-        self.jobsThreadPool.close()
-        self.jobsThreadPool.join()
+        self.jobsExecutor.shutdown()
 
-        log.debug("jobsThreadPool joined")
+        log.debug("jobsExecutor shut down")
 
         log.debug("Closing opsThreadPool")
 
@@ -145,6 +145,16 @@ class FTS3Job(JSerializable):
         except FTS3ClientException as e:
             return S_ERROR("Error getting the job status %s" % e)
 
+        return self.processStatus(jobStatusDict)
+
+    def processStatus(self, jobStatusDict):
+        """Update the internal state of the object from the status of the job on the FTS server
+
+        :param jobStatusDict: status of the job, including its files, as returned by fts3.get_job_status
+
+        :returns: {FileID: { status, error } } (see monitor)
+        """
+
         now = datetime.datetime.utcnow().replace(microsecond=0)
         self.lastMonitor = now
 
@@ -11,6 +11,7 @@ from DIRAC import S_OK, S_ERROR
 import DIRAC.Core.Utilities.TimeUtilities as TimeUtilities
 
 import json
+from itertools import compress
 
 FILE_STANDARD_METAKEYS = {
     "SE": "VARCHAR",
@@ -50,6 +51,213 @@ FILEINFO_TABLE_METAKEYS = {
 }
 
 
+def getTypeConverter(mtype):
+    """Function converting the values of a metadata field to its type, None if they are kept as they are
+
+    :param str mtype: type of the metadata field
+    """
+    mtype = mtype.lower()
+    if mtype.startswith("int"):
+        return int
+    elif mtype.startswith("float"):
+        return float
+    elif mtype.startswith("date"):
+        return TimeUtilities.fromString
+    return None
+
+
+def getTypedValue(value, mtype):
+    """Convert the value of a metadata field to its type
+
+    :raises ValueError: if the value can not be converted
+    """
+    converter = getTypeConverter(mtype)
+    return value if converter is None else converter(value)
+
+
+# Whether a value passes the check of a compiled query term.
+# The comparisons fail as in the original MetaQuery.applyQuery, e.g. ">" fails if operand >= value
+_CHECKS = {
+    "in": lambda value, operand: value in operand,
+    "nin": lambda value, operand: value not in operand,
+    "=": lambda value, operand: value == operand,
+    "!=": lambda value, operand: value != operand,
+    ">": lambda value, operand: not operand >= value,
+    "<": lambda value, operand: not operand <= value,
+    ">=": lambda value, operand: not operand > value,
+    "<=": lambda value, operand: not operand < value,
+}
+
+
+def _getFlags(kind, operand, values):
+    """Whether each value passes the check of a compiled query term, as _CHECKS on a whole column"""
+    if kind == "in":
+        return [value in operand for value in values]
+    elif kind == "nin":
+        return [value not in operand for value in values]
+    elif kind == "=":
+        return [value == operand for value in values]
+    elif kind == "!=":
+        return [value != operand for value in values]
+    elif kind == ">":
+        return [not operand >= value for value in values]
+    elif kind == "<":
+        return [not operand <= value for value in values]
+    elif kind == ">=":
+        return [not operand > value for value in values]
+    elif kind == "<=":
+        return [not operand < value for value in values]
+    raise ValueError("Unknown check %s" % kind)
+
+
+class CompiledMetaQuery:
+    """Metadata query compiled into a predicate on the user Metadata of files
+
+    The terms of the query and their operands are typed once, and the predicate is applied either to
+    the Metadata dictionary of one file, by calling the object, or to a columnar batch of Metadata of many files,
+    with :py:meth:`applyToColumns`. Both give the same results as the original evaluation of the query
+    for each file: the terms are checked in order, and an illegal value is only reported for the files
+    reaching its check.
+    """
+
+    def __init__(self, queryDict, typeDict):
+        self.__terms = [self.__compileTerm(meta, value, typeDict) for meta, value in queryDict.items()]
+
+    @staticmethod
+    def __compileTerm(meta, value, typeDict):
+        """Compile the query of a metadata field
+
+        :returns: tuple (meta, ifMissing, isAny, converter, checks, error), with
+                  ifMissing the result for files without this metadata,
+                  isAny True if any value passes,
+                  checks a list of (kind, typed operand), or ("error", message) for illegal operands,
+                  and error a message if the metadata field is not defined
+        """
+        ifMissing = isinstance(value, str) and value.lower() == "missing"
+        isAny = isinstance(value, str) and value.lower() == "any"
+        if meta not in typeDict:
+            return (meta, ifMissing, isAny, None, [], "Metadata field %s not defined" % meta)
+        converter = getTypeConverter(typeDict[meta])
+
+        if isinstance(value, list):
+            operands = [("in", value)]
+        elif isinstance(value, dict):
+            operands = list(value.items())
+        else:
+            operands = [("=", value)]
+
+        checks = []
+        for operation, operand in operands:
+            try:
+                if converter is None:
+                    typedValue = operand
+                elif isinstance(operand, list):
+                    typedValue = [converter(x) for x in operand]
+                else:
+                    typedValue = converter(operand)
+            except ValueError:
+                checks.append(("error", f"Illegal type for metadata {meta}: {str(operand)} in filter"))
+                continue
+
+            if operation in [">", "<", ">=", "<="]:
+                if isinstance(typedValue, list):
+                    checks.append(("error", "Illegal query: list of values for comparison operation"))
+                else:
+                    checks.append((operation, typedValue))
+            elif operation in ["in", "=", "nin", "!="]:
+                included = operation in ["in", "="]
+                if isinstance(typedValue, list):
+                    try:
+                        typedValue = frozenset(typedValue)
+                    except TypeError:
+                        pass
+                    checks.append(("in" if included else "nin", typedValue))
+                else:
+                    checks.append(("=" if included else "!=", typedValue))
+        return (meta, ifMissing, isAny, converter, checks, None)
+
+    def __call__(self, userMetaDict):
+        """Check whether the user Metadata of a file satisfies the query
+
+        :param dict userMetaDict: {metadata field: value}
+        :returns: S_OK(bool)
+        """
+        for meta, ifMissing, isAny, converter, checks, error in self.__terms:
+            userValue = userMetaDict.get(meta, None)
+            if userValue is None:
+                if ifMissing:
+                    continue
+                return S_OK(False)
+            elif isAny:
+                continue
+            if error:
+                return S_ERROR(error)
+            try:
+                if converter is not None:
+                    userValue = converter(userValue)
+            except ValueError:
+                return S_ERROR(f"Illegal type for metadata {meta}: {str(userValue)} in user data")
+            for kind, operand in checks:
+                if kind == "error":
+                    return S_ERROR(operand)
+                if not _CHECKS[kind](userValue, operand):
+                    return S_OK(False)
+        return S_OK(True)
+
+    def applyToColumns(self, columns, nbFiles=None):
+        """Check which files of a columnar batch of user Metadata satisfy the query
+
+        The terms are checked one after the other, each on all the files still satisfying the previous ones.
+
+        :param dict columns: {metadata field: sequence of values, one per file}, None for missing values.
+                             The fields not in the dictionary are missing for all the files.
+        :param int nbFiles: number of files, by default the length of the columns
+        :returns: S_OK(list of bool), one per file
+        """
+        if nbFiles is None:
+            nbFiles = len(next(iter(columns.values()))) if columns else 0
+        selected = range(nbFiles)
+        for meta, ifMissing, isAny, converter, checks, error in self.__terms:
+            if not selected:
+                break
+            column = columns.get(meta)
+            if column is None:
+                if not ifMissing:
+                    selected = []
+                continue
+            present = [index for index in selected if column[index] is not None]
+            kept = [index for index in selected if column[index] is None] if ifMissing else []
+            if isAny or not present:
+                selected = kept + present
+                continue
+            if error:
+                return S_ERROR(error)
+            values = [column[index] for index in present]
+            if converter is not None:
+                try:
+                    values = list(map(converter, values))
+                except ValueError:
+                    for value in values:
+                        try:
+                            converter(value)
+                        except ValueError:
+                            return S_ERROR(f"Illegal type for metadata {meta}: {str(value)} in user data")
+            for kind, operand in checks:
+                if not present:
+                    break
+                if kind == "error":
+                    return S_ERROR(operand)
+                flags = _getFlags(kind, operand, values)
+                present = list(compress(present, flags))
+                values = list(compress(values, flags))
+            selected = kept + present
+
+        mask = [False] * nbFiles
+        for index in selected:
+            mask[index] = True
+        return S_OK(mask)
+
+
 class MetaQuery:
     def __init__(self, queryDict=None, typeDict=None):
 
@@ -59,6 +267,7 @@ class MetaQuery:
         self.__metaTypeDict = {}
         if typeDict is not None:
             self.__metaTypeDict = typeDict
+        self.__compiledQuery = None
 
     def setMetaQuery(self, queryList, metaTypeDict=None):
         """Create the metadata query out of the command line arguments"""
@@ -157,6 +366,7 @@ class MetaQuery:
                 metaDict[name] = mvalue
 
         self.__metaQueryDict = metaDict
+        self.__compiledQuery = None
         return S_OK(metaDict)
 
     def getMetaQuery(self):
@@ -167,79 +377,26 @@ class MetaQuery:
 
         return json.dumps(self.__metaQueryDict)
 
-    def applyQuery(self, userMetaDict):
-        """Return a list of tuples with tables and conditions to locate files for a given user Metadata"""
-
-        def getOperands(value):
-            if isinstance(value, list):
-                return [("in", value)]
-            elif isinstance(value, dict):
-                resultList = []
-                for operation, operand in value.items():
-                    resultList.append((operation, operand))
-                return resultList
-            else:
-                return [("=", value)]
-
-        def getTypedValue(value, mtype):
-            if mtype[0:3].lower() == "int":
-                return int(value)
-            elif mtype[0:5].lower() == "float":
-                return float(value)
-            elif mtype[0:4].lower() == "date":
-                return TimeUtilities.fromString(value)
-            else:
-                return value
+    def compileQuery(self):
+        """Compile the query into a predicate, which can be applied to many files
 
-        for meta, value in self.__metaQueryDict.items():
+        :returns: CompiledMetaQuery
+        """
+        return CompiledMetaQuery(self.__metaQueryDict, self.__metaTypeDict)
 
-            # Check if user dict contains all the requested meta data
-            userValue = userMetaDict.get(meta, None)
-            if userValue is None:
-                if str(value).lower() == "missing":
-                    continue
-                else:
-                    return S_OK(False)
-            elif str(value).lower() == "any":
-                continue
-
-            mtype = self.__metaTypeDict[meta]
-            try:
-                userValue = getTypedValue(userValue, mtype)
-            except ValueError:
-                return S_ERROR(f"Illegal type for metadata {meta}: {str(userValue)} in user data")
+    def applyQuery(self, userMetaDict):
+        """Check whether the user Metadata of a file satisfies the query
 
-            # Check operations
-            for operation, operand in getOperands(value):
-                try:
-                    if isinstance(operand, list):
-                        typedValue = [getTypedValue(x, mtype) for x in operand]
-                    else:
-                        typedValue = getTypedValue(operand, mtype)
-                except ValueError:
-                    return S_ERROR(f"Illegal type for metadata {meta}: {str(operand)} in filter")
-
-                # Apply query operation
-                if operation in [">", "<", ">=", "<="]:
-                    if isinstance(typedValue, list):
-                        return S_ERROR("Illegal query: list of values for comparison operation")
-                    elif operation == ">" and typedValue >= userValue:
-                        return S_OK(False)
-                    elif operation == "<" and typedValue <= userValue:
-                        return S_OK(False)
-                    elif operation == ">=" and typedValue > userValue:
-                        return S_OK(False)
-                    elif operation == "<=" and typedValue < userValue:
-                        return S_OK(False)
-                elif operation == "in" or operation == "=":
-                    if isinstance(typedValue, list) and userValue not in typedValue:
-                        return S_OK(False)
-                    elif not isinstance(typedValue, list) and userValue != typedValue:
-                        return S_OK(False)
-                elif operation == "nin" or operation == "!=":
-                    if isinstance(typedValue, list) and userValue in typedValue:
-                        return S_OK(False)
-                    elif not isinstance(typedValue, list) and userValue == typedValue:
-                        return S_OK(False)
+        The query is compiled with the first call, see :py:class:`CompiledMetaQuery`
+        """
+        if self.__compiledQuery is None:
+            self.__compiledQuery = self.compileQuery()
+        return self.__compiledQuery(userMetaDict)
 
-        return S_OK(True)
+    def applyQueryToColumns(self, columns, nbFiles=None):
+        """Check which files of a columnar batch of user Metadata satisfy the query,
+        see :py:meth:`CompiledMetaQuery.applyToColumns`
+        """
+        if self.__compiledQuery is None:
+            self.__compiledQuery = self.compileQuery()
+        return self.__compiledQuery.applyToColumns(columns, nbFiles)
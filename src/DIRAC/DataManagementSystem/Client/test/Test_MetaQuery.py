@@ -0,0 +1,96 @@
+""" Test the evaluation of the metadata queries, on one file and on columnar batches of files
+"""
+import datetime
+
+import pytest
+
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+
+typeDict = {
+    "Run": "INT",
+    "Energy": "FLOAT",
+    "Type": "VARCHAR(128)",
+    "Version": "VARCHAR(128)",
+    "Date": "DATETIME",
+}
+
+files = [
+    {"Run": 10, "Type": "RAW", "Energy": "6.5", "Date": "2022-01-10 12:00:00"},
+    {"Run": "11", "Type": "DST", "Energy": 7, "Version": "v1"},
+    {"Run": 12, "Type": "SIM", "Version": "v2", "Date": "2022-03-01 00:00:00"},
+    {"Run": 3, "Type": "DST"},
+    {"Type": "SIM", "Version": None},
+    {},
+]
+
+queries = [
+    ({"Run": 10}, [True, False, False, False, False, False]),
+    ({"Run": "11"}, [False, True, False, False, False, False]),
+    ({"Run": [10, 12]}, [True, False, True, False, False, False]),
+    ({"Run": {"in": [10, 11], "!=": 11}}, [True, False, False, False, False, False]),
+    ({"Run": {"nin": [10, 11]}}, [False, False, True, True, False, False]),
+    ({"Run": {">": 10}}, [False, True, True, False, False, False]),
+    ({"Run": {">=": 10, "<": 12}}, [True, True, False, False, False, False]),
+    ({"Run": {"<=": 10}}, [True, False, False, True, False, False]),
+    ({"Energy": {">": 6.5}}, [False, True, False, False, False, False]),
+    ({"Type": {"!=": "RAW"}, "Version": "Missing"}, [False, False, False, True, True, False]),
+    ({"Version": "Any"}, [False, True, True, False, False, False]),
+    ({"Type": ["DST", "SIM"], "Run": {"<": 12}}, [False, True, False, True, False, False]),
+    ({"Date": {">": "2022-02-01 00:00:00"}}, [False, False, True, False, False, False]),
+    ({}, [True, True, True, True, True, True]),
+]
+
+
+def toColumns(metadataDicts):
+    fields = {field for metadata in metadataDicts for field in metadata}
+    return {field: [metadata.get(field) for metadata in metadataDicts] for field in fields}
+
+
+@pytest.mark.parametrize("queryDict, expected", queries)
+def test_applyQuery(queryDict, expected):
+    """A file and a columnar batch of files give the same results"""
+    metaQuery = MetaQuery(queryDict, typeDict)
+    assert [metaQuery.applyQuery(metadata)["Value"] for metadata in files] == expected
+    res = metaQuery.applyQueryToColumns(toColumns(files))
+    assert res["OK"], res
+    assert res["Value"] == expected
+
+
+def test_columns():
+    """The files missing from the columns, or without any column, are handled"""
+    metaQuery = MetaQuery({"Version": "Missing"}, typeDict)
+    assert metaQuery.applyQueryToColumns({}, 3)["Value"] == [True, True, True]
+    metaQuery = MetaQuery({"Run": 1}, typeDict)
+    assert metaQuery.applyQueryToColumns({"Type": ["RAW"] * 3})["Value"] == [False, False, False]
+    assert metaQuery.applyQueryToColumns({"Run": []})["Value"] == []
+
+
+def test_illegalValues():
+    """Illegal values are only reported for the files reaching their check"""
+    metaQuery = MetaQuery({"Type": "RAW", "Run": {"<": "abc"}}, typeDict)
+    assert metaQuery.applyQuery({"Type": "DST", "Run": 1})["Value"] is False
+    assert metaQuery.applyQueryToColumns({"Type": ["DST"], "Run": [1]})["Value"] == [False]
+    assert not metaQuery.applyQuery({"Type": "RAW", "Run": 1})["OK"]
+    assert not metaQuery.applyQueryToColumns({"Type": ["DST", "RAW"], "Run": [1, 1]})["OK"]
+
+    metaQuery = MetaQuery({"Run": 1}, typeDict)
+    assert not metaQuery.applyQuery({"Run": "abc"})["OK"]
+    assert not metaQuery.applyQueryToColumns({"Run": [1, "abc"]})["OK"]
+
+    metaQuery = MetaQuery({"Run": {">": [1, 2]}}, typeDict)
+    assert not metaQuery.applyQuery({"Run": 1})["OK"]
+
+
+def test_compileQuery():
+    """A compiled query can be applied to many files"""
+    predicate = MetaQuery({"Date": {"<": datetime.datetime(2022, 2, 1)}}, typeDict).compileQuery()
+    assert [predicate(metadata)["Value"] for metadata in files] == [True, False, False, False, False, False]
+
+
+def test_setMetaQuery():
+    """Setting the query compiles it again"""
+    metaQuery = MetaQuery(typeDict=typeDict)
+    assert metaQuery.setMetaQuery(["Run>10"])["OK"]
+    assert metaQuery.applyQuery({"Run": 11})["Value"] is True
+    assert metaQuery.setMetaQuery(["Run<10"])["OK"]
+    assert metaQuery.applyQuery({"Run": 11})["Value"] is False
@@ -7,6 +7,9 @@
 
 import datetime
 import errno
+import random
+import time
+from collections import defaultdict
 
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.exc import SQLAlchemyError
@@ -39,6 +42,13 @@ from DIRAC.ConfigurationSystem.Client.Utilities import getDBParameters
 
 metadata = MetaData()
 
+# Maximum number of rows updated in one transaction by the bulk updates
+UPDATE_CHUNK_SIZE = 1000
+# Number of times a transaction is retried when it was chosen as deadlock victim
+DEADLOCK_RETRIES = 3
+# MySQL errors after which the transaction can be retried: ER_LOCK_DEADLOCK and ER_LOCK_WAIT_TIMEOUT
+RETRIABLE_MYSQL_ERRORS = (1213, 1205)
+
 # Define the default utc_timestampfunction.
 # We overwrite it in the case of sqlite in the tests
 # because sqlite does not know UTC_TIMESTAMP
@@ -156,6 +166,30 @@ mapper(FTS3StagingOperation, fts3OperationTable, inherits=fts3Operation_mapper,
 # We set it to `False` simply because we do not rely on the session cache.
 # Please see https://github.com/sqlalchemy/sqlalchemy/discussions/6159 for detailed discussion
 
+
+def _isRetriable(exc):
+    """Whether a transaction failed because of a deadlock or lock wait timeout, and can be retried"""
+    orig = getattr(exc, "orig", None)
+    return bool(orig is not None and orig.args and orig.args[0] in RETRIABLE_MYSQL_ERRORS)
+
+
+def _groupChangedRows(currentRows, rowUpdates):
+    """Group the rows to update by their new values, skipping the rows which already have them
+
+    :param currentRows: iterable of (rowID, {column name: current value})
+    :param dict rowUpdates: { rowID: { column name: new value } }
+
+    :returns: { tuple of (column name, new value) : list of rowIDs }
+    """
+    groups = defaultdict(list)
+    for rowID, currentValues in currentRows:
+        updateDict = rowUpdates[rowID]
+        if all(currentValues.get(column) == value for column, value in updateDict.items()):
+            continue
+        groups[tuple(sorted(updateDict.items()))].append(rowID)
+    return groups
+
+
 ########################################################################
 class FTS3DB:
     """
@@ -345,14 +379,47 @@ class FTS3DB:
         finally:
             session.close()
 
+    def _updateInChunks(self, methodName, rowIDs, updateChunk):
+        """Update rows by chunks of UPDATE_CHUNK_SIZE, each of them in its own transaction.
+
+        The rows are sorted, so that concurrent updates lock them in the same order,
+        and a chunk is retried when its transaction is chosen as deadlock victim
+        (https://dev.mysql.com/doc/refman/5.7/en/innodb-deadlocks-handling.html)
+
+        :param str methodName: name of the calling method, for the logs
+        :param rowIDs: IDs of the rows to update
+        :param updateChunk: function taking a session and a list of rowIDs, updating these rows
+
+        :returns: S_OK()/S_ERROR()
+        """
+        rowIDs = sorted(rowIDs)
+        for chunkStart in range(0, len(rowIDs), UPDATE_CHUNK_SIZE):
+            chunk = rowIDs[chunkStart : chunkStart + UPDATE_CHUNK_SIZE]
+            for attempt in range(DEADLOCK_RETRIES + 1):
+                session = self.dbSession()
+                try:
+                    updateChunk(session, chunk)
+                    session.commit()
+                    break
+                except SQLAlchemyError as e:
+                    session.rollback()
+                    if attempt < DEADLOCK_RETRIES and _isRetriable(e):
+                        self.log.warn("%s: transaction aborted, retrying" % methodName, repr(e))
+                        time.sleep(random.uniform(0, 0.1 * (attempt + 1)))
+                        continue
+                    self.log.exception("%s: unexpected exception" % methodName, lException=e)
+                    return S_ERROR(f"{methodName}: unexpected exception {e}")
+                finally:
+                    session.close()
+        return S_OK()
+
     def updateFileStatus(self, fileStatusDict, ftsGUID=None):
         """Update the file ftsStatus and error
          The update is only done if the file is not in a final state
          (To avoid bringing back to life a file by consuming MQ a posteriori)
 
-
-
-         TODO: maybe it should query first the status and filter the rows I want to update !
+         The current state of the files is read first, and only the files which changed are updated,
+         with one UPDATE per set of new values.
 
         :param fileStatusDict: { fileID : { status , error, ftsGUID } }
         :param ftsGUID: If specified, only update the rows where the ftsGUID matches this value.
@@ -361,110 +428,110 @@ class FTS3DB:
 
         """
 
-        # This here is inneficient as we update every files, even if it did not change, and we commit every time.
-        # It would probably be best to update only the files that changed.
-        # However, commiting every time is the recommendation of MySQL
-        # (https://dev.mysql.com/doc/refman/5.7/en/innodb-deadlocks-handling.html)
-
+        # { fileID : { column name : new value } }
+        fileUpdates = {}
         for fileID, valueDict in fileStatusDict.items():
+            updateDict = {"status": valueDict["status"]}
+
+            # We only update error if it is specified
+            if "error" in valueDict:
+                # Replace empty string with None
+                updateDict["error"] = valueDict["error"] or None
+
+            # We only update ftsGUID if it is specified
+            if "ftsGUID" in valueDict:
+                # Replace empty string with None
+                updateDict["ftsGUID"] = valueDict["ftsGUID"] or None
+
+            fileUpdates[int(fileID)] = updateDict
+
+        def updateChunk(session, fileIDs):
+            # We only update the lines matching:
+            # * the good fileID
+            # * the status is not Final
+            # * the ftsGUID, if specified
+            whereConditions = [~FTS3File.status.in_(FTS3File.FINAL_STATES)]
+            if ftsGUID:
+                whereConditions.append(FTS3File.ftsGUID == ftsGUID)
+
+            currentRows = session.execute(
+                select(FTS3File.fileID, FTS3File.status, FTS3File.error, FTS3File.ftsGUID).where(
+                    and_(FTS3File.fileID.in_(fileIDs), *whereConditions)
+                )
+            ).all()
+
+            groups = _groupChangedRows(
+                (
+                    (fileID, {"status": status, "error": error, "ftsGUID": fileFtsGUID})
+                    for fileID, status, error, fileFtsGUID in currentRows
+                ),
+                fileUpdates,
+            )
 
-            session = self.dbSession()
-            try:
-
-                updateDict = {FTS3File.status: valueDict["status"]}
-
-                # We only update error if it is specified
-                if "error" in valueDict:
-                    newError = valueDict["error"]
-                    # Replace empty string with None
-                    if not newError:
-                        newError = None
-                    updateDict[FTS3File.error] = newError
-
-                # We only update ftsGUID if it is specified
-                if "ftsGUID" in valueDict:
-                    newFtsGUID = valueDict["ftsGUID"]
-                    # Replace empty string with None
-                    if not newFtsGUID:
-                        newFtsGUID = None
-                    updateDict[FTS3File.ftsGUID] = newFtsGUID
-
-                # We only update the lines matching:
-                # * the good fileID
-                # * the status is not Final
-
-                whereConditions = [FTS3File.fileID == fileID, ~FTS3File.status.in_(FTS3File.FINAL_STATES)]
-
-                # If an ftsGUID is specified, add it to the `where` condition
-                if ftsGUID:
-                    whereConditions.append(FTS3File.ftsGUID == ftsGUID)
-
-                updateQuery = (
+            for newValues, groupFileIDs in groups.items():
+                session.execute(
                     update(FTS3File)
-                    .where(and_(*whereConditions))
-                    .values(updateDict)
-                    .execution_options(synchronize_session=False)
-                )  # see comment about synchronize_session
-
-                session.execute(updateQuery)
-
-                session.commit()
-
-            except SQLAlchemyError as e:
-                session.rollback()
-                self.log.exception("updateFileFtsStatus: unexpected exception", lException=e)
-                return S_ERROR("updateFileFtsStatus: unexpected exception %s" % e)
-            finally:
-                session.close()
+                    .where(and_(FTS3File.fileID.in_(groupFileIDs), *whereConditions))
+                    .values({getattr(FTS3File, column): value for column, value in newValues})
+                    .execution_options(synchronize_session=False)  # see comment about synchronize_session
+                )
 
-        return S_OK()
+        return self._updateInChunks("updateFileFtsStatus", fileUpdates, updateChunk)
 
     def updateJobStatus(self, jobStatusDict):
         """Update the job Status and error
          The update is only done if the job is not in a final state
          The assignment flag is released
 
+         As for the files, only the jobs which changed are updated, grouped by new values.
+
         :param jobStatusDict: { jobID : { status , error, completeness } }
         """
-        session = self.dbSession()
-        try:
 
-            for jobID, valueDict in jobStatusDict.items():
+        # { jobID : { column name : new value } }
+        jobUpdates = {}
+        for jobID, valueDict in jobStatusDict.items():
+            updateDict = {"status": valueDict["status"], "assignment": None}
+
+            # We only update error if it is specified
+            if "error" in valueDict:
+                # Replace empty string with None
+                updateDict["error"] = valueDict["error"] or None
 
-                updateDict = {FTS3Job.status: valueDict["status"]}
+            if "completeness" in valueDict:
+                updateDict["completeness"] = valueDict["completeness"]
 
-                # We only update error if it is specified
-                if "error" in valueDict:
-                    newError = valueDict["error"]
-                    # Replace empty string with None
-                    if not newError:
-                        newError = None
-                    updateDict[FTS3Job.error] = newError
+            # Never equal to the current value, replaced by the current time in the update
+            if valueDict.get("lastMonitor"):
+                updateDict["lastMonitor"] = True
 
-                if "completeness" in valueDict:
-                    updateDict[FTS3Job.completeness] = valueDict["completeness"]
+            jobUpdates[int(jobID)] = updateDict
 
-                if valueDict.get("lastMonitor"):
-                    updateDict[FTS3Job.lastMonitor] = utc_timestamp()
+        def updateChunk(session, jobIDs):
+            notFinal = ~FTS3Job.status.in_(FTS3Job.FINAL_STATES)
+            columns = ("status", "error", "completeness", "assignment")
 
-                updateDict[FTS3Job.assignment] = None
+            currentRows = session.execute(
+                select(FTS3Job.jobID, *[getattr(FTS3Job, column) for column in columns]).where(
+                    and_(FTS3Job.jobID.in_(jobIDs), notFinal)
+                )
+            ).all()
+
+            groups = _groupChangedRows(((row[0], dict(zip(columns, row[1:]))) for row in currentRows), jobUpdates)
 
+            for newValues, groupJobIDs in groups.items():
+                updateDict = {
+                    getattr(FTS3Job, column): utc_timestamp() if column == "lastMonitor" else value
+                    for column, value in newValues
+                }
                 session.execute(
                     update(FTS3Job)
-                    .where(and_(FTS3Job.jobID == jobID, ~FTS3Job.status.in_(FTS3Job.FINAL_STATES)))
+                    .where(and_(FTS3Job.jobID.in_(groupJobIDs), notFinal))
                     .values(updateDict)
                     .execution_options(synchronize_session=False)  # see comment about synchronize_session
                 )
-            session.commit()
 
-            return S_OK()
-
-        except SQLAlchemyError as e:
-            session.rollback()
-            self.log.exception("updateJobStatus: unexpected exception", lException=e)
-            return S_ERROR("updateJobStatus: unexpected exception %s" % e)
-        finally:
-            session.close()
+        return self._updateInChunks("updateJobStatus", jobUpdates, updateChunk)
 
     def cancelNonExistingJob(self, operationID, ftsGUID):
         """
@@ -226,7 +226,7 @@ class DirectoryClosure(DirectoryTreeBase):
         """
 
         if requestString:
-            reqStr = "SELECT ChildID FROM FC_DirectoryClosure WHERE ParentID = %s" % dirID
+            reqStr = "SELECT ChildID AS DirID FROM FC_DirectoryClosure WHERE ParentID = %s" % dirID
             if not includeParent:
                 reqStr += " AND Depth != 0"
             return S_OK(reqStr)
@@ -239,6 +239,14 @@ class DirectoryClosure(DirectoryTreeBase):
 
         return S_OK({x[0]: x[1] for x in result["Value"]})
 
+    def getAllSubdirectoriesRequest(self, parentsRequest):
+        """Get the SQL request selecting the DirID of the given directories and of all their subdirectories
+
+        :param str parentsRequest: SQL request selecting the IDs of the parent directories
+        :returns: S_OK(request)
+        """
+        return S_OK("SELECT ChildID AS DirID FROM FC_DirectoryClosure WHERE ParentID IN (%s)" % parentsRequest)
+
     def getAllSubdirectoriesByID(self, dirIdList):
         """Get IDs of all the subdirectories of directories in a given list
 
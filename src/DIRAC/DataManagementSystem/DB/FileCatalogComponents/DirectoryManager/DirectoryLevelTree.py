@@ -404,6 +404,23 @@ class DirectoryLevelTree(DirectoryTreeBase):
             return result
         return S_OK(result["Value"][0][0])
 
+    def getAllSubdirectoriesRequest(self, parentsRequest):
+        """Get the SQL request selecting the DirID of the given directories and of all their subdirectories
+
+        :param str parentsRequest: SQL request selecting the IDs of the parent directories
+        :return: S_OK(request)
+        """
+        # The enumerated path of a subdirectory starts with the one of its parent: one request per level
+        # of the parents, matching the LPATH prefix of this level with the (LPATH1, ..., LPATH15) index
+        levelRequests = []
+        for level in range(MAX_LEVELS + 1):
+            req = "SELECT S.DirID FROM FC_DirectoryLevelTree AS P JOIN FC_DirectoryLevelTree AS S"
+            if level:
+                req += " ON %s" % " AND ".join("S.LPATH%d=P.LPATH%d" % (i, i) for i in range(1, level + 1))
+            req += " WHERE P.Level=%d AND P.DirID IN (%s)" % (level, parentsRequest)
+            levelRequests.append(req)
+        return S_OK(" UNION ALL ".join(levelRequests))
+
     def getAllSubdirectoriesByID(self, dirList):
         """Get IDs of all the subdirectories of directories in a given list"""
 
@@ -5,7 +5,11 @@ import os
 import stat
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities import getIDSelectString
+from DIRAC.Core.Utilities.List import intListToString
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities import (
+    getIDSelectString,
+    getDirectoryUsageUpdateReq,
+)
 
 DEBUG = 0
 
@@ -17,6 +21,9 @@ class DirectoryTreeBase:
         self.db = database
         self.lock = threading.Lock()
         self.treeTable = ""
+        # Stack of ( dirID, recursive ) of the directory usage verification
+        self.__usageVerificationStack = []
+        self.__usageVerificationLock = threading.Lock()
 
     ############################################################################
     #
@@ -54,6 +61,14 @@ class DirectoryTreeBase:
         """Get all the subdirectories of the given directory at a given level"""
         return S_ERROR("To be implemented on derived class")
 
+    def getAllSubdirectoriesRequest(self, parentsRequest):
+        """Get the SQL request selecting the DirID of the given directories and of all their subdirectories
+
+        :param str parentsRequest: SQL request selecting the IDs of the parent directories
+        :return: S_OK(request)/S_ERROR
+        """
+        return S_ERROR("To be implemented on derived class")
+
     ##########################################################################
 
     def _getConnection(self, connection):
@@ -153,6 +168,9 @@ class DirectoryTreeBase:
                 return result
             result = self.makeDirectory(path, credDict)
 
+        if result["OK"] and self.db.dmeta:
+            # The new directories inherit the metadata of their parents
+            self.db.dmeta.metadataChanged()
         return result
 
     #####################################################################
@@ -1155,6 +1173,158 @@ class DirectoryTreeBase:
 
         return S_OK(resultDict)
 
+    def verifyDirectoryUsage(self, dirID, recursive=True):
+        """Reconcile the FC_DirectoryUsage entries of a directory with the file and replica tables.
+        This is what _rebuildDirectoryUsage does for the whole catalog, limited to one directory.
+
+        With recursive=True, the entries of the whole subtree are recomputed from the file and replica tables.
+        Otherwise, only the entries of the directory itself are recomputed, from its own files and
+        the entries of its subdirectories, which are supposed to be correct.
+        The entries of the parent directories are not changed: they are corrected by their own verification.
+
+        The usage entries are locked during the verification, so the concurrent changes of the
+        catalog wait for it to complete.
+
+        :param int dirID: directory ID
+        :param bool recursive: verify the whole subtree
+        :return: S_OK( number of corrected entries )
+        """
+        result = self.db._getConnection()
+        if not result["OK"]:
+            return result
+        connection = result["Value"]
+
+        result = self.db._update("START TRANSACTION", conn=connection)
+        if not result["OK"]:
+            return result
+        result = self.__verifyDirectoryUsage(dirID, recursive, connection)
+        if not result["OK"]:
+            self.db._update("ROLLBACK", conn=connection)
+            return result
+        corrections = result["Value"]
+        commit = self.db._update("COMMIT", conn=connection)
+        if not commit["OK"]:
+            return commit
+        if corrections:
+            gLogger.info("Corrected directory usage", "of DirID %d: %s" % (dirID, corrections))
+        return S_OK(len(corrections))
+
+    def __verifyDirectoryUsage(self, dirID, recursive, connection):
+        """Compute and apply the corrections of the usage of a directory, within an open transaction
+
+        :return: S_OK( { (dirID, seID): (sizeCorrection, filesCorrection) } )
+        """
+        if recursive:
+            result = self.getSubdirectoriesByID(dirID, requestString=True, includeParent=True)
+            if not result["OK"]:
+                return result
+            dirSelect = result["Value"]
+        else:
+            dirSelect = "%d" % dirID
+
+        req = "SELECT DirID, SEID, SESize, SEFiles FROM FC_DirectoryUsage WHERE DirID IN (%s) FOR UPDATE" % dirSelect
+        result = self.db._query(req, conn=connection)
+        if not result["OK"]:
+            return result
+        stored = {(row[0], row[1]): (int(row[2]), int(row[3])) for row in result["Value"]}
+
+        # Usage of the files of each directory, the SEID 0 being the logical usage
+        ownUsage = {}
+        req = "SELECT DirID, 0, SUM(Size), COUNT(*) FROM FC_Files WHERE DirID IN (%s) GROUP BY DirID" % dirSelect
+        result = self.db._query(req, conn=connection)
+        if not result["OK"]:
+            return result
+        rows = list(result["Value"])
+        req = "SELECT F.DirID, R.SEID, SUM(F.Size), COUNT(*) FROM FC_Files AS F JOIN FC_Replicas AS R"
+        req += " ON F.FileID=R.FileID WHERE F.DirID IN (%s) GROUP BY F.DirID, R.SEID" % dirSelect
+        result = self.db._query(req, conn=connection)
+        if not result["OK"]:
+            return result
+        rows += list(result["Value"])
+        for fileDirID, seID, size, files in rows:
+            ownUsage.setdefault(fileDirID, {})[seID] = (int(size or 0), int(files))
+
+        expected = {}
+        if recursive:
+            result = self.db._query(dirSelect, conn=connection)
+            if not result["OK"]:
+                return result
+            subtreeIDs = {row[0] for row in result["Value"]}
+            # Add the usage of each directory to all its parents within the subtree
+            for fileDirID, seDict in ownUsage.items():
+                result = self.getPathIDsByID(fileDirID)
+                if not result["OK"]:
+                    return result
+                for pathID in subtreeIDs.intersection(result["Value"]):
+                    for seID, (size, files) in seDict.items():
+                        usage = expected.setdefault((pathID, seID), [0, 0])
+                        usage[0] += size
+                        usage[1] += files
+        else:
+            for seID, (size, files) in ownUsage.get(dirID, {}).items():
+                expected[(dirID, seID)] = [size, files]
+            result = self.getChildren(dirID, connection=connection)
+            if not result["OK"]:
+                return result
+            if result["Value"]:
+                req = "SELECT SEID, SUM(SESize), SUM(SEFiles) FROM FC_DirectoryUsage WHERE DirID IN (%s) GROUP BY SEID"
+                result = self.db._query(req % intListToString(result["Value"]), conn=connection)
+                if not result["OK"]:
+                    return result
+                for seID, size, files in result["Value"]:
+                    usage = expected.setdefault((dirID, seID), [0, 0])
+                    usage[0] += int(size)
+                    usage[1] += int(files)
+
+        corrections = {}
+        for key in set(expected) | set(stored):
+            expSize, expFiles = expected.get(key, (0, 0))
+            storedSize, storedFiles = stored.get(key, (0, 0))
+            if (expSize, expFiles) != (storedSize, storedFiles):
+                corrections[key] = (expSize - storedSize, expFiles - storedFiles)
+        if not corrections:
+            return S_OK(corrections)
+
+        result = self.db._update(getDirectoryUsageUpdateReq(corrections), conn=connection)
+        if not result["OK"]:
+            return result
+        return S_OK(corrections)
+
+    def verifyNextDirectoryUsage(self, maxSubdirectories=1000):
+        """Verify the usage of the next subtree of the catalog, walking the whole directory tree
+        over successive calls, to be called periodically.
+
+        The subtrees with more than maxSubdirectories directories are not verified at once:
+        their subdirectories are verified first, then the directory itself from the entries of its
+        subdirectories.
+
+        :param int maxSubdirectories: maximum number of directories verified in one call
+        :return: S_OK( number of corrected entries )
+        """
+        with self.__usageVerificationLock:
+            if not self.__usageVerificationStack:
+                result = self.findDir("/")
+                if not result["OK"]:
+                    return result
+                if not result["Value"]:
+                    return S_ERROR("Directory / not found")
+                self.__usageVerificationStack.append((result["Value"], True))
+            dirID, recursive = self.__usageVerificationStack.pop()
+
+        if recursive:
+            result = self.countSubdirectories(dirID)
+            if not result["OK"]:
+                return result
+            if result["Value"] > maxSubdirectories:
+                result = self.getChildren(dirID)
+                if not result["OK"]:
+                    return result
+                with self.__usageVerificationLock:
+                    self.__usageVerificationStack.append((dirID, False))
+                    self.__usageVerificationStack.extend((childID, True) for childID in result["Value"])
+                return S_OK(0)
+        return self.verifyDirectoryUsage(dirID, recursive=recursive)
+
     def getDirectoryCounters(self, connection=False):
         """Get the total number of directories"""
         conn = self._getConnection(connection)
@@ -1,17 +1,44 @@
 """ DIRAC FileCatalog mix-in class to manage directory metadata
 """
 # pylint: disable=protected-access
+import functools
 import os
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.DictCache import DictCache
 from DIRAC.Core.Utilities.TimeUtilities import queryTime
 
+# Lifetime of the statistics of the metadata tables, used to order the conditions of the queries
+META_STATISTICS_LIFETIME = 300
+
+
+def changesMetadata(method):
+    """Decorator for the methods changing the directory metadata, which invalidates the cached query results"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.metadataChanged()
+
+    return wrapper
+
 
 class DirectoryMetadata:
     def __init__(self, database=None):
 
         self.db = database
+        # Incremented at each change of the directory metadata or of the directory tree,
+        # it is part of the key of the cached query results
+        self.epoch = 0
+        self.__queryCache = DictCache()
+        self.__statisticsCache = DictCache()
+
+    def metadataChanged(self):
+        """Invalidate the cached query results, after a change of the directory metadata or tree"""
+        self.epoch += 1
 
     def setDatabase(self, database):
         self.db = database
@@ -21,6 +48,7 @@ class DirectoryMetadata:
     #  Manage Metadata fields
     #
 
+    @changesMetadata
     def addMetadataField(self, pName, pType, credDict):
         """Add a new metadata parameter to the Metadata Database.
 
@@ -77,6 +105,7 @@ class DirectoryMetadata:
 
         return S_OK("Added new metadata: %d" % metadataID)
 
+    @changesMetadata
     def deleteMetadataField(self, pName, credDict):
         """Remove metadata field
 
@@ -125,6 +154,7 @@ class DirectoryMetadata:
 
         return S_OK(metaDict)
 
+    @changesMetadata
     def addMetadataSet(self, metaSetName, metaSetDict, credDict):
         """Add a new metadata set with the contents from metaSetDict
 
@@ -202,6 +232,7 @@ class DirectoryMetadata:
     #
     #############################################################################################
 
+    @changesMetadata
     def setMetadata(self, dPath, metaDict, credDict):
         """Set the value of a given metadata field for the the given directory path
 
@@ -252,6 +283,7 @@ class DirectoryMetadata:
 
         return S_OK()
 
+    @changesMetadata
     def removeMetadata(self, dPath, metaData, credDict):
         """Remove the specified metadata for the given directory
 
@@ -569,33 +601,6 @@ class DirectoryMetadata:
 
         return S_OK(dirList)
 
-    def __findSubdirMissingMeta(self, metaName, pathSelection):
-        """Find directories not having the given meta datum defined
-
-        :param str metaName: metadata name
-        :param str pathSelection: directory path selection string
-
-        :return: S_OK,S_ERROR , Value list of directories
-        """
-        result = self.__findSubdirByMeta(metaName, "Any", pathSelection)
-        if not result["OK"]:
-            return result
-        dirList = result["Value"]
-        table = self.db.dtree.getTreeTable()
-        dirString = ",".join([str(x) for x in dirList])
-        if dirList:
-            req = f"SELECT DirID FROM {table} WHERE DirID NOT IN ( {dirString} )"
-        else:
-            req = "SELECT DirID FROM %s" % table
-        result = self.db._query(req)
-        if not result["OK"]:
-            return result
-        if not result["Value"]:
-            return S_OK([])
-
-        dirList = [x[0] for x in result["Value"]]
-        return S_OK(dirList)
-
     def __expandMetaDictionary(self, metaDict, credDict):
         """Update the dictionary with metadata query by expand metaSet type metadata
 
@@ -665,6 +670,111 @@ class DirectoryMetadata:
         else:
             return S_OK(result["Value"][0][0])
 
+    def __getQueryCacheKey(self, queryName, queryDict, path):
+        """Key of the cached result of a query, None if the query results are not cached"""
+        if self.__getQueryCacheLifeTime() <= 0:
+            return None
+        return (self.epoch, queryName, str(sorted(queryDict.items())), path)
+
+    def __getQueryCacheLifeTime(self):
+        return getattr(self.db, "metaQueryCacheLifeTime", 0)
+
+    def __getMetaStatistics(self, metaName):
+        """Get the number of directories defining the given metadata, and its number of distinct values
+
+        :return: tuple (number of directories, number of values), None if not available
+        """
+        statistics = self.__statisticsCache.get(metaName)
+        if statistics is None:
+            result = self.db._query(f"SELECT COUNT(*), COUNT(DISTINCT Value) FROM FC_Meta_{metaName}")
+            if not result["OK"] or not result["Value"]:
+                return None
+            statistics = tuple(int(count) for count in result["Value"][0])
+            self.__statisticsCache.add(metaName, META_STATISTICS_LIFETIME, statistics)
+        return statistics
+
+    def __estimateCardinality(self, metaName, value):
+        """Estimate the number of directories defining the given metadata with a value satisfying the condition
+
+        :param str metaName: metadata name
+        :param value: condition, as given to __createMetaSelection
+
+        :return: tuple to sort the conditions from the most to the least selective one
+        """
+        if value == "Missing":
+            # Can only be evaluated over the whole directory tree
+            return (True, 0)
+        statistics = self.__getMetaStatistics(metaName)
+        if not statistics:
+            return (False, float("inf"))
+        nDirs, nValues = statistics
+        perValue = nDirs / max(nValues, 1)
+        if isinstance(value, list):
+            return (False, min(len(value) * perValue, nDirs))
+        if isinstance(value, dict):
+            estimate = nDirs
+            for operation, operand in value.items():
+                if operation in ["in", "="]:
+                    estimate = min(estimate, len(operand) * perValue if isinstance(operand, list) else perValue)
+                elif operation in [">", "<", ">=", "<="]:
+                    estimate = min(estimate, nDirs / 3)
+            return (False, estimate)
+        if value == "Any":
+            return (False, nDirs)
+        return (False, perValue)
+
+    def __findSubdirsByMetaDict(self, metaDict, pathSelection):
+        """Find the directories satisfying all the conditions of metaDict, with a single query
+
+        A directory satisfies a condition if the metadata is defined with a matching value for it or
+        for one of its parents. The conditions are put in the query from the most to the least selective
+        one, as estimated from the statistics of the metadata tables, the "Missing" ones last.
+
+        :param dict metaDict: metadata name -> condition
+        :param str pathSelection: directory path selection string
+
+        :return: S_OK/S_ERROR, Value list of directory IDs
+        """
+        included = []
+        excluded = []
+        for metaName, value in sorted(metaDict.items(), key=lambda item: self.__estimateCardinality(*item)):
+            result = self.__createMetaSelection("Any" if value == "Missing" else value, "M.")
+            if not result["OK"]:
+                return result
+            req = "SELECT M.DirID FROM FC_Meta_%s AS M" % metaName
+            if result["Value"]:
+                req += " WHERE %s" % result["Value"]
+            result = self.db.dtree.getAllSubdirectoriesRequest(req)
+            if not result["OK"]:
+                return result
+            if value == "Missing":
+                excluded.append(result["Value"])
+            else:
+                included.append(result["Value"])
+        if pathSelection:
+            included.append(pathSelection)
+        if not included:
+            # Only missing metadata, in the whole catalog
+            result = self.db.dtree.findDir("/")
+            if not result["OK"]:
+                return result
+            if not result["Value"]:
+                return S_OK([])
+            result = self.db.dtree.getSubdirectoriesByID(result["Value"], requestString=True, includeParent=True)
+            if not result["OK"]:
+                return result
+            included.append(result["Value"])
+
+        req = "SELECT DISTINCT D.DirID FROM (%s) AS D" % included[0]
+        conditions = ["D.DirID IN (%s)" % request for request in included[1:]]
+        conditions += ["D.DirID NOT IN (%s)" % request for request in excluded]
+        if conditions:
+            req += " WHERE %s" % " AND ".join(conditions)
+        result = self.db._query(req)
+        if not result["OK"]:
+            return result
+        return S_OK([row[0] for row in result["Value"]])
+
     @queryTime
     def findDirIDsByMetadata(self, queryDict, path, credDict):
         """Find Directories satisfying the given metadata and being subdirectories of
@@ -676,6 +786,25 @@ class DirectoryMetadata:
 
         :return: S_OK/S_ERROR, Value list of selected directory IDs
         """
+        cacheKey = self.__getQueryCacheKey("findDirIDsByMetadata", queryDict, path)
+        if cacheKey:
+            cachedResult = self.__queryCache.get(cacheKey)
+            if cachedResult:
+                result = S_OK(list(cachedResult[0]))
+                result["Selection"] = cachedResult[1]
+                return result
+
+        result = self.__findDirIDsByMetadata(queryDict, path, credDict)
+        if result["OK"] and cacheKey:
+            self.__queryCache.add(
+                cacheKey, self.__getQueryCacheLifeTime(), (tuple(result["Value"]), result["Selection"])
+            )
+        return result
+
+    def __findDirIDsByMetadata(self, queryDict, path, credDict):
+        """Find Directories satisfying the given metadata and being subdirectories of
+        the given path, see findDirIDsByMetadata
+        """
 
         pathDirList = []
         pathDirID = 0
@@ -712,25 +841,10 @@ class DirectoryMetadata:
                 if not result["OK"]:
                     return result
                 pathSelection = result["Value"]
-            dirList = []
-            first = True
-            for meta, value in finalMetaDict.items():
-                if value == "Missing":
-                    result = self.__findSubdirMissingMeta(meta, pathSelection)
-                else:
-                    result = self.__findSubdirByMeta(meta, value, pathSelection)
-                if not result["OK"]:
-                    return result
-                mList = result["Value"]
-                if first:
-                    dirList = mList
-                    first = False
-                else:
-                    newList = []
-                    for d in dirList:
-                        if d in mList:
-                            newList.append(d)
-                    dirList = newList
+            result = self.__findSubdirsByMetaDict(finalMetaDict, pathSelection)
+            if not result["OK"]:
+                return result
+            dirList = result["Value"]
         else:
             if pathDirID:
                 result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
@@ -921,6 +1035,25 @@ class DirectoryMetadata:
 
         :return: S_OK/S_ERROR, Value dictionary of metadata
         """
+        cacheKey = self.__getQueryCacheKey("getCompatibleMetadata", queryDict, path)
+        if cacheKey:
+            cachedResult = self.__queryCache.get(cacheKey)
+            if cachedResult is not None:
+                return S_OK({meta: list(values) for meta, values in cachedResult.items()})
+
+        result = self.__getCompatibleMetadata(queryDict, path, credDict)
+        if result["OK"] and cacheKey:
+            self.__queryCache.add(
+                cacheKey,
+                self.__getQueryCacheLifeTime(),
+                {meta: tuple(values) for meta, values in result["Value"].items()},
+            )
+        return result
+
+    def __getCompatibleMetadata(self, queryDict, path, credDict):
+        """Get distinct metadata values compatible with the given already defined metadata,
+        see getCompatibleMetadata
+        """
 
         pathDirID = 0
         if path != "/":
@@ -964,7 +1097,8 @@ class DirectoryMetadata:
         anyMeta = True
         if metaDict:
             anyMeta = False
-            for meta, value in metaDict.items():
+            # The most selective metadata first, to restrict the directories as early as possible
+            for meta, value in sorted(metaDict.items(), key=lambda item: self.__estimateCardinality(*item)):
                 result = self.__findCompatibleDirectories(meta, value, fromList)
                 if not result["OK"]:
                     return result
@@ -981,6 +1115,7 @@ class DirectoryMetadata:
             result = S_OK({})
         return result
 
+    @changesMetadata
     def removeMetadataForDirectory(self, dirList, credDict):
         """Remove all the metadata for the given directory list
 
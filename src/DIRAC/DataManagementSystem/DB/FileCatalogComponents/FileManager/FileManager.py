@@ -300,17 +300,13 @@ class FileManager(FileManagerBase):
         if insertTuples:
             fields = "FileID,GUID,Checksum,ChecksumType,CreationDate,ModificationDate,Mode"
             req = "INSERT INTO FC_FileInfo ({}) VALUES {}".format(fields, ",".join(insertTuples))
-            res = self.db._update(req)
+            # The directory usage is updated in the same transaction
+            res = self._updateWithDirectoryUsage([req], directorySESizeDict, "+", connection=connection)
             if not res["OK"]:
                 self._deleteFiles(toDelete, connection=connection)
                 for lfn in list(lfns):
                     failed[lfn] = res["Message"]
                     lfns.pop(lfn)
-            else:
-                # Update the directory usage
-                result = self._updateDirectoryUsage(directorySESizeDict, "+", connection=connection)
-                if not result["OK"]:
-                    gLogger.warn("Failed to insert FC_DirectoryUsage", result["Message"])
 
         return S_OK({"Successful": lfns, "Failed": failed})
 
@@ -389,16 +385,30 @@ class FileManager(FileManagerBase):
             return res
         return self.__deleteReplicas(list(res["Value"]), connection=connection)
 
+    def _deleteFilesWithUsage(self, fileIDs, directorySEDict, connection=False):
+        """Remove the files with their replicas, and update the directory usage in the same transaction"""
+        connection = self._getConnection(connection)
+        if not fileIDs:
+            return S_OK()
+        res = self.__getFileIDReplicas(fileIDs, connection=connection)
+        if not res["OK"]:
+            return res
+        reqList = self.__getDeleteReplicasReqs(list(res["Value"])) + self.__getDeleteFilesReqs(fileIDs)
+        return self._updateWithDirectoryUsage(reqList, directorySEDict, "-", connection=connection)
+
+    @staticmethod
+    def __getDeleteFilesReqs(fileIDs):
+        fileIDString = intListToString(fileIDs)
+        return [f"DELETE FROM {table} WHERE FileID in ({fileIDString})" for table in ["FC_Files", "FC_FileInfo"]]
+
     def __deleteFiles(self, fileIDs, connection=False):
         connection = self._getConnection(connection)
         if not isinstance(fileIDs, (list, tuple)):
             fileIDs = [fileIDs]
         if not fileIDs:
             return S_OK()
-        fileIDString = intListToString(fileIDs)
         failed = []
-        for table in ["FC_Files", "FC_FileInfo"]:
-            req = f"DELETE FROM {table} WHERE FileID in ({fileIDString})"
+        for table, req in zip(["FC_Files", "FC_FileInfo"], self.__getDeleteFilesReqs(fileIDs)):
             res = self.db._update(req, conn=connection)
             if not res["OK"]:
                 gLogger.error("Failed to remove files from table %s" % table, res["Message"])
@@ -490,14 +500,13 @@ class FileManager(FileManagerBase):
             req = "INSERT INTO FC_ReplicaInfo (RepID,RepType,CreationDate,ModificationDate,PFN) VALUES %s" % (
                 ",".join(insertReplicas)
             )
-            res = self.db._update(req, conn=connection)
+            # The directory usage is updated in the same transaction
+            res = self._updateWithDirectoryUsage([req], directorySESizeDict, "+", connection=connection)
             if not res["OK"]:
                 for lfn in lfns.keys():
                     failed[lfn] = res["Message"]
                 self.__deleteReplicas(toDelete, connection=connection)
             else:
-                # Update the directory usage
-                self._updateDirectoryUsage(directorySESizeDict, "+", connection=connection)
                 for lfn in lfns.keys():
                     successful[lfn] = True
         return S_OK({"Successful": successful, "Failed": failed})
@@ -563,27 +572,32 @@ class FileManager(FileManagerBase):
             for fileID, seDict in res["Value"].items():
                 for seID, repID in seDict.items():
                     repIDs.append(repID)
-            res = self.__deleteReplicas(repIDs, connection=connection)
+            # The directory usage is updated in the same transaction
+            reqList = self.__getDeleteReplicasReqs(repIDs)
+            res = self._updateWithDirectoryUsage(reqList, directorySESizeDict, "-", connection=connection)
             if not res["OK"]:
                 for lfn in lfnFileIDDict.keys():
                     failed[lfn] = res["Message"]
             else:
-                # Update the directory usage
-                self._updateDirectoryUsage(directorySESizeDict, "-", connection=connection)
                 for lfn in lfnFileIDDict.keys():
                     successful[lfn] = True
         return S_OK({"Successful": successful, "Failed": failed})
 
+    @staticmethod
+    def __getDeleteReplicasReqs(repIDs):
+        if not repIDs:
+            return []
+        repIDString = intListToString(repIDs)
+        return [f"DELETE FROM {table} WHERE RepID in ({repIDString})" for table in ["FC_Replicas", "FC_ReplicaInfo"]]
+
     def __deleteReplicas(self, repIDs, connection=False):
         connection = self._getConnection(connection)
         if not isinstance(repIDs, (list, tuple)):
             repIDs = [repIDs]
         if not repIDs:
             return S_OK()
-        repIDString = intListToString(repIDs)
         failed = []
-        for table in ["FC_Replicas", "FC_ReplicaInfo"]:
-            req = f"DELETE FROM {table} WHERE RepID in ({repIDString})"
+        for table, req in zip(["FC_Replicas", "FC_ReplicaInfo"], self.__getDeleteReplicasReqs(repIDs)):
             res = self.db._update(req, conn=connection)
             if not res["OK"]:
                 gLogger.error("Failed to remove replicas from table %s" % table, res["Message"])
@@ -784,6 +798,17 @@ class FileManager(FileManagerBase):
             fileIDDict[repID] = (fileID, seID, statusID)
         return S_OK(fileIDDict)
 
+    def _getSEDumpRows(self, seIDs, lastRepID, pageSize):
+        """Get a page of the replicas at the given SEs, ordered by RepID"""
+        req = "SELECT R.RepID, S.SEName, CONCAT(D.DirName,'/',F.FileName), FI.Checksum, F.Size"
+        req += " FROM FC_Replicas AS R JOIN FC_Files AS F ON R.FileID=F.FileID"
+        req += " JOIN FC_FileInfo AS FI ON F.FileID=FI.FileID"
+        req += " JOIN %s AS D ON F.DirID=D.DirID" % self.db.dtree.getTreeTable()
+        req += " JOIN FC_StorageElements AS S ON R.SEID=S.SEID"
+        req += " WHERE R.SEID IN (%s) AND R.RepID > %d" % (intListToString(seIDs), lastRepID)
+        req += " ORDER BY R.RepID LIMIT %d" % pageSize
+        return self.db._query(req)
+
     def _getDirectoryReplicas(self, dirID, allStatus=False, connection=False):
         """Get replicas for files in a given directory"""
         replicaStatusIDs = []
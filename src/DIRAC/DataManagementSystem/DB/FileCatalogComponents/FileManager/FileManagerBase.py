@@ -8,6 +8,7 @@ import stat
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.Core.Utilities.List import intListToString
 from DIRAC.Core.Utilities.Pfn import pfnunparse
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.Utilities import getDirectoryUsageUpdateReq
 
 
 class FileManagerBase:
@@ -365,33 +366,64 @@ class FileManagerBase:
 
         return S_OK({"Successful": successful, "Failed": failed})
 
-    def _updateDirectoryUsage(self, directorySEDict, change, connection=False):
-        connection = self._getConnection(connection)
-        for directoryID in directorySEDict.keys():
+    def _getDirectoryUsageDeltas(self, directorySEDict, change):
+        """Propagate the usage change of directories to all their parent directories
+
+        :param dict directorySEDict: { dirID: { seID: { "Size": size, "Files": files } } }
+        :param str change: "+" or "-"
+        :return: S_OK( { (dirID, seID): [sizeDelta, filesDelta] } )
+        """
+        sign = -1 if change == "-" else 1
+        usageDeltas = {}
+        for directoryID, dirDict in directorySEDict.items():
             result = self.db.dtree.getPathIDsByID(directoryID)
             if not result["OK"]:
                 return result
-            parentIDs = result["Value"]
-            dirDict = directorySEDict[directoryID]
-            for seID in dirDict.keys():
-                seDict = dirDict[seID]
-                files = seDict["Files"]
-                size = seDict["Size"]
-                insertTuples = []
-                for dirID in parentIDs:
-                    insertTuples.append("(%d,%d,%d,%d,UTC_TIMESTAMP())" % (dirID, seID, size, files))
-
-                req = "INSERT INTO FC_DirectoryUsage (DirID,SEID,SESize,SEFiles,LastUpdate) "
-                req += "VALUES %s" % ",".join(insertTuples)
-                req += (
-                    " ON DUPLICATE KEY UPDATE SESize=SESize%s%d, SEFiles=SEFiles%s%d, LastUpdate=UTC_TIMESTAMP() "
-                    % (change, size, change, files)
-                )
-                res = self.db._update(req)
-                if not res["OK"]:
-                    gLogger.warn("Failed to update FC_DirectoryUsage", res["Message"])
+            for dirID in result["Value"]:
+                for seID, seDict in dirDict.items():
+                    delta = usageDeltas.setdefault((dirID, seID), [0, 0])
+                    delta[0] += sign * seDict["Size"]
+                    delta[1] += sign * seDict["Files"]
+        return S_OK(usageDeltas)
+
+    def _updateDirectoryUsage(self, directorySEDict, change, connection=False):
+        connection = self._getConnection(connection)
+        result = self._getDirectoryUsageDeltas(directorySEDict, change)
+        if not result["OK"]:
+            return result
+        if not result["Value"]:
+            return S_OK()
+        res = self.db._update(getDirectoryUsageUpdateReq(result["Value"]), conn=connection)
+        if not res["OK"]:
+            gLogger.warn("Failed to update FC_DirectoryUsage", res["Message"])
+            return res
         return S_OK()
 
+    def _updateWithDirectoryUsage(self, reqList, directorySEDict, change, connection=False):
+        """Execute the given statements and the corresponding directory usage update in one transaction,
+        so that the usage can not drift from the content of the file and replica tables
+
+        :param list reqList: statements changing the file or replica tables
+        :param dict directorySEDict: { dirID: { seID: { "Size": size, "Files": files } } }
+        :param str change: "+" or "-"
+        """
+        connection = self._getConnection(connection)
+        result = self._getDirectoryUsageDeltas(directorySEDict, change)
+        if not result["OK"]:
+            return result
+        if result["Value"]:
+            reqList = reqList + [getDirectoryUsageUpdateReq(result["Value"])]
+        return self.db._transaction(["START TRANSACTION"] + reqList, conn=connection)
+
+    def _deleteFilesWithUsage(self, fileIDs, directorySEDict, connection=False):
+        """Remove files and their contribution to the directory usage.
+        Derived classes may do both in the same transaction
+        """
+        res = self._deleteFiles(fileIDs, connection=connection)
+        if res["OK"]:
+            self._updateDirectoryUsage(directorySEDict, "-", connection=connection)
+        return res
+
     def _populateFileAncestors(self, lfns, connection=False):
         connection = self._getConnection(connection)
         successful = {}
@@ -646,14 +678,12 @@ class FileManagerBase:
             return res
         directorySESizeDict = res["Value"]
 
-        # Now do removal
-        res = self._deleteFiles(list(fileIDLfns), connection=connection)
+        # Now do removal, and update the directory usage
+        res = self._deleteFilesWithUsage(list(fileIDLfns), directorySESizeDict, connection=connection)
         if not res["OK"]:
             for lfn in fileIDLfns.values():
                 failed[lfn] = res["Message"]
         else:
-            # Update the directory usage
-            self._updateDirectoryUsage(directorySESizeDict, "-", connection=connection)
             for lfn in fileIDLfns.values():
                 successful[lfn] = True
         return S_OK({"Successful": successful, "Failed": failed})
@@ -1340,4 +1370,47 @@ class FileManagerBase:
 
         :returns: S_OK with list of tuples (SEName, lfn, checksum, size)
         """
+        records = []
+        token = 0
+        while token is not None:
+            result = self.getSEDumpPage(seNames, token)
+            if not result["OK"]:
+                return result
+            records.extend(result["Value"]["Records"])
+            token = result["Value"]["Token"]
+        return S_OK(records)
+
+    def getSEDumpPage(self, seNames, token=0, pageSize=10000):
+        """
+         Return a page of the files at given SEs, together with checksum and size.
+         The replicas are returned by increasing replica ID, the token being the last ID of the previous page,
+         so that the dump can be resumed from any page, and does not need to be held in memory.
+
+        :param seNames: list of StorageElement names
+        :param int token: token returned with the previous page, 0 for the first page
+        :param int pageSize: maximum number of replicas in the page
+
+        :returns: S_OK( { "Records": list of tuples (SEName, lfn, checksum, size),
+                          "Token": token of the next page, None for the last page } )
+        """
+        seIDs = []
+        for seName in seNames:
+            res = self.db.seManager.findSE(seName)
+            if not res["OK"]:
+                return res
+            seIDs.append(res["Value"])
+
+        res = self._getSEDumpRows(seIDs, int(token), int(pageSize))
+        if not res["OK"]:
+            return res
+        rows = res["Value"]
+        nextToken = rows[-1][0] if len(rows) == pageSize else None
+        return S_OK({"Records": [tuple(row[1:]) for row in rows], "Token": nextToken})
+
+    def _getSEDumpRows(self, seIDs, lastRepID, pageSize):
+        """To be implemented on derived class
+
+        Should return the rows (RepID, SEName, lfn, checksum, size) of the replicas at the given SEs,
+        with a RepID bigger than lastRepID, ordered by RepID
+        """
         return S_ERROR("To be implemented on derived class")
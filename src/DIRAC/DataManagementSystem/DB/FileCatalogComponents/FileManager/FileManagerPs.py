@@ -938,3 +938,13 @@ class FileManagerPs(FileManagerBase):
         formatedSEIds = intListToString(seIDs)
 
         return self.db.executeStoredProcedureWithCursor("ps_get_se_dump", (formatedSEIds,))
+
+    def _getSEDumpRows(self, seIDs, lastRepID, pageSize):
+        """Get a page of the replicas at the given SEs, ordered by RepID, like ps_get_se_dump"""
+        req = "SELECT r.RepID, s.SEName, CONCAT(d.Name, '/', f.FileName), f.Checksum, f.Size"
+        req += " FROM FC_Replicas r JOIN FC_Files f ON f.FileID = r.FileID"
+        req += " JOIN FC_DirectoryList d ON d.DirID = f.DirID"
+        req += " JOIN FC_StorageElements s ON r.SEID = s.SEID"
+        req += " WHERE r.SEID IN (%s) AND r.RepID > %d" % (intListToString(seIDs), lastRepID)
+        req += " ORDER BY r.RepID LIMIT %d" % pageSize
+        return self.db._query(req)
@@ -19,3 +19,18 @@ def getIDSelectString(ids):
         return S_ERROR("Illegal fileID")
 
     return S_OK(idString)
+
+
+def getDirectoryUsageUpdateReq(usageDeltas):
+    """
+    :param dict usageDeltas: { (dirID, seID): (sizeDelta, filesDelta) }
+    :return: statement adding the deltas to the FC_DirectoryUsage entries, creating the missing ones
+    """
+    values = ",".join(
+        "(%d,%d,%d,%d,UTC_TIMESTAMP())" % (dirID, seID, size, files)
+        for (dirID, seID), (size, files) in sorted(usageDeltas.items())
+    )
+    req = "INSERT INTO FC_DirectoryUsage (DirID,SEID,SESize,SEFiles,LastUpdate) VALUES %s" % values
+    req += " ON DUPLICATE KEY UPDATE SESize=SESize+VALUES(SESize), SEFiles=SEFiles+VALUES(SEFiles),"
+    req += " LastUpdate=UTC_TIMESTAMP()"
+    return req
@@ -13,6 +13,7 @@ from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.Direct
 # from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryNodeTree import DirectoryNodeTree
 
 from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager.FileManagerBase import FileManagerBase
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.FileManager.FileManager import FileManager
 
 dbMock = MagicMock()
 ugManagerMock = MagicMock()
@@ -99,3 +100,45 @@ def test_Base_addFile():
     res = fmb.addFile({"aa": "aaa/bbb"}, {})
     assert res["OK"] is True  # this will need to be implemented on a derived class, but it anyway returns S_OK()
     assert "aa" in res["Value"]["Failed"]
+
+
+####################################################################################
+# FileManager
+
+
+def test_getSEDumpPage():
+    """The SE dump is read page by page, the token being the last RepID of the page"""
+    replicas = [(repID, "SE1", f"/vo/file{repID}", "ad1er", repID * 10) for repID in range(1, 26)]
+
+    def query(req, conn=None):
+        lastRepID = int(req.split("R.RepID > ")[1].split()[0])
+        pageSize = int(req.split("LIMIT ")[1])
+        return {"OK": True, "Value": tuple(row for row in replicas if row[0] > lastRepID)[:pageSize]}
+
+    db = MagicMock()
+    db.seManager.findSE.return_value = {"OK": True, "Value": 1}
+    db._query.side_effect = query
+    fm = FileManager(db)
+
+    records = []
+    tokens = []
+    token = 0
+    while token is not None:
+        res = fm.getSEDumpPage(["SE1"], token=token, pageSize=10)
+        assert res["OK"], res
+        assert len(res["Value"]["Records"]) <= 10
+        records.extend(res["Value"]["Records"])
+        token = res["Value"]["Token"]
+        tokens.append(token)
+
+    assert tokens == [10, 20, None]
+    assert records == [row[1:] for row in replicas]
+
+    # Resuming from a token
+    res = fm.getSEDumpPage(["SE1"], token=20, pageSize=10)
+    assert res["Value"] == {"Records": [row[1:] for row in replicas[20:]], "Token": None}
+
+    # The whole dump, in one go
+    res = fm.getSEDump(["SE1"])
+    assert res["OK"], res
+    assert res["Value"] == [row[1:] for row in replicas]
@@ -0,0 +1,156 @@
+""" Test the directory metadata queries and their caching, on a sqlite copy of the catalog tables
+"""
+# pylint: disable=protected-access
+import sqlite3
+from unittest.mock import MagicMock
+
+import pytest
+
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryClosure import DirectoryClosure
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryLevelTree import (
+    MAX_LEVELS,
+    DirectoryLevelTree,
+)
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryMetadata.DirectoryMetadata import DirectoryMetadata
+
+# DirID -> parent DirID
+TREE = {1: 0, 2: 1, 3: 2, 4: 3, 5: 3, 6: 4, 7: 4, 8: 5, 9: 2, 10: 9}
+# / = 1, /vo = 2, /vo/data = 3, /vo/data/run1 = 4, /vo/data/run2 = 5, /vo/data/run1/raw = 6,
+# /vo/data/run1/reco = 7, /vo/data/run2/raw = 8, /vo/mc = 9, /vo/mc/sim1 = 10
+META = {
+    "DataType": {3: "data", 9: "mc"},
+    "Run": {4: "1", 5: "2"},
+    "Stage": {6: "raw", 7: "reco", 8: "raw"},
+}
+
+
+def pathIDs(dirID):
+    result = []
+    while dirID:
+        result.insert(0, dirID)
+        dirID = TREE[dirID]
+    return result
+
+
+def createTables(conn):
+    """Fill the tables of both directory trees and of the metadata"""
+    lpaths = ", ".join("LPATH%d INTEGER NOT NULL DEFAULT 0" % (i + 1) for i in range(MAX_LEVELS))
+    conn.execute(
+        f"CREATE TABLE FC_DirectoryLevelTree (DirID INTEGER, DirName TEXT, Parent INTEGER, Level INTEGER, {lpaths})"
+    )
+    conn.execute("CREATE INDEX Level ON FC_DirectoryLevelTree (Level)")
+    conn.execute("CREATE INDEX Parent ON FC_DirectoryLevelTree (Parent)")
+    conn.execute(
+        "CREATE INDEX LPATH ON FC_DirectoryLevelTree (%s)" % ", ".join("LPATH%d" % (i + 1) for i in range(MAX_LEVELS))
+    )
+    conn.execute("CREATE TABLE FC_DirectoryClosure (ParentID INTEGER, ChildID INTEGER, Depth INTEGER)")
+    conn.execute("CREATE TABLE FC_MetaFields (MetaName TEXT, MetaType TEXT)")
+    for dirID in TREE:
+        # The enumerated path is made of the rank of each directory among its siblings
+        path = pathIDs(dirID)
+        lpath = [sorted(child for child, parent in TREE.items() if parent == TREE[d]).index(d) + 1 for d in path[1:]]
+        columns = ["DirID", "Parent", "Level"] + ["LPATH%d" % (i + 1) for i in range(len(lpath))]
+        values = [dirID, TREE[dirID], len(lpath)] + lpath
+        conn.execute(
+            "INSERT INTO FC_DirectoryLevelTree (%s) VALUES (%s)" % (", ".join(columns), ", ".join("?" * len(values))),
+            values,
+        )
+        for depth, parentID in enumerate(reversed(path)):
+            conn.execute("INSERT INTO FC_DirectoryClosure VALUES (?, ?, ?)", (parentID, dirID, depth))
+    for metaName, values in META.items():
+        conn.execute("INSERT INTO FC_MetaFields VALUES (?, 'VARCHAR(128)')", (metaName,))
+        conn.execute(f"CREATE TABLE FC_Meta_{metaName} (DirID INTEGER, Value TEXT)")
+        conn.executemany(f"INSERT INTO FC_Meta_{metaName} VALUES (?, ?)", values.items())
+
+
+@pytest.fixture(params=[DirectoryLevelTree, DirectoryClosure])
+def dmeta(request):
+    conn = sqlite3.connect(":memory:")
+    createTables(conn)
+
+    def query(req):
+        try:
+            return {"OK": True, "Value": tuple(conn.execute(req).fetchall())}
+        except sqlite3.Error as e:
+            return {"OK": False, "Message": str(e)}
+
+    db = MagicMock()
+    db.metaQueryCacheLifeTime = 0
+    db._query.side_effect = query
+    db._update.side_effect = query
+    db.dtree = request.param(db)
+    db.dtree.findDir = lambda path: {"OK": True, "Value": 1}
+    yield DirectoryMetadata(db)
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "queryDict, expected",
+    [
+        ({"DataType": "data"}, [3, 4, 5, 6, 7, 8]),
+        ({"DataType": "data", "Stage": "raw"}, [6, 8]),
+        ({"Run": "1", "Stage": "raw"}, [6]),
+        ({"Run": ["1", "2"], "DataType": "data"}, [4, 5, 6, 7, 8]),
+        ({"DataType": "mc", "Stage": "raw"}, []),
+        ({"DataType": "data", "Stage": "Missing"}, [3, 4, 5]),
+        ({"DataType": "data", "Run": "Any", "Stage": "Missing"}, [4, 5]),
+        ({"Run": "Missing", "Stage": "Missing"}, [1, 2, 3, 9, 10]),
+    ],
+)
+def test_findDirIDsByMetadata(dmeta, queryDict, expected):
+    result = dmeta.findDirIDsByMetadata(queryDict, "/", {})
+    assert result["OK"], result
+    assert sorted(result["Value"]) == expected
+
+
+def test_singleQuery(dmeta):
+    """All the conditions are evaluated in one query, the most selective one first"""
+    dmeta.db._query.reset_mock()
+    result = dmeta.findDirIDsByMetadata({"Stage": "raw", "Run": "1", "DataType": "Missing"}, "/", {})
+    assert result["OK"], result
+    assert result["Value"] == []
+    dirQueries = [call.args[0] for call in dmeta.db._query.call_args_list if call.args[0].startswith("SELECT DISTINCT")]
+    assert len(dirQueries) == 1
+    metaTables = [table for table in ("FC_Meta_Run", "FC_Meta_Stage", "FC_Meta_DataType") if table in dirQueries[0]]
+    assert sorted(metaTables, key=dirQueries[0].index) == ["FC_Meta_Run", "FC_Meta_Stage", "FC_Meta_DataType"]
+
+
+def test_queryCache(dmeta):
+    dmeta.db.metaQueryCacheLifeTime = 60
+    queryDict = {"DataType": "data", "Stage": "raw"}
+    assert sorted(dmeta.findDirIDsByMetadata(queryDict, "/", {})["Value"]) == [6, 8]
+    nQueries = dmeta.db._query.call_count
+    result = dmeta.findDirIDsByMetadata(queryDict, "/", {})
+    assert sorted(result["Value"]) == [6, 8]
+    assert result["Selection"] == "Done"
+    assert dmeta.db._query.call_count == nQueries
+
+    # A change of the metadata invalidates the cache
+    dmeta.db._update("UPDATE FC_Meta_Stage SET Value='raw' WHERE DirID=7")
+    dmeta.deleteMetadataField("Unused", {})
+    assert sorted(dmeta.findDirIDsByMetadata(queryDict, "/", {})["Value"]) == [6, 7, 8]
+
+
+def test_pathSelection(dmeta):
+    """The query is restricted to the subdirectories of the path"""
+    pathSelection = dmeta.db.dtree.getSubdirectoriesByID(4, requestString=True, includeParent=True)["Value"]
+    result = dmeta._DirectoryMetadata__findSubdirsByMetaDict({"DataType": "data", "Stage": "raw"}, pathSelection)
+    assert result["Value"] == [6]
+    result = dmeta._DirectoryMetadata__findSubdirsByMetaDict({"Stage": "Missing"}, pathSelection)
+    assert result["Value"] == [4]
+
+
+def test_subdirectoriesIndex():
+    """The subdirectories of the parents below the root are searched with the LPATH index, not scanned"""
+    conn = sqlite3.connect(":memory:")
+    createTables(conn)
+    req = DirectoryLevelTree(MagicMock()).getAllSubdirectoriesRequest("SELECT DirID FROM FC_Meta_Run")["Value"]
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN %s" % req)]
+    conn.close()
+    subdirSearches = [step for step in plan if step.startswith(("SCAN S", "SEARCH S"))]
+    assert len(subdirSearches) == MAX_LEVELS + 1
+    # The root is the parent of all the directories
+    assert subdirSearches[0].startswith("SCAN S")
+    for level, step in enumerate(subdirSearches[1:], 1):
+        assert step.startswith("SEARCH S USING INDEX LPATH (LPATH1=?"), step
+        assert "LPATH%d=?" % level in step and "LPATH%d=?" % (level + 1) not in step, step
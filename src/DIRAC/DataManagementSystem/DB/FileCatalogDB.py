@@ -27,6 +27,8 @@ class FileCatalogDB(DB):
         self.dmeta = None
         self.fmeta = None
         self.datasetManager = None
+        # Lifetime of the cached results of the directory metadata queries, 0 to disable the cache
+        self.metaQueryCacheLifeTime = 0
 
     def setConfig(self, databaseConfig):
         self.directories = {}
@@ -50,6 +52,7 @@ class FileCatalogDB(DB):
         self.validReplicaStatus = databaseConfig["ValidReplicaStatus"]
         self.visibleFileStatus = databaseConfig["VisibleFileStatus"]
         self.visibleReplicaStatus = databaseConfig["VisibleReplicaStatus"]
+        self.metaQueryCacheLifeTime = databaseConfig.get("MetaQueryCacheLifeTime", 0)
 
         # Load the configured components
         for compAttribute, componentType in [
@@ -1020,6 +1023,15 @@ class FileCatalogDB(DB):
         result = self.dtree._rebuildDirectoryUsage()
         return result
 
+    def verifyDirectoryUsage(self, path, recursive=True):
+        """Reconcile the DirectoryUsage entries of a directory, and of its subdirectories if recursive"""
+        result = self.dtree.findDir(path)
+        if not result["OK"]:
+            return result
+        if not result["Value"]:
+            return S_ERROR(errno.ENOENT, "Directory %s not found" % path)
+        return self.dtree.verifyDirectoryUsage(result["Value"], recursive=recursive)
+
     def repairCatalog(self, credDict={}):
         """Repair catalog inconsistencies"""
 
@@ -1180,3 +1192,16 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (SEName, lfn, checksum, size)
         """
         return self.fileManager.getSEDump(seNames)
+
+    def getSEDumpPage(self, seNames, token=0, pageSize=10000):
+        """
+         Return a page of the files at given SEs, together with checksum and size
+
+        :param seNames: list of StorageElement names
+        :param int token: token returned with the previous page, 0 for the first page
+        :param int pageSize: maximum number of files in the page
+
+        :returns: S_OK( { "Records": list of tuples (SEName, lfn, checksum, size),
+                          "Token": token of the next page, None for the last page } )
+        """
+        return self.fileManager.getSEDumpPage(seNames, token=token, pageSize=pageSize)
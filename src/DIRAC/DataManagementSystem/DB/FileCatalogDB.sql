@@ -219,9 +219,15 @@ CREATE TABLE FC_DirectoryLevelTree (
  LPATH15 INT NOT NULL DEFAULT 0,
  INDEX (Level),
  INDEX (Parent),
+ INDEX LPATH (LPATH1, LPATH2, LPATH3, LPATH4, LPATH5, LPATH6, LPATH7, LPATH8,
+              LPATH9, LPATH10, LPATH11, LPATH12, LPATH13, LPATH14, LPATH15),
  UNIQUE INDEX (DirName)
 ) ENGINE = INNODB;
 
+-- Index of the enumerated paths, used to select the subdirectories
+-- ALTER TABLE FC_DirectoryLevelTree ADD INDEX LPATH (LPATH1, LPATH2, LPATH3, LPATH4, LPATH5, LPATH6, LPATH7, LPATH8,
+--                                                    LPATH9, LPATH10, LPATH11, LPATH12, LPATH13, LPATH14, LPATH15);
+
 -- ------------------------------------------------------------------------------
 
 
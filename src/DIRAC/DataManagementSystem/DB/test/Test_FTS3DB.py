@@ -189,3 +189,104 @@ def test_raceCondition(fts3db):
     activeJobs = res["Value"]
     activeJobIDs = [op.jobID for op in activeJobs]
     assert activeJobIDs == [1, 6]
+
+
+def _countUpdates(fts3db):
+    """Count the UPDATE statements executed on the DB"""
+    statements = []
+
+    @event.listens_for(fts3db.engine, "before_cursor_execute")
+    def countUpdate(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            statements.append(statement)
+
+    return statements
+
+
+def test_updateFileStatus(fts3db, monkeypatch):
+    """The files are updated with one UPDATE per new values, skipping the files which did not change,
+    the files in final state and the files of other jobs
+    """
+    monkeypatch.setattr(FTS3DB, "UPDATE_CHUNK_SIZE", 4)
+
+    op = FTS3TransferOperation()
+    for _ in range(10):
+        ftsFile = FTS3File()
+        ftsFile.targetSE = "targetSE"
+        ftsFile.ftsGUID = "job1"
+        op.ftsFiles.append(ftsFile)
+    res = fts3db.persistOperation(op)
+    assert res["OK"], res
+    opID = res["Value"]
+    fileIDs = sorted(ftsFile.fileID for ftsFile in fts3db.getOperation(opID)["Value"].ftsFiles)
+
+    def getFiles():
+        ftsFiles = fts3db.getOperation(opID)["Value"].ftsFiles
+        return {ftsFile.fileID: (ftsFile.status, ftsFile.error, ftsFile.ftsGUID) for ftsFile in ftsFiles}
+
+    # Files 0-4 Finished, 5-9 Failed, with one UPDATE per status per chunk
+    statements = _countUpdates(fts3db)
+    fileStatusDict = {fileID: {"status": "Finished", "error": ""} for fileID in fileIDs[:5]}
+    fileStatusDict.update({fileID: {"status": "Failed", "error": "Tough luck"} for fileID in fileIDs[5:]})
+    res = fts3db.updateFileStatus(fileStatusDict, ftsGUID="job1")
+    assert res["OK"], res
+    assert len(statements) == 4
+    files = getFiles()
+    assert all(files[fileID] == ("Finished", None, "job1") for fileID in fileIDs[:5])
+    assert all(files[fileID] == ("Failed", "Tough luck", "job1") for fileID in fileIDs[5:])
+
+    # Nothing changes: the files in final state are not updated, and neither are the files already Failed
+    statements.clear()
+    fileStatusDict = {fileID: {"status": "Failed", "error": "Tough luck"} for fileID in fileIDs}
+    res = fts3db.updateFileStatus(fileStatusDict, ftsGUID="job1")
+    assert res["OK"], res
+    assert not statements
+    assert getFiles() == files
+
+    # Only the files of the given job are updated
+    fileStatusDict = {fileID: {"status": "Submitted", "ftsGUID": ""} for fileID in fileIDs[5:]}
+    res = fts3db.updateFileStatus(fileStatusDict, ftsGUID="job2")
+    assert res["OK"], res
+    assert getFiles() == files
+    res = fts3db.updateFileStatus(fileStatusDict, ftsGUID="job1")
+    assert res["OK"], res
+    files = getFiles()
+    assert all(files[fileID] == ("Submitted", "Tough luck", None) for fileID in fileIDs[5:])
+
+
+def test_updateJobStatus(fts3db):
+    """The assignment of the jobs is released even if their status did not change"""
+
+    op = FTS3TransferOperation()
+    ftsFile = FTS3File()
+    ftsFile.targetSE = "targetSE"
+    op.ftsFiles.append(ftsFile)
+    for jobID in (1, 2, 3):
+        job = FTS3Job()
+        job.jobID = jobID
+        job.status = "Active"
+        op.ftsJobs.append(job)
+    res = fts3db.persistOperation(op)
+    assert res["OK"], res
+    opID = res["Value"]
+
+    with fts3db.engine.begin() as conn:
+        conn.execute(update(FTS3DB.fts3JobTable).values(assignment="Yes").where(FTS3DB.fts3JobTable.c.jobID == 1))
+
+    statements = _countUpdates(fts3db)
+    res = fts3db.updateJobStatus({1: {"status": "Active"}, 2: {"status": "Active"}, 3: {"status": "Finished"}})
+    assert res["OK"], res
+    # Job 2 did not change
+    assert len(statements) == 2
+
+    jobs = {job.jobID: job for job in fts3db.getOperation(opID)["Value"].ftsJobs}
+    assert [jobs[jobID].status for jobID in (1, 2, 3)] == ["Active", "Active", "Finished"]
+    assert not any(job.assignment for job in jobs.values())
+
+    statements.clear()
+    res = fts3db.updateJobStatus({2: {"status": "Active", "completeness": 50, "lastMonitor": True}})
+    assert res["OK"], res
+    assert len(statements) == 1
+    job = {job.jobID: job for job in fts3db.getOperation(opID)["Value"].ftsJobs}[2]
+    assert job.completeness == 50
+    assert job.lastMonitor
@@ -10,9 +10,37 @@ from io import StringIO
 
 from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.DataManagementSystem.DB.FileCatalogDB import FileCatalogDB
 
 
+class SEDumpReader:
+    """File-like object reading the dump of SEs from the DB page by page, formatted as CSV with '|' separation.
+    Only one page is held in memory at a time, whatever the size of the SEs.
+    """
+
+    def __init__(self, fileCatalogDB, seNames, pageSize):
+        self.__db = fileCatalogDB
+        self.__seNames = seNames
+        self.__pageSize = pageSize
+        self.__token = 0
+        self.__buffer = ""
+
+    def read(self, size=-1):
+        while self.__token is not None and (size < 0 or len(self.__buffer) < size):
+            res = self.__db.getSEDumpPage(self.__seNames, token=self.__token, pageSize=self.__pageSize)
+            if not res["OK"]:
+                raise OSError(res["Message"])
+            csvOutput = StringIO()
+            csv.writer(csvOutput, delimiter="|").writerows(res["Value"]["Records"])
+            self.__buffer += csvOutput.getvalue()
+            self.__token = res["Value"]["Token"]
+        if size < 0:
+            size = len(self.__buffer)
+        data, self.__buffer = self.__buffer[:size], self.__buffer[size:]
+        return data
+
+
 class FileCatalogHandlerMixin:
     """
     A simple Replica and Metadata Catalog service.
@@ -56,6 +84,7 @@ class FileCatalogHandlerMixin:
             "ValidReplicaStatus": ["AprioriGood", "Trash", "Removing", "Probing"],
             "VisibleFileStatus": ["AprioriGood"],
             "VisibleReplicaStatus": ["AprioriGood"],
+            "MetaQueryCacheLifeTime": 0,
         }
         for configKey in sorted(defaultConfig.keys()):
             defaultValue = defaultConfig[configKey]
@@ -63,9 +92,30 @@ class FileCatalogHandlerMixin:
             cls.log.info("%-20s : %-20s" % (str(configKey), str(configValue)))
             databaseConfig[configKey] = configValue
         res = cls.fileCatalogDB.setConfig(databaseConfig)
+        if not res["OK"]:
+            return res
+
+        # Maximum number of files per page of the SE dumps
+        cls.seDumpPageSize = getServiceOption(serviceInfo, "SEDumpPageSize", 10000)
+
+        # Periodic reconciliation of the directory usage, one subtree at a time
+        verificationPeriod = getServiceOption(serviceInfo, "DirectoryUsageVerificationPeriod", 0)
+        if verificationPeriod > 0:
+            if databaseConfig["FileManager"] == "FileManagerPs":
+                cls.log.warn("The directory usage verification is not available with FileManagerPs")
+            else:
+                cls.usageVerificationSize = getServiceOption(serviceInfo, "DirectoryUsageVerificationSize", 1000)
+                gThreadScheduler.addPeriodicTask(verificationPeriod, cls.__verifyDirectoryUsage)
 
         return res
 
+    @classmethod
+    def __verifyDirectoryUsage(cls):
+        """Verify the directory usage of the next subtree of the catalog"""
+        result = cls.fileCatalogDB.dtree.verifyNextDirectoryUsage(cls.usageVerificationSize)
+        if not result["OK"]:
+            cls.log.error("Failed to verify the directory usage", result["Message"])
+
     ########################################################################
     # Path operations (not updated)
     #
@@ -632,6 +682,23 @@ class FileCatalogHandlerMixin:
         """
         return self.fileCatalogDB.getSEDump(seNames)
 
+    types_getSEDumpPage = [list, int, int]
+
+    def export_getSEDumpPage(self, seNames, token, pageSize):
+        """
+         Return a page of the files at given SEs, together with checksum and size.
+         Iterating over the pages gives the same content as getSEDump, and can be resumed from any page.
+
+        :param seNames: StorageElement names
+        :param token: token returned with the previous page, 0 for the first page
+        :param pageSize: maximum number of files in the page, limited by the SEDumpPageSize option
+
+        :returns: S_OK( { "Records": list of tuples (SEName, lfn, checksum, size),
+                          "Token": token of the next page, None for the last page } )
+        """
+        pageSize = min(pageSize, self.seDumpPageSize) if pageSize > 0 else self.seDumpPageSize
+        return self.fileCatalogDB.getSEDumpPage(seNames, token=token, pageSize=pageSize)
+
 
 class FileCatalogHandler(FileCatalogHandlerMixin, RequestHandler):
     def transfer_toClient(self, jsonSENames, token, fileHelper):
@@ -646,29 +713,10 @@ class FileCatalogHandler(FileCatalogHandlerMixin, RequestHandler):
         """
 
         seNames = json.loads(jsonSENames)
-        csvOutput = None
-        res = self.getSEDump(seNames)
-
-        try:
-            if not res["OK"]:
-                ret = fileHelper.stringToNetwork(json.dumps(res))
-                return ret
-
-            retVal = res["Value"]
-
-            csvOutput = StringIO()
-            writer = csv.writer(csvOutput, delimiter="|")
-            for lfn in retVal:
-                writer.writerow(lfn)
-
-            csvOutput.seek(0)
-
-            ret = fileHelper.DataSourceToNetwork(csvOutput)
-            return ret
-
-        except Exception as e:
-            self.log.exception("Exception while sending seDump", repr(e))
-            return S_ERROR("Exception while sending seDump: %s" % repr(e))
-        finally:
-            if csvOutput is not None:
-                csvOutput.close()
+        # The dump is read from the DB page by page while it is sent
+        res = fileHelper.DataSourceToNetwork(SEDumpReader(self.fileCatalogDB, seNames, self.seDumpPageSize))
+        if not res["OK"]:
+            self.log.error("Error while sending seDump", res["Message"])
+            if not fileHelper.finishedTransmission():
+                fileHelper.sendError(res["Message"])
+        return res
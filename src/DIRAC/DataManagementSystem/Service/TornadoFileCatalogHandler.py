@@ -11,15 +11,11 @@
 """
 # imports
 import json
-import csv
-
-from io import StringIO
 
 # from DIRAC
 
 from DIRAC import S_ERROR
-from DIRAC.Core.Utilities.ReturnValues import returnValueOrRaise
-from DIRAC.DataManagementSystem.Service.FileCatalogHandler import FileCatalogHandlerMixin
+from DIRAC.DataManagementSystem.Service.FileCatalogHandler import FileCatalogHandlerMixin, SEDumpReader
 
 from DIRAC.Core.Tornado.Server.TornadoService import TornadoService
 
@@ -42,21 +38,10 @@ class TornadoFileCatalogHandler(FileCatalogHandlerMixin, TornadoService):
 
         """
         seNames = json.loads(jsonSENames)
-        csvOutput = None
 
         try:
-            retVal = returnValueOrRaise(self.getSEDump(seNames))
-
-            csvOutput = StringIO()
-            writer = csv.writer(csvOutput, delimiter="|")
-            writer.writerows(retVal)
-
-            ret = csvOutput.getvalue()
-            return ret
-
+            # The response is not streamed: the clients needing to bound their memory use getSEDumpPage
+            return SEDumpReader(self.fileCatalogDB, seNames, self.seDumpPageSize).read()
         except Exception as e:
             self.log.exception("Exception while sending seDump", repr(e))
             return S_ERROR("Exception while sendind seDump: %s" % repr(e))
-        finally:
-            if csvOutput is not None:
-                csvOutput.close()
@@ -0,0 +1,52 @@
+""" Test the SE dump reader of the FileCatalogHandler
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from DIRAC import S_ERROR, S_OK
+from DIRAC.DataManagementSystem.Service.FileCatalogHandler import SEDumpReader
+
+RECORDS = [("SE1", f"/vo/file{i}", "ad1er", i) for i in range(25)]
+
+
+def getSEDumpPage(seNames, token=0, pageSize=10):
+    page = RECORDS[token : token + pageSize]
+    nextToken = token + pageSize if len(page) == pageSize else None
+    return S_OK({"Records": page, "Token": nextToken})
+
+
+@pytest.mark.parametrize("readSize", [-1, 1, 7, 100, 1048576])
+def test_read(readSize):
+    """Whatever the read size, the content is the CSV of all the pages"""
+    fcDB = MagicMock()
+    fcDB.getSEDumpPage.side_effect = getSEDumpPage
+    reader = SEDumpReader(fcDB, ["SE1"], 10)
+
+    content = ""
+    data = reader.read(readSize)
+    while data:
+        content += data
+        data = reader.read(readSize)
+
+    assert content == "".join(f"SE1|/vo/file{i}|ad1er|{i}\r\n" for i in range(25))
+    assert fcDB.getSEDumpPage.call_count == 3
+
+
+def test_lazyRead():
+    """The pages are only read from the DB when needed"""
+    fcDB = MagicMock()
+    fcDB.getSEDumpPage.side_effect = getSEDumpPage
+    reader = SEDumpReader(fcDB, ["SE1"], 10)
+
+    assert reader.read(10) == "SE1|/vo/fi"
+    assert fcDB.getSEDumpPage.call_count == 1
+
+
+def test_readError():
+    fcDB = MagicMock()
+    fcDB.getSEDumpPage.return_value = S_ERROR("DB error")
+    reader = SEDumpReader(fcDB, ["SE1"], 10)
+
+    with pytest.raises(OSError, match="DB error"):
+        reader.read(10)
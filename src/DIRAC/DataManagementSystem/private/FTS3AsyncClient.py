@@ -0,0 +1,154 @@
+""" Non blocking client of the FTS3 REST API, used by the FTS3Agent to monitor many jobs concurrently
+
+The status of several jobs of a server is queried in a single request (``GET /jobs/<id1>,<id2>,...``),
+falling back to one request per job for the servers which do not accept it, and the number of requests
+in flight is limited per server.
+"""
+import asyncio
+import errno
+import json
+import ssl
+
+from tornado.httpclient import AsyncHTTPClient, HTTPError
+
+from DIRAC import S_OK, S_ERROR
+
+# Attributes of the files returned by the bulk status queries.
+# These are the ones used by FTS3Job.processStatus
+FILE_FIELDS = "file_state,reason,file_metadata,filesize,tx_duration"
+
+
+class FTS3AsyncClient:
+    """Query the status of FTS3 jobs with a non blocking HTTP client
+
+    It has to be used from within a single asyncio event loop, and closed afterwards.
+
+    :param int bulkSize: maximum number of jobs whose status is queried in one request
+    :param int maxRequestsPerServer: maximum number of requests in flight per FTS server
+    :param int requestTimeout: timeout of the requests, in seconds
+    """
+
+    def __init__(self, bulkSize=20, maxRequestsPerServer=10, requestTimeout=120):
+        self.bulkSize = max(1, bulkSize)
+        self.maxRequestsPerServer = max(1, maxRequestsPerServer)
+        self.requestTimeout = requestTimeout
+        # { endpoint : (AsyncHTTPClient, Semaphore) }
+        self.__clients = {}
+        # { (ucert, ukey) : SSLContext }
+        self.__sslContexts = {}
+        # Endpoints which rejected the bulk status queries
+        self.__noBulkEndpoints = set()
+
+    def close(self):
+        """Close the HTTP clients"""
+        for client, _semaphore in self.__clients.values():
+            client.close()
+        self.__clients = {}
+
+    def __getClient(self, endpoint):
+        """HTTP client of a server, and the semaphore limiting the requests in flight"""
+        if endpoint not in self.__clients:
+            client = AsyncHTTPClient(force_instance=True, max_clients=self.maxRequestsPerServer)
+            self.__clients[endpoint] = (client, asyncio.Semaphore(self.maxRequestsPerServer))
+        return self.__clients[endpoint]
+
+    def __getSSLContext(self, context):
+        """SSL context presenting the proxy of an fts3 context.
+        As the fts3 client, the certificate of the server is not verified
+        """
+        key = (context.ucert, context.ukey)
+        if key not in self.__sslContexts:
+            sslContext = ssl.create_default_context()
+            sslContext.check_hostname = False
+            sslContext.verify_mode = ssl.CERT_NONE
+            if context.ucert:
+                sslContext.load_cert_chain(context.ucert, context.ukey or context.ucert)
+            self.__sslContexts[key] = sslContext
+        return self.__sslContexts[key]
+
+    async def __get(self, context, path):
+        """GET a path of the REST API of a server
+
+        :param context: fts3 context of the server
+        :param str path: path of the query
+
+        :returns: the decoded JSON answer
+        """
+        client, semaphore = self.__getClient(context.endpoint)
+        kwargs = {}
+        if context.endpoint.startswith("https"):
+            kwargs["ssl_options"] = self.__getSSLContext(context)
+        async with semaphore:
+            response = await client.fetch(
+                context.endpoint + path,
+                headers={"Accept": "application/json"},
+                request_timeout=self.requestTimeout,
+                validate_cert=False,
+                **kwargs,
+            )
+        return json.loads(response.body)
+
+    async def getJobsStatus(self, context, ftsGUIDs):
+        """Get the status of jobs of one server, with the status of their files
+
+        :param context: fts3 context of the server
+        :param list ftsGUIDs: IDs of the jobs on the server
+
+        :returns: { ftsGUID : S_OK(status dict, as returned by fts3.get_job_status) / S_ERROR }
+                  The error number is errno.ESRCH if the job does not exist on the server
+        """
+        chunks = [ftsGUIDs[start : start + self.bulkSize] for start in range(0, len(ftsGUIDs), self.bulkSize)]
+        jobsStatus = {}
+        for chunkStatus in await asyncio.gather(*(self.__getChunkStatus(context, chunk) for chunk in chunks)):
+            jobsStatus.update(chunkStatus)
+        return jobsStatus
+
+    async def __getChunkStatus(self, context, ftsGUIDs):
+        """Get the status of jobs in a single request if possible, see getJobsStatus"""
+        if len(ftsGUIDs) > 1 and context.endpoint not in self.__noBulkEndpoints:
+            try:
+                jobStatusList = await self.__get(context, "/jobs/{}?files={}".format(",".join(ftsGUIDs), FILE_FIELDS))
+            except HTTPError as e:
+                # Bad request or method not allowed: the server does not know the bulk queries
+                if e.code in (400, 405):
+                    self.__noBulkEndpoints.add(context.endpoint)
+                # For the other errors, and in particular for not found, we query the jobs one by one
+                elif e.code != 404:
+                    return {ftsGUID: S_ERROR(f"Error getting the job status {e}") for ftsGUID in ftsGUIDs}
+            except (OSError, ValueError) as e:
+                return {ftsGUID: S_ERROR(f"Error getting the job status {e!r}") for ftsGUID in ftsGUIDs}
+            else:
+                # A single job is returned as a dict
+                if isinstance(jobStatusList, dict):
+                    jobStatusList = [jobStatusList]
+                jobsStatus = {}
+                for jobStatusDict in jobStatusList:
+                    ftsGUID = jobStatusDict.get("job_id")
+                    # The missing jobs are returned with their http status only
+                    if str(jobStatusDict.get("http_status", "")).startswith("404"):
+                        jobsStatus[ftsGUID] = S_ERROR(errno.ESRCH, f"FTSGUID {ftsGUID} not found on {context.endpoint}")
+                    else:
+                        jobsStatus[ftsGUID] = S_OK(jobStatusDict)
+                for ftsGUID in ftsGUIDs:
+                    if ftsGUID not in jobsStatus:
+                        jobsStatus[ftsGUID] = S_ERROR(f"Status of {ftsGUID} not returned by {context.endpoint}")
+                return jobsStatus
+
+        statusList = await asyncio.gather(*(self.__getJobStatus(context, ftsGUID) for ftsGUID in ftsGUIDs))
+        return dict(zip(ftsGUIDs, statusList))
+
+    async def __getJobStatus(self, context, ftsGUID):
+        """Get the status of one job, the same way as fts3.get_job_status
+
+        :returns: S_OK(status dict)/S_ERROR
+        """
+        try:
+            jobStatusDict = await self.__get(context, f"/jobs/{ftsGUID}")
+            jobStatusDict["files"] = await self.__get(context, f"/jobs/{ftsGUID}/files")
+        except HTTPError as e:
+            if e.code == 404:
+                return S_ERROR(errno.ESRCH, f"FTSGUID {ftsGUID} not found on {context.endpoint}")
+            return S_ERROR(f"Error getting the job status {e}")
+        except (OSError, ValueError) as e:
+            return S_ERROR(f"Error getting the job status {e!r}")
+        return S_OK(jobStatusDict)
@@ -0,0 +1,235 @@
+""" Test the monitoring of the FTS3 jobs with the non blocking client, against a local fake FTS REST server
+"""
+import asyncio
+import errno
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.DErrno import cmpError
+from DIRAC.DataManagementSystem.Agent.FTS3Agent import FTS3Agent
+from DIRAC.DataManagementSystem.Client.FTS3Job import FTS3Job
+from DIRAC.DataManagementSystem.private.FTS3AsyncClient import FTS3AsyncClient
+
+# pylint: disable=redefined-outer-name,abstract-method
+
+
+class FakeFTS:
+    """State of the fake FTS server"""
+
+    def __init__(self):
+        # { ftsGUID : job status dict, with its files }
+        self.jobs = {}
+        self.bulk = True
+        self.delay = 0.05
+        self.requests = []
+        self.running = 0
+        self.maxRunning = 0
+
+    def addJob(self, ftsGUID, jobState, fileStates):
+        """Add a job, whose files have the fileIDs 1, 2, ..."""
+        self.jobs[ftsGUID] = {
+            "job_id": ftsGUID,
+            "job_state": jobState,
+            "reason": None,
+            "job_metadata": {"sourceSE": "SourceSE", "targetSE": "TargetSE"},
+            "files": [
+                {
+                    "file_state": fileState,
+                    "reason": "Failed" if fileState == "FAILED" else None,
+                    "file_metadata": {"fileID": fileID},
+                    "filesize": 10,
+                    "tx_duration": 1,
+                }
+                for fileID, fileState in enumerate(fileStates, start=1)
+            ],
+        }
+
+
+class JobsHandler(tornado.web.RequestHandler):
+    def initialize(self, fts):
+        self.fts = fts
+
+    async def get(self, jobIDs, files):
+        fts = self.fts
+        fts.requests.append(self.request.uri)
+        fts.running += 1
+        fts.maxRunning = max(fts.maxRunning, fts.running)
+        try:
+            await asyncio.sleep(fts.delay)
+        finally:
+            fts.running -= 1
+
+        ftsGUIDs = jobIDs.split(",")
+        if len(ftsGUIDs) > 1:
+            if not fts.bulk:
+                raise tornado.web.HTTPError(400)
+            answer = []
+            for ftsGUID in ftsGUIDs:
+                if ftsGUID in fts.jobs:
+                    answer.append(fts.jobs[ftsGUID])
+                else:
+                    answer.append({"job_id": ftsGUID, "http_status": "404 Not Found"})
+        elif ftsGUIDs[0] not in fts.jobs:
+            raise tornado.web.HTTPError(404)
+        elif files:
+            answer = fts.jobs[ftsGUIDs[0]]["files"]
+        else:
+            answer = {key: value for key, value in fts.jobs[ftsGUIDs[0]].items() if key != "files"}
+        self.write(json.dumps(answer))
+
+
+@pytest.fixture
+def fakeFTS():
+    """Fake FTS REST server, in a thread with its own event loop.
+    Returns its state and the context to use with it
+    """
+    fts = FakeFTS()
+    sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+    port = sockets[0].getsockname()[1]
+    started = threading.Event()
+    state = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = tornado.web.Application([(r"/jobs/([^/]+)(/files)?", JobsHandler, {"fts": fts})])
+        server = tornado.httpserver.HTTPServer(app)
+        server.add_sockets(sockets)
+        state["loop"] = loop
+        started.set()
+        loop.run_forever()
+        server.stop()
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+    yield fts, SimpleNamespace(endpoint=f"http://127.0.0.1:{port}", ucert=None, ukey=None)
+    state["loop"].call_soon_threadsafe(state["loop"].stop)
+    thread.join()
+
+
+def getJobsStatus(context, ftsGUIDs, **kwargs):
+    """Run FTS3AsyncClient.getJobsStatus in a new event loop"""
+
+    async def run():
+        client = FTS3AsyncClient(**kwargs)
+        try:
+            return await client.getJobsStatus(context, ftsGUIDs)
+        finally:
+            client.close()
+
+    return asyncio.run(run())
+
+
+def test_bulkStatus(fakeFTS):
+    """The status of the jobs is queried in bulk, at most maxRequestsPerServer requests at a time"""
+    fts, context = fakeFTS
+    for i in range(49):
+        fts.addJob(f"job{i}", "ACTIVE", ["ACTIVE", "FINISHED"])
+
+    ftsGUIDs = [f"job{i}" for i in range(49)]
+    ftsGUIDs.insert(10, "missing")
+    jobsStatus = getJobsStatus(context, ftsGUIDs, bulkSize=5, maxRequestsPerServer=3)
+
+    assert len(fts.requests) == 10
+    assert all("?files=" in uri for uri in fts.requests)
+    assert fts.maxRunning == 3
+    assert set(jobsStatus) == set(ftsGUIDs)
+    assert cmpError(jobsStatus.pop("missing"), errno.ESRCH)
+    for ftsGUID, res in jobsStatus.items():
+        assert res["OK"], res
+        assert res["Value"]["job_id"] == ftsGUID
+        assert len(res["Value"]["files"]) == 2
+
+
+def test_noBulk(fakeFTS):
+    """The jobs are queried one by one on the servers which do not accept bulk queries"""
+    fts, context = fakeFTS
+    fts.bulk = False
+    for i in range(4):
+        fts.addJob(f"job{i}", "FINISHED", ["FINISHED"])
+
+    ftsGUIDs = ["job0", "job1", "missing", "job2", "job3"]
+    jobsStatus = getJobsStatus(context, ftsGUIDs, bulkSize=10)
+
+    assert cmpError(jobsStatus["missing"], errno.ESRCH)
+    for ftsGUID in ftsGUIDs[:2] + ftsGUIDs[3:]:
+        assert jobsStatus[ftsGUID]["OK"]
+        assert jobsStatus[ftsGUID]["Value"]["files"][0]["file_state"] == "FINISHED"
+
+
+def test_serverDown():
+    """The jobs of a server which can not be contacted are in error"""
+    context = SimpleNamespace(endpoint="http://127.0.0.1:1", ucert=None, ukey=None)
+    jobsStatus = getJobsStatus(context, ["job0", "job1"])
+    assert not any(res["OK"] for res in jobsStatus.values())
+
+
+def test_agentMonitoring(fakeFTS):
+    """The agent monitors the active jobs from the fake server, and updates the DB"""
+    fts, context = fakeFTS
+    fts.addJob("job1", "ACTIVE", ["FINISHED", "ACTIVE"])
+    fts.addJob("job2", "FINISHED", ["FINISHED"])
+
+    ftsJobs = []
+    for jobID, ftsGUID in enumerate(("job1", "job2", "job3"), start=1):
+        ftsJob = FTS3Job()
+        ftsJob.jobID = jobID
+        ftsJob.operationID = jobID
+        ftsJob.ftsGUID = ftsGUID
+        ftsJob.ftsServer = context.endpoint
+        ftsJob.username = "user"
+        ftsJob.userGroup = "group"
+        ftsJob.submitTime = ftsJob.lastUpdate = "2022-01-01 00:00:00"
+        ftsJobs.append(ftsJob)
+
+    agent = FTS3Agent.__new__(FTS3Agent)
+    agent.jobBulkSize = 20
+    agent.monitoringBulkSize = 20
+    agent.maxRequestsPerServer = 10
+    agent.assignmentTag = "test"
+    agent.getFTS3Context = MagicMock(return_value=S_OK(context))
+    agent.fts3db = MagicMock()
+    agent.fts3db.getActiveJobs.return_value = S_OK(ftsJobs)
+    agent.fts3db.updateFileStatus.return_value = S_OK()
+    agent.fts3db.updateJobStatus.return_value = S_OK()
+    agent.fts3db.cancelNonExistingJob.return_value = S_OK()
+    agent.dataOpSender = MagicMock()
+    agent._globalContextCache = MagicMock()
+    agent.jobsExecutor = ThreadPoolExecutor(2)
+
+    try:
+        res = agent.monitorJobsLoop()
+    finally:
+        agent.jobsExecutor.shutdown()
+    assert res["OK"], res
+
+    # One context, and one request for the status of the three jobs
+    agent.getFTS3Context.assert_called_once_with("user", "group", context.endpoint)
+    assert len(fts.requests) == 1
+
+    fileUpdates = {call.kwargs["ftsGUID"]: call.args[0] for call in agent.fts3db.updateFileStatus.call_args_list}
+    assert fileUpdates["job1"] == {
+        1: {"status": "Finished", "error": None, "ftsGUID": None},
+        2: {"status": "Active", "error": None},
+    }
+    assert fileUpdates["job2"] == {1: {"status": "Finished", "error": None, "ftsGUID": None}}
+    jobUpdates = {}
+    for call in agent.fts3db.updateJobStatus.call_args_list:
+        jobUpdates.update(call.args[0])
+    assert jobUpdates[1]["status"] == "Active" and jobUpdates[1]["completeness"] == 50
+    assert jobUpdates[2]["status"] == "Finished"
+    # The job not found on the server is canceled
+    agent.fts3db.cancelNonExistingJob.assert_called_once_with(3, "job3")
+    # The finished job is accounted
+    assert agent.dataOpSender.sendData.call_count == 1
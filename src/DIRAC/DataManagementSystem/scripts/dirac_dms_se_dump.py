@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Dump the content of Storage Elements according to the DIRAC File Catalog
+
+The dump is retrieved page by page, so the memory used does not depend on the size of the SEs.
+Each line of the output file is SEName|LFN|Checksum|Size.
+If the dump is interrupted, it can be resumed with the token printed at the interruption.
+
+Example:
+  $ dirac-dms-se-dump -o CERN-DST.csv CERN-DST
+  Dumped 123456 files of CERN-DST in CERN-DST.csv
+"""
+import csv
+
+from DIRAC import S_OK, exit as DIRACExit
+from DIRAC.Core.Base.Script import Script
+
+outputFile = None
+token = 0
+pageSize = 10000
+
+
+def setOutputFile(arg):
+    global outputFile
+    outputFile = arg
+    return S_OK()
+
+
+def setToken(arg):
+    global token
+    token = int(arg)
+    return S_OK()
+
+
+def setPageSize(arg):
+    global pageSize
+    pageSize = int(arg)
+    return S_OK()
+
+
+@Script()
+def main():
+    Script.registerSwitch("o:", "Output=", "Output file (default: <SEs>.csv)", setOutputFile)
+    Script.registerSwitch("t:", "Token=", "Resume the dump from this token, appending to the output file", setToken)
+    Script.registerSwitch("p:", "PageSize=", f"Number of files per page (default: {pageSize})", setPageSize)
+    Script.registerArgument(["SE: Storage Element names"])
+    Script.parseCommandLine(ignoreErrors=False)
+
+    from DIRAC import gLogger
+    from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+    seNames = Script.getPositionalArgs()
+    fileName = outputFile or "%s.csv" % "_".join(seNames)
+    fc = FileCatalogClient()
+
+    nbFiles = 0
+    nextToken = token
+    with open(fileName, "a" if token else "w", newline="") as dumpFile:
+        writer = csv.writer(dumpFile, delimiter="|")
+        while nextToken is not None:
+            result = fc.getSEDumpPage(seNames, token=nextToken, pageSize=pageSize)
+            if not result["OK"]:
+                gLogger.error("Failed to get the SE dump", result["Message"])
+                gLogger.notice(f"Dumped {nbFiles} files, resume with --Token={nextToken}")
+                DIRACExit(1)
+            writer.writerows(result["Value"]["Records"])
+            nbFiles += len(result["Value"]["Records"])
+            nextToken = result["Value"]["Token"]
+
+    gLogger.notice(f"Dumped {nbFiles} files of {', '.join(seNames)} in {fileName}")
+    DIRACExit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,12 @@ class AgentMonitoring(BaseType):
             "MemoryUsage",
             "CpuPercentage",
             "CycleDuration",
+            "DBConnectionsInUse",
+            "DBConnectionsIdle",
+            "DBConnectionsWaiting",
+            "DBConnectionsCreated",
+            "DBConnectionsClosed",
+            "DBConnectionsWaitTime",
         ]
 
         self.index = "agent_monitoring-index"
@@ -37,6 +43,12 @@ class AgentMonitoring(BaseType):
                 "MemoryUsage": {"type": "long"},
                 "CpuPercentage": {"type": "long"},
                 "CycleDuration": {"type": "long"},
+                "DBConnectionsInUse": {"type": "long"},
+                "DBConnectionsIdle": {"type": "long"},
+                "DBConnectionsWaiting": {"type": "long"},
+                "DBConnectionsCreated": {"type": "long"},
+                "DBConnectionsClosed": {"type": "long"},
+                "DBConnectionsWaitTime": {"type": "long"},
             }
         )
 
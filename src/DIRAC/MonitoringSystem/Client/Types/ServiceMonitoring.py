@@ -18,6 +18,7 @@ class ServiceMonitoring(BaseType):
             "ServiceName",
             "Status",
             "Location",
+            "MethodName",
         ]
 
         self.monitoringFields = [
@@ -30,6 +31,16 @@ class ServiceMonitoring(BaseType):
             "RunningThreads",
             "MaxFD",
             "ResponseTime",
+            "DBConnectionsInUse",
+            "DBConnectionsIdle",
+            "DBConnectionsWaiting",
+            "DBConnectionsCreated",
+            "DBConnectionsClosed",
+            "DBConnectionsWaitTime",
+            "RejectedQueries",
+            "WaitTime",
+            "MaxWaitTime",
+            "ExecutionTime",
         ]
 
         self.index = "service_monitoring-index"
@@ -40,6 +51,7 @@ class ServiceMonitoring(BaseType):
                 "ServiceName": {"type": "keyword"},
                 "Status": {"type": "keyword"},
                 "Location": {"type": "keyword"},
+                "MethodName": {"type": "keyword"},
                 "MemoryUsage": {"type": "long"},
                 "CpuPercentage": {"type": "long"},
                 "Connections": {"type": "long"},
@@ -49,6 +61,16 @@ class ServiceMonitoring(BaseType):
                 "RunningThreads": {"type": "long"},
                 "MaxFD": {"type": "long"},
                 "ResponseTime": {"type": "long"},
+                "DBConnectionsInUse": {"type": "long"},
+                "DBConnectionsIdle": {"type": "long"},
+                "DBConnectionsWaiting": {"type": "long"},
+                "DBConnectionsCreated": {"type": "long"},
+                "DBConnectionsClosed": {"type": "long"},
+                "DBConnectionsWaitTime": {"type": "long"},
+                "RejectedQueries": {"type": "long"},
+                "WaitTime": {"type": "long"},
+                "MaxWaitTime": {"type": "long"},
+                "ExecutionTime": {"type": "long"},
             }
         )
 
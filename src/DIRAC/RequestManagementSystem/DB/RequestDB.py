@@ -16,7 +16,6 @@
     db holding Request, Operation and File
 """
 import errno
-import random
 
 import datetime
 
@@ -37,6 +36,8 @@ from sqlalchemy import (
     TEXT,
     BigInteger,
     distinct,
+    and_,
+    or_,
 )
 
 # # from DIRAC
@@ -184,6 +185,12 @@ class RequestDB:
     db holding requests
     """
 
+    # Seconds after which the requests Assigned for execution are considered lost, and can be assigned again.
+    # Same as the default KickGraceHours of the CleanReqDBAgent
+    LEASE_TIME = 3600
+    # Number of candidates read for each request to assign without SKIP LOCKED, see __leaseRequestIDs
+    LEASE_CANDIDATES_FACTOR = 5
+
     def __getDBConnectionInfo(self, fullname):
         """Collect from the CS all the info needed to connect to the DB.
         This should be in a base class eventually
@@ -328,7 +335,7 @@ class RequestDB:
     def getRequest(self, reqID=0, assigned=True):
         """read request for execution
 
-        :param reqID: request's ID (default 0) If 0, take a pseudo random one
+        :param reqID: request's ID (default 0) If 0, take the oldest Waiting one, see :py:meth:`getBulkRequests`
 
         """
 
@@ -356,40 +363,11 @@ class RequestDB:
                     )
 
             else:
-                now = datetime.datetime.utcnow().replace(microsecond=0)
-                reqIDs = set()
-                try:
-                    reqAscIDs = (
-                        session.query(Request.RequestID)
-                        .filter(Request._Status == "Waiting")
-                        .filter(Request._NotBefore < now)
-                        .order_by(Request._LastUpdate)
-                        .limit(100)
-                        .all()
-                    )
-
-                    reqIDs = {reqID[0] for reqID in reqAscIDs}
-
-                    reqDescIDs = (
-                        session.query(Request.RequestID)
-                        .filter(Request._Status == "Waiting")
-                        .filter(Request._NotBefore < now)
-                        .order_by(Request._LastUpdate.desc())
-                        .limit(50)
-                        .all()
-                    )
-
-                    reqIDs |= {reqID[0] for reqID in reqDescIDs}
-                # No Waiting requests
-                except NoResultFound:
-                    return S_OK()
-
-                if not reqIDs:
+                # Assign the oldest request, as getBulkRequests would do
+                requestIDs = self.__leaseRequestIDs(session, 1, assigned)
+                if not requestIDs:
                     return S_OK()
-
-                reqIDs = list(reqIDs)
-                random.shuffle(reqIDs)
-                requestID = reqIDs[0]
+                requestID = requestIDs[0]
 
             # If we are here, the request MUST exist, so no try catch
             # the joinedload is to force the non-lazy loading of all the attributes, especially _parent
@@ -412,7 +390,7 @@ class RequestDB:
                     .where(Request.RequestID == requestID)
                     .values({Request._Status: "Assigned", Request._LastUpdate: datetime.datetime.utcnow()})
                 )
-                session.commit()
+            session.commit()
 
             session.expunge_all()
             return S_OK(request)
@@ -424,9 +402,72 @@ class RequestDB:
         finally:
             session.close()
 
+    def __leaseRequestIDs(self, session, numberOfRequest, assigned):
+        """Select the IDs of the oldest requests to execute.
+
+        If assigned, the requests Assigned for longer than LEASE_TIME are selected as well,
+        and the selected ones are locked until the end of the transaction, so that concurrent
+        callers get disjoint requests: the oldest ones not being assigned by another transaction
+        are locked directly, skipping the others (MySQL >= 8.0.1). Without SKIP LOCKED, the candidates
+        are first read without lock, and then locked by primary key.
+
+        :param session: session of the transaction, which must set the status of the requests
+        :param int numberOfRequest: maximum number of requests
+        :param bool assigned: if True, lock the requests to assign them
+
+        :returns: list of RequestIDs
+        """
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        toExecute = Request._Status == "Waiting"
+        if assigned:
+            leaseExpiry = now - datetime.timedelta(seconds=self.LEASE_TIME)
+            toExecute = or_(toExecute, and_(Request._Status == "Assigned", Request._LastUpdate < leaseExpiry))
+
+        query = session.query(Request.RequestID).filter(toExecute).filter(Request._NotBefore < now)
+        query = query.order_by(Request._LastUpdate)
+        if not assigned:
+            return [ridTuple[0] for ridTuple in query.limit(numberOfRequest).all()]
+        if self.__supportsSkipLocked(session):
+            locked = query.limit(numberOfRequest).with_for_update(skip_locked=True).all()
+            return [ridTuple[0] for ridTuple in locked]
+
+        candidates = query.limit(numberOfRequest * self.LEASE_CANDIDATES_FACTOR).all()
+        requestIDs = [ridTuple[0] for ridTuple in candidates]
+        if not requestIDs:
+            return requestIDs
+
+        # The conditions are checked again on the locked rows,
+        # as the candidates may have been assigned since they were read
+        locked = (
+            session.query(Request.RequestID)
+            .filter(Request.RequestID.in_(requestIDs))
+            .filter(toExecute)
+            .order_by(Request._LastUpdate)
+            .limit(numberOfRequest)
+            .with_for_update()
+            .all()
+        )
+        return [ridTuple[0] for ridTuple in locked]
+
+    def __supportsSkipLocked(self, session):
+        """Whether the DB server supports SELECT ... FOR UPDATE SKIP LOCKED.
+        Otherwise, concurrent transactions wait for the locked rows to be assigned.
+        """
+        dialect = session.get_bind().dialect
+        if dialect.name != "mysql":
+            return False
+        version = dialect.server_version_info or ()
+        if getattr(dialect, "is_mariadb", False):
+            return version >= (10, 6)
+        return version >= (8, 0, 1)
+
     def getBulkRequests(self, numberOfRequest=10, assigned=True):
         """read as many requests as requested for execution
 
+        The oldest Waiting requests are selected. If assigned, the requests Assigned for longer
+        than LEASE_TIME, whose executor is considered lost, are selected as well,
+        and concurrent calls get disjoint requests.
+
         :param int numberOfRequest: Number of Request we want (default 10)
         :param bool assigned: if True, the status of the selected requests are set to assign
 
@@ -444,18 +485,7 @@ class RequestDB:
             # If we are here, the request MUST exist, so no try catch
             # the joinedload is to force the non-lazy loading of all the attributes, especially _parent
             try:
-                now = datetime.datetime.utcnow().replace(microsecond=0)
-                requestIDs = (
-                    session.query(Request.RequestID)
-                    .with_for_update()
-                    .filter(Request._Status == "Waiting")
-                    .filter(Request._NotBefore < now)
-                    .order_by(Request._LastUpdate)
-                    .limit(numberOfRequest)
-                    .all()
-                )
-
-                requestIDs = [ridTuple[0] for ridTuple in requestIDs]
+                requestIDs = self.__leaseRequestIDs(session, numberOfRequest, assigned)
                 log.debug("Got request ids %s" % requestIDs)
 
                 requests = (
@@ -4,8 +4,11 @@ integration tests (Test_ReqDB.py)
 """
 
 # pylint: disable=invalid-name,wrong-import-position
+import datetime
+import threading
 import time
 
+from sqlalchemy.sql import update
 
 from DIRAC.RequestManagementSystem.Client.Request import Request
 from DIRAC.RequestManagementSystem.Client.Operation import Operation
@@ -83,6 +86,101 @@ def test_stressBulk(reqDB):
         assert delete["OK"], delete
 
 
+def test_lease(reqDB):
+    """The requests are assigned once, unless their lease expired"""
+
+    reqIDs = []
+    for i in range(3):
+        request = Request({"RequestName": "lease-%d" % i})
+        op = Operation({"Type": "RemoveReplica", "TargetSE": "CERN-USER"})
+        op += File({"LFN": "/lhcb/user/c/cibak/foo"})
+        request += op
+        put = reqDB.putRequest(request)
+        assert put["OK"], put
+        reqIDs.append(put["Value"])
+
+    time.sleep(1)
+    get = reqDB.getBulkRequests(2, True)
+    assert get["OK"], get
+    leased = set(get["Value"])
+    assert len(leased) == 2
+    get = reqDB.getRequest()
+    assert get["OK"], get
+    leased.add(get["Value"].RequestID)
+    assert leased == set(reqIDs)
+
+    # Nothing left to assign
+    get = reqDB.getBulkRequests(2, True)
+    assert get["OK"], get
+    assert not get["Value"]
+    get = reqDB.getRequest()
+    assert get["OK"], get
+    assert not get["Value"]
+
+    # The lease of a lost request expires
+    session = reqDB.DBSession()
+    session.execute(
+        update(Request)
+        .where(Request.RequestID == reqIDs[0])
+        .values({Request._LastUpdate: datetime.datetime.utcnow() - datetime.timedelta(seconds=reqDB.LEASE_TIME + 60)})
+    )
+    session.commit()
+    session.close()
+    get = reqDB.getBulkRequests(2, True)
+    assert get["OK"], get
+    assert list(get["Value"]) == [reqIDs[0]]
+
+    for reqID in reqIDs:
+        delete = reqDB.deleteRequest(reqID)
+        assert delete["OK"], delete
+
+
+def test_concurrentLease(reqDB):
+    """Concurrent callers, more numerous than the candidates read for each of them, get disjoint requests.
+    As it needs concurrent transactions, it only runs as integration test.
+    """
+    nbCallers = reqDB.LEASE_CANDIDATES_FACTOR + 3
+    reqIDs = []
+    for i in range(nbCallers * BULK_REQUESTS):
+        request = Request({"RequestName": "concurrentLease-%d" % i})
+        op = Operation({"Type": "RemoveReplica", "TargetSE": "CERN-USER"})
+        op += File({"LFN": "/lhcb/user/c/cibak/foo"})
+        request += op
+        put = reqDB.putRequest(request)
+        assert put["OK"], put
+        reqIDs.append(put["Value"])
+
+    time.sleep(1)
+    results = [None] * nbCallers
+    started = threading.Barrier(nbCallers)
+
+    def getBulkRequests(index):
+        started.wait()
+        results[index] = reqDB.getBulkRequests(BULK_REQUESTS, True)
+
+    threads = [threading.Thread(target=getBulkRequests, args=(index,)) for index in range(nbCallers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    leased = []
+    for result in results:
+        assert result["OK"], result
+        leased.extend(result["Value"])
+    assert len(leased) == len(set(leased))
+    session = reqDB.DBSession()
+    skipLocked = reqDB._RequestDB__supportsSkipLocked(session)  # pylint: disable=protected-access
+    session.close()
+    if skipLocked:
+        # Nobody gets a partial batch while requests are waiting
+        assert sorted(leased) == sorted(reqIDs)
+
+    for reqID in reqIDs:
+        delete = reqDB.deleteRequest(reqID)
+        assert delete["OK"], delete
+
+
 def test_scheduled(reqDB):
     """scheduled request r/w"""
 
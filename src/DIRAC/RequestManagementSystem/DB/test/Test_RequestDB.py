@@ -15,6 +15,7 @@ from DIRAC.RequestManagementSystem.DB import RequestDB
 
 from DIRAC.RequestManagementSystem.DB.test.RMSTestScenari import (
     test_dirty,
+    test_lease,
     test_scheduled,
     test_stress,
     test_stressBulk,
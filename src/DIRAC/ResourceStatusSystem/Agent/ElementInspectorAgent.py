@@ -46,6 +46,8 @@ class ElementInspectorAgent(AgentModule):
         self.elementType = "Resource"
         self.rsClient = None
         self.clients = {}
+        # Number of elements whose policies are evaluated together, 0 to evaluate them one by one
+        self.batchSize = 0
 
     def initialize(self):
         """Standard initialize."""
@@ -71,6 +73,8 @@ class ElementInspectorAgent(AgentModule):
         if not self.elementType:
             return S_ERROR("Missing elementType")
 
+        self.batchSize = self.am_getOption("batchSize", self.batchSize)
+
         maxNumberOfThreads = self.am_getOption("maxNumberOfThreads", 15)
         self.log.info("Multithreaded with %d threads" % maxNumberOfThreads)
         self.threadPoolExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=maxNumberOfThreads)
@@ -95,6 +99,7 @@ class ElementInspectorAgent(AgentModule):
 
         utcnow = datetime.datetime.utcnow().replace(microsecond=0)
         future_to_element = {}
+        elementsToCheck = []
 
         # filter elements by Type
         for element in res["Value"]:
@@ -132,8 +137,17 @@ class ElementInspectorAgent(AgentModule):
                 if len(key) >= 2:  # VO !
                     lowerElementDict[key[0].lower() + key[1:]] = value
             # We process lowerElementDict
-            future = self.threadPoolExecutor.submit(self._execute, lowerElementDict)
-            future_to_element[future] = elemDict["Name"]
+            if self.batchSize > 0:
+                elementsToCheck.append(lowerElementDict)
+            else:
+                future = self.threadPoolExecutor.submit(self._execute, lowerElementDict)
+                future_to_element[future] = elemDict["Name"]
+
+        # The policies of the elements of a batch are evaluated together, see PEP.enforceBatch
+        for start in range(0, len(elementsToCheck), self.batchSize or 1):
+            batch = elementsToCheck[start : start + self.batchSize]
+            future = self.threadPoolExecutor.submit(self._executeBatch, batch)
+            future_to_element[future] = "%d elements, from %s" % (len(batch), batch[0]["name"])
 
         for future in concurrent.futures.as_completed(future_to_element):
             transID = future_to_element[future]
@@ -167,7 +181,36 @@ class ElementInspectorAgent(AgentModule):
             self.log.error("Failed policy enforcement", res["Message"])
             return res
 
-        resEnforce = res["Value"]
+        self.__logEnforcement(res["Value"])
+
+    def _executeBatch(self, elements):
+        """
+        Evaluates the policies for a batch of elements and enforces the necessary actions.
+        """
+
+        pep = PEP(clients=self.clients)
+
+        self.log.verbose("Batch of %d elements being processed" % len(elements))
+
+        try:
+            res = pep.enforceBatch(elements)
+        except Exception:
+            self.log.exception("Exception during enforcement")
+            res = S_ERROR("Exception during enforcement")
+        if not res["OK"]:
+            self.log.error("Failed policy enforcement", res["Message"])
+            return res
+
+        for element, resElement in zip(elements, res["Value"]):
+            if not resElement["OK"]:
+                self.log.error("Failed policy enforcement", "{}: {}".format(element["name"], resElement["Message"]))
+                continue
+            self.__logEnforcement(resElement["Value"])
+
+    def __logEnforcement(self, resEnforce):
+        """
+        Logs the status change of an element, if any.
+        """
 
         oldStatus = resEnforce["decisionParams"]["status"]
         statusType = resEnforce["decisionParams"]["statusType"]
@@ -176,7 +219,9 @@ class ElementInspectorAgent(AgentModule):
 
         if oldStatus != newStatus:
             self.log.info(
-                "{} ({}) is now {} ( {} ), before {}".format(element["name"], statusType, newStatus, reason, oldStatus)
+                "{} ({}) is now {} ( {} ), before {}".format(
+                    resEnforce["decisionParams"]["name"], statusType, newStatus, reason, oldStatus
+                )
             )
 
     def finalize(self):
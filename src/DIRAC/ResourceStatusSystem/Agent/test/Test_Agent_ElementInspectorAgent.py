@@ -46,3 +46,38 @@ def test__execute(mocker):
     result = elementInspectorAgent._execute(elemDict)
 
     assert result is None
+
+
+def test__executeBatch(mocker):
+    """Testing ElementInspectorAgent()._executeBatch()"""
+
+    mocker.patch("DIRAC.ResourceStatusSystem.Agent.ElementInspectorAgent.AgentModule.__init__")
+    mockPEP = mocker.patch("DIRAC.ResourceStatusSystem.Agent.ElementInspectorAgent.PEP")
+    mocker.patch(
+        "DIRAC.ResourceStatusSystem.Agent.ElementInspectorAgent.AgentModule._AgentModule__moduleProperties",
+        side_effect=lambda x, y=None: y,
+        create=True,
+    )
+    mockPEP.return_value.enforceBatch.return_value = {
+        "OK": True,
+        "Value": [
+            {
+                "OK": True,
+                "Value": {
+                    "decisionParams": elemDict,
+                    "policyCombinedResult": {"Status": "Banned", "Reason": "reason"},
+                },
+            },
+            {"OK": False, "Message": "error"},
+        ],
+    }
+
+    elementInspectorAgent = ElementInspectorAgent()
+    elementInspectorAgent.log = gLogger
+    elementInspectorAgent._AgentModule__configDefaults = mockAM
+    elementInspectorAgent.initialize()
+
+    result = elementInspectorAgent._executeBatch([elemDict, dict(elemDict, name="site2")])
+
+    assert result is None
+    mockPEP.return_value.enforceBatch.assert_called_once()
@@ -2,7 +2,7 @@
 
 Module that acts as a helper for knowing the status of a resource.
 It takes care of switching between the CS and the RSS.
-The status is kept in the RSSCache object, which is a small wrapper on top of DictCache
+The status is kept in the RSSCache object, which holds a snapshot of the RSS table refreshed in the background
 
 """
 
@@ -43,7 +43,7 @@ class ResourceStatus(metaclass=DIRACSingleton):
         cacheLifeTime = int(self.rssConfig.getConfigCache())
 
         # RSSCache only affects the calls directed to RSS, if using the CS it is not used.
-        self.rssCache = RSSCache(cacheLifeTime, self.__updateRssCache)
+        self.rssCache = RSSCache(cacheLifeTime, self.__updateRssCache, self.__updateRssCache)
 
     def getElementStatus(self, elementName, elementType, statusType=None, default=None, vO=None):
         """
@@ -137,25 +137,35 @@ class ResourceStatus(metaclass=DIRACSingleton):
 
     ################################################################################
 
-    def __updateRssCache(self):
+    def __updateRssCache(self, since=None):
         """Method used to update the rssCache.
 
         It will try 5 times to contact the RSS before giving up
+
+        :param since: if given, only the rows checked or changed after this UTC datetime are returned
+        :type since: datetime
         """
 
         meta = {"columns": ["Name", "ElementType", "StatusType", "Status", "VO"]}
+        if since is None:
+            metaList = [meta]
+        else:
+            metaList = [dict(meta, newer=[column, since]) for column in ("LastCheckTime", "DateEffective")]
+
+        rows = []
+        for queryMeta in metaList:
+            for ti in range(5):
+                rawCache = self.rssClient.selectStatusElement("Resource", "Status", meta=queryMeta)
+                if rawCache["OK"]:
+                    break
+                self.log.warn("Can't get resource's status", rawCache["Message"] + "; trial %d" % ti)
+                sleep(math.pow(ti, 2))
+                self.rssClient = ResourceStatusClient()
 
-        for ti in range(5):
-            rawCache = self.rssClient.selectStatusElement("Resource", "Status", meta=meta)
-            if rawCache["OK"]:
-                break
-            self.log.warn("Can't get resource's status", rawCache["Message"] + "; trial %d" % ti)
-            sleep(math.pow(ti, 2))
-            self.rssClient = ResourceStatusClient()
-
-        if not rawCache["OK"]:
-            return rawCache
-        return S_OK(getCacheDictFromRawData(rawCache["Value"]))
+            if not rawCache["OK"]:
+                return rawCache
+            rows.extend(rawCache["Value"])
+        return S_OK(getCacheDictFromRawData(rows))
 
     ################################################################################
 
@@ -255,7 +265,7 @@ class ResourceStatus(metaclass=DIRACSingleton):
             )
 
             if res["OK"]:
-                self.rssCache.refreshCache()
+                self.rssCache.refreshCache(full=False)
 
             if not res["OK"]:
                 _msg = f"Error updating Element ({elementName},{statusType},{status})"
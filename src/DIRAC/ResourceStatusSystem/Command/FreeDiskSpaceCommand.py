@@ -32,7 +32,10 @@ class FreeDiskSpaceCommand(Command):
 
         super().__init__(args, clients=clients)
 
-        self.rmClient = ResourceManagementClient()
+        if "ResourceManagementClient" in self.apis:
+            self.rmClient = self.apis["ResourceManagementClient"]
+        else:
+            self.rmClient = ResourceManagementClient()
 
     def _prepareCommand(self):
         """
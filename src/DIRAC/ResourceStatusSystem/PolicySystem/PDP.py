@@ -7,7 +7,9 @@
 
 """
 from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.ResourceStatusSystem.Command import CommandCaller
 from DIRAC.ResourceStatusSystem.PolicySystem.PolicyCaller import PolicyCaller
+from DIRAC.ResourceStatusSystem.PolicySystem.PrefetchingClient import PrefetchingClient
 from DIRAC.ResourceStatusSystem.PolicySystem.StateMachine import RSSMachine
 from DIRAC.ResourceStatusSystem.Utilities import RssConfiguration
 from DIRAC.ResourceStatusSystem.Utilities.InfoGetter import getPolicyActionsThatApply, getPoliciesThatApply
@@ -141,8 +143,87 @@ class PDP:
         policiesThatApply = policiesThatApply["Value"]
         self.log.verbose("Policies that apply: %s" % ", ".join([po["name"] for po in policiesThatApply]))
 
+        return self._decide(policiesThatApply)
+
+    def takeDecisions(self, decisionParamsList):
+        """batch version of setup and takeDecision, for many elements. The elements are
+        grouped by the set of policies that apply to them, and the results cached in the
+        ResourceManagementDB for the commands of these policies are prefetched for the whole
+        batch, with one query per command type. The policies are then evaluated in memory.
+
+        examples:
+          >>> [res['OK'] for res in pdp.takeDecisions( [ decisionParams1, decisionParams2 ] )]
+              [ True, True ]
+
+        :Parameters:
+          **decisionParamsList** - `list( dict )`
+            decisionParams of each element ( see setup )
+
+        :return: `list` with the takeDecision result of each element, in the same order
+
+        """
+
+        rmClient = PrefetchingClient(self.pCaller.clients.get("ResourceManagementClient"))
+        clients = dict(self.pCaller.clients, ResourceManagementClient=rmClient)
+        pCaller = PolicyCaller(clients)
+
+        # Policies that apply to each element, and elements grouped by policy set
+        batch = []
+        policySets = {}
+        for decisionParams in decisionParamsList:
+            self.setup(decisionParams)
+            policiesThatApply = getPoliciesThatApply(self.decisionParams)
+            batch.append((self.decisionParams, policiesThatApply))
+            if policiesThatApply["OK"]:
+                policySet = tuple(policyDict["name"] for policyDict in policiesThatApply["Value"])
+                policySets.setdefault(policySet, (policiesThatApply["Value"], []))[1].append(self.decisionParams)
+        self.log.verbose("Batch of %d elements, with %d policy sets" % (len(batch), len(policySets)))
+
+        # Record the queries of the commands to the cache tables, and prefetch their results
+        rmClient.startRecording()
+        for policiesThatApply, decisionParamsGroup in policySets.values():
+            for policyDict in policiesThatApply:
+                for decisionParams in decisionParamsGroup:
+                    command = CommandCaller.commandInvocation(
+                        policyDict.get("command"), policyDict.get("args"), decisionParams, clients
+                    )
+                    if not command["OK"] or getattr(command["Value"], "rmClient", None) is not rmClient:
+                        continue
+                    try:
+                        command["Value"].doCache()
+                    except Exception as e:  # pylint: disable=broad-except
+                        # The command will query the DB itself while evaluating the policy
+                        self.log.warn("Could not record the cache query", f"{policyDict['name']}: {e!r}")
+        rmClient.prefetch()
+
+        decisions = []
+        for decisionParams, policiesThatApply in batch:
+            self.setup(decisionParams)
+            if not policiesThatApply["OK"]:
+                decisions.append(policiesThatApply)
+                continue
+            decisions.append(self._decide(policiesThatApply["Value"], pCaller))
+
+        return decisions
+
+    def _decide(self, policiesThatApply, pCaller=None):
+        """evaluates the policies that apply to the element of <self.decisionParams>, combines
+        their results and finds the actions to be triggered ( see takeDecision ).
+
+        :Parameters:
+          **policiesThatApply** - `list( dict )`
+            policies to be run
+          **pCaller** - `PolicyCaller`
+            PolicyCaller used to evaluate the policies, self.pCaller by default
+
+        :return: S_OK( { 'singlePolicyResults'  : `list`,
+                         'policyCombinedResult' : `dict`,
+                         'decisionParams'      : `dict` } ) / S_ERROR
+
+        """
+
         # Evaluate policies
-        singlePolicyResults = self._runPolicies(policiesThatApply)
+        singlePolicyResults = self._runPolicies(policiesThatApply, pCaller)
         if not singlePolicyResults["OK"]:
             return singlePolicyResults
         singlePolicyResults = singlePolicyResults["Value"]
@@ -175,7 +256,7 @@ class PDP:
             }
         )
 
-    def _runPolicies(self, policies):
+    def _runPolicies(self, policies, pCaller=None):
         """Given a list of policy dictionaries, loads them making use of the PolicyCaller
         and evaluates them. This method requires to have run setup previously.
 
@@ -195,11 +276,16 @@ class PDP:
           **policies** - `list( dict )`
             list of dictionaries containing the policies selected to be run. Check the
             examples to get an idea of how the policy dictionaries look like.
+          **pCaller** - `PolicyCaller`
+            PolicyCaller used to evaluate the policies, self.pCaller by default
 
         :return: S_OK() / S_ERROR
 
         """
 
+        if pCaller is None:
+            pCaller = self.pCaller
+
         policyInvocationResults = []
 
         # Gets all valid status for RSS to avoid misconfigured policies returning statuses
@@ -210,7 +296,7 @@ class PDP:
 
             # Load and evaluate policy described in <policyDict> for element described
             # in <self.decisionParams>
-            policyInvocationResult = self.pCaller.policyInvocation(self.decisionParams, policyDict)
+            policyInvocationResult = pCaller.policyInvocation(self.decisionParams, policyDict)
             if not policyInvocationResult["OK"]:
                 # We should never enter this line ! Just in case there are policies
                 # missconfigured !
@@ -10,6 +10,8 @@
   determined by the PDP output ).
 
 """
+import datetime
+
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.ResourceStatusSystem.PolicySystem.PDP import PDP
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
@@ -93,6 +95,82 @@ class PEP:
             self.log.warn("No decision params...?")
             return S_OK()
 
+        decisionParams = self.__standardParams(decisionParams)
+
+        # Setup PDP with new parameters dictionary
+        self.pdp.setup(decisionParams)
+
+        # Run policies, get decision, get actions to apply
+        resDecisions = self.pdp.takeDecision()
+        if not resDecisions["OK"]:
+            self.log.error("Something went wrong, not enforcing policies", "%s" % decisionParams)
+            return resDecisions
+        resDecisions = resDecisions["Value"]
+
+        # We have run the actions and at this point, we are about to execute the actions.
+        # One more final check before proceeding
+        isNotUpdated = self.__isNotUpdated(resDecisions["decisionParams"])
+        if not isNotUpdated["OK"]:
+            return isNotUpdated
+
+        self.__runActions(resDecisions)
+
+        return S_OK(resDecisions)
+
+    def enforceBatch(self, decisionParamsList):
+        """batch version of enforce, for many elements. The PDP takes the decisions for all
+        of them at once ( see PDP.takeDecisions ), and the elements are checked not to have
+        been updated meanwhile with one query per element family, before enforcing the actions.
+
+        examples:
+           >>> pep.enforceBatch( [ { 'element' : 'Resource', 'name' : 'myce.domain.ch' }, ... ] )
+
+        :Parameters:
+          **decisionParamsList** - `list( dict )`
+            dictionaries with the parameters that will be used to match policies.
+
+        :return: S_OK( `list` ) with the result of enforce for each element, in the same order
+
+        """
+
+        decisionParamsList = [self.__standardParams(decisionParams) for decisionParams in decisionParamsList]
+
+        # Run policies, get decisions, get actions to apply
+        decisions = self.pdp.takeDecisions(decisionParamsList)
+
+        # Check the elements with a decision were not updated meanwhile
+        decidedParams = [res["Value"]["decisionParams"] for res in decisions if res["OK"]]
+        notUpdated = iter(self.__areNotUpdated(decidedParams))
+
+        results = []
+        for decisionParams, resDecisions in zip(decisionParamsList, decisions):
+            if not resDecisions["OK"]:
+                self.log.error("Something went wrong, not enforcing policies", "%s" % decisionParams)
+                results.append(resDecisions)
+                continue
+
+            isNotUpdated = next(notUpdated)
+            if not isNotUpdated["OK"]:
+                results.append(isNotUpdated)
+                continue
+
+            self.__runActions(resDecisions["Value"])
+            results.append(resDecisions)
+
+        return S_OK(results)
+
+    def __standardParams(self, decisionParams):
+        """Adds to the decisionParams the missing standard parameters, and sets the logger
+        for the element
+
+        :Parameters:
+          **decisionParams** - `dict`
+            dictionary with the parameters that will be used to match policies.
+
+        :return: `dict`
+
+        """
+
         standardParamsDict = {
             "element": None,
             "name": None,
@@ -117,29 +195,22 @@ class PEP:
                     "Enforce - statusType: %s, status: %s"
                     % (standardParamsDict["statusType"], standardParamsDict["status"])
                 )
-        decisionParams = dict(standardParamsDict)
+        return dict(standardParamsDict)
 
-        # Setup PDP with new parameters dictionary
-        self.pdp.setup(decisionParams)
+    def __runActions(self, resDecisions):
+        """Runs the actions that apply, as decided by the PDP
 
-        # Run policies, get decision, get actions to apply
-        resDecisions = self.pdp.takeDecision()
-        if not resDecisions["OK"]:
-            self.log.error("Something went wrong, not enforcing policies", "%s" % decisionParams)
-            return resDecisions
-        resDecisions = resDecisions["Value"]
+        :Parameters:
+          **resDecisions** - `dict`
+            decision of the PDP ( see PDP.takeDecision )
+
+        """
 
         # We take from PDP the decision parameters used to find the policies
         decisionParams = resDecisions["decisionParams"]
         policyCombinedResult = resDecisions["policyCombinedResult"]
         singlePolicyResults = resDecisions["singlePolicyResults"]
 
-        # We have run the actions and at this point, we are about to execute the actions.
-        # One more final check before proceeding
-        isNotUpdated = self.__isNotUpdated(decisionParams)
-        if not isNotUpdated["OK"]:
-            return isNotUpdated
-
         for policyActionName, policyActionType in policyCombinedResult["PolicyAction"]:
 
             result = self.objectLoader.loadObject(f"DIRAC.ResourceStatusSystem.PolicySystem.Actions.{policyActionType}")
@@ -158,8 +229,6 @@ class PEP:
             if not actionResult["OK"]:
                 self.log.error(actionResult["Message"])
 
-        return S_OK(resDecisions)
-
     def __isNotUpdated(self, decisionParams):
         """Checks for the existence of the element as it was passed to the PEP. It may
         happen that while being the element processed by the PEP an user through the
@@ -199,3 +268,70 @@ class PEP:
             return S_ERROR(msg)
 
         return S_OK()
+
+    def __areNotUpdated(self, decisionParamsList):
+        """batch version of __isNotUpdated. The elements of each family but Site are selected
+        with a single query, and compared in memory to their decisionParams.
+
+        :Parameters:
+          **decisionParamsList** - `list( dict )`
+            dictionaries with the parameters that were used to match policies
+
+        :return: `list` of S_OK / S_ERROR, in the same order
+
+        """
+
+        results = [None] * len(decisionParamsList)
+
+        # { element : [ index in decisionParamsList, ... ] }
+        elements = {}
+        for index, decisionParams in enumerate(decisionParamsList):
+            if decisionParams["element"] == "Site":
+                results[index] = self.__isNotUpdated(decisionParams)
+            else:
+                elements.setdefault(decisionParams["element"], []).append(index)
+
+        for element, indexes in elements.items():
+            names = sorted({decisionParamsList[index]["name"] for index in indexes})
+            rows = self.clients["ResourceStatusClient"].selectStatusElement(element, "Status", name=names, vO=None)
+            if not rows["OK"]:
+                for index in indexes:
+                    results[index] = rows
+                continue
+            rows = [dict(zip(rows["Columns"], row)) for row in rows["Value"]]
+
+            for index in indexes:
+                selectParams = dict(decisionParamsList[index])
+                del selectParams["element"]
+                del selectParams["active"]
+                # As in selectStatusElement
+                selectParams.setdefault("vO", "all")
+
+                # Same selection as the DB: the empty parameters, and those of other types, are ignored
+                conditions = {
+                    key[0].upper() + key[1:]: value
+                    for key, value in selectParams.items()
+                    if value and isinstance(value, (list, tuple, str, datetime.datetime, bool))
+                }
+                if rows and any(column not in rows[0] for column in conditions):
+                    # Unknown column, we let the DB tell
+                    results[index] = self.__isNotUpdated(decisionParamsList[index])
+                    continue
+
+                if any(
+                    all(
+                        row[column] in value if isinstance(value, (list, tuple)) else row[column] == value
+                        for column, value in conditions.items()
+                    )
+                    for row in rows
+                ):
+                    results[index] = S_OK()
+                else:
+                    msg = (
+                        "%(name)s  ( %(status)s / %(statusType)s ) has been updated after PEP started running"
+                        % selectParams
+                    )
+                    self.log.error(msg)
+                    results[index] = S_ERROR(msg)
+
+        return results
@@ -0,0 +1,173 @@
+""" PrefetchingClient
+
+  ResourceManagementClient used by the PDP to evaluate the policies of many elements
+  at once. The select queries done by the commands on the cache tables are first
+  recorded, then prefetched with one query per table ( and set of selection columns )
+  for all the elements, and finally answered in memory while evaluating the policies.
+
+"""
+from DIRAC import gLogger, S_OK
+from DIRAC.ResourceStatusSystem.Client.ResourceManagementClient import ResourceManagementClient
+
+
+def _freezeSelection(params):
+    """Hashable form of the parameters of a select query, or None if it can not be
+    answered from prefetched rows ( query with metadata, or on non string values ).
+    As in the DB, the empty values do not select anything.
+
+    :param dict params: parameters of the select query, the keys being the column names
+
+    :return: tuple( ( column, value or tuple( values ) ), ... ) / None
+    """
+
+    selection = []
+    for column, value in params.items():
+        if column == "Meta":
+            return None
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            if not all(isinstance(item, str) for item in value):
+                return None
+            value = tuple(sorted(set(value)))
+        elif not isinstance(value, str):
+            return None
+        selection.append((column, value))
+    return tuple(sorted(selection))
+
+
+class _PrefetchingRPC:
+    """RPC client whose select calls go through the PrefetchingClient"""
+
+    def __init__(self, client, rpc):
+        self.__client = client
+        self.__rpc = rpc
+
+    def select(self, table, params):
+        return self.__client._select(self.__rpc, table, params)
+
+    def __getattr__(self, name):
+        return getattr(self.__rpc, name)
+
+
+class PrefetchingClient(ResourceManagementClient):
+    """
+    ResourceManagementClient answering the select queries from prefetched rows.
+
+    examples:
+      >>> rmClient = PrefetchingClient()
+      >>> rmClient.startRecording()
+      >>> rmClient.selectJobCache( 'Site1' ) # recorded, returns no rows
+      >>> rmClient.selectJobCache( 'Site2' )
+      >>> rmClient.prefetch() # a single query for the JobCache of Site1 and Site2
+      >>> rmClient.selectJobCache( 'Site1' ) # answered from the prefetched rows
+
+    The queries which were not recorded, and all the other methods, go to the server.
+    It is meant to be used by a single thread.
+    """
+
+    def __init__(self, rmClient=None, **kwargs):
+        """
+        Constructor
+
+        :Parameters:
+          **rmClient** - `ResourceManagementClient`
+            client used for the queries to the server. If None, a new one is created.
+        """
+
+        super().__init__(**kwargs)
+
+        self.log = gLogger.getSubLogger(self.__class__.__name__)
+        self.__rmClient = rmClient if rmClient is not None else ResourceManagementClient()
+        self.__recording = False
+        # { ( table, selection ), ... } recorded queries
+        self.__recorded = set()
+        # { ( table, selection columns ) : S_OK( rows ) } prefetched rows
+        self.__prefetched = {}
+
+    def _getRPC(self, rpc=None, url="", timeout=None):
+        """The RPC client of the server client, whose select calls are intercepted"""
+        return _PrefetchingRPC(self, self.__rmClient._getRPC(rpc=rpc, url=url, timeout=timeout))
+
+    def startRecording(self):
+        """
+        From now on, the select queries are recorded, and return no rows, until prefetch is called.
+        """
+        self.__recording = True
+        self.__recorded = set()
+        self.__prefetched = {}
+
+    def prefetch(self):
+        """
+        Gets from the server the rows of all the recorded queries, with one query per table
+        and set of selection columns, and stops recording. If one of these queries fails,
+        the queries it covers go to the server.
+
+        :return: S_OK( number of queries done )
+        """
+
+        self.__recording = False
+
+        # { ( table, selection columns ) : { column : set( values ) } }
+        groups = {}
+        for table, selection in self.__recorded:
+            columnValues = groups.setdefault((table, tuple(column for column, _value in selection)), {})
+            for column, value in selection:
+                columnValues.setdefault(column, set()).update(value if isinstance(value, tuple) else [value])
+
+        rpc = self.__rmClient._getRPC()
+        for (table, columns), columnValues in groups.items():
+            result = rpc.select(table, {column: sorted(values) for column, values in columnValues.items()})
+            if not result["OK"]:
+                self.log.warn("Could not prefetch", f"{table}: {result['Message']}")
+                continue
+            self.__prefetched[(table, columns)] = result
+
+        self.log.verbose("Prefetched", f"{len(self.__recorded)} queries with {len(groups)} queries")
+        return S_OK(len(groups))
+
+    def _select(self, rpc, table, params):
+        """
+        Records a select query, answers it from the prefetched rows, or sends it to the server.
+
+        :Parameters:
+          **rpc** - RPC client of the server
+          **table** - `str`
+            name of the table
+          **params** - `dict`
+            parameters of the query, the keys being the column names
+
+        :return: S_OK( rows ) with the column names in 'Columns' || S_ERROR
+        """
+
+        selection = _freezeSelection(params)
+        if selection is not None:
+            if self.__recording:
+                self.__recorded.add((table, selection))
+                result = S_OK([])
+                result["Columns"] = []
+                return result
+
+            prefetched = self.__prefetched.get((table, tuple(column for column, _value in selection)))
+            if prefetched is not None and (table, selection) in self.__recorded:
+                result = self.__filterRows(prefetched, selection)
+                if result is not None:
+                    return result
+
+        return rpc.select(table, params)
+
+    @staticmethod
+    def __filterRows(prefetched, selection):
+        """The prefetched rows matching a selection, or None if a selection column was not returned"""
+
+        columns = prefetched["Columns"]
+        if not all(column in columns for column, _value in selection):
+            return None
+        conditions = [
+            (columns.index(column), value if isinstance(value, tuple) else (value,)) for column, value in selection
+        ]
+        rows = [row for row in prefetched["Value"] if all(row[index] in values for index, values in conditions)]
+
+        result = S_OK(rows)
+        result["Columns"] = columns
+        return result
@@ -0,0 +1,178 @@
+""" Test the batch evaluation of the policies, with the results of the commands prefetched
+"""
+import copy
+from unittest.mock import MagicMock
+
+import pytest
+
+from DIRAC import S_OK
+from DIRAC.ResourceStatusSystem.Client.ResourceManagementClient import ResourceManagementClient
+from DIRAC.ResourceStatusSystem.Policy.Configurations import POLICIESMETA
+from DIRAC.ResourceStatusSystem.PolicySystem import PDP as moduleUnderTest
+from DIRAC.ResourceStatusSystem.PolicySystem.PDP import PDP
+from DIRAC.ResourceStatusSystem.PolicySystem.PEP import PEP
+from DIRAC.ResourceStatusSystem.PolicySystem.PrefetchingClient import PrefetchingClient
+
+# pylint: disable=redefined-outer-name,protected-access
+
+
+class FakeRPC:
+    """ResourceManagement service, selecting the rows the same way as the DB"""
+
+    def __init__(self):
+        self.tables = {
+            "JobCache": (
+                ["Site", "Completed", "Done", "Failed"],
+                [["Site0", 10, 80, 10], ["Site1", 0, 10, 90], ["Site2", 5, 5, 0]],
+            ),
+            "PilotCache": (
+                ["Site", "CE", "PilotJobEff", "VO"],
+                [["Site0", "Multiple", 95.0, "all"], ["Site1", "Multiple", 40.0, "all"], ["Site1", "ce1", 10.0, "all"]],
+            ),
+        }
+        self.selects = []
+
+    def select(self, table, params):
+        self.selects.append((table, params))
+        columns, rows = self.tables[table]
+        for column, value in params.items():
+            if not value:
+                continue
+            values = value if isinstance(value, list) else [value]
+            rows = [row for row in rows if row[columns.index(column)] in values]
+        result = S_OK(rows)
+        result["Columns"] = columns
+        return result
+
+
+@pytest.fixture
+def rpc():
+    return FakeRPC()
+
+
+@pytest.fixture
+def rmClient(rpc):
+    rmClient = MagicMock()
+    rmClient._getRPC.return_value = rpc
+    return rmClient
+
+
+def test_prefetchingClient(rpc, rmClient):
+    """The recorded queries are answered from the rows prefetched with one query per table"""
+    client = PrefetchingClient(rmClient)
+    client.startRecording()
+    for site in ("Site0", "Site1", "Site3"):
+        assert client.selectJobCache(site)["Value"] == []
+        client.selectPilotCache(site=site, cE="Multiple")
+    assert not rpc.selects
+
+    assert client.prefetch()["Value"] == 2
+    assert len(rpc.selects) == 2
+
+    for site in ("Site0", "Site1", "Site3"):
+        for args, kwargs in (((site,), {}), ((), {"site": site, "cE": "Multiple"})):
+            method = client.selectJobCache if args else client.selectPilotCache
+            res = method(*args, **kwargs)
+            if args:
+                expected = rpc.select("JobCache", {"Site": site})
+            else:
+                expected = rpc.select("PilotCache", {"Site": site, "CE": "Multiple"})
+            assert res["OK"], res
+            assert res["Value"] == expected["Value"]
+            assert res["Columns"] == expected["Columns"]
+
+    # The queries not recorded go to the server
+    nbSelects = len(rpc.selects)
+    client.selectJobCache("Site2")
+    client.selectPilotCache(site="Site1")
+    assert len(rpc.selects) == nbSelects + 2
+
+
+def getPolicies(decisionParams):
+    """Policies of the sites: the job efficiency for all, the pilots efficiency for those with an even number"""
+    policies = []
+    names = ["JobEfficiency"] + (["PilotInstantEfficiency"] if int(decisionParams["name"][-1]) % 2 == 0 else [])
+    for name in names:
+        policyDict = {"name": name, "type": name, "args": {}}
+        policyDict.update(copy.deepcopy(POLICIESMETA[name]))
+        policies.append(policyDict)
+    return S_OK(policies)
+
+
+def test_takeDecisions(mocker, rpc):
+    """The decisions taken in batch are the same as one by one, with one query per command type"""
+    mocker.patch.object(moduleUnderTest, "getPoliciesThatApply", side_effect=getPolicies)
+    mocker.patch.object(moduleUnderTest, "getPolicyActionsThatApply", return_value=S_OK([]))
+    mocker.patch.object(moduleUnderTest.RssConfiguration, "getPolicies", return_value=S_OK({}))
+
+    mocker.patch.object(ResourceManagementClient, "_getRPC", return_value=rpc)
+
+    clients = {"ResourceManagementClient": ResourceManagementClient(), "WMSAdministrator": None, "Pilots": None}
+    decisionParamsList = [
+        {
+            "element": "Site",
+            "name": f"Site{i}",
+            "elementType": "Site",
+            "statusType": "all",
+            "status": "Active",
+            "vO": "all",
+        }
+        for i in range(5)
+    ]
+
+    pdp = PDP(clients)
+    expected = []
+    for decisionParams in decisionParamsList:
+        pdp.setup(decisionParams)
+        expected.append(pdp.takeDecision())
+    # JobCache for all sites, PilotCache for 3 of them
+    assert len(rpc.selects) == 8
+
+    rpc.selects = []
+    decisions = PDP(clients).takeDecisions(decisionParamsList)
+    assert sorted(table for table, _params in rpc.selects) == ["JobCache", "PilotCache"]
+    assert decisions == expected
+    assert [res["Value"]["policyCombinedResult"]["Status"] for res in decisions] == [
+        "Active",
+        "Banned",
+        "Active",
+        "Unknown",
+        "Unknown",
+    ]
+
+
+def test_enforceBatch(mocker):
+    """The elements are checked not to have been updated with a single query"""
+    rsClient = MagicMock()
+    columns = ["Name", "StatusType", "Status", "ElementType", "Reason", "VO", "TokenOwner"]
+    rows = [
+        ["SE0", "ReadAccess", "Active", "StorageElement", "ok", "all", "rs_svc"],
+        ["SE1", "ReadAccess", "Banned", "StorageElement", "changed by hand", "all", "rs_svc"],
+    ]
+    rsClient.selectStatusElement.return_value = dict(S_OK(rows), Columns=columns)
+
+    decisionParamsList = [
+        {
+            "element": "Resource",
+            "name": name,
+            "elementType": "StorageElement",
+            "statusType": "ReadAccess",
+            "status": "Active",
+            "reason": "ok",
+            "vO": "all",
+            "tokenOwner": "rs_svc",
+        }
+        for name in ("SE0", "SE1", "SE2")
+    ]
+
+    pep = PEP({"ResourceStatusClient": rsClient, "ResourceManagementClient": MagicMock(), "SiteStatus": MagicMock()})
+    pep.pdp = MagicMock()
+    pep.pdp.takeDecisions.side_effect = lambda paramsList: [
+        S_OK({"decisionParams": params, "policyCombinedResult": {"PolicyAction": []}, "singlePolicyResults": []})
+        for params in paramsList
+    ]
+
+    res = pep.enforceBatch(decisionParamsList)
+    assert res["OK"], res
+    assert [result["OK"] for result in res["Value"]] == [True, False, False]
+    assert rsClient.selectStatusElement.call_count == 1
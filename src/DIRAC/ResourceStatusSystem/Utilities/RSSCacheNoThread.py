@@ -1,39 +1,55 @@
 """ Cache
 
 This module provides a generic Cache extended to be used on RSS, RSSCache.
-This cache features a lazy update method. It will only be updated if it is
-empty and there is a new query. If not, it will remain in its previous state.
-However, Cache class internal cache: DictCache sets a validity to its entries.
-After that, the cache is empty.
+
+The cache holds a snapshot of the table, filled the first time it is queried.
+Once the snapshot is older than the lifetime of the cache, a refresh is started
+in the background, and the callers are served the previous snapshot until it
+is over. When the update function supports it, the refresh only fetches the
+rows changed since the previous one, and the whole table is reloaded from time
+to time to forget the rows which were deleted. The new snapshot is built aside,
+and swapped with the previous one in a single step.
 
 """
+import datetime
 import itertools
 import random
+import threading
+import time
 
 from DIRAC import gLogger, S_OK, S_ERROR
-from DIRAC.Core.Utilities.DictCache import DictCache
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.ResourceStatusSystem.Utilities.RssConfiguration import RssConfiguration
 
+# The delta refreshes fetch the rows changed since the beginning of the previous refresh,
+# minus this margin (seconds), to cover the clock differences between the hosts
+DELTA_OVERLAP = 300
+# Number of delta refreshes after which the whole table is reloaded
+FULL_RELOAD_PERIOD = 10
+
 
 class Cache:
     """
     Cache basic class.
 
-    WARNING: None of its methods is thread safe. Acquire / Release lock when
-    using them !
+    The refreshes are thread safe, and the snapshot is never modified once built,
+    so it can be read without locking. The lock (acquireLock / releaseLock) is
+    there to serialize the callers modifying the underlying table.
     """
 
-    def __init__(self, lifeTime, updateFunc):
+    def __init__(self, lifeTime, updateFunc, deltaUpdateFunc=None):
         """
         Constructor
 
         :Parameters:
           **lifeTime** - `int`
-            Lifetime of the elements in the cache ( seconds ! )
+            Lifetime of the snapshot in the cache ( seconds ! )
           **updateFunc** - `function`
             This function MUST return a S_OK | S_ERROR object. In the case of the first,
             its value must be a dictionary.
+          **deltaUpdateFunc** - `function`
+            Optional function taking a UTC datetime, and returning like updateFunc
+            the entries changed since then. If not given, every refresh calls updateFunc.
 
         """
 
@@ -45,28 +61,39 @@ class Cache:
 
         self.__lifeTime = int(lifeTime * (1 + randomLifeTimeBias))
         self.__updateFunc = updateFunc
-        # The records returned from the cache must be valid at least 30 seconds.
-        self.__validSeconds = 30
+        self.__deltaUpdateFunc = deltaUpdateFunc
+        # A failed background refresh is not retried before 30 seconds.
+        self.__retrySeconds = 30
+
+        # Snapshot, and its bookkeeping
+        self.__snapshot = {}
+        self.__version = 0
+        self.__snapshotTime = 0
+        self.__refreshStart = None
+        self.__deltaRefreshes = 0
+        self.__lastFailure = 0
+        self.__refreshLock = threading.Lock()
+        self.__refreshThread = None
 
-        # Cache
-        self.__cache = DictCache()
         self.__cacheLock = LockRing()
         self.__cacheLock.getLock(self.__class__.__name__)
 
     # internal cache object getter
 
+    @property
+    def version(self):
+        """
+        Version of the snapshot, incremented each time a new one is swapped in
+        """
+        return self.__version
+
     def cacheKeys(self):
         """
         Cache keys getter
 
-        :returns: list with keys in the cache valid for at least twice the validity period of the element
+        :returns: list with the keys in the current snapshot
         """
-
-        # Here we need to have more than the validity period because of the logic of the matching:
-        # * get all the keys with validity T
-        # * for each key K, get the element K with validity T
-        # This logic fails for elements just at the limit of the required time
-        return self.__cache.getKeys(validSeconds=self.__validSeconds * 2)
+        return list(self.__snapshot)
 
     # acquire / release Locks
 
@@ -84,23 +111,47 @@ class Cache:
 
     # Cache getters
 
-    def get(self, cacheKeys):
+    def getSnapshot(self):
+        """
+        Gets the current snapshot, filling it first if the cache was never filled, or
+        if its snapshot is too old to be served (the refreshes failed for a whole lifetime).
+        If the snapshot has expired, a refresh is started in the background.
+
+        :return: S_OK | S_ERROR. If the first, its content is the snapshot.
         """
-        Gets values for cacheKeys given, if all are found ( present on the cache and
-        valid ), returns S_OK with the results. If any is not neither present not
-        valid, returns S_ERROR.
+
+        age = time.time() - self.__snapshotTime
+        if not self.__version or age > 2 * self.__lifeTime:
+            with self.__refreshLock:
+                # Another thread may have refreshed it in the meantime
+                if self.__version and time.time() - self.__snapshotTime <= self.__lifeTime:
+                    return S_OK(self.__snapshot)
+                return self.__refresh()
+
+        if age > self.__lifeTime:
+            self.__refreshInBackground()
+        return S_OK(self.__snapshot)
+
+    def get(self, cacheKeys, snapshot=None):
+        """
+        Gets values for cacheKeys given, if all are found, returns S_OK with the results.
+        If any is not present, returns S_ERROR.
 
         :Parameters:
           **cacheKeys** - `list`
             list of keys to be extracted from the cache
+          **snapshot** - `dict`
+            snapshot to look into, by default the current one
 
         :return: S_OK | S_ERROR
         """
 
+        if snapshot is None:
+            snapshot = self.__snapshot
         result = {}
 
         for cacheKey in cacheKeys:
-            cacheRow = self.__cache.get(cacheKey, validSeconds=self.__validSeconds)
+            cacheRow = snapshot.get(cacheKey)
 
             if not cacheRow:
                 return S_ERROR("Cannot get %s" % str(cacheKey))
@@ -108,29 +159,32 @@ class Cache:
 
         return S_OK(result)
 
-    def check(self, cacheKeys, vO):
+    def check(self, cacheKeys, vO, snapshot=None):
         """
         Modified get() method. Attempts to find keys with a vO value appended or 'all'
         value appended. The cacheKeys passed in are 'flattened' cache keys (no vO)
-        Gets values for cacheKeys given, if all are found ( present on the cache and
-        valid ), returns S_OK with the results. If any is not neither present not
-        valid, returns S_ERROR.
+        Gets values for cacheKeys given, if all are found, returns S_OK with the results.
+        If any is not present, returns S_ERROR.
 
         :Parameters:
           **cacheKeys** - `list`
             list of keys to be extracted from the cache
+          **snapshot** - `dict`
+            snapshot to look into, by default the current one
 
         :return: S_OK | S_ERROR
         """
 
+        if snapshot is None:
+            snapshot = self.__snapshot
         result = {}
 
         for cacheKey in cacheKeys:
             longCacheKey = cacheKey + ("all",)
-            cacheRow = self.__cache.get(longCacheKey, validSeconds=self.__validSeconds)
+            cacheRow = snapshot.get(longCacheKey)
             if not cacheRow:
                 longCacheKey = cacheKey + (vO,)
-                cacheRow = self.__cache.get(longCacheKey, validSeconds=self.__validSeconds)
+                cacheRow = snapshot.get(longCacheKey)
                 if not cacheRow:
                     return S_ERROR(f'Cannot get extended {str(cacheKey)} (neither for VO = {vO} nor for "all" Vos)')
             result.update({longCacheKey: cacheRow})
@@ -139,48 +193,86 @@ class Cache:
 
     # Cache refreshers
 
-    def refreshCache(self):
+    def refreshCache(self, full=True):
         """
-        Purges the cache and gets fresh data from the update function.
+        Gets fresh data from the update function, and swaps it in.
+
+        :Parameters:
+          **full** - `bool`
+            if False, only the entries changed since the previous refresh are fetched
+            (when there is a delta update function, and the cache was filled already)
 
         :return: S_OK | S_ERROR. If the first, its content is the new cache.
         """
 
-        self.log.verbose("refreshing...")
+        with self.__refreshLock:
+            return self.__refresh(full=full)
+
+    # Private methods
+
+    def __refresh(self, full=False):
+        """
+        Builds a new snapshot, from the whole table or from the entries changed since the
+        previous refresh, and swaps it with the current one. The caller holds the refresh lock.
 
-        self.__cache.purgeAll()
+        :return: S_OK | S_ERROR. If the first, its content is the new snapshot.
+        """
 
-        newCache = self.__updateFunc()
-        if not newCache["OK"]:
-            self.log.error(newCache["Message"])
-            return newCache
+        full = (
+            full or self.__deltaUpdateFunc is None or not self.__version or self.__deltaRefreshes >= FULL_RELOAD_PERIOD
+        )
+        self.log.verbose("refreshing...", "(full)" if full else "(delta)")
 
-        newCache = self.__updateCache(newCache["Value"])
+        refreshStart = datetime.datetime.utcnow()
+        if full:
+            result = self.__updateFunc()
+        else:
+            result = self.__deltaUpdateFunc(self.__refreshStart - datetime.timedelta(seconds=DELTA_OVERLAP))
+        if not result["OK"]:
+            self.__lastFailure = time.time()
+            self.log.error("Cannot refresh the cache", result["Message"])
+            return result
+
+        if full:
+            snapshot = dict(result["Value"])
+            self.__deltaRefreshes = 0
+        else:
+            snapshot = dict(self.__snapshot)
+            snapshot.update(result["Value"])
+            self.__deltaRefreshes += 1
 
-        self.log.verbose("refreshed")
+        # The readers get either the previous snapshot or this one, never a partial one
+        self.__snapshot = snapshot
+        self.__snapshotTime = time.time()
+        self.__refreshStart = refreshStart
+        self.__version += 1
 
-        return newCache
+        self.log.verbose("refreshed", "%d entries, %d changed" % (len(snapshot), len(result["Value"])))
 
-    # Private methods
+        return S_OK(snapshot)
 
-    def __updateCache(self, newCache):
+    def __refreshInBackground(self):
+        """
+        Starts a thread refreshing the snapshot, unless one is running already or the
+        previous one failed less than 30 seconds ago.
         """
-        Given the new cache dictionary, updates the internal cache with it. It sets
-        a duration to the entries of <self.__lifeTime> seconds.
 
-        :Parameters:
-          **newCache** - `dict`
-            dictionary containing a new cache
+        if self.__refreshLock.locked() or time.time() - self.__lastFailure < self.__retrySeconds:
+            return
+        if self.__refreshThread and self.__refreshThread.is_alive():
+            return
+        self.__refreshThread = threading.Thread(target=self.__backgroundRefresh, daemon=True)
+        self.__refreshThread.start()
 
-        :return: dictionary. It is newCache argument.
+    def __backgroundRefresh(self):
+        """
+        Body of the background refresh thread
         """
 
-        for cacheKey, cacheValue in newCache.items():
-            self.__cache.add(cacheKey, self.__lifeTime, value=cacheValue)
-
-        # We are assuming nothing will fail while inserting in the cache. There is
-        # no apparent reason to suspect from that piece of code.
-        return S_OK(newCache)
+        with self.__refreshLock:
+            # Another thread may have refreshed it in the meantime
+            if time.time() - self.__snapshotTime > self.__lifeTime:
+                self.__refresh()
 
 
 class RSSCache(Cache):
@@ -191,11 +283,10 @@ class RSSCache(Cache):
     When instantiating one object of RSSCache, we need to specify the RSS elementType
     it applies, e.g. : StorageElement, CE, Queue, ...
 
-    It provides a unique public method `match` which is thread safe. All other
-    methods are not !!
+    It provides a unique public method `match` which is thread safe.
     """
 
-    def __init__(self, lifeTime, updateFunc):
+    def __init__(self, lifeTime, updateFunc, deltaUpdateFunc=None):
         """
         Constructor
 
@@ -210,17 +301,21 @@ class RSSCache(Cache):
             This function MUST return a S_OK | S_ERROR object. In the case of the first,
             its value must follow the dict format: ( key, value ) being key ( elementName,
             statusType ) and value status.
+          **deltaUpdateFunc** - `function`
+            Optional function returning the same, for the entries changed since the
+            UTC datetime it is given.
 
         """
 
-        super().__init__(lifeTime, updateFunc)
+        super().__init__(lifeTime, updateFunc, deltaUpdateFunc)
 
         self.allStatusTypes = RssConfiguration().getConfigStatusType()
 
     def match(self, elementNames, elementType, statusTypes, vO):
         """
-        In first instance, if the cache is invalid, it will request a new one from
-        the server.
+        In first instance, if the cache was never filled, it will request a new one from
+        the server. It is not blocked by the refreshes of an expired cache, and is then
+        served the previous snapshot.
         It make the Cartesian product of elementNames x statusTypes to generate a key
         set that will be compared against the cache set. If the first is included in
         the second, we have a positive match and a dictionary will be returned. Otherwise,
@@ -240,19 +335,13 @@ class RSSCache(Cache):
         :return: S_OK() || S_ERROR()
         """
 
-        self.acquireLock()
-        try:
-            return self._match(elementNames, elementType, statusTypes, vO)
-        finally:
-            # Release lock, no matter what !
-            self.releaseLock()
+        return self._match(elementNames, elementType, statusTypes, vO)
 
-    # Private methods: NOT THREAD SAFE !!
+    # Private methods
 
     def _match(self, elementNames, elementType, statusTypes, vO):
         """
-        Method doing the actual work. It must be wrapped around locks to ensure no
-        disaster happens.
+        Method doing the actual work, on a single snapshot of the cache.
 
         :Parameters:
           **elementNames** - [ None, `string`, `list` ]
@@ -265,8 +354,8 @@ class RSSCache(Cache):
         :return: S_OK() || S_ERROR()
         """
 
-        # Gets the entire cache or a new one if it is empty / invalid
-        validCache = self.__getValidCache()
+        # Gets the entire cache or a new one if it was never filled
+        validCache = self.getSnapshot()
         if not validCache["OK"]:
             return validCache
         validCache = validCache["Value"]
@@ -280,13 +369,11 @@ class RSSCache(Cache):
         if not matchKeys["OK"]:
             return matchKeys
 
-        # Gets objects for matched keys. It will return S_ERROR if the cache value
-        # has expired in between. It has 30 valid seconds, which means something was
-        # extremely slow above.
+        # Gets objects for matched keys, from the same snapshot
         if matchKeys["CheckVO"]:
-            cacheMatches = self.check(matchKeys["Value"], vO)  # add an appropriate VO to the keys
+            cacheMatches = self.check(matchKeys["Value"], vO, validCache)  # add an appropriate VO to the keys
         else:
-            cacheMatches = self.get(matchKeys["Value"])
+            cacheMatches = self.get(matchKeys["Value"], validCache)
         if not cacheMatches["OK"]:
             return cacheMatches
 
@@ -302,24 +389,6 @@ class RSSCache(Cache):
 
         return S_OK(cacheMatchesDict)
 
-    def __getValidCache(self):
-        """
-        Obtains the keys on the cache which are valid. If any, returns the complete
-        valid dictionary. If the list is empty, we assume the cache is invalid or
-        not filled, so we issue a cache refresh and return its data.
-
-        :return: { ( elementName, statusType, vO ) : status, ... }
-        """
-
-        cacheKeys = self.cacheKeys()
-        # If cache is empty, we refresh it.
-        if not cacheKeys:
-            cache = self.refreshCache()
-        else:
-            cache = self.get(cacheKeys)
-
-        return cache
-
     def __match(self, validCache, elementNames, elementType, statusTypes, vO):
         """
         Obtains all keys on the cache ( should not be empty ! ).
@@ -0,0 +1,183 @@
+""" Test the refreshes of the RSS cache: delta refreshes, atomic swap of the snapshot, and stale reads
+"""
+import datetime
+import threading
+import time
+
+import pytest
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.ResourceStatusSystem.Utilities import RSSCacheNoThread
+from DIRAC.ResourceStatusSystem.Utilities.RSSCacheNoThread import RSSCache
+
+# pylint: disable=redefined-outer-name
+
+
+class FakeTable:
+    """Resource status table, with the update functions of the cache"""
+
+    def __init__(self):
+        self.rows = {
+            ("SE1", "StorageElement", "ReadAccess", "all"): "Active",
+            ("SE1", "StorageElement", "WriteAccess", "all"): "Active",
+            ("SE2", "StorageElement", "ReadAccess", "all"): "Banned",
+        }
+        self.changed = set()
+        self.calls = []
+        self.delay = 0
+        self.fail = False
+        self.released = threading.Event()
+        self.released.set()
+
+    def __query(self, call, result):
+        self.calls.append(call)
+        time.sleep(self.delay)
+        self.released.wait()
+        if self.fail:
+            return S_ERROR("RSS down")
+        return S_OK(result)
+
+    def update(self):
+        return self.__query("full", dict(self.rows))
+
+    def deltaUpdate(self, since):
+        changed, self.changed = self.changed, set()
+        return self.__query(("delta", since), {key: self.rows[key] for key in changed})
+
+    def setStatus(self, key, status):
+        self.rows[key] = status
+        self.changed.add(key)
+
+
+@pytest.fixture
+def table():
+    return FakeTable()
+
+
+def expire(cache):
+    """Age the snapshot of a cache past its lifetime"""
+    cache._Cache__snapshotTime -= 61
+
+
+def waitForRefresh(cache):
+    thread = cache._Cache__refreshThread
+    if thread:
+        thread.join()
+
+
+def test_firstFill(table):
+    """The first query fills the cache from the whole table, the next ones use it"""
+    cache = RSSCache(50, table.update, table.deltaUpdate)
+    res = cache.match(["SE1", "SE2"], "StorageElement", "ReadAccess", "all")
+    assert res["OK"], res
+    assert res["Value"] == {"SE1": {"ReadAccess": "Active"}, "SE2": {"ReadAccess": "Banned"}}
+    assert cache.match("SE1", "StorageElement", ["ReadAccess", "WriteAccess"], "all")["OK"]
+    assert table.calls == ["full"]
+    assert cache.version == 1
+
+
+def test_deltaRefresh(table):
+    """Once expired, the cache is refreshed in the background with the changed rows only"""
+    cache = RSSCache(50, table.update, table.deltaUpdate)
+    cache.match("SE1", "StorageElement", "ReadAccess", "all")
+    table.setStatus(("SE1", "StorageElement", "ReadAccess", "all"), "Banned")
+    table.setStatus(("SE3", "StorageElement", "ReadAccess", "all"), "Active")
+
+    # Not expired yet
+    res = cache.match("SE1", "StorageElement", "ReadAccess", "all")
+    assert res["Value"] == {"SE1": {"ReadAccess": "Active"}}
+
+    expire(cache)
+    table.released.clear()
+    # The stale snapshot is served while the refresh runs
+    res = cache.match("SE1", "StorageElement", "ReadAccess", "all")
+    assert res["Value"] == {"SE1": {"ReadAccess": "Active"}}
+    table.released.set()
+    waitForRefresh(cache)
+
+    assert table.calls[0] == "full"
+    assert table.calls[1][0] == "delta"
+    assert cache.version == 2
+    res = cache.match(["SE1", "SE2", "SE3"], "StorageElement", "ReadAccess", "all")
+    assert res["Value"] == {
+        "SE1": {"ReadAccess": "Banned"},
+        "SE2": {"ReadAccess": "Banned"},
+        "SE3": {"ReadAccess": "Active"},
+    }
+    # The rows not changed are kept
+    assert cache.match("SE1", "StorageElement", "WriteAccess", "all")["OK"]
+
+
+def test_deltaSince(table):
+    """The delta refreshes ask for the rows changed since the previous refresh, with a margin"""
+    cache = RSSCache(50, table.update, table.deltaUpdate)
+    cache.refreshCache()
+    refreshStart = cache._Cache__refreshStart
+    cache.refreshCache(full=False)
+    since = table.calls[1][1]
+    assert refreshStart - since == datetime.timedelta(seconds=RSSCacheNoThread.DELTA_OVERLAP)
+
+
+def test_fullReload(table, monkeypatch):
+    """The whole table is reloaded periodically, forgetting the deleted rows"""
+    monkeypatch.setattr(RSSCacheNoThread, "FULL_RELOAD_PERIOD", 2)
+    cache = RSSCache(50, table.update, table.deltaUpdate)
+    for _ in range(4):
+        assert cache.refreshCache(full=False)["OK"]
+    assert ["full" if call == "full" else "delta" for call in table.calls] == ["full", "delta", "delta", "full"]
+
+    del table.rows[("SE2", "StorageElement", "ReadAccess", "all")]
+    cache.refreshCache()
+    assert not cache.match("SE2", "StorageElement", "ReadAccess", "all")["OK"]
+
+
+def test_withoutDelta(table):
+    """Without a delta update function, the refreshes reload the whole table"""
+    cache = RSSCache(50, table.update)
+    cache.refreshCache(full=False)
+    cache.refreshCache(full=False)
+    assert table.calls == ["full", "full"]
+
+
+def test_failedRefresh(table):
+    """A failed background refresh keeps the previous snapshot, and is not retried immediately"""
+    cache = RSSCache(50, table.update, table.deltaUpdate)
+    cache.match("SE1", "StorageElement", "ReadAccess", "all")
+    table.fail = True
+    expire(cache)
+    assert cache.match("SE1", "StorageElement", "ReadAccess", "all")["OK"]
+    waitForRefresh(cache)
+    assert cache.match("SE1", "StorageElement", "ReadAccess", "all")["OK"]
+    waitForRefresh(cache)
+    assert len(table.calls) == 2
+    assert cache.version == 1
+
+    # Too old to be served: the refresh is synchronous, and its error returned
+    expire(cache)
+    assert not cache.match("SE1", "StorageElement", "ReadAccess", "all")["OK"]
+
+
+def test_concurrentReaders(table):
+    """Many readers of an expired cache trigger a single refresh, and are not blocked by it"""
+    cache = RSSCache(50, table.update, table.deltaUpdate)
+    cache.match("SE1", "StorageElement", "ReadAccess", "all")
+    expire(cache)
+    table.delay = 0.5
+
+    results = []
+
+    def read():
+        start = time.time()
+        res = cache.match("SE1", "StorageElement", "ReadAccess", "all")
+        results.append((res["OK"], time.time() - start))
+
+    threads = [threading.Thread(target=read) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    waitForRefresh(cache)
+
+    assert all(ok for ok, _duration in results)
+    assert max(duration for _ok, duration in results) < 0.5
+    assert len(table.calls) == 2
@@ -44,8 +44,11 @@
 
 """
 import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from DIRAC import gLogger, gConfig, S_OK, S_ERROR
+from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 from DIRAC.Core.Utilities import DErrno
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Security.ProxyInfo import getVOfromProxyGroup
@@ -53,6 +56,79 @@ from DIRAC.Resources.Catalog.Utilities import checkArgumentFormat
 from DIRAC.Resources.Catalog.FileCatalogFactory import FileCatalogFactory
 from DIRAC.Resources.Catalog.FCConditionParser import FCConditionParser
 
+# Number of threads calling the catalogs concurrently, shared by all the FileCatalog objects
+CATALOG_THREADS = 20
+
+_catalogExecutor = None
+_catalogExecutorLock = threading.Lock()
+# Set in the threads of the executor, which call the catalogs serially
+_catalogWorker = threading.local()
+
+
+def _getCatalogExecutor():
+    """Executor calling the catalogs concurrently"""
+    global _catalogExecutor
+    with _catalogExecutorLock:
+        if _catalogExecutor is None:
+            _catalogExecutor = ThreadPoolExecutor(max_workers=CATALOG_THREADS, thread_name_prefix="FileCatalog")
+        return _catalogExecutor
+
+
+def _runInWorker(threadConfig, function, *args):
+    """Call a function in a thread of the executor, on behalf of the same identity as the caller"""
+    workerConfig = ThreadConfig()
+    workerConfig.load(threadConfig[0])
+    workerConfig.setDecorator(threadConfig[1])
+    _catalogWorker.active = True
+    try:
+        return function(*args)
+    finally:
+        _catalogWorker.active = False
+        workerConfig.reset()
+
+
+def _isCompleteReadResult(result):
+    """Whether a result of a read method answers for all the LFNs"""
+    return (
+        result is not None
+        and result["OK"]
+        and not (isinstance(result["Value"], dict) and result["Value"].get("Failed"))
+    )
+
+
+def _callConcurrently(function, argsList, isComplete=None):
+    """Call a function with each of the arguments concurrently
+
+    :param function: function to call
+    :param list argsList: tuples of arguments
+    :param isComplete: if given, function returning True for a result which can be returned straight away
+
+    :returns: the first result for which isComplete is True if any, otherwise the list of results,
+              in the same order as argsList
+    """
+    # Nothing to gain from the executor, which can not be used from its own threads
+    if len(argsList) <= 1 or getattr(_catalogWorker, "active", False):
+        results = []
+        for args in argsList:
+            result = function(*args)
+            if isComplete and isComplete(result):
+                return result
+            results.append(result)
+        return results
+
+    threadConfig = ThreadConfig()
+    callerConfig = (threadConfig.dump(), threadConfig.getDecorator())
+    executor = _getCatalogExecutor()
+    futures = [executor.submit(_runInWorker, callerConfig, function, *args) for args in argsList]
+    if isComplete:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if isComplete(future.result()):
+                    return future.result()
+    return [future.result() for future in futures]
+
 
 class FileCatalog:
     def __init__(self, catalogs=None, vo=None):
@@ -133,6 +209,10 @@ class FileCatalog:
 
         self.condParser = FCConditionParser(vo=self.vo, ro_methods=self.ro_methods)
 
+        # Call the other write catalogs concurrently with the master, and return the first complete read answer
+        self.concurrentWrites = self.opHelper.getValue("/Services/Catalogs/ConcurrentWrites", False)
+        self.hedgedReads = self.opHelper.getValue("/Services/Catalogs/HedgedReads", False)
+
     def isOK(self):
         return self.valid
 
@@ -163,6 +243,11 @@ class FileCatalog:
         If one of the LFNs given as input does not pass a condition defined for the
         master catalog, we return S_ERROR without trying anything else
 
+        The master catalog is called first, and the other catalogs are then called concurrently.
+        If ``/Operations/<vo/setup>/Services/Catalogs/ConcurrentWrites`` is True, they are called
+        concurrently with the master: this saves the master latency, but the LFNs failing in the
+        master are then also attempted in the other catalogs.
+
         :param fcConditions: either a dict or a string, to be propagated to the FCConditionParser
 
                              * If it is a string, it is given for all catalogs
@@ -176,6 +261,7 @@ class FileCatalog:
 
 
         """
+        call = self.call
         successful = {}
         failed = {}
         failedCatalogs = {}
@@ -187,7 +273,8 @@ class FileCatalog:
         lfnMapDict = {}
         masterResult = {}
         parms1 = []
-        if self.call not in self.no_lfn_methods:
+        fileInfo = {}
+        if call not in self.no_lfn_methods:
             fileInfo = parms[0]
             result = checkArgumentFormat(fileInfo, generateMap=True)
             if not result["OK"]:
@@ -198,26 +285,25 @@ class FileCatalog:
             allLfns = list(fileInfo)
             parms1 = parms[1:]
 
+        # Conditions of the catalogs to call, evaluated before calling any of them
+        catalogCalls = []
         for catalogName, oCatalog, master in self.writeCatalogs:
 
             # Skip if the method is not implemented in this catalog
             # NOTE: it is impossible for the master since the write method list is populated
             # only from the master catalog, and if the method is not there, __getattr__
             # would raise an exception
-            if not oCatalog.hasCatalogMethod(self.call):
+            if not oCatalog.hasCatalogMethod(call):
                 continue
 
-            method = getattr(oCatalog, self.call)
-
-            if self.call in self.no_lfn_methods:
-                result = method(*parms, **kws)
-            else:
+            condEvals = None
+            if call not in self.no_lfn_methods:
                 if isinstance(specialConditions, dict):
                     condition = specialConditions.get(catalogName)
                 else:
                     condition = specialConditions
                 # Check whether this catalog should be used for this method
-                res = self.condParser(catalogName, self.call, fileInfo, condition=condition)
+                res = self.condParser(catalogName, call, fileInfo, condition=condition)
                 # condParser never returns S_ERROR
                 condEvals = res["Value"]["Successful"]
                 # For a master catalog, ALL the lfns should be valid
@@ -225,34 +311,51 @@ class FileCatalog:
                     if any([not valid for valid in condEvals.values()]):
                         gLogger.error("The master catalog is not valid for some LFNS", condEvals)
                         return S_ERROR("The master catalog is not valid for some LFNS %s" % condEvals)
+            catalogCalls.append((catalogName, getattr(oCatalog, call), master, condEvals))
 
-                validLFNs = {lfn: fileInfo[lfn] for lfn in condEvals if condEvals[lfn]}
+        def callCatalog(catalogName, method, _master, condEvals):
+            """Call the method of a catalog, with the LFNs valid for it. Returns None if there are none"""
+            if condEvals is None:
+                return method(*parms, **kws)
 
-                # We can skip the execution without worry,
-                # since at this level it is for sure not a master catalog
-                if not validLFNs:
-                    gLogger.debug("No valid LFN, skipping the call")
-                    continue
+            # The LFNs which failed in the master are not in fileInfo anymore
+            validLFNs = {lfn: fileInfo[lfn] for lfn in condEvals if condEvals[lfn] and lfn in fileInfo}
 
-                invalidLFNs = [lfn for lfn in condEvals if not condEvals[lfn]]
+            # We can skip the execution without worry,
+            # since at this level it is for sure not a master catalog
+            if not validLFNs:
+                gLogger.debug("No valid LFN, skipping the call")
+                return None
 
-                if invalidLFNs:
-                    gLogger.debug(
-                        "Some LFNs are not valid for operation '%s' on catalog '%s' : %s"
-                        % (self.call, catalogName, invalidLFNs)
-                    )
+            invalidLFNs = [lfn for lfn in condEvals if not condEvals[lfn]]
 
-                result = method(validLFNs, *parms1, **kws)
+            if invalidLFNs:
+                gLogger.debug(
+                    "Some LFNs are not valid for operation '%s' on catalog '%s' : %s" % (call, catalogName, invalidLFNs)
+                )
 
-            if master:
-                masterResult = result
+            return method(validLFNs, *parms1, **kws)
 
+        masterCalls = [catalogCall for catalogCall in catalogCalls if catalogCall[2]]
+        otherCalls = [catalogCall for catalogCall in catalogCalls if not catalogCall[2]]
+        if self.concurrentWrites:
+            results = _callConcurrently(callCatalog, masterCalls + otherCalls)
+        else:
+            results = _callConcurrently(callCatalog, masterCalls)
+
+        for catalogIndex, (catalogName, _method, master, _condEvals) in enumerate(masterCalls + otherCalls):
+            if catalogIndex == len(results):
+                # The master catalog succeeded, we can call the others
+                results += _callConcurrently(callCatalog, otherCalls)
+            result = results[catalogIndex]
+            if result is None:
+                continue
             if not result["OK"]:
                 if master:
                     # If this is the master catalog and it fails we don't want to continue with the other catalogs
                     self.log.error(
                         "Failed to execute call on master catalog",
-                        "{} on {}: {}".format(self.call, catalogName, result["Message"]),
+                        "{} on {}: {}".format(call, catalogName, result["Message"]),
                     )
                     return result
                 else:
@@ -261,6 +364,9 @@ class FileCatalog:
             else:
                 successfulCatalogs[catalogName] = result["Value"]
 
+            if master:
+                masterResult = result
+
             if allLfns:
                 if result["OK"]:
                     for lfn, message in result["Value"]["Failed"].items():
@@ -269,9 +375,9 @@ class FileCatalog:
                         if master:
                             # If this is the master catalog then we should not attempt the operation on other catalogs
                             fileInfo.pop(lfn, None)
-                    for lfn, result in result["Value"]["Successful"].items():
+                    for lfn, lfnResult in result["Value"]["Successful"].items():
                         # Save the result return for each file for the successful operations
-                        successful.setdefault(lfn, {})[catalogName] = result
+                        successful.setdefault(lfn, {})[catalogName] = lfnResult
 
         if allLfns:
             # This recovers the states of the files that completely failed i.e. when S_ERROR is returned by a catalog
@@ -292,17 +398,41 @@ class FileCatalog:
             return masterResult
 
     def r_execute(self, *parms, **kws):
-        """Read method executor."""
-        successful = {}
-        failed = {}
+        """Read method executor.
+
+        For the methods taking LFNs, all the catalogs are called concurrently, and their results are merged
+        giving precedence to the first catalogs. For the other methods, the result of the first catalog
+        which succeeds is returned.
+
+        If ``/Operations/<vo/setup>/Services/Catalogs/HedgedReads`` is True, all the catalogs are called
+        concurrently, and the first complete answer is returned: a successful result without any failed LFN.
+        If there is none, the results are merged as above.
+        """
+        call = self.call
+        catalogCalls = []
         for _catalogName, oCatalog, _master in self.readCatalogs:
 
             # Skip if the method is not implemented in this catalog
-            if not oCatalog.hasCatalogMethod(self.call):
+            if not oCatalog.hasCatalogMethod(call):
                 continue
+            catalogCalls.append((getattr(oCatalog, call),))
+
+        def callCatalog(method):
+            return method(*parms, **kws)
+
+        if self.hedgedReads:
+            results = _callConcurrently(callCatalog, catalogCalls, isComplete=_isCompleteReadResult)
+            if not isinstance(results, list):
+                # First complete answer
+                return results
+        elif call in self.no_lfn_methods:
+            results = (callCatalog(method) for method, in catalogCalls)
+        else:
+            results = _callConcurrently(callCatalog, catalogCalls)
 
-            method = getattr(oCatalog, self.call)
-            res = method(*parms, **kws)
+        successful = {}
+        failed = {}
+        for res in results:
             if res["OK"]:
                 if "Successful" in res["Value"]:
                     for key, item in res["Value"]["Successful"].items():
@@ -314,7 +444,7 @@ class FileCatalog:
                 else:
                     return res
         if not successful and not failed:
-            return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % self.call)
+            return S_ERROR(DErrno.EFCERR, "Failed to perform %s from any catalog" % call)
         return S_OK({"Failed": failed, "Successful": successful})
 
     ###########################################################################################
@@ -47,6 +47,7 @@ class FileCatalogClient(FileCatalogClientBase):
         "getDatasetFiles",
         "getDatasetAnnotation",
         "getSEDump",
+        "getSEDumpPage",
     ]
 
     WRITE_METHODS = [
@@ -675,3 +676,20 @@ class FileCatalogClient(FileCatalogClientBase):
 
         dfc = TransferClient(self.serverURL, timeout=3600)
         return dfc.receiveFile(outputFilename, seNames)
+
+    def getSEDumpPage(self, seNames, token=0, pageSize=10000, timeout=120):
+        """
+        Get a page of the content of SEs, as a list of [SEName, lfn, checksum, size].
+        Iterating over the pages, the memory needed on the client and on the server
+        does not depend on the size of the SEs, and the dump can be resumed from any page.
+
+        :param seNames: list of StorageElement names
+        :param int token: token of the page, as returned with the previous page, 0 for the first one
+        :param int pageSize: maximum number of files in the page (the server may limit it)
+
+        :returns: S_OK( { "Records": list of [SEName, lfn, checksum, size],
+                          "Token": token of the next page, None for the last page } )
+        """
+        if isinstance(seNames, str):
+            seNames = seNames.split(",")
+        return self._getRPC(timeout=timeout).getSEDumpPage(seNames, token, pageSize)
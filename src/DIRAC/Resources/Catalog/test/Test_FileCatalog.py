@@ -2,6 +2,7 @@
    Testing the FileCatalog logic
 """
 import sys
+import time
 import unittest
 from unittest import mock
 
@@ -91,6 +92,37 @@ class GenericCatalog:
         return self.generic
 
 
+class SlowCatalog:
+    """Wraps a catalog, each call of which takes some time"""
+
+    def __init__(self, catalog, delay):
+        self.catalog = catalog
+        self.delay = delay
+
+    def hasCatalogMethod(self, methName):
+        return self.catalog.hasCatalogMethod(methName)
+
+    def __getattr__(self, meth):
+        method = getattr(self.catalog, meth)
+
+        def slowMethod(*args, **kwargs):
+            time.sleep(self.delay)
+            return method(*args, **kwargs)
+
+        return slowMethod
+
+
+def slowDown(fc, delays):
+    """Slow down the catalogs of a FileCatalog
+
+    :param fc: FileCatalog
+    :param dict delays: { catalogName : delay of each call }
+    """
+    for catalogs in (fc.readCatalogs, fc.writeCatalogs):
+        for i, (name, obj, master) in enumerate(catalogs):
+            catalogs[i] = (name, SlowCatalog(obj, delays.get(name, 0)), master)
+
+
 def mock_fc_getSelectedCatalogs(self, desiredCatalogs):
     """Mock the getSelectedCatalogs method
     The name of the catalog should contain the following info, separated by '_':
@@ -424,9 +456,125 @@ class TestRead(unittest.TestCase):
         self.assertEqual(["c2"], sorted(res["Value"]["Failed"][lfn]))
 
 
+class TestConcurrency(unittest.TestCase):
+    """Tests the concurrent calls of the catalogs"""
+
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getSelectedCatalogs",
+        side_effect=mock_fc_getSelectedCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getEligibleCatalogs",
+        side_effect=mock_fc_getEligibleCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    def test_01_read(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+        """The read catalogs are called concurrently, and their results merged in order"""
+
+        fc = FileCatalog(
+            catalogs=["c1_True_True_True_2_1_2_0", "c2_False_True_True_2_1_1_0", "c3_False_True_True_2_1_1_0"]
+        )
+        slowDown(fc, {"c1": 0.5, "c2": 0.5, "c3": 0.5})
+
+        lfns = ["/lhcb/toto", "/lhcb/c1/Failed", "/lhcb/c1/c2/Failed/c3/Failed"]
+        start = time.time()
+        res = fc.read1(lfns)
+        self.assertLess(time.time() - start, 1)
+        self.assertTrue(res["OK"])
+        self.assertEqual(sorted(res["Value"]["Successful"]), sorted(lfns[:2]))
+        self.assertEqual(list(res["Value"]["Failed"]), lfns[2:])
+        self.assertTrue("c3" in res["Value"]["Failed"][lfns[2]])
+
+        # The no_lfn methods still return the first successful answer
+        res = fc.read2("/lhcb/c1")
+        self.assertTrue(res["OK"])
+        self.assertEqual(res["Value"], "yeah")
+
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getSelectedCatalogs",
+        side_effect=mock_fc_getSelectedCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getEligibleCatalogs",
+        side_effect=mock_fc_getEligibleCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    def test_02_hedgedRead(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+        """With hedged reads, the first complete answer is returned"""
+
+        fc = FileCatalog(catalogs=["c1_True_True_True_2_0_2_0", "c2_False_True_True_2_0_1_0"])
+        fc.hedgedReads = True
+        slowDown(fc, {"c1": 1})
+
+        # c2 answers first
+        start = time.time()
+        res = fc.read1(["/lhcb/c1/Failed"])
+        self.assertLess(time.time() - start, 0.5)
+        self.assertTrue(res["OK"])
+        self.assertEqual(list(res["Value"]["Successful"]), ["/lhcb/c1/Failed"])
+
+        # The answer of c2 is not complete, so the answers are merged
+        res = fc.read1(["/lhcb/toto", "/lhcb/c2/Failed"])
+        self.assertTrue(res["OK"])
+        self.assertEqual(sorted(res["Value"]["Successful"]), ["/lhcb/c2/Failed", "/lhcb/toto"])
+        self.assertTrue(not res["Value"]["Failed"])
+
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getSelectedCatalogs",
+        side_effect=mock_fc_getSelectedCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    @mock.patch.object(
+        DIRAC.Resources.Catalog.FileCatalog.FileCatalog,
+        "_getEligibleCatalogs",
+        side_effect=mock_fc_getEligibleCatalogs,
+        autospec=True,
+    )  # autospec is for the binding of the method...
+    def test_03_write(self, mk_getSelectedCatalogs, mk_getEligibleCatalogs):
+        """The master is called first, then the other write catalogs concurrently"""
+
+        fc = FileCatalog(
+            catalogs=["c1_True_True_True_2_0_2_0", "c2_False_True_True_2_0_1_0", "c3_False_True_True_2_0_1_0"]
+        )
+        slowDown(fc, {"c1": 0.5, "c2": 0.5, "c3": 0.5})
+
+        lfns = ["/lhcb/toto", "/lhcb/c1/Failed", "/lhcb/c3/Error"]
+        start = time.time()
+        res = fc.write1(lfns)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertTrue(res["OK"])
+        self.assertEqual(sorted(res["Value"]["Successful"]["/lhcb/toto"]), ["c1", "c2"])
+        # Not attempted in the other catalogs
+        self.assertEqual(list(res["Value"]["Failed"]["/lhcb/c1/Failed"]), ["c1", "c3"])
+        self.assertEqual(list(res["Value"]["Failed"]["/lhcb/c3/Error"]), ["c3"])
+
+        res = fc.write1("/lhcb/c1/Error")
+        self.assertTrue(not res["OK"])
+
+        # Calling the other catalogs concurrently with the master
+        fc.concurrentWrites = True
+        start = time.time()
+        res = fc.write1("/lhcb/toto")
+        self.assertLess(time.time() - start, 1)
+        self.assertTrue(res["OK"])
+        self.assertEqual(sorted(res["Value"]["Successful"]["/lhcb/toto"]), ["c1", "c2", "c3"])
+
+        # The master still decides
+        res = fc.write1("/lhcb/c1/Error")
+        self.assertTrue(not res["OK"])
+
+
 if __name__ == "__main__":
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestInitialization)
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestWrite))
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestRead))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestConcurrency))
 
     unittest.TextTestRunner(verbosity=2).run(suite)
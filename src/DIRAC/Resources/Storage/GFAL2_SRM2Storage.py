@@ -32,6 +32,9 @@ class GFAL2_SRM2Storage(GFAL2_StorageBase):
     ]
     _OUTPUT_PROTOCOLS = ["https", "gsiftp", "root", "srm"]
 
+    # SRM supports bulk requests
+    _GFAL2_BULK_METHODS = frozenset(["removeFile", "prestageFile", "prestageFileStatus"])
+
     def __init__(self, storageName, parameters):
         """ """
         super().__init__(storageName, parameters)
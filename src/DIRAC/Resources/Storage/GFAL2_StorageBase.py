@@ -22,11 +22,14 @@ Environment Variables:
 import os
 import datetime
 import errno
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from stat import S_ISREG, S_ISDIR, S_IXUSR, S_IRUSR, S_IWUSR, S_IRWXG, S_IRWXU, S_IRWXO
 from urllib import parse
 
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 from typing import cast, Literal, Union, Any, Optional
 
 import gfal2  # pylint: disable=import-error
@@ -37,6 +40,7 @@ from DIRAC.Core.Utilities.ReturnValues import convertToReturnValue, returnValueO
 from DIRAC.Resources.Storage.Utilities import checkArgumentFormat
 from DIRAC.Resources.Storage.StorageBase import StorageBase
 from DIRAC.Core.Utilities.File import getSize
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.Core.Utilities.Pfn import pfnparse, pfnunparse
 
 # MacOS does not know ECOMM...
@@ -52,6 +56,12 @@ except AttributeError:
 MAX_SINGLE_STREAM_SIZE = 1024 * 1024 * 10  # 10MB
 MIN_BANDWIDTH = 0.5 * (1024 * 1024)  # 0.5 MB/s
 
+# Number of URLs in each request made with the gfal2 bulk API
+BULK_CHUNK_SIZE = 100
+
+# Set in the threads of the bulk worker pools, which execute the operations serially
+_bulkWorker = threading.local()
+
 
 @contextmanager
 def setGfalSetting(
@@ -109,8 +119,20 @@ class GFAL2_StorageBase(StorageBase):
     """.. class:: GFAL2_StorageBase
 
     This is the base class for all the gfal2 base protocol plugins
+
+    The bulk methods (exists, getFileSize, getFileMetadata, removeFile, prestageFile, prestageFileStatus
+    and getDirectorySize) execute the operations on the URLs concurrently, in a worker pool shared by
+    all the plugin objects of the SE. The number of workers is given by the ``BulkConcurrency`` option
+    of the plugin, and each operation times out after ``BulkTimeout`` seconds.
     """
 
+    # Bulk methods using the gfal2 bulk API, for the protocols supporting it
+    _GFAL2_BULK_METHODS: frozenset[str] = frozenset()
+
+    # Worker pools of the bulk methods, per SE
+    __bulkExecutors: dict[str, ThreadPoolExecutor] = {}
+    __bulkExecutorsLock = threading.Lock()
+
     def __init__(self, storageName: str, parameters: dict[str, str]):
         """c'tor
 
@@ -179,6 +201,103 @@ class GFAL2_StorageBase(StorageBase):
         # If the list is empty, all of them will be queried
         self._defaultExtendedAttributes: Union[list[str], None] = []
 
+        # Number of operations executed concurrently by the bulk methods on this SE, and timeout of each of them
+        self.bulkConcurrency = int(
+            parameters.get("BulkConcurrency", gConfig.getValue("/Resources/StorageElements/GFAL_BulkConcurrency", 10))
+        )
+        self.bulkTimeout = int(
+            parameters.get("BulkTimeout", gConfig.getValue("/Resources/StorageElements/GFAL_BulkTimeout", 300))
+        )
+
+    def __getBulkExecutor(self) -> ThreadPoolExecutor:
+        """Worker pool of the bulk methods, shared by all the plugin objects of the SE"""
+        with self.__bulkExecutorsLock:
+            if self.name not in self.__bulkExecutors:
+                self.__bulkExecutors[self.name] = ThreadPoolExecutor(
+                    max_workers=self.bulkConcurrency, thread_name_prefix=f"GFAL2_{self.name}"
+                )
+            return self.__bulkExecutors[self.name]
+
+    @staticmethod
+    def __runInWorker(operation: Callable[[], dict[str, dict]], startTimes: dict, key: int) -> dict[str, dict]:
+        """Execute an operation in a thread of a bulk worker pool, recording when it started"""
+        startTimes[key] = time.monotonic()
+        _bulkWorker.active = True
+        try:
+            return operation()
+        finally:
+            _bulkWorker.active = False
+
+    def _executeBulk(
+        self,
+        urls: list[str],
+        singleOperation: Optional[Callable[[str], Any]],
+        bulkOperation: Optional[Callable[[list[str]], dict[str, dict]]] = None,
+    ) -> dict[str, dict]:
+        """Execute an operation on each URL, concurrently in the worker pool of the SE
+
+        :param urls: URLs to which the operation is applied
+        :param singleOperation: operation on one URL, returning its result or raising an exception,
+                                not used if there is a bulkOperation
+        :param bulkOperation: if given, operation on a chunk of URLs with the gfal2 bulk API,
+                              returning the Successful and Failed dictionaries of the chunk
+
+        :returns: Successful dict {url: result}, Failed dict {url: error message}.
+                  The operations not finished after ``bulkTimeout`` seconds fail
+        """
+
+        def singleUnit(url: str) -> dict[str, dict]:
+            try:
+                return {"Successful": {url: cast(Callable[[str], Any], singleOperation)(url)}, "Failed": {}}
+            except Exception as e:
+                return {"Successful": {}, "Failed": {url: repr(e)}}
+
+        def bulkUnit(chunk: list[str]) -> dict[str, dict]:
+            try:
+                return cast(Callable[[list[str]], dict[str, dict]], bulkOperation)(chunk)
+            except Exception as e:
+                return {"Successful": {}, "Failed": {url: repr(e) for url in chunk}}
+
+        if bulkOperation:
+            units = [
+                (chunk, lambda chunk=chunk: bulkUnit(chunk)) for chunk in breakListIntoChunks(urls, BULK_CHUNK_SIZE)
+            ]
+        else:
+            units = [([url], lambda url=url: singleUnit(url)) for url in urls]
+
+        successful: dict[str, Any] = {}
+        failed: dict[str, str] = {}
+        # Nothing to gain from the pool, which can not be used from its own threads
+        if self.bulkConcurrency <= 1 or len(units) <= 1 or getattr(_bulkWorker, "active", False):
+            for _unitUrls, operation in units:
+                result = operation()
+                successful.update(result["Successful"])
+                failed.update(result["Failed"])
+            return {"Failed": failed, "Successful": successful}
+
+        executor = self.__getBulkExecutor()
+        startTimes: dict[int, float] = {}
+        futures = {
+            executor.submit(self.__runInWorker, operation, startTimes, key): key
+            for key, (_unitUrls, operation) in enumerate(units)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=min(self.bulkTimeout, 1), return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                successful.update(result["Successful"])
+                failed.update(result["Failed"])
+            # The operations can not be interrupted, but their URLs are not waited for any longer
+            now = time.monotonic()
+            for future in list(pending):
+                key = futures[future]
+                if key in startTimes and now - startTimes[key] > self.bulkTimeout:
+                    pending.discard(future)
+                    for url in units[key][0]:
+                        failed[url] = f"Operation timed out after {self.bulkTimeout} seconds"
+        return {"Failed": failed, "Successful": successful}
+
     def _estimateTransferTimeout(self, fileSize: int) -> int:
         """Dark magic to estimate the timeout for a transfer
         The values are set empirically and seem to work fine.
@@ -204,17 +323,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.exists: Checking the existence of {len(urls)} path(s)")
 
-        successful = {}
-        failed = {}
-
-        for url in urls:
-            try:
-                successful[url] = self.__singleExists(url)
-            except Exception as e:
-                failed[url] = repr(e)
-
-        resDict = {"Failed": failed, "Successful": successful}
-        return resDict
+        return self._executeBulk(list(urls), self.__singleExists)
 
     def __singleExists(self, path: str) -> bool:
         """Check if :path: exists on the storage
@@ -505,16 +614,8 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.removeFile: Attempting to remove {len(urls)} files")
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            try:
-                successful[url] = self._removeSingleFile(url)
-            except Exception as e:
-                failed[url] = repr(e)
-
-        return {"Failed": failed, "Successful": successful}
+        bulkOperation = self._removeFilesBulk if "removeFile" in self._GFAL2_BULK_METHODS else None
+        return self._executeBulk(list(urls), self._removeSingleFile, bulkOperation)
 
     def _removeSingleFile(self, path: str) -> Literal[True]:
         """Physically remove the file specified by path
@@ -559,16 +660,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.getFileSize: Trying to determine file size of {len(urls)} files")
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            try:
-                successful[url] = self._getSingleFileSize(url)
-            except Exception as e:
-                failed[url] = repr(e)
-
-        return {"Failed": failed, "Successful": successful}
+        return self._executeBulk(list(urls), self._getSingleFileSize)
 
     def _getSingleFileSize(self, path: str) -> int:
         """Get the physical size of the given file
@@ -604,17 +696,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.getFileMetadata: trying to read metadata for {len(urls)} paths")
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            try:
-                successful[url] = self._getSingleFileMetadata(url)
-
-            except Exception as e:
-                failed[url] = repr(e)
-
-        return {"Failed": failed, "Successful": successful}
+        return self._executeBulk(list(urls), self._getSingleFileMetadata)
 
     def _getSingleFileMetadata(self, path: str) -> dict[str, str]:
         """Fetch the metadata associated to the file
@@ -694,15 +776,9 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.prestageFile: Attempting to issue stage requests for {len(urls)} file(s).")
 
-        failed = {}
-        successful = {}
-        for url in urls:
-            try:
-                successful[url] = self._prestageSingleFile(url, lifetime)
-            except Exception as e:
-                failed[url] = repr(e)
-
-        return {"Failed": failed, "Successful": successful}
+        if "prestageFile" in self._GFAL2_BULK_METHODS:
+            return self._executeBulk(list(urls), None, lambda chunk: self._prestageFilesBulk(chunk, lifetime))
+        return self._executeBulk(list(urls), lambda url: self._prestageSingleFile(url, lifetime))
 
     def _prestageSingleFile(self, path: str, lifetime: int) -> str:
         """Issue prestage for single file
@@ -735,15 +811,23 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.prestageFileStatus: Checking the staging status for {len(urls)} file(s).")
 
-        failed = {}
-        successful = {}
-        for url, token in urls.items():
-
-            try:
-                successful[url] = self._prestageSingleFileStatus(url, token)
-            except Exception as e:
-                failed[url] = repr(e)
-        return {"Failed": failed, "Successful": successful}
+        # The setting of the shared context is not changed concurrently by each operation
+        with setGfalSetting(self.ctx, "BDII", "ENABLE", True):
+            if "prestageFileStatus" not in self._GFAL2_BULK_METHODS:
+                return self._executeBulk(list(urls), lambda url: self._prestageSingleFileStatus(url, urls[url]))
+            # The bulk requests are made per token
+            urlsPerToken: dict[str, list[str]] = {}
+            for url, token in urls.items():
+                urlsPerToken.setdefault(str(token), []).append(url)
+            failed = {}
+            successful = {}
+            for token, tokenUrls in urlsPerToken.items():
+                result = self._executeBulk(
+                    tokenUrls, None, lambda chunk, token=token: self._prestageFilesStatusBulk(chunk, token)
+                )
+                successful.update(result["Successful"])
+                failed.update(result["Failed"])
+            return {"Failed": failed, "Successful": successful}
 
     def _prestageSingleFileStatus(self, path: str, token: str) -> bool:
         """Check prestage status for single file
@@ -762,15 +846,71 @@ class GFAL2_StorageBase(StorageBase):
         # also allow int as token - converting them to strings
         token = str(token)
 
-        with setGfalSetting(self.ctx, "BDII", "ENABLE", True):
+        # 0: not staged
+        # 1: staged
+        status = self.ctx.bring_online_poll(path, token)
 
-            # 0: not staged
-            # 1: staged
-            status = self.ctx.bring_online_poll(path, token)
+        isStaged = bool(status)
+        log.debug(f"File staged: {isStaged}")
+        return isStaged
 
-            isStaged = bool(status)
-            log.debug(f"File staged: {isStaged}")
-            return isStaged
+    @staticmethod
+    def __splitBulkErrors(urls: list[str], errors: list, result: Any) -> dict[str, dict]:
+        """Successful and Failed dictionaries of a request with the gfal2 bulk API
+
+        :param urls: URLs of the request
+        :param errors: errors returned by gfal2 for each URL, None if there was no error
+        :param result: value for the successful URLs
+        """
+        successful = {}
+        failed = {}
+        for url, error in zip(urls, errors):
+            if error is None:
+                successful[url] = result
+            else:
+                failed[url] = repr(error)
+        return {"Successful": successful, "Failed": failed}
+
+    def _removeFilesBulk(self, urls: list[str]) -> dict[str, dict]:
+        """Physically remove files with one request of the gfal2 bulk API
+
+        :param urls: paths on storage (srm://...)
+        :returns: Successful dict {path : True}, Failed dict {path : error message}.
+                  The files which do not exist are successfully removed
+        """
+        errors = self.ctx.unlink(urls)
+        errors = [None if error is not None and error.code in (errno.ENOENT, ECOMM) else error for error in errors]
+        return self.__splitBulkErrors(urls, errors, True)
+
+    def _prestageFilesBulk(self, urls: list[str], lifetime: int) -> dict[str, dict]:
+        """Issue prestage for files with one request of the gfal2 bulk API
+
+        :param urls: paths to be prestaged
+        :param lifetime: prestage lifetime in seconds
+        :returns: Successful dict {path : token}, Failed dict {path : error message}
+        """
+        errors, token = self.ctx.bring_online(urls, lifetime, self.stageTimeout, True)
+        return self.__splitBulkErrors(urls, errors, cast(str, token))
+
+    def _prestageFilesStatusBulk(self, urls: list[str], token: str) -> dict[str, dict]:
+        """Check prestage status for files with one request of the gfal2 bulk API
+
+        :param urls: paths to be checked
+        :param token: common token of the files
+        :returns: Successful dict {path : bool whether the file is staged}, Failed dict {path : error message}
+        """
+        errors = self.ctx.bring_online_poll(urls, token)
+        successful = {}
+        failed = {}
+        for url, error in zip(urls, errors):
+            if error is None:
+                successful[url] = True
+            elif error.code == errno.EAGAIN:
+                # Still staging
+                successful[url] = False
+            else:
+                failed[url] = repr(error)
+        return {"Successful": successful, "Failed": failed}
 
     @convertToReturnValue
     def releaseFile(self, path):
@@ -1410,17 +1550,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug(f"GFAL2_StorageBase.getDirectorySize: Attempting to get size of {len(urls)} directories")
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            try:
-                successful[url] = self._getSingleDirectorySize(url)
-
-            except Exception as e:
-                failed[url] = repr(e)
-
-        return {"Failed": failed, "Successful": successful}
+        return self._executeBulk(list(urls), self._getSingleDirectorySize)
 
     def _getSingleDirectorySize(self, path: str) -> dict[str, int]:
         """Get the size of the directory on the storage
@@ -0,0 +1,175 @@
+""" Test the concurrent bulk methods of GFAL2_StorageBase, with a gfal2 context on the local file system
+"""
+import errno
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.modules.setdefault("gfal2", MagicMock())
+
+# pylint: disable=wrong-import-position
+from DIRAC.Resources.Storage import GFAL2_StorageBase as moduleUnderTest  # noqa: E402
+from DIRAC.Resources.Storage.GFAL2_StorageBase import GFAL2_StorageBase  # noqa: E402
+
+
+class GError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class LocalContext:
+    """gfal2 context on the local file system, each operation taking some time"""
+
+    def __init__(self, delay=0.05, slowPaths=()):
+        self.delay = delay
+        self.slowPaths = slowPaths
+        self.running = 0
+        self.maxRunning = 0
+        self.bulkCalls = []
+        self.staged = set()
+        self.__lock = threading.Lock()
+
+    def __operation(self, path):
+        with self.__lock:
+            self.running += 1
+            self.maxRunning = max(self.maxRunning, self.running)
+        time.sleep(2 if path in self.slowPaths else self.delay)
+        with self.__lock:
+            self.running -= 1
+
+    def stat(self, path):
+        self.__operation(path)
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            raise GError("No such file", errno.ENOENT)
+
+    def unlink(self, path):
+        if isinstance(path, list):
+            self.bulkCalls.append(("unlink", path))
+            errors = []
+            for singlePath in path:
+                try:
+                    os.unlink(singlePath)
+                    errors.append(None)
+                except FileNotFoundError:
+                    errors.append(GError("No such file", errno.ENOENT))
+            return errors
+        self.__operation(path)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            raise GError("No such file", errno.ENOENT)
+
+    def bring_online(self, paths, lifetime, timeout, asynchronous):
+        self.bulkCalls.append(("bring_online", paths))
+        return [None if os.path.exists(path) else GError("No such file", errno.ENOENT) for path in paths], "token"
+
+    def bring_online_poll(self, paths, token):
+        self.bulkCalls.append(("bring_online_poll", paths))
+        return [None if path in self.staged else GError("Staging", errno.EAGAIN) for path in paths]
+
+    def get_opt_boolean(self, *args):
+        return False
+
+    set_opt_boolean = set_opt_integer = set_opt_string = set_opt_string_list = remove_opt = MagicMock()
+
+
+class SRMLikeStorage(GFAL2_StorageBase):
+    _GFAL2_BULK_METHODS = frozenset(["removeFile", "prestageFile", "prestageFileStatus"])
+
+
+@pytest.fixture
+def localFiles(tmp_path):
+    """Ten files, and ten paths which do not exist"""
+    existing = []
+    for i in range(10):
+        path = tmp_path / f"file{i}"
+        path.write_bytes(b"x" * i)
+        existing.append(str(path))
+    return existing, [str(tmp_path / f"missing{i}") for i in range(10)]
+
+
+def getStorage(monkeypatch, ctx, concurrency, timeout=10, storageClass=GFAL2_StorageBase):
+    # set_verbose is called when the log level is DEBUG
+    gfal2 = SimpleNamespace(
+        GError=GError,
+        creat_context=lambda: ctx,
+        set_verbose=lambda level: None,
+        verbose_level=SimpleNamespace(trace=3),
+    )
+    monkeypatch.setattr(moduleUnderTest, "gfal2", gfal2)
+    # The worker pools are per SE name
+    storageName = f"{storageClass.__name__}_{concurrency}_{timeout}"
+    parameters = {"Protocol": "file", "Path": "", "BulkConcurrency": str(concurrency), "BulkTimeout": str(timeout)}
+    return storageClass(storageName, parameters)
+
+
+def test_concurrentExists(monkeypatch, localFiles):
+    """The URLs are checked concurrently, by at most BulkConcurrency workers"""
+    existing, missing = localFiles
+    ctx = LocalContext()
+    storage = getStorage(monkeypatch, ctx, 4)
+    res = storage.exists(existing + missing)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {**{url: True for url in existing}, **{url: False for url in missing}}
+    assert res["Value"]["Failed"] == {}
+    assert ctx.maxRunning == 4
+
+
+def test_serial(monkeypatch, localFiles):
+    """With a concurrency of 1, the URLs are processed one after the other"""
+    existing, missing = localFiles
+    ctx = LocalContext(delay=0)
+    storage = getStorage(monkeypatch, ctx, 1)
+    res = storage.getFileSize(existing + missing)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {url: i for i, url in enumerate(existing)}
+    assert set(res["Value"]["Failed"]) == set(missing)
+    assert ctx.maxRunning == 1
+
+
+def test_timeout(monkeypatch, localFiles):
+    """The URLs whose operation takes too long fail, without waiting for them"""
+    existing, _missing = localFiles
+    ctx = LocalContext(slowPaths=existing[:1])
+    storage = getStorage(monkeypatch, ctx, 4, timeout=1)
+    res = storage.removeFile(existing)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {url: True for url in existing[1:]}
+    assert "timed out" in res["Value"]["Failed"][existing[0]]
+
+
+def test_bulkAPI(monkeypatch, localFiles):
+    """The plugins supporting it use the gfal2 bulk API, in chunks"""
+    existing, missing = localFiles
+    monkeypatch.setattr(moduleUnderTest, "BULK_CHUNK_SIZE", 3)
+    ctx = LocalContext()
+    storage = getStorage(monkeypatch, ctx, 4, storageClass=SRMLikeStorage)
+
+    res = storage.prestageFile(existing[:5] + missing[:1])
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {url: "token" for url in existing[:5]}
+    assert list(res["Value"]["Failed"]) == missing[:1]
+
+    ctx.staged = set(existing[:2])
+    res = storage.prestageFileStatus({url: "token" for url in existing[:5]})
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {url: url in ctx.staged for url in existing[:5]}
+
+    # Removing files which do not exist succeeds
+    res = storage.removeFile(existing + missing)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {url: True for url in existing + missing}
+    assert not any(os.path.exists(url) for url in existing)
+
+    for operation in ("bring_online", "bring_online_poll", "unlink"):
+        chunks = [paths for name, paths in ctx.bulkCalls if name == operation]
+        assert chunks and all(len(paths) <= 3 for paths in chunks)
@@ -21,9 +21,14 @@ from DIRAC.Core.Utilities.List import stringListToString, intListToString, break
 from DIRAC.Core.Utilities.Shifter import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Utilities.Subprocess import pythonCall
-from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.FilterQueryIndex import FilterQueryIndex
 
 MAX_ERROR_COUNT = 10
+# Statuses of the transformations to which new files are added
+FILTER_STATUSES = ["New", "Active", "Stopped", "Flush", "Completing"]
+# Seconds during which the metadata fields of the catalog and the statuses of the transformations are cached
+METADATA_FIELDS_LIFETIME = 600
+FILTER_STATUSES_LIFETIME = 60
 
 #############################################################################
 
@@ -111,6 +116,13 @@ class TransformationDB(DB):
 
         # Intialize filter Queries with Input Meta Queries
         self.filterQueries = []
+        # Index of the filter queries, built when the metadata fields are known
+        self.__filterLock = threading.Lock()
+        self.__filterIndex = None
+        self.__metadataFields = None
+        self.__metadataFieldsTime = 0
+        self.__filterStatuses = {}
+        self.__filterStatusesTime = 0
         res = self.__updateFilterQueries()
         if not res["OK"]:
             gLogger.fatal("Failed to create filter queries")
@@ -208,7 +220,11 @@ class TransformationDB(DB):
 
         # If the transformation has an input data specification
         if inputMetaQuery:
-            self.filterQueries.append((transID, inputMetaQuery))
+            with self.__filterLock:
+                self.filterQueries.append((str(transID), inputMetaQuery))
+                self.__filterStatuses[str(transID)] = "New"
+                if self.__filterIndex is not None:
+                    self.__filterIndex.add(str(transID), inputMetaQuery)
 
         if inheritedFrom:
             res = self._getTransformationID(inheritedFrom, connection=connection)
@@ -441,9 +457,8 @@ class TransformationDB(DB):
     def __updateFilterQueries(self, connection=False):
         """Get filters for all defined input streams in all the transformations."""
         resultList = []
-        res = self.getTransformations(
-            condDict={"Status": ["New", "Active", "Stopped", "Flush", "Completing"]}, connection=connection
-        )
+        statuses = {}
+        res = self.getTransformations(condDict={"Status": FILTER_STATUSES}, connection=connection)
         if not res["OK"]:
             return res
 
@@ -454,10 +469,64 @@ class TransformationDB(DB):
             if not res["OK"]:
                 continue
             resultList.append((transID, res["Value"]))
-
-        self.filterQueries = resultList
+            statuses[transID] = transDict["Status"]
+
+        with self.__filterLock:
+            self.filterQueries = resultList
+            self.__filterStatuses = statuses
+            self.__filterStatusesTime = time.time()
+            # Compiled again with the next file filtered
+            self.__filterIndex = None
         return S_OK(resultList)
 
+    def __getFilterIndex(self):
+        """Index of the filter queries, compiled with the metadata fields of the catalog
+
+        The metadata fields are cached for METADATA_FIELDS_LIFETIME seconds,
+        and the index is compiled again only if they changed.
+        """
+        # Read once: __updateFilterQueries may reset it concurrently
+        filterIndex = self.__filterIndex
+        if filterIndex is not None and time.time() - self.__metadataFieldsTime < METADATA_FIELDS_LIFETIME:
+            return S_OK(filterIndex)
+        res = FileCatalog().getMetadataFields()
+        if not res["OK"]:
+            gLogger.error("Error in getMetadataFields", res["Message"])
+            return res
+        if not res["Value"]:
+            gLogger.error("Error: no metadata fields defined")
+            return S_ERROR("No metadata fields defined")
+        typeDict = dict(res["Value"]["FileMetaFields"])
+        typeDict.update(res["Value"]["DirectoryMetaFields"])
+        with self.__filterLock:
+            self.__metadataFieldsTime = time.time()
+            if self.__filterIndex is None or typeDict != self.__metadataFields:
+                self.__metadataFields = typeDict
+                self.__filterIndex = FilterQueryIndex(typeDict, self.filterQueries)
+            return S_OK(self.__filterIndex)
+
+    def __getFilterTransIDs(self):
+        """IDs of the transformations with filter queries whose status allows adding files
+
+        The statuses are updated by setTransformationParameter, and refreshed from the DB
+        every FILTER_STATUSES_LIFETIME seconds for the changes made by other instances.
+        """
+        if time.time() - self.__filterStatusesTime >= FILTER_STATUSES_LIFETIME:
+            transIDs = [int(transID) for transID, _query in self.filterQueries]
+            if transIDs:
+                res = self.getTransformations(
+                    condDict={"TransformationID": transIDs}, columns=["TransformationID", "Status"]
+                )
+                if not res["OK"]:
+                    return res
+                statuses = {str(transDict["TransformationID"]): transDict["Status"] for transDict in res["Value"]}
+            else:
+                statuses = {}
+            with self.__filterLock:
+                self.__filterStatuses = statuses
+                self.__filterStatusesTime = time.time()
+        return S_OK({transID for transID, status in self.__filterStatuses.items() if status in FILTER_STATUSES})
+
     ###########################################################################
     #
     # These methods manipulate the AdditionalParameters tables
@@ -472,6 +541,8 @@ class TransformationDB(DB):
         message = ""
         if paramName in self.TRANSPARAMS:
             res = self.__updateTransformationParameter(transID, paramName, paramValue, connection=connection)
+            if res["OK"] and paramName == "Status" and str(transID) in self.__filterStatuses:
+                self.__filterStatuses[str(transID)] = paramValue
             if res["OK"]:
                 pv = self._escapeString(paramValue)
                 if not pv["OK"]:
@@ -1595,38 +1666,38 @@ class TransformationDB(DB):
         filesToAdd = []
         catalog = FileCatalog()
 
+        metadataDicts = {}
         for lfn in fileDicts:
-            gLogger.info("addFile: Attempting to add file %s" % lfn)
+            gLogger.verbose("addFile: Attempting to add file %s" % lfn)
             res = catalog.getFileUserMetadata(lfn)
             if not res["OK"]:
                 gLogger.error("Failed to getFileUserMetadata for file", "{}: {}".format(lfn, res["Message"]))
                 failed[lfn] = res["Message"]
                 continue
-            else:
-                metadatadict = res["Value"]
-            gLogger.info("Filter file with metadata", metadatadict)
-            transIDs = self._filterFileByMetadata(metadatadict)
-            gLogger.info("Transformations passing the filter: %s" % transIDs)
+            metadataDicts[lfn] = res["Value"]
+
+        # All the files are routed to the transformations in one pass
+        res = self._filterFilesByMetadata(metadataDicts)
+        if not res["OK"]:
+            return res
+        for lfn, transIDs in res["Value"].items():
+            gLogger.verbose("Transformations passing the filter", f"{lfn}: {transIDs}")
             if not (transIDs or force):  # not clear how force should be used for
                 successful[lfn] = False  # True -> False bug fix: otherwise it is set to True even if transIDs is empty.
             else:
                 filesToAdd.append(lfn)
                 for trans in transIDs:
-                    if trans not in transFiles:
-                        transFiles[trans] = []
-                    transFiles[trans].append(lfn)
+                    transFiles.setdefault(trans, []).append(lfn)
 
-            # Add the files to the transformations
-            gLogger.info("Files to add to transformations:", filesToAdd)
-            if filesToAdd:
-                for transID, lfns in transFiles.items():
-                    res = self.addFilesToTransformation(transID, lfns)
-                    if not res["OK"]:
-                        gLogger.error("Failed to add files to transformation", "{} {}".format(transID, res["Message"]))
-                        return res
-                    else:
-                        for lfn in lfns:
-                            successful[lfn] = True
+        # Add the files to the transformations
+        gLogger.info("Files to add to transformations:", len(filesToAdd))
+        for transID, lfns in transFiles.items():
+            res = self.addFilesToTransformation(transID, lfns)
+            if not res["OK"]:
+                gLogger.error("Failed to add files to transformation", "{} {}".format(transID, res["Message"]))
+                return res
+            for lfn in lfns:
+                successful[lfn] = True
 
         res = S_OK({"Successful": successful, "Failed": failed})
         return res
@@ -1729,7 +1800,10 @@ class TransformationDB(DB):
             metadatadict = res["Value"]
         metadatadict.update(usermetadatadict)
         gLogger.info("Filter file with metadata:", metadatadict)
-        transIDs = self._filterFileByMetadata(metadatadict)
+        res = self._filterFilesByMetadata({path: metadatadict})
+        if not res["OK"]:
+            return res
+        transIDs = res["Value"][path]
         gLogger.info("Transformations passing the filter: %s" % transIDs)
         if not transIDs:
             return S_OK()
@@ -1759,37 +1833,36 @@ class TransformationDB(DB):
 
     def _filterFileByMetadata(self, metadatadict):
         """Pass the input metadatadict through those currently active"""
-        transIDs = []
-        queries = self.filterQueries
+        res = self._filterFilesByMetadata({None: metadatadict})
+        if not res["OK"]:
+            gLogger.error("Failed to filter file by metadata", res["Message"])
+            return []
+        return res["Value"][None]
 
-        catalog = FileCatalog()
-        gLogger.info("Filter file by queries", queries)
-        res = catalog.getMetadataFields()
+    def _filterFilesByMetadata(self, metadataDicts):
+        """Pass the metadata of several files through the filter queries of the active transformations
+
+        Only the queries indexed on the values of the metadata of a file, or without equality terms,
+        are applied to it.
 
+        :param dict metadataDicts: {lfn: metadatadict}
+        :returns: S_OK({lfn: list of transIDs})
+        """
+        res = self.__getFilterIndex()
         if not res["OK"]:
-            gLogger.error("Error in getMetadataFields: %s" % res["Message"])
             return res
-        if not res["Value"]:
-            gLogger.error("Error: no metadata fields defined")
+        filterIndex = res["Value"]
+        res = self.__getFilterTransIDs()
+        if not res["OK"]:
             return res
-        typeDict = res["Value"]["FileMetaFields"]
-        typeDict.update(res["Value"]["DirectoryMetaFields"])
-
-        for transID, query in queries:
-            gLogger.info("Check the transformation status")
-            res = self.getTransformationParameters(transID, "Status")
-            if res["Value"] not in ["New", "Active", "Stopped", "Completing", "Flush"]:
-                continue
-            mq = MetaQuery(query, typeDict)
-            gLogger.info(f"Apply query {mq.getMetaQuery()} to metadata {metadatadict}")
-            res = mq.applyQuery(metadatadict)
-            if not res["OK"]:
-                gLogger.error("Error in applying query: %s" % res["Message"])
-                return res
-            elif res["Value"]:
-                gLogger.info("Apply query result is True")
-                transIDs.append(transID)
-            else:
-                gLogger.info("Apply query result is False")
+        activeTransIDs = res["Value"]
 
-        return transIDs
+        result = {}
+        with self.__filterLock:
+            for lfn, metadatadict in metadataDicts.items():
+                res = filterIndex.filter(metadatadict, activeTransIDs)
+                if not res["OK"]:
+                    gLogger.error("Error in applying query", res["Message"])
+                    return res
+                result[lfn] = res["Value"]
+        return S_OK(result)
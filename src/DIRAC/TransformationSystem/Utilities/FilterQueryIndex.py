@@ -0,0 +1,131 @@
+"""Index of the input meta queries of the transformations, used to route new files to the transformations
+
+Each query is indexed on one of its equality terms (``=`` or ``in`` on a metadata field), with the typed values
+of the term as keys. The metadata of a file then only selects the queries indexed on its values, plus the queries
+without any equality term, and the full query is applied only to these candidates.
+"""
+from collections import defaultdict
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery, getTypedValue
+
+
+def getEqualityValues(value):
+    """Values one of which a metadata field must be equal to for a query term to be satisfied
+
+    :param value: query term of a metadata field
+    :returns: list of values, or None if the term is not an equality
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        for operation in ("=", "in"):
+            if operation in value:
+                operand = value[operation]
+                return operand if isinstance(operand, list) else [operand]
+        return None
+    if str(value).lower() in ("missing", "any"):
+        return None
+    return [value]
+
+
+class FilterQueryIndex:
+    """Input meta queries of the transformations, indexed on their equality terms
+
+    :param dict typeDict: {metadata field: type} of the catalog
+    :param queries: iterable of (transID, queryDict)
+    """
+
+    def __init__(self, typeDict, queries=()):
+        self.typeDict = typeDict
+        # {field: {typed value: set of transIDs}}
+        self.__index = defaultdict(lambda: defaultdict(set))
+        # {transID: (field, typed values)} of the indexed queries
+        self.__indexKeys = {}
+        # transIDs of the queries which must be applied to every file
+        self.__unindexed = set()
+        self.__metaQueries = {}
+        for transID, query in queries:
+            self.add(transID, query)
+
+    def __len__(self):
+        return len(self.__metaQueries)
+
+    def add(self, transID, query):
+        """Add or replace the query of a transformation"""
+        self.remove(transID)
+        self.__metaQueries[transID] = MetaQuery(query, self.typeDict).compileQuery()
+        bestKey = None
+        for meta, value in query.items():
+            values = getEqualityValues(value)
+            if values is None or meta not in self.typeDict:
+                continue
+            try:
+                typedValues = {getTypedValue(val, self.typeDict[meta]) for val in values}
+            except (ValueError, TypeError):
+                # The query is invalid, let MetaQuery report it for every file
+                bestKey = None
+                break
+            # The fewer values, the fewer files the query is a candidate for
+            if bestKey is None or len(typedValues) < len(bestKey[1]):
+                bestKey = (meta, typedValues)
+        if bestKey is None:
+            self.__unindexed.add(transID)
+            return
+        meta, typedValues = bestKey
+        for typedValue in typedValues:
+            self.__index[meta][typedValue].add(transID)
+        self.__indexKeys[transID] = bestKey
+
+    def remove(self, transID):
+        """Remove the query of a transformation, if any"""
+        self.__metaQueries.pop(transID, None)
+        self.__unindexed.discard(transID)
+        meta, typedValues = self.__indexKeys.pop(transID, (None, ()))
+        for typedValue in typedValues:
+            transIDs = self.__index[meta][typedValue]
+            transIDs.discard(transID)
+            if not transIDs:
+                del self.__index[meta][typedValue]
+        if meta is not None and not self.__index[meta]:
+            del self.__index[meta]
+
+    def getCandidates(self, metadata):
+        """Transformations whose queries may be satisfied by the metadata of a file
+
+        :param dict metadata: {field: value} of a file
+        :returns: set of transIDs
+        """
+        candidates = set(self.__unindexed)
+        for meta, valueIndex in self.__index.items():
+            userValue = metadata.get(meta)
+            if userValue is None:
+                continue
+            try:
+                typedValue = getTypedValue(userValue, self.typeDict[meta])
+            except (ValueError, TypeError):
+                # Let MetaQuery report the illegal value
+                for transIDs in valueIndex.values():
+                    candidates.update(transIDs)
+                continue
+            candidates.update(valueIndex.get(typedValue, ()))
+        return candidates
+
+    def filter(self, metadata, transIDs=None):
+        """Transformations whose queries are satisfied by the metadata of a file
+
+        :param dict metadata: {field: value} of a file
+        :param transIDs: if given, only consider these transformations
+        :returns: S_OK(list of transIDs)
+        """
+        candidates = self.getCandidates(metadata)
+        if transIDs is not None:
+            candidates.intersection_update(transIDs)
+        selected = []
+        for transID in candidates:
+            res = self.__metaQueries[transID](metadata)
+            if not res["OK"]:
+                return res
+            if res["Value"]:
+                selected.append(transID)
+        return S_OK(selected)
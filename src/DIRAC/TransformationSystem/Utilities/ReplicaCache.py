@@ -0,0 +1,118 @@
+"""Replica cache of the TransformationAgent, shared by all the transformations
+
+The replicas are stored in a sqlite file, one row per LFN, with the time at which they were obtained
+and the IDs of their SEs, whose names are stored once in a separate table.
+The replicas eligible for jobs (without failover SEs) and all the replicas are cached separately.
+Entries are added, removed and expired individually, so the cache is never rewritten as a whole,
+and only the replicas looked up are loaded in memory.
+"""
+import sqlite3
+import threading
+import time
+
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+
+# Maximum number of variables in a sqlite statement is 999 in old versions
+CHUNK_SIZE = 900
+
+
+class ReplicaCache:
+    """Replicas of LFNs, with their update time
+
+    :param str fileName: path of the sqlite file
+    :param float validity: seconds after which the cached replicas expire
+    """
+
+    def __init__(self, fileName, validity):
+        self.fileName = fileName
+        self.validity = validity
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(fileName, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS SE (SEID INTEGER PRIMARY KEY, Name TEXT UNIQUE)")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS Replicas "
+            "(LFN TEXT, ForJobs INTEGER, UpdateTime REAL, SEIDs TEXT, PRIMARY KEY (LFN, ForJobs)) WITHOUT ROWID"
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS UpdateTime ON Replicas (UpdateTime)")
+        self.__seIDs = dict(self.__connection.execute("SELECT Name, SEID FROM SE"))
+        self.__seNames = {seID: name for name, seID in self.__seIDs.items()}
+
+    def close(self):
+        """Close the sqlite file"""
+        with self.__lock:
+            self.__connection.close()
+
+    def __getSEID(self, seName):
+        """ID of an SE, inserted if it is new. Must be called with the lock"""
+        if seName not in self.__seIDs:
+            seID = self.__connection.execute("INSERT INTO SE (Name) VALUES (?)", (seName,)).lastrowid
+            self.__seIDs[seName] = seID
+            self.__seNames[seID] = seName
+        return self.__seIDs[seName]
+
+    def getReplicas(self, lfns, forJobs=True):
+        """Get the cached replicas which are not expired
+
+        :param lfns: iterable of LFNs
+        :param bool forJobs: replicas eligible for jobs, or all the replicas
+
+        :returns: dict {lfn: [SE names]} of the LFNs found in the cache
+        """
+        replicas = {}
+        timeLimit = time.time() - self.validity
+        with self.__lock:
+            for chunk in breakListIntoChunks(list(lfns), CHUNK_SIZE):
+                rows = self.__connection.execute(
+                    "SELECT LFN, SEIDs FROM Replicas WHERE ForJobs = ? AND UpdateTime >= ? AND LFN IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    [int(forJobs), timeLimit] + chunk,
+                )
+                for lfn, seIDs in rows:
+                    replicas[lfn] = [self.__seNames[int(seID)] for seID in seIDs.split(",")]
+        return replicas
+
+    def addReplicas(self, replicas, forJobs=True):
+        """Add or replace replicas in the cache
+
+        :param dict replicas: {lfn: [SE names]}
+        :param bool forJobs: replicas eligible for jobs, or all the replicas
+        """
+        now = time.time()
+        with self.__lock, self.__connection:
+            rows = [
+                (lfn, int(forJobs), now, ",".join(str(self.__getSEID(se)) for se in ses))
+                for lfn, ses in replicas.items()
+                if ses
+            ]
+            self.__connection.executemany("INSERT OR REPLACE INTO Replicas VALUES (?, ?, ?, ?)", rows)
+
+    def removeReplicas(self, lfns):
+        """Remove LFNs from the cache
+
+        :param lfns: iterable of LFNs
+
+        :returns: number of replicas removed
+        """
+        removed = 0
+        with self.__lock, self.__connection:
+            for chunk in breakListIntoChunks(list(lfns), CHUNK_SIZE):
+                removed += self.__connection.execute(
+                    "DELETE FROM Replicas WHERE LFN IN (%s)" % ",".join("?" * len(chunk)), chunk
+                ).rowcount
+        return removed
+
+    def expire(self):
+        """Remove the expired replicas
+
+        :returns: number of replicas removed
+        """
+        with self.__lock, self.__connection:
+            return self.__connection.execute(
+                "DELETE FROM Replicas WHERE UpdateTime < ?", (time.time() - self.validity,)
+            ).rowcount
+
+    def __len__(self):
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM Replicas").fetchone()[0]
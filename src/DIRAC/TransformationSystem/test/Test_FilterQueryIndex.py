@@ -0,0 +1,70 @@
+""" Test the index of the transformation filter queries
+"""
+import pytest
+
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.FilterQueryIndex import FilterQueryIndex
+
+typeDict = {"Run": "INT", "Energy": "FLOAT", "Type": "VARCHAR(128)", "Version": "VARCHAR(128)"}
+
+queries = [
+    ("1", {"Run": 10, "Type": "RAW"}),
+    ("2", {"Run": [10, 11, 12]}),
+    ("3", {"Run": {">": 5, "<=": 11}}),
+    ("4", {"Type": {"in": ["RAW", "DST"]}, "Energy": {"!=": 6.5}}),
+    ("5", {"Type": {"nin": ["RAW"]}, "Version": "Missing"}),
+    ("6", {"Version": "Any", "Run": "11"}),
+]
+
+files = [
+    {"Run": 10, "Type": "RAW"},
+    {"Run": "11", "Type": "DST", "Energy": 6.5},
+    {"Run": 12, "Type": "SIM", "Version": "v1"},
+    {"Run": 3, "Type": "DST", "Energy": 7},
+    {"Type": "SIM"},
+    {},
+]
+
+
+def bruteForce(metadata, transIDs=None):
+    return {
+        transID
+        for transID, query in queries
+        if (transIDs is None or transID in transIDs) and MetaQuery(query, typeDict).applyQuery(metadata)["Value"]
+    }
+
+
+@pytest.mark.parametrize("metadata", files)
+def test_filter(metadata):
+    """The index selects the same transformations as applying every query"""
+    index = FilterQueryIndex(typeDict, queries)
+    res = index.filter(metadata)
+    assert res["OK"], res
+    assert set(res["Value"]) == bruteForce(metadata)
+    res = index.filter(metadata, {"1", "3", "5"})
+    assert res["OK"], res
+    assert set(res["Value"]) == bruteForce(metadata, {"1", "3", "5"})
+
+
+def test_candidates():
+    """Only the queries indexed on the values of the file, or without equality terms, are candidates"""
+    index = FilterQueryIndex(typeDict, queries)
+    assert index.getCandidates({"Run": 10, "Type": "RAW"}) == {"1", "2", "3", "4", "5"}
+    assert index.getCandidates({"Run": 13, "Type": "SIM"}) == {"3", "5"}
+
+
+def test_addRemove():
+    """Queries can be replaced and removed"""
+    index = FilterQueryIndex(typeDict, queries)
+    index.add("1", {"Run": 13})
+    assert index.filter({"Run": 13})["Value"] == ["1"]
+    index.remove("1")
+    index.remove("3")
+    assert index.getCandidates({"Run": 10, "Type": "RAW"}) == {"2", "4", "5"}
+    assert len(index) == len(queries) - 2
+
+
+def test_illegalValue():
+    """An illegal metadata value is reported"""
+    index = FilterQueryIndex(typeDict, queries)
+    assert not index.filter({"Run": "abc"})["OK"]
@@ -0,0 +1,57 @@
+"""Test the replica cache of the TransformationAgent"""
+import time
+
+import pytest
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
+
+
+@pytest.fixture
+def cacheFile(tmp_path):
+    return str(tmp_path / "ReplicaCache.sqlite")
+
+
+def test_replicas(cacheFile):
+    cache = ReplicaCache(cacheFile, 3600)
+    cache.addReplicas({"/a/1": ["SE-A", "SE-B"], "/a/2": ["SE-B"], "/a/3": []})
+    cache.addReplicas({"/a/1": ["SE-A", "SE-B", "Failover-SE"]}, forJobs=False)
+
+    assert cache.getReplicas(["/a/1", "/a/2", "/a/3", "/a/4"]) == {"/a/1": ["SE-A", "SE-B"], "/a/2": ["SE-B"]}
+    assert cache.getReplicas(["/a/1", "/a/2"], forJobs=False) == {"/a/1": ["SE-A", "SE-B", "Failover-SE"]}
+    assert len(cache) == 3
+
+    # Updated entries replace the former ones
+    cache.addReplicas({"/a/2": ["SE-C"]})
+    assert cache.getReplicas(["/a/2"]) == {"/a/2": ["SE-C"]}
+
+    assert cache.removeReplicas(["/a/1", "/a/4"]) == 2
+    assert cache.getReplicas(["/a/1"]) == {}
+    cache.close()
+
+    # The cache is kept in the file
+    cache = ReplicaCache(cacheFile, 3600)
+    assert cache.getReplicas(["/a/2"]) == {"/a/2": ["SE-C"]}
+    cache.addReplicas({"/a/5": ["SE-A", "SE-D"]})
+    assert cache.getReplicas(["/a/5"]) == {"/a/5": ["SE-A", "SE-D"]}
+    cache.close()
+
+
+def test_expiration(cacheFile):
+    cache = ReplicaCache(cacheFile, 0.5)
+    cache.addReplicas({"/a/1": ["SE-A"]})
+    time.sleep(0.6)
+    cache.addReplicas({"/a/2": ["SE-A"]})
+    # Expired entries are not returned, even before they are removed
+    assert cache.getReplicas(["/a/1", "/a/2"]) == {"/a/2": ["SE-A"]}
+    assert cache.expire() == 1
+    assert len(cache) == 1
+    cache.close()
+
+
+def test_manyLFNs(cacheFile):
+    cache = ReplicaCache(cacheFile, 3600)
+    replicas = {f"/a/{i}": [f"SE-{i % 3}"] for i in range(5000)}
+    cache.addReplicas(replicas)
+    assert cache.getReplicas(replicas) == replicas
+    assert cache.removeReplicas(list(replicas)[:2000]) == 2000
+    cache.close()
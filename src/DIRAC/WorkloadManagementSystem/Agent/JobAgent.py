@@ -27,6 +27,7 @@ from DIRAC.RequestManagementSystem.private.RequestValidator import RequestValida
 from DIRAC.WorkloadManagementSystem.Client.MatcherClient import MatcherClient
 from DIRAC.WorkloadManagementSystem.Client.PilotManagerClient import PilotManagerClient
 from DIRAC.WorkloadManagementSystem.Client.JobManagerClient import JobManagerClient
+from DIRAC.WorkloadManagementSystem.Client.JobMonitoringClient import JobMonitoringClient
 from DIRAC.WorkloadManagementSystem.Client.JobStateUpdateClient import JobStateUpdateClient
 from DIRAC.WorkloadManagementSystem.Client.JobReport import JobReport
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
@@ -63,6 +64,9 @@ class JobAgent(AgentModule):
         self.minimumTimeLeft = 5000
         self.stopOnApplicationFailure = True
         self.stopAfterFailedMatches = 10
+        # Number of jobs requested at once to the Matcher, the extra ones are kept for the next cycles
+        self.jobsPerMatch = 1
+        self.matchedJobs = []
         self.jobCount = 0
         self.matchFailedCount = 0
         self.extraOptions = ""
@@ -111,6 +115,7 @@ class JobAgent(AgentModule):
         self.minimumTimeLeft = self.am_getOption("MinimumTimeLeft", self.minimumTimeLeft)
         self.stopOnApplicationFailure = self.am_getOption("StopOnApplicationFailure", self.stopOnApplicationFailure)
         self.stopAfterFailedMatches = self.am_getOption("StopAfterFailedMatches", self.stopAfterFailedMatches)
+        self.jobsPerMatch = self.am_getOption("JobsPerMatch", self.jobsPerMatch)
         self.extraOptions = gConfig.getValue("/AgentJobRequirements/ExtraOptions", self.extraOptions)
         # Utilities
         self.timeLeftUtil = TimeLeft()
@@ -147,6 +152,7 @@ class JobAgent(AgentModule):
         if not result["OK"]:
             return self._finish(result["Message"])
         if result["OK"] and result["Value"]:
+            self._releaseMatchedJobs("No slot left in the JobAgent")
             return result
 
         # Check that we are allowed to continue and that time left is sufficient
@@ -162,6 +168,7 @@ class JobAgent(AgentModule):
         # Get environment details and enhance them
         result = self._getCEDict(self.computingElement)
         if not result["OK"]:
+            self._releaseMatchedJobs("Could not get the CE description")
             return result
         ceDictList = result["Value"]
 
@@ -527,22 +534,115 @@ class JobAgent(AgentModule):
 
     #############################################################################
     def _matchAJob(self, ceDictList):
-        """Call the Matcher with each ceDict until we get a job"""
+        """Call the Matcher with each ceDict until we get a job
+
+        If JobsPerMatch is greater than 1, several jobs are requested at once:
+        the first one is returned, the others are returned by the next calls, without calling the Matcher,
+        as long as they still fit one of the CE descriptions.
+        """
+        matcherInfo = self._getMatchedJob(ceDictList)
+        if matcherInfo:
+            self.log.verbose("Using a job already matched", matcherInfo["JobID"])
+            return S_OK(matcherInfo)
+
         jobRequest = S_ERROR("No CE Dictionary available")
         for ceDict in ceDictList:
             self.log.verbose("CE dict", ceDict)
 
             start = time.time()
-            jobRequest = MatcherClient().requestJob(ceDict)
+            if self.jobsPerMatch > 1:
+                jobRequest = MatcherClient().requestJobs(ceDict, self.jobsPerMatch)
+            else:
+                jobRequest = MatcherClient().requestJob(ceDict)
             matchTime = time.time() - start
 
             self.log.info("MatcherTime", "= %.2f (s)" % (matchTime))
             if jobRequest["OK"]:
-                jobRequest["Value"]["matchTime"] = matchTime
-                jobRequest["Value"]["CEDict"] = ceDict
+                matchedJobs = jobRequest["Value"] if isinstance(jobRequest["Value"], list) else [jobRequest["Value"]]
+                if not matchedJobs:
+                    jobRequest = S_ERROR("No match found")
+                    continue
+                for matcherInfo in matchedJobs:
+                    matcherInfo["matchTime"] = matchTime
+                    matcherInfo["CEDict"] = ceDict
+                jobRequest = S_OK(matchedJobs[0])
+                self.matchedJobs = matchedJobs[1:]
                 break
         return jobRequest
 
+    def _getMatchedJob(self, ceDictList):
+        """Get a job matched in advance which still fits one of the current CE descriptions
+
+        The jobs matched in advance which do not fit anymore, e.g. because of the CPU work left, are rescheduled.
+
+        :param list ceDictList: current CE descriptions
+        :return: the matcher information of the job, with the CE description it fits, or None
+        """
+        self._dropJobsNotMatched()
+        while self.matchedJobs:
+            matcherInfo = self.matchedJobs.pop(0)
+            for ceDict in ceDictList:
+                if self._fitsCEDict(matcherInfo, ceDict):
+                    matcherInfo["CEDict"] = ceDict
+                    return matcherInfo
+            self.log.info(
+                "Releasing job matched in advance", f"{matcherInfo['JobID']}: does not fit the resource anymore"
+            )
+            self._rescheduleFailedJob(matcherInfo["JobID"], "Job does not fit the resource anymore", direct=True)
+        return None
+
+    def _fitsCEDict(self, matcherInfo, ceDict):
+        """Check that the CPU time and number of processors required by a job fit a CE description
+
+        :param dict matcherInfo: matcher information of the job
+        :param dict ceDict: CE description
+        :return: bool
+        """
+        result = self._getJDLParameters(matcherInfo.get("JDL", ""))
+        if not result["OK"]:
+            # The job is failed when it is processed
+            return True
+        params = result["Value"]
+
+        cpuTime = int(params.get("CPUTime", 0))
+        if "CPUTime" in ceDict and cpuTime > int(ceDict["CPUTime"]):
+            return False
+        processors = int(params.get("NumberOfProcessors", int(params.get("MinNumberOfProcessors", 1))))
+        if ceDict.get("NumberOfProcessors") and processors > int(ceDict["NumberOfProcessors"]):
+            return False
+        return True
+
+    def _dropJobsNotMatched(self):
+        """Forget the jobs matched in advance which are not in Matched status anymore
+
+        They were taken back from the agent, for instance rescheduled by the StalledJobAgent,
+        and must not be run. If their status can not be checked, they are all forgotten:
+        the StalledJobAgent reschedules them.
+        """
+        if not self.matchedJobs:
+            return
+        result = JobMonitoringClient().getJobsStatus([int(matcherInfo["JobID"]) for matcherInfo in self.matchedJobs])
+        if not result["OK"]:
+            self.log.warn("Could not check the status of the jobs matched in advance", result["Message"])
+            self.matchedJobs = []
+            return
+        jobsStatus = result["Value"]
+        stillMatched = []
+        for matcherInfo in self.matchedJobs:
+            if jobsStatus.get(int(matcherInfo["JobID"]), {}).get("Status") == JobStatus.MATCHED:
+                stillMatched.append(matcherInfo)
+            else:
+                self.log.info("Job matched in advance was taken back", matcherInfo["JobID"])
+        self.matchedJobs = stillMatched
+
+    def _releaseMatchedJobs(self, message):
+        """Reschedule the jobs matched in advance that will not be run by the agent"""
+        self._dropJobsNotMatched()
+        while self.matchedJobs:
+            jobID = self.matchedJobs.pop(0)["JobID"]
+            self.log.info("Releasing job matched in advance", f"{jobID}: {message}")
+            self._rescheduleFailedJob(jobID, message, direct=True)
+
     def _checkMatchingIssues(self, jobRequest):
         """Check the source of the matching issue
 
@@ -741,6 +841,7 @@ class JobAgent(AgentModule):
         """Force the JobAgent to complete gracefully."""
         if stop:
             self.log.info("JobAgent will stop", 'with message "%s", execution complete.' % message)
+            self._releaseMatchedJobs("Job not started by the JobAgent")
             self.am_stopExecution()
             return S_ERROR(message)
 
@@ -806,6 +907,8 @@ class JobAgent(AgentModule):
     def finalize(self):
         """Job Agent finalization method"""
 
+        self._releaseMatchedJobs("Job not started by the JobAgent")
+
         # wait for all jobs to be completed
         res = self.computingElement.shutdown()
         if not res["OK"]:
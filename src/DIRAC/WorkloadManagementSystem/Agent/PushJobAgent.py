@@ -293,6 +293,7 @@ class PushJobAgent(JobAgent):
                     # Check that there is enough slots locally
                     result = self._checkCEAvailability(self.computingElement)
                     if not result["OK"] or result["Value"]:
+                        self._releaseMatchedJobs("No slot left in the PushJobAgent")
                         return result
 
                     # Check that there is enough slots in the remote CE to match a new job
@@ -309,6 +310,9 @@ class PushJobAgent(JobAgent):
                     self.failedQueues[queueName] += 1
                     break
 
+            # The jobs matched in advance for this queue can not be submitted to another one
+            self._releaseMatchedJobs("Job not submitted by the PushJobAgent")
+
             if not jobRequest["OK"]:
                 self._checkMatchingIssues(jobRequest)
                 self.failedQueues[queueName] += 1
@@ -7,7 +7,7 @@ from DIRAC.WorkloadManagementSystem.Agent.JobAgent import JobAgent
 from DIRAC.WorkloadManagementSystem.Client.JobReport import JobReport
 from DIRAC.Resources.Computing.ComputingElementFactory import ComputingElementFactory
 from DIRAC.Resources.Computing.BatchSystems.TimeLeft.TimeLeft import TimeLeft
-from DIRAC import gLogger, S_ERROR
+from DIRAC import gLogger, S_ERROR, S_OK
 
 gLogger.setLevel("DEBUG")
 
@@ -410,6 +410,82 @@ def test__getJDLParameters(mocker):
     assert result["Value"]["Tags"] == ["16Processors", "MultiProcessor"]
 
 
+@pytest.mark.parametrize("jobsPerMatch", [1, 3])
+def test__matchAJob(mocker, jobsPerMatch):
+    """Testing JobAgent()._matchAJob(): the jobs matched in advance are used first"""
+    mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobAgent.AgentModule.__init__")
+    matcherClient = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobAgent.MatcherClient")
+    matcherClient.return_value.requestJob.return_value = S_OK({"JobID": 1})
+    matcherClient.return_value.requestJobs.return_value = S_OK([{"JobID": 1}, {"JobID": 2}, {"JobID": 3}])
+    jobMonitoringClient = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobAgent.JobMonitoringClient")
+    jobMonitoringClient.return_value.getJobsStatus.side_effect = lambda jobIDs: S_OK(
+        {jobID: {"Status": "Matched"} for jobID in jobIDs}
+    )
+    mocker.patch.object(JobAgent, "_rescheduleFailedJob")
+
+    jobAgent = JobAgent("Test", "Test1")
+    jobAgent.log = gLogger
+    jobAgent.jobsPerMatch = jobsPerMatch
+    ceDictList = [{"Site": "Test"}]
+
+    jobIDs = []
+    for _ in range(3):
+        result = jobAgent._matchAJob(ceDictList)
+        assert result["OK"]
+        assert result["Value"]["CEDict"] == ceDictList[0]
+        jobIDs.append(result["Value"]["JobID"])
+
+    if jobsPerMatch == 1:
+        assert jobIDs == [1, 1, 1]
+        assert matcherClient.return_value.requestJob.call_count == 3
+    else:
+        assert jobIDs == [1, 2, 3]
+        matcherClient.return_value.requestJobs.assert_called_once_with(ceDictList[0], 3)
+
+    # The jobs matched in advance and not used are rescheduled
+    jobAgent._matchAJob(ceDictList)
+    jobAgent._releaseMatchedJobs("Test")
+    assert not jobAgent.matchedJobs
+    assert jobAgent._rescheduleFailedJob.call_count == jobsPerMatch - 1
+
+
+def test__getMatchedJob(mocker):
+    """Testing JobAgent()._getMatchedJob(): the jobs matched in advance are checked before being used"""
+    mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobAgent.AgentModule.__init__")
+    jobMonitoringClient = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobAgent.JobMonitoringClient")
+    jobMonitoringClient.return_value.getJobsStatus.return_value = S_OK(
+        {2: {"Status": "Matched"}, 3: {"Status": "Matched"}, 4: {"Status": "Rescheduled"}, 5: {"Status": "Matched"}}
+    )
+    mocker.patch.object(JobAgent, "_rescheduleFailedJob")
+
+    jobAgent = JobAgent("Test", "Test1")
+    jobAgent.log = gLogger
+    jobAgent.matchedJobs = [
+        # Taken back by the StalledJobAgent: not used, nor rescheduled
+        {"JobID": 4, "JDL": "[JobID = 4; CPUTime = 100;]"},
+        # Requires more CPU work than left: rescheduled
+        {"JobID": 3, "JDL": "[JobID = 3; CPUTime = 100000;]"},
+        {"JobID": 2, "JDL": "[JobID = 2; CPUTime = 100;]"},
+        {"JobID": 5, "JDL": "[JobID = 5; CPUTime = 100; NumberOfProcessors = 8;]"},
+    ]
+    ceDictList = [{"CPUTime": 1000, "NumberOfProcessors": 4}]
+
+    matcherInfo = jobAgent._getMatchedJob(ceDictList)
+    assert matcherInfo["JobID"] == 2
+    assert matcherInfo["CEDict"] == ceDictList[0]
+    jobAgent._rescheduleFailedJob.assert_called_once_with(3, "Job does not fit the resource anymore", direct=True)
+
+    # Requires more processors than available
+    assert jobAgent._getMatchedJob(ceDictList) is None
+    assert jobAgent._rescheduleFailedJob.call_count == 2
+
+    # The jobs whose status can not be checked are not used
+    jobAgent.matchedJobs = [{"JobID": 2, "JDL": "[JobID = 2; CPUTime = 100;]"}]
+    jobMonitoringClient.return_value.getJobsStatus.return_value = S_ERROR("Service down")
+    assert jobAgent._getMatchedJob(ceDictList) is None
+    assert jobAgent._rescheduleFailedJob.call_count == 2
+
+
 @pytest.mark.parametrize(
     "mockJMInput, expected",
     [
@@ -9,7 +9,7 @@ from DIRAC.Core.Utilities.DictCache import DictCache
 from DIRAC.Core.Utilities.DErrno import cmpError, ESECTION
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
-from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.private.RunningJobCounters import gRunningJobCounters, countedStatuses
 
 
 class Limiter:
@@ -178,14 +178,14 @@ class Limiter:
             if attName not in self.jobDB.jobAttributeNames:
                 self.log.error("Attribute does not exist", "(%s). Check the job limits" % attName)
                 continue
-            cK = f"Running:{siteName}:{attName}"
-            data = self.condCache.get(cK)
-            if not data:
-                result = self.jobDB.getCounters(
-                    "Jobs",
-                    [attName],
-                    {"Site": siteName, "Status": [JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED]},
-                )
+            data = None
+            if self.__opsHelper.getValue("JobScheduling/UseRunningCounters", False):
+                data = self.__getRunningCounters(siteName, attName)
+            if data is None:
+                cK = f"Running:{siteName}:{attName}"
+                data = self.condCache.get(cK)
+            if data is None:
+                result = self.jobDB.getCounters("Jobs", [attName], {"Site": siteName, "Status": list(countedStatuses)})
                 if not result["OK"]:
                     return result
                 data = result["Value"]
@@ -205,7 +205,81 @@ class Limiter:
         # negCond is something like : {'JobType': ['Merge']}
         return S_OK(negCond)
 
+    def __getRunningCounters(self, siteName, attName):
+        """Get the number of running jobs from the in-memory counters, reconciling them with the JobDB if needed
+
+        :return: dict attribute value -> number of jobs, None if not available from the counters
+        """
+        lifeTime = self.__opsHelper.getValue("JobScheduling/RunningCountersLifeTime", 60)
+        if gRunningJobCounters.isStale(lifeTime):
+            with gRunningJobCounters.loadLock:
+                # Another thread may have done it in the meantime
+                if gRunningJobCounters.isStale(lifeTime):
+                    result = self.__loadRunningCounters()
+                    if not result["OK"]:
+                        self.log.error("Failed to load the running job counters", result["Message"])
+                        return None
+        return gRunningJobCounters.getCounters(siteName, attName)
+
+    def __loadRunningCounters(self):
+        """Seed the running job counters with one query grouped by site and all the limited attributes"""
+        result = self.__opsHelper.getSections(self.__runningLimitSection)
+        if not result["OK"]:
+            if not cmpError(result, ESECTION):
+                return result
+            result["Value"] = []
+        siteAttributes = {}
+        for siteName in result["Value"]:
+            csSections = [f"{self.__runningLimitSection}/{siteName}"]
+            result = self.__opsHelper.getSections(f"{self.__runningLimitSection}/{siteName}/CEs")
+            if result["OK"]:
+                csSections += [f"{self.__runningLimitSection}/{siteName}/CEs/{gridCE}" for gridCE in result["Value"]]
+            attNames = set()
+            for csSection in csSections:
+                result = self.__extractCSData(csSection)
+                if not result["OK"]:
+                    return result
+                attNames.update(attName for attName in result["Value"] if attName in self.jobDB.jobAttributeNames)
+            if attNames:
+                siteAttributes[siteName] = sorted(attNames)
+
+        counters = []
+        if siteAttributes:
+            attNames = sorted({attName for attNames in siteAttributes.values() for attName in attNames} - {"Site"})
+            result = self.jobDB.getCounters(
+                "Jobs", ["Site"] + attNames, {"Site": list(siteAttributes), "Status": list(countedStatuses)}
+            )
+            if not result["OK"]:
+                return result
+            counters = result["Value"]
+        gRunningJobCounters.load(siteAttributes, counters)
+        self.log.verbose("Running job counters loaded", f"for {len(siteAttributes)} sites")
+        return S_OK()
+
+    def updateRunningCounters(self, siteName, jid):
+        """Count the jobs matched at a site in the running job counters
+
+        :param str siteName: site name
+        :param jid: job ID, or list of job IDs matched at the site
+        """
+        if not self.__opsHelper.getValue("JobScheduling/UseRunningCounters", False):
+            return S_OK()
+        attNames = gRunningJobCounters.getAttributes(siteName)
+        if not attNames:
+            return S_OK()
+        result = self.jobDB.getJobsAttributes(jid if isinstance(jid, list) else [jid], attNames)
+        if not result["OK"]:
+            self.log.error("Error while retrieving attributes", result["Message"])
+            return result
+        gRunningJobCounters.jobsMatched(siteName, result["Value"].values())
+        return S_OK()
+
     def updateDelayCounters(self, siteName, jid):
+        """Start the matching delays triggered by the jobs matched at a site
+
+        :param str siteName: site name
+        :param jid: job ID, or list of job IDs matched at the site
+        """
         # Get the info from the CS
         siteSection = f"{self.__matchingDelaySection}/{siteName}"
         result = self.__extractCSData(siteSection)
@@ -221,24 +295,24 @@ class Limiter:
                 self.log.error("Attribute does not exist in the JobDB. Please fix it!", "(%s)" % attName)
             else:
                 attNames.append(attName)
-        result = self.jobDB.getJobAttributes(jid, attNames)
+        result = self.jobDB.getJobsAttributes(jid if isinstance(jid, list) else [jid], attNames)
         if not result["OK"]:
             self.log.error(
                 "Error while retrieving attributes", "coming from {}: {}".format(siteSection, result["Message"])
             )
             return result
-        atts = result["Value"]
         # Create the DictCache if not there
         if siteName not in self.delayMem:
             self.delayMem[siteName] = DictCache()
         # Update the counters
         delayCounter = self.delayMem[siteName]
-        for attName in atts:
-            attValue = atts[attName]
-            if attValue in delayDict[attName]:
-                delayTime = delayDict[attName][attValue]
-                self.log.notice(f"Adding delay for {siteName}/{attName}={attValue} of {delayTime} secs")
-                delayCounter.add((attName, attValue), delayTime)
+        for atts in result["Value"].values():
+            for attName in atts:
+                attValue = atts[attName]
+                if attValue in delayDict[attName]:
+                    delayTime = delayDict[attName][attValue]
+                    self.log.notice(f"Adding delay for {siteName}/{attName}={attValue} of {delayTime} secs")
+                    delayCounter.add((attName, attValue), delayTime)
         return S_OK()
 
     def __getDelayCondition(self, siteName):
@@ -70,21 +70,7 @@ class Matcher:
         startTime = time.time()
 
         resourceDict = self._getResourceDict(resourceDescription, credDict)
-
-        # Make a nice print of the resource matching parameters
-        toPrintDict = dict(resourceDict)
-        if "MaxRAM" in resourceDescription:
-            toPrintDict["MaxRAM"] = resourceDescription["MaxRAM"]
-        if "NumberOfProcessors" in resourceDescription:
-            toPrintDict["NumberOfProcessors"] = resourceDescription["NumberOfProcessors"]
-        toPrintDict["Tag"] = []
-        if "Tag" in resourceDict:
-            for tag in resourceDict["Tag"]:
-                if not tag.endswith("GB") and not tag.endswith("Processors"):
-                    toPrintDict["Tag"].append(tag)
-        if not toPrintDict["Tag"]:
-            toPrintDict.pop("Tag")
-        self.log.info("Resource description for matching", printDict(toPrintDict))
+        self._printResourceDict(resourceDescription, resourceDict)
 
         negativeCond = self.limiter.getNegativeCondForSite(resourceDict["Site"], resourceDict.get("GridCE"))
         result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
@@ -133,6 +119,8 @@ class Matcher:
         if not resAtt["Value"]:
             raise RuntimeError("No attributes returned for job")
 
+        if self.opsHelper.getValue("JobScheduling/CheckJobLimits", True):
+            self.limiter.updateRunningCounters(resourceDict["Site"], jobID)
         if self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
             self.limiter.updateDelayCounters(resourceDict["Site"], jobID)
 
@@ -147,6 +135,104 @@ class Matcher:
 
         return resultDict
 
+    def selectJobs(self, resourceDescription, credDict, numJobs):
+        """Bulk version of selectJob: find up to numJobs jobs matching the resource capacity
+
+        The jobs are taken out of the task queues in one go, and their attributes, JDLs and
+        optimizer parameters are retrieved, and their status updated, with one query for all of them.
+
+        :return: list of dictionaries, as returned by selectJob
+        """
+
+        startTime = time.time()
+
+        resourceDict = self._getResourceDict(resourceDescription, credDict)
+        self._printResourceDict(resourceDescription, resourceDict)
+
+        negativeCond = self.limiter.getNegativeCondForSite(resourceDict["Site"], resourceDict.get("GridCE"))
+        result = self.tqDB.matchAndGetJobs(resourceDict, numJobs, negativeCond=negativeCond)
+
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+        result = result["Value"]
+        if not result["matchFound"]:
+            self.log.info("No match found")
+            return []
+
+        matchedJobIDs = [jobID for jobID, _tqID in result["jobs"]]
+        resAtt = self.jobDB.getJobsAttributes(matchedJobIDs, ["OwnerDN", "OwnerGroup", "Status"])
+        if not resAtt["OK"]:
+            raise RuntimeError("Could not retrieve job attributes")
+        jobsAttributes = resAtt["Value"]
+
+        jobIDs = []
+        for jobID in matchedJobIDs:
+            if not jobsAttributes.get(jobID):
+                self.log.error("No attributes returned for job", str(jobID))
+            elif not jobsAttributes[jobID]["Status"] == "Waiting":
+                self.log.error("Job matched by the TQ is not in Waiting state", str(jobID))
+            else:
+                jobIDs.append(jobID)
+        if not jobIDs:
+            raise RuntimeError("Jobs %s are not in Waiting state" % ",".join(str(jobID) for jobID in matchedJobIDs))
+
+        result = self.jobDB.getJobsJDL(jobIDs)
+        if not result["OK"]:
+            raise RuntimeError("Failed to get the job JDL")
+        jdls = result["Value"]
+        # The jobs without JDL can not be run, they are not served
+        for jobID in [jobID for jobID in jobIDs if not jdls.get(jobID)]:
+            self.log.error("No JDL for matched job", str(jobID))
+            jobIDs.remove(jobID)
+        if not jobIDs:
+            raise RuntimeError("No JDL for jobs %s" % ",".join(str(jobID) for jobID in matchedJobIDs))
+
+        self._reportStatus(resourceDict, jobIDs)
+
+        matchTime = time.time() - startTime
+        self.log.verbose("Match time", "[%s] for %d jobs" % (str(matchTime), len(jobIDs)))
+
+        # Get some extra stuff into the response returned
+        resOpt = self.jobDB.getJobsOptParameters(jobIDs)
+        optParameters = resOpt["Value"] if resOpt["OK"] else {}
+
+        if self.opsHelper.getValue("JobScheduling/CheckJobLimits", True):
+            self.limiter.updateRunningCounters(resourceDict["Site"], jobIDs)
+        if self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
+            self.limiter.updateDelayCounters(resourceDict["Site"], jobIDs)
+
+        pilotInfoReportedFlag = resourceDict.get("PilotInfoReportedFlag", False)
+        if not pilotInfoReportedFlag:
+            self._updatePilotInfo(resourceDict)
+        self._updatePilotJobMapping(resourceDict, jobIDs)
+
+        resultList = []
+        for jobID in jobIDs:
+            resultDict = {"JDL": jdls[jobID], "JobID": jobID}
+            resultDict.update(optParameters.get(jobID, {}))
+            resultDict["DN"] = jobsAttributes[jobID]["OwnerDN"]
+            resultDict["Group"] = jobsAttributes[jobID]["OwnerGroup"]
+            resultDict["PilotInfoReportedFlag"] = True
+            resultList.append(resultDict)
+
+        return resultList
+
+    def _printResourceDict(self, resourceDescription, resourceDict):
+        """Make a nice print of the resource matching parameters"""
+        toPrintDict = dict(resourceDict)
+        if "MaxRAM" in resourceDescription:
+            toPrintDict["MaxRAM"] = resourceDescription["MaxRAM"]
+        if "NumberOfProcessors" in resourceDescription:
+            toPrintDict["NumberOfProcessors"] = resourceDescription["NumberOfProcessors"]
+        toPrintDict["Tag"] = []
+        if "Tag" in resourceDict:
+            for tag in resourceDict["Tag"]:
+                if not tag.endswith("GB") and not tag.endswith("Processors"):
+                    toPrintDict["Tag"].append(tag)
+        if not toPrintDict["Tag"]:
+            toPrintDict.pop("Tag")
+        self.log.info("Resource description for matching", printDict(toPrintDict))
+
     def _getResourceDict(self, resourceDescription, credDict):
         """from resourceDescription to resourceDict (just various mods)"""
         resourceDict = self._processResourceDescription(resourceDescription)
@@ -243,9 +329,11 @@ class Matcher:
         return resourceDict
 
     def _reportStatus(self, resourceDict, jobID):
-        """Reports the status of the matched job in jobDB and jobLoggingDB
+        """Reports the status of the matched job(s) in jobDB and jobLoggingDB
 
         Do not fail if errors happen here
+
+        :param jobID: job ID, or list of job IDs
         """
         attNames = ["Status", "MinorStatus", "ApplicationStatus", "Site"]
         attValues = ["Matched", "Assigned", "Unknown", resourceDict["Site"]]
@@ -307,10 +395,14 @@ class Matcher:
                 )
 
     def _updatePilotJobMapping(self, resourceDict, jobID):
-        """Update pilot to job mapping information"""
+        """Update pilot to job mapping information
+
+        :param jobID: job ID, or list of job IDs, the last one being the current job of the pilot
+        """
         pilotReference = resourceDict.get("PilotReference", "")
         if pilotReference and pilotReference != "Unknown":
-            result = self.pilotAgentsDB.setCurrentJobID(pilotReference, jobID)
+            currentJobID = jobID[-1] if isinstance(jobID, list) else jobID
+            result = self.pilotAgentsDB.setCurrentJobID(pilotReference, currentJobID)
             if not result["OK"]:
                 self.log.error(
                     "Problem updating pilot information",
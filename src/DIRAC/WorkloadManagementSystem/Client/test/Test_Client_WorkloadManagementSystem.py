@@ -13,6 +13,7 @@ from DIRAC import gLogger
 gLogger.setLevel("DEBUG")
 
 # sut
+from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
 from DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient import SandboxStoreClient
 
@@ -81,6 +82,110 @@ def test__processResourceDescription(setUp):
     assert res == resExpected
 
 
+def test_selectJobs(mocker, setUp):
+    """The jobs are matched, described and reported with bulk calls, the ones without JDL are not served"""
+    resourceDict = {"Site": "DIRAC.Jenkins.ch", "CPUTime": 1080000, "PilotReference": "somePilotReference"}
+    mocker.patch.object(matcher, "_getResourceDict", return_value=resourceDict)
+    mocker.patch.object(matcher.limiter, "getNegativeCondForSite", return_value={})
+    mocker.patch.object(matcher.limiter, "updateDelayCounters")
+    mocker.patch.object(matcher.limiter, "updateRunningCounters")
+    tqDBMock.matchAndGetJobs.return_value = {
+        "OK": True,
+        "Value": {"matchFound": True, "jobs": [(1, 10), (2, 10), (3, 11), (4, 11)], "tqMatch": resourceDict},
+    }
+    jobDBMock.getJobsAttributes.return_value = {
+        "OK": True,
+        "Value": {
+            1: {"OwnerDN": "/DN/1", "OwnerGroup": "group", "Status": "Waiting"},
+            2: {"OwnerDN": "/DN/2", "OwnerGroup": "group", "Status": "Killed"},
+            3: {"OwnerDN": "/DN/3", "OwnerGroup": "group", "Status": "Waiting"},
+            4: {"OwnerDN": "/DN/4", "OwnerGroup": "group", "Status": "Waiting"},
+        },
+    }
+    jobDBMock.getJobsJDL.return_value = {"OK": True, "Value": {1: "[JDL1]", 3: "[JDL3]"}}
+    jobDBMock.getJobsOptParameters.return_value = {"OK": True, "Value": {1: {"Opt": "1"}, 3: {}}}
+
+    res = matcher.selectJobs({}, {}, 3)
+
+    assert [job["JobID"] for job in res] == [1, 3]
+    assert res[0] == {
+        "JDL": "[JDL1]",
+        "JobID": 1,
+        "Opt": "1",
+        "DN": "/DN/1",
+        "Group": "group",
+        "PilotInfoReportedFlag": True,
+    }
+    assert res[1]["DN"] == "/DN/3"
+    tqDBMock.matchAndGetJobs.assert_called_once_with(resourceDict, 3, negativeCond={})
+    jobDBMock.setJobAttributes.assert_called_once_with(
+        [1, 3],
+        ["Status", "MinorStatus", "ApplicationStatus", "Site"],
+        ["Matched", "Assigned", "Unknown", "DIRAC.Jenkins.ch"],
+    )
+    assert jlDBMock.addLoggingRecord.call_args[0][0] == [1, 3]
+    pilotAgentsDBMock.setCurrentJobID.assert_called_with("somePilotReference", 3)
+    pilotAgentsDBMock.setJobForPilot.assert_called_with([1, 3], "somePilotReference", updateStatus=False)
+
+
+def test_selectJobs_noMatch(mocker, setUp):
+    mocker.patch.object(matcher, "_getResourceDict", return_value={"Site": "DIRAC.Jenkins.ch"})
+    mocker.patch.object(matcher.limiter, "getNegativeCondForSite", return_value={})
+    tqDBMock.matchAndGetJobs.return_value = {"OK": True, "Value": {"matchFound": False, "jobs": [], "tqMatch": {}}}
+
+    assert matcher.selectJobs({}, {}, 3) == []
+
+
+def test_limiterRunningCounters(mocker):
+    """With UseRunningCounters, the running limits are checked against in-memory counters"""
+    from DIRAC.WorkloadManagementSystem.private.RunningJobCounters import RunningJobCounters
+
+    counters = RunningJobCounters()
+    mocker.patch("DIRAC.WorkloadManagementSystem.Client.Limiter.gRunningJobCounters", counters)
+    mocker.patch("DIRAC.WorkloadManagementSystem.DB.JobDB.gRunningJobCounters", counters)
+    opsHelper = MagicMock()
+    opsHelper.getValue.side_effect = lambda option, default: {
+        "JobScheduling/CheckMatchingDelay": False,
+        "JobScheduling/UseRunningCounters": True,
+    }.get(option, default)
+    sections = {
+        "JobScheduling/RunningLimit": ["Site.Counted.ch"],
+        "JobScheduling/RunningLimit/Site.Counted.ch": ["JobType"],
+    }
+    opsHelper.getSections.side_effect = lambda section: (
+        {"OK": True, "Value": sections[section]} if section in sections else {"OK": False, "Message": "No section"}
+    )
+    opsHelper.getOptionsDict.return_value = {"OK": True, "Value": {"User": "2", "MCSimulation": "3"}}
+    jobDB = MagicMock()
+    jobDB.jobAttributeNames = ["JobID", "Site", "JobType", "Status"]
+    jobDB.getCounters.return_value = {
+        "OK": True,
+        "Value": [
+            ({"Site": "Site.Counted.ch", "JobType": "User"}, 1),
+            ({"Site": "Site.Counted.ch", "JobType": "MC"}, 5),
+        ],
+    }
+    limiter = Limiter(jobDB=jobDB, opsHelper=opsHelper)
+
+    # Seeded with one grouped query
+    assert limiter.getNegativeCondForSite("Site.Counted.ch") == {}
+    jobDB.getCounters.assert_called_once_with(
+        "Jobs", ["Site", "JobType"], {"Site": ["Site.Counted.ch"], "Status": ["Running", "Matched", "Stalled"]}
+    )
+    assert counters.attributes == ["JobType"]
+
+    # Matched jobs are counted without querying the counters again
+    jobDB.getJobsAttributes.return_value = {"OK": True, "Value": {10: {"JobType": "User"}}}
+    assert limiter.updateRunningCounters("Site.Counted.ch", 10)["OK"]
+    assert limiter.getNegativeCondForSite("Site.Counted.ch") == {"JobType": ["User"]}
+    assert jobDB.getCounters.call_count == 1
+
+    # Jobs leaving the running statuses are discounted
+    counters.jobsStatusChanged({10: {"Status": "Running", "Site": "Site.Counted.ch", "JobType": "User"}}, {10: "Done"})
+    assert limiter.getNegativeCondForSite("Site.Counted.ch") == {}
+    assert jobDB.getCounters.call_count == 1
+
+
 def test_uploadFilesAsSandbox(mocker, setUp):
 
     mocker.patch("DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient.TransferClient", return_value=MagicMock())
@@ -25,6 +25,7 @@
     The following class methods are provided for public usage
       - getJobParameters()
       - setJobParameter()
+      - setJobsParameters()
       - deleteJobParameters()
 """
 from DIRAC import S_OK, S_ERROR, gConfig
@@ -35,8 +36,10 @@ from DIRAC.Core.Base.ElasticDB import ElasticDB
 
 try:
     from opensearchpy.exceptions import NotFoundError, RequestError
+    from opensearchpy.helpers import BulkIndexError, bulk
 except ImportError:
     from elasticsearch.exceptions import NotFoundError, RequestError
+    from elasticsearch.helpers import BulkIndexError, bulk
 
 name = "ElasticJobParametersDB"  # (base for) old index name
 
@@ -209,6 +212,44 @@ class ElasticJobParametersDB(ElasticDB):
             self.log.error("Couldn't insert or update data", result["Message"])
         return result
 
+    def setJobsParameters(self, jobsParameters: dict) -> dict:
+        """
+        Inserts the parameters of several jobs with a single bulk request,
+        updating the documents of the jobs which already have one
+
+        :param self: self reference
+        :param jobsParameters: { jobID : list of tuples (name, value) pairs }
+        :returns: S_OK/S_ERROR as result of indexing
+        """
+        if not jobsParameters:
+            return S_OK()
+
+        timestamp = int(TimeUtilities.toEpochMilliSeconds())
+        actions = []
+        for jobID, parameters in jobsParameters.items():
+            parametersDict = dict(parameters)
+            parametersDict["JobID"] = jobID
+            parametersDict["timestamp"] = timestamp
+            actions.append(
+                {
+                    "_op_type": "update",
+                    "_index": self._indexName(jobID),
+                    "_id": str(jobID),
+                    "doc": parametersDict,
+                    "doc_as_upsert": True,
+                }
+            )
+        self.log.debug("Inserting parameters", f"for {len(actions)} jobs")
+
+        for indexName in {action["_index"] for action in actions}:
+            self._createIndex(indexName)
+        try:
+            bulk(client=self.client, actions=actions)
+        except (BulkIndexError, RequestError) as e:
+            self.log.error("Couldn't insert or update data", repr(e))
+            return S_ERROR(e)
+        return S_OK()
+
     def deleteJobParameters(self, jobID: int, paramList=None) -> dict:
         """Deletes Job Parameters defined for jobID.
           Returns a dictionary with the Job Parameters.
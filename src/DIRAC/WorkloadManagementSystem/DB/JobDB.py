@@ -31,6 +31,7 @@ from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest import JobManife
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
 from DIRAC.WorkloadManagementSystem.Client import JobMinorStatus
 from DIRAC.WorkloadManagementSystem.Client.JobMonitoringClient import JobMonitoringClient
+from DIRAC.WorkloadManagementSystem.private.RunningJobCounters import gRunningJobCounters
 
 #############################################################################
 # utility functions
@@ -343,6 +344,44 @@ class JobDB(DB):
             jobOptParameters = {name: value for name, value in result.get("Value", {})}
         return S_OK(jobOptParameters)
 
+    #############################################################################
+    def getJobsOptParameters(self, jobIDs, paramList=None):
+        """Get optimizer parameters for a list of jobs. If the list of parameter names is
+        empty, get all the parameters then
+
+        :param list jobIDs: job IDs
+        :return: S_OK( { jobID: { name: value } } )
+        """
+        if not jobIDs:
+            return S_OK({})
+
+        jIDList = []
+        for jobID in jobIDs:
+            ret = self._escapeString(jobID)
+            if not ret["OK"]:
+                return ret
+            jIDList.append(ret["Value"])
+
+        cmd = "SELECT JobID, Name, Value from OptimizerParameters WHERE JobID IN (%s)" % ",".join(jIDList)
+        if paramList:
+            paramNameList = []
+            for x in paramList:
+                ret = self._escapeString(x)
+                if not ret["OK"]:
+                    return ret
+                paramNameList.append(ret["Value"])
+            cmd += " and Name in (%s)" % ",".join(paramNameList)
+
+        result = self._query(cmd)
+        if not result["OK"]:
+            return S_ERROR("JobDB.getJobsOptParameters: failed to retrieve parameters")
+        jobsOptParameters = {int(jobID): {} for jobID in jobIDs}
+        for jobID, name, value in result["Value"]:
+            if isinstance(value, bytes):  # account for BLOBs
+                value = value.decode()
+            jobsOptParameters.setdefault(int(jobID), {})[name] = value
+        return S_OK(jobsOptParameters)
+
     #############################################################################
 
     def getInputData(self, jobID):
@@ -585,8 +624,12 @@ class JobDB(DB):
         :param str candidateStatus: candidate major Status
         """
 
-        # get the current statuses of the jobs
-        res = self.getJobsAttributes(jIDList, ["Status"])
+        # get the current statuses of the jobs, and what the running job counters need to discount them
+        countedAttributes = gRunningJobCounters.attributes
+        attrList = ["Status"]
+        if countedAttributes:
+            attrList += [attrName for attrName in ["Site"] + countedAttributes if attrName not in attrList]
+        res = self.getJobsAttributes(jIDList, attrList)
         if not res["OK"]:
             return res
         jIDStatusDict = res["Value"]
@@ -625,7 +668,10 @@ class JobDB(DB):
 
         cmd += " ON DUPLICATE KEY UPDATE Status=VALUES(Status)"
 
-        return self._update(cmd)
+        res = self._update(cmd)
+        if res["OK"] and countedAttributes:
+            gRunningJobCounters.jobsStatusChanged(jIDStatusDict, newStatuses)
+        return res
 
     def setJobStatus(self, jobID, status="", minorStatus="", applicationStatus=""):
         """Set status of the job specified by its jobID"""
@@ -739,6 +785,34 @@ class JobDB(DB):
         cmd = "REPLACE JobParameters (JobID,Name,Value) VALUES %s" % ", ".join(insertValueList)
         return self._update(cmd)
 
+    #############################################################################
+    def setJobsParameters(self, jobsParameters):
+        """Set the parameters of several jobs at once
+
+        :param dict jobsParameters: { jobID : list of tuples (name, value) pairs }
+
+        :return: S_OK/S_ERROR
+        """
+
+        insertValueList = []
+        for jobID, parameters in jobsParameters.items():
+            for name, value in parameters:
+                ret = self._escapeString(name)
+                if not ret["OK"]:
+                    return ret
+                e_name = ret["Value"]
+                ret = self._escapeString(value)
+                if not ret["OK"]:
+                    return ret
+                e_value = ret["Value"]
+                insertValueList.append(f"({int(jobID)},{e_name},{e_value})")
+
+        if not insertValueList:
+            return S_OK()
+
+        cmd = "REPLACE JobParameters (JobID,Name,Value) VALUES %s" % ", ".join(insertValueList)
+        return self._update(cmd)
+
     #############################################################################
     def setJobOptParameter(self, jobID, name, value):
         """Set an optimzer parameter specified by name,value pair for the job JobID"""
@@ -903,6 +977,30 @@ class JobDB(DB):
             return S_OK(extractJDL(jdl[0][0]))
         return result
 
+    #############################################################################
+    def getJobsJDL(self, jobIDs, original=False):
+        """Get the JDLs of a list of jobs. By default the current job JDLs
+        are returned. If 'original' argument is True, original JDLs are returned
+
+        :param list jobIDs: job IDs
+        :return: S_OK( { jobID: JDL } ), the jobs without JDL are not in the dictionary
+        """
+        if not jobIDs:
+            return S_OK({})
+
+        jIDList = []
+        for jobID in jobIDs:
+            ret = self._escapeString(jobID)
+            if not ret["OK"]:
+                return ret
+            jIDList.append(ret["Value"])
+
+        column = "OriginalJDL" if original else "JDL"
+        result = self._query(f"SELECT JobID, {column} FROM JobJDLs WHERE JobID IN ({','.join(jIDList)})")
+        if not result["OK"]:
+            return result
+        return S_OK({int(jobID): extractJDL(jdl) for jobID, jdl in result["Value"]})
+
     #############################################################################
     def insertNewJobIntoDB(
         self,
@@ -1904,6 +2002,69 @@ class JobDB(DB):
 
         return S_OK() if ok else S_ERROR("Failed to store some or all the parameters")
 
+    #####################################################################################
+    def setHeartBeatsData(self, heartBeats):
+        """Add the heart beat data of several jobs to the database, in the same way as setHeartBeatData
+        but with one UPDATE of the Jobs table per kind of heart beat and a single INSERT of the logging
+
+        :param list heartBeats: list of tuples (jobID, dynamicDataDict, receptionTime) where receptionTime
+                                is the UTC datetime at which the heart beat was received, used instead of
+                                the time of the query. If the dynamicDataDict of a job contains HeartBeatTime
+                                it is used instead, and the status of the job is not set to Running.
+
+        :return: S_OK/S_ERROR
+        """
+
+        # { jobID : HeartBeatTime }, for the jobs whose status is set to Running or not. The last heart beat wins
+        heartBeatTimes = {True: {}, False: {}}
+        valueList = []
+        for jobID, dynamicDataDict, receptionTime in heartBeats:
+            jobID = int(jobID)
+            timeStamp = dynamicDataDict.pop("HeartBeatTime", None)
+            receptionTime = receptionTime.strftime("%Y-%m-%d %H:%M:%S")
+            setRunning = not timeStamp
+            result = self._escapeString(timeStamp or receptionTime)
+            if not result["OK"]:
+                self.log.warn("Failed to escape string ", timeStamp)
+                return result
+            heartBeatTimes[not setRunning].pop(jobID, None)
+            heartBeatTimes[setRunning][jobID] = result["Value"]
+
+            for key, value in dynamicDataDict.items():
+                result = self._escapeString(key)
+                if not result["OK"]:
+                    self.log.warn("Failed to escape string", key)
+                    continue
+                e_key = result["Value"]
+                result = self._escapeString(value)
+                if not result["OK"]:
+                    self.log.warn("Failed to escape string", value)
+                    continue
+                e_value = result["Value"]
+                valueList.append(f"( {jobID}, {e_key}, {e_value}, '{receptionTime}')")
+
+        for setRunning, jobTimes in heartBeatTimes.items():
+            if not jobTimes:
+                continue
+            cases = " ".join(f"WHEN {jobID} THEN {timeStamp}" for jobID, timeStamp in sorted(jobTimes.items()))
+            req = f"UPDATE Jobs SET HeartBeatTime=CASE JobID {cases} END"
+            if setRunning:
+                req += f", Status='{JobStatus.RUNNING}'"
+            req += " WHERE JobID IN (%s)" % ",".join(str(jobID) for jobID in sorted(jobTimes))
+            result = self._update(req)
+            if not result["OK"]:
+                return S_ERROR(f"Failed to set the heart beat time: {result['Message']}")
+
+        if valueList:
+            req = "INSERT INTO HeartBeatLoggingInfo (JobID,Name,Value,HeartBeatTime) VALUES "
+            req += ",".join(valueList)
+            result = self._update(req)
+            if not result["OK"]:
+                self.log.warn("Error storing heart beat data", result["Message"])
+                return S_ERROR("Failed to store some or all the parameters")
+
+        return S_OK()
+
     #####################################################################################
     def getHeartBeatData(self, jobID):
         """Retrieve the job's heart beat data"""
@@ -1974,6 +2135,36 @@ class JobDB(DB):
 
         return S_OK(dict(result["Value"]))
 
+    #####################################################################################
+    def getJobsCommand(self, jobIDs, status=JobStatus.RECEIVED):
+        """Get the commands to be passed to several jobs together with their next heart beat
+
+        :param list jobIDs: job IDs
+        :param str status: status of the commands
+
+        :return: S_OK({ jobID : { command : arguments } }) for the jobs having commands
+        """
+
+        if not jobIDs:
+            return S_OK({})
+
+        ret = self._escapeString(status)
+        if not ret["OK"]:
+            return ret
+        status = ret["Value"]
+
+        jobIDList = ",".join(str(int(jobID)) for jobID in jobIDs)
+        result = self._query(
+            f"SELECT JobID, Command, Arguments FROM JobCommands WHERE JobID IN ({jobIDList}) AND Status={status}"
+        )
+        if not result["OK"]:
+            return result
+
+        jobsCommand = {}
+        for jobID, command, arguments in result["Value"]:
+            jobsCommand.setdefault(int(jobID), {})[command] = arguments
+        return S_OK(jobsCommand)
+
     #####################################################################################
     def setJobCommandStatus(self, jobID, command, status):
         """Set the command status"""
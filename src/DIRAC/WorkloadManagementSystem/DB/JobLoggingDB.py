@@ -42,10 +42,19 @@ class JobLoggingDB(DB):
         be provided in a form of a string in a format '%Y-%m-%d %H:%M:%S' or
         as datetime.datetime object. If the time stamp is not provided the current
         UTC time is used.
+
+        :param jobID: one or more job IDs, the same record is added for all of them
+        :type jobID: int or str or list
         """
 
+        jobIDList = jobID if isinstance(jobID, (list, tuple)) else [jobID]
+        if not jobIDList:
+            return S_OK(0)
+
         event = f"status/minor/app={status}/{minorStatus}/{applicationStatus}"
-        self.log.info("Adding record for job ", str(jobID) + ": '" + event + "' from " + source)
+        self.log.info(
+            "Adding record for job ", ",".join(str(jID) for jID in jobIDList) + ": '" + event + "' from " + source
+        )
 
         try:
             if not date:
@@ -64,10 +73,14 @@ class JobLoggingDB(DB):
             _date = datetime.datetime.utcnow()
         epoc = time.mktime(_date.timetuple()) + _date.microsecond / 1000000.0 - MAGIC_EPOC_NUMBER
 
+        values = ",".join(
+            "(%d,'%s','%s','%s','%s',%f,'%s')"
+            % (int(jID), status, minorStatus, applicationStatus[:255], str(_date), epoc, source[:32])
+            for jID in jobIDList
+        )
         cmd = (
             "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, "
-            + "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')"
-            % (int(jobID), status, minorStatus, applicationStatus[:255], str(_date), epoc, source[:32])
+            + "StatusTime, StatusTimeOrder, StatusSource) VALUES %s" % values
         )
 
         return self._update(cmd)
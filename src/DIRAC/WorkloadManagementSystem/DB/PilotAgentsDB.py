@@ -451,18 +451,21 @@ AND SubmissionTime < DATE_SUB(UTC_TIMESTAMP(),INTERVAL %d DAY)"
 
     ##########################################################################################
     def setJobForPilot(self, jobID, pilotRef, site=None, updateStatus=True):
-        """Store the jobID of the job executed by the pilot with reference pilotRef"""
+        """Store the jobID of the job executed by the pilot with reference pilotRef
 
+        :param jobID: job ID, or list of job IDs executed by the pilot
+        """
+
+        jobIDList = jobID if isinstance(jobID, (list, tuple)) else [jobID]
         pilotID = self.__getPilotID(pilotRef)
         if pilotID:
             if updateStatus:
-                reason = "Report from job %d" % int(jobID)
+                reason = "Report from job %s" % ",".join(str(int(jID)) for jID in jobIDList)
                 result = self.setPilotStatus(pilotRef, status=PilotStatus.RUNNING, statusReason=reason, gridSite=site)
                 if not result["OK"]:
                     return result
-            req = "INSERT INTO JobToPilotMapping (PilotID,JobID,StartTime) VALUES (%d,%d,UTC_TIMESTAMP())" % (
-                pilotID,
-                jobID,
+            req = "INSERT INTO JobToPilotMapping (PilotID,JobID,StartTime) VALUES %s" % ",".join(
+                "(%d,%d,UTC_TIMESTAMP())" % (pilotID, int(jID)) for jID in jobIDList
             )
             return self._update(req)
         else:
@@ -2,6 +2,7 @@
 """
 import random
 import string
+import threading
 
 from DIRAC import gConfig, S_OK, S_ERROR
 from DIRAC.Core.Base.DB import DB
@@ -12,6 +13,7 @@ from DIRAC.Core.Security import Properties
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.WorkloadManagementSystem.private.SharesCorrector import SharesCorrector
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 
 DEFAULT_GROUP_SHARE = 1000
 TQ_MIN_SHARE = 0.001
@@ -60,13 +62,19 @@ class TaskQueueDB(DB):
         self.__opsHelper = Operations()
         self.__ensureInsertionIsSingle = False
         self.__sharesCorrector = SharesCorrector(self.__opsHelper)
+        # In-memory index of the task queues, only created if used for matching
+        self.__tqIndex = None
+        self.__tqIndexLoadLock = threading.Lock()
         result = self.__initializeDB()
         if not result["OK"]:
             raise Exception("Can't create tables: %s" % result["Message"])
 
     def enableAllTaskQueues(self):
         """Enable all Task queues"""
-        return self.updateFields("tq_TaskQueues", updateDict={"Enabled": "1"})
+        result = self.updateFields("tq_TaskQueues", updateDict={"Enabled": "1"})
+        if result["OK"] and self.__tqIndex:
+            self.__tqIndex.enableAll()
+        return result
 
     def findOrphanJobs(self):
         """Find jobs that are not in any task queue"""
@@ -315,6 +323,9 @@ class TaskQueueDB(DB):
         result = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId in ( %s )" % ",".join(orphanedTQs), conn=connObj)
         if not result["OK"]:
             return result
+        if self.__tqIndex:
+            for tqId in orphanedTQs:
+                self.__tqIndex.removeTaskQueue(int(tqId))
         return S_OK()
 
     def __setTaskQueueEnabled(self, tqId, enabled=True, connObj=False):
@@ -330,6 +341,8 @@ class TaskQueueDB(DB):
         updated = result["Value"] > 0
         if updated:
             self.log.verbose("Set enabled for TQ", f"({enabled} for TQ {tqId})")
+            if self.__tqIndex:
+                self.__tqIndex.updateEnabled(tqId, 1 if enabled == "+ 1" else -1)
         return S_OK(updated)
 
     def __hackJobPriority(self, jobPriority):
@@ -357,7 +370,10 @@ class TaskQueueDB(DB):
         if not retVal["OK"]:
             return S_ERROR("Can't insert job: %s" % retVal["Message"])
         connObj = retVal["Value"]
+        # Unescaped definition, for the task queue index
+        rawTQDefDict = None
         if not skipTQDefCheck:
+            rawTQDefDict = dict(tqDefDict)
             tqDefDict = dict(tqDefDict)
             retVal = self._checkTaskQueueDefinition(tqDefDict)
             if not retVal["OK"]:
@@ -381,6 +397,10 @@ class TaskQueueDB(DB):
         else:
             tqId = tqInfo["tqId"]
             self.log.info("Found TQ for job requirements", f"({tqId} : {jobId})")
+        if self.__tqIndex and rawTQDefDict and not self.__tqIndex.hasTaskQueue(tqId):
+            # The TQ is disabled at this point, it is enabled in the finally clause below
+            rawTQDefDict["CPUTime"] = tqDefDict["CPUTime"]
+            self.__tqIndex.addTaskQueue(tqId, dict(rawTQDefDict, Enabled=0, Priority=1))
         try:
             result = self.__insertJobInTaskQueue(jobId, tqId, int(jobPriority), checkTQExists=False, connObj=connObj)
             if not result["OK"]:
@@ -521,6 +541,7 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC"
         if negativeCond is None:
             negativeCond = {}
         # Make a copy to avoid modification of original if escaping needs to be done
+        rawMatchDict = dict(tqMatchDict)
         tqMatchDict = dict(tqMatchDict)
         retVal = self._checkMatchDefinition(tqMatchDict)
         if not retVal["OK"]:
@@ -530,6 +551,11 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC"
         if not retVal["OK"]:
             return S_ERROR("Can't connect to DB: %s" % retVal["Message"])
         connObj = retVal["Value"]
+        # A certain JobID required by the resource is better served by the DB
+        if "JobID" not in tqMatchDict and self.__getCSOption("UseTaskQueueIndex", False):
+            return self.__matchAndGetJobFromIndex(
+                rawMatchDict, tqMatchDict, numJobsPerTry, numQueuesPerTry, negativeCond, connObj
+            )
         preJobSQL = "SELECT `tq_Jobs`.JobId, `tq_Jobs`.TQId \
 FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s"
         prioSQL = "SELECT `tq_Jobs`.Priority FROM `tq_Jobs` \
@@ -592,6 +618,191 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         self.log.info("Could not find a match after %s match retries" % self.__maxMatchRetry)
         return S_ERROR("Could not find a match after %s match retries" % self.__maxMatchRetry)
 
+    def __getTaskQueueIndex(self):
+        """Get the task queue index, (re)loading it from the DB if needed
+
+        :returns: S_OK( TaskQueueIndex ) / S_ERROR
+        """
+        if self.__tqIndex and not self.__tqIndex.isStale():
+            return S_OK(self.__tqIndex)
+        # Only one thread reloads, the others keep on using the current index if there is one
+        if not self.__tqIndexLoadLock.acquire(blocking=self.__tqIndex is None):
+            return S_OK(self.__tqIndex)
+        try:
+            if self.__tqIndex and not self.__tqIndex.isStale():
+                return S_OK(self.__tqIndex)
+            result = self.retrieveTaskQueues(includeEmpty=True)
+            if not result["OK"]:
+                return result
+            tqIndex = self.__tqIndex or TaskQueueIndex(self.__getCSOption("TaskQueueIndexLifeTime", 300))
+            tqIndex.load(result["Value"])
+            self.__tqIndex = tqIndex
+            self.log.verbose("Loaded task queue index", f"with {len(result['Value'])} TQs")
+            return S_OK(tqIndex)
+        finally:
+            self.__tqIndexLoadLock.release()
+
+    def __matchAndGetJobFromIndex(
+        self, rawMatchDict, tqMatchDict, numJobsPerTry, numQueuesPerTry, negativeCond, connObj
+    ):
+        """Match a job using the in-memory task queue index
+
+        A match costs a lookup in the index, a single query to pick a job and its deletion from tq_Jobs.
+
+        :param dict rawMatchDict: unescaped resource description, used for the index lookup
+        :param dict tqMatchDict: escaped resource description, returned to the caller
+        :returns: S_OK() / S_ERROR
+        """
+        # Priority winner and jobs in a single query
+        jobSQL = "SELECT `tq_Jobs`.JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %(tqId)s AND `tq_Jobs`.Priority = \
+( SELECT `tq_Jobs`.Priority FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %(tqId)s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1 ) \
+ORDER BY `tq_Jobs`.JobId ASC LIMIT %(limit)s"
+        for _ in range(self.__maxMatchRetry):
+            retVal = self.__getTaskQueueIndex()
+            if not retVal["OK"]:
+                return retVal
+            retVal = retVal["Value"].match(rawMatchDict, numQueuesToGet=numQueuesPerTry, negativeCond=negativeCond)
+            if not retVal["OK"]:
+                return retVal
+            tqList = retVal["Value"]
+            if not tqList:
+                self.log.info("No TQ matches requirements")
+                return S_OK({"matchFound": False, "tqMatch": tqMatchDict})
+            for tqId, tqOwnerDN, tqOwnerGroup in tqList:
+                self.log.verbose("Trying to extract jobs from TQ", tqId)
+                retVal = self._query(jobSQL % {"tqId": tqId, "limit": numJobsPerTry}, conn=connObj)
+                if not retVal["OK"]:
+                    return S_ERROR("Can't retrieve jobs for matching: %s" % retVal["Message"])
+                jobList = [row[0] for row in retVal["Value"]]
+                if not jobList:
+                    self.log.info("Task queue seems to be empty, triggering a cleaning of", tqId)
+                    self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
+                while jobList:
+                    jobId = jobList.pop(random.randint(0, len(jobList) - 1))
+                    self.log.verbose("Trying to extract job from TQ", f"{jobId} : {tqId}")
+                    retVal = self.__extractJob(jobId, tqId, tqOwnerDN, tqOwnerGroup, connObj=connObj)
+                    if not retVal["OK"]:
+                        msgFix = "Could not take job"
+                        msgVar = " {} out from the TQ {}: {}".format(jobId, tqId, retVal["Message"])
+                        self.log.error(msgFix, msgVar)
+                        return S_ERROR(msgFix + msgVar)
+                    if retVal["Value"]:
+                        self.log.info("Extracted job from TQ", f"({jobId} : {tqId})")
+                        return S_OK({"matchFound": True, "jobId": jobId, "taskQueueId": tqId, "tqMatch": tqMatchDict})
+                self.log.info("No jobs could be extracted from TQ", tqId)
+        return S_OK({"matchFound": False, "tqMatch": tqMatchDict})
+
+    def matchAndGetJobs(self, tqMatchDict, numJobs, numQueuesPerTry=10, negativeCond=None):
+        """Match up to numJobs jobs based on requirements
+
+        The task queues are matched once per try, and the jobs are taken out of each of them
+        with a single locking SELECT and a single DELETE, in one transaction.
+
+        :param dict tqMatchDict: resource description
+        :param int numJobs: maximum number of jobs to extract
+        :returns: S_OK( { "matchFound": bool, "jobs": [ (jobId, tqId) ], "tqMatch": dict } ) / S_ERROR
+        """
+        if "JobID" in tqMatchDict:
+            # A certain JobID is required by the resource, there is at most one job to get
+            retVal = self.matchAndGetJob(tqMatchDict, negativeCond=negativeCond)
+            if not retVal["OK"]:
+                return retVal
+            jobs = [(retVal["Value"]["jobId"], retVal["Value"]["taskQueueId"])] if retVal["Value"]["matchFound"] else []
+            return S_OK({"matchFound": bool(jobs), "jobs": jobs, "tqMatch": retVal["Value"]["tqMatch"]})
+
+        if negativeCond is None:
+            negativeCond = {}
+        # Make a copy to avoid modification of original if escaping needs to be done
+        rawMatchDict = dict(tqMatchDict)
+        tqMatchDict = dict(tqMatchDict)
+        retVal = self._checkMatchDefinition(tqMatchDict)
+        if not retVal["OK"]:
+            self.log.error("TQ match request check failed", retVal["Message"])
+            return retVal
+        retVal = self._getConnection()
+        if not retVal["OK"]:
+            return S_ERROR("Can't connect to DB: %s" % retVal["Message"])
+        connObj = retVal["Value"]
+        useIndex = self.__getCSOption("UseTaskQueueIndex", False)
+
+        jobs = []
+        for _ in range(self.__maxMatchRetry):
+            if useIndex:
+                retVal = self.__getTaskQueueIndex()
+                if not retVal["OK"]:
+                    return retVal
+                retVal = retVal["Value"].match(rawMatchDict, numQueuesToGet=numQueuesPerTry, negativeCond=negativeCond)
+            else:
+                retVal = self.matchAndGetTaskQueue(
+                    tqMatchDict,
+                    numQueuesToGet=numQueuesPerTry,
+                    skipMatchDictDef=True,
+                    negativeCond=negativeCond,
+                    connObj=connObj,
+                )
+            if not retVal["OK"]:
+                return retVal
+            tqList = retVal["Value"]
+            if not tqList:
+                self.log.info("No TQ matches requirements")
+                break
+            numExtracted = len(jobs)
+            for tqId, tqOwnerDN, tqOwnerGroup in tqList:
+                self.log.verbose("Trying to extract jobs from TQ", tqId)
+                retVal = self.__extractJobs(tqId, tqOwnerDN, tqOwnerGroup, numJobs - len(jobs), connObj=connObj)
+                if not retVal["OK"]:
+                    return retVal
+                jobs.extend((jobId, tqId) for jobId in retVal["Value"])
+                if len(jobs) >= numJobs:
+                    break
+            # Stop when full, or when the matching TQs could not provide anything
+            if len(jobs) >= numJobs or len(jobs) == numExtracted:
+                break
+
+        self.log.info("Extracted jobs from TQs", f"{len(jobs)} out of {numJobs} requested")
+        return S_OK({"matchFound": bool(jobs), "jobs": jobs, "tqMatch": tqMatchDict})
+
+    def __extractJobs(self, tqId, tqOwnerDN, tqOwnerGroup, numJobs, connObj=False):
+        """
+        Take up to numJobs jobs out of a task queue, in one transaction.
+        The jobs are chosen randomly, weighted by their priority, like in matchAndGetJob.
+
+        Return S_OK( [ jobIds ] ) / S_ERROR
+        """
+        retVal = self._update("START TRANSACTION", conn=connObj)
+        if not retVal["OK"]:
+            return S_ERROR("Can't begin transaction for matching jobs: %s" % retVal["Message"])
+        retVal = self._query(
+            "SELECT `tq_Jobs`.JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s \
+ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT %s FOR UPDATE"
+            % (tqId, numJobs),
+            conn=connObj,
+        )
+        if retVal["OK"]:
+            jobList = [row[0] for row in retVal["Value"]]
+            if jobList:
+                retVal = self._update(
+                    "DELETE FROM `tq_Jobs` WHERE TQId = %s AND JobId IN ( %s )"
+                    % (tqId, ", ".join(str(jobId) for jobId in jobList)),
+                    conn=connObj,
+                )
+        if not retVal["OK"]:
+            self._update("ROLLBACK", conn=connObj)
+            msg = f"Could not take jobs out from the TQ {tqId}: {retVal['Message']}"
+            self.log.error(msg)
+            return S_ERROR(msg)
+        retVal = self._update("COMMIT", conn=connObj)
+        if not retVal["OK"]:
+            return S_ERROR("Could not commit the extraction of jobs from TQ {}: {}".format(tqId, retVal["Message"]))
+
+        if jobList:
+            self.log.info("Extracted jobs from TQ", f"({len(jobList)} : {tqId})")
+        else:
+            self.log.info("Task queue seems to be empty, triggering a cleaning of", tqId)
+        # The TQ may be empty now
+        self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
+        return S_OK(jobList)
+
     def matchAndGetTaskQueue(
         self, tqMatchDict, numQueuesToGet=1, skipMatchDictDef=False, negativeCond=None, connObj=False
     ):
@@ -905,8 +1116,15 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
         if not data:
             return S_OK(False)
         tqId, tqOwnerDN, tqOwnerGroup = data[0]
+        return self.__extractJob(jobId, tqId, tqOwnerDN, tqOwnerGroup, connObj=connObj)
+
+    def __extractJob(self, jobId, tqId, tqOwnerDN, tqOwnerGroup, connObj=False):
+        """
+        Delete a job from a known task queue
+        Return S_OK( True/False ) / S_ERROR
+        """
         self.log.verbose("Deleting job", jobId)
-        retVal = self._update("DELETE FROM `tq_Jobs` WHERE JobId = %s" % jobId, conn=connObj)
+        retVal = self._update(f"DELETE FROM `tq_Jobs` WHERE JobId = {jobId} AND TQId = {tqId}", conn=connObj)
         if not retVal["OK"]:
             return S_ERROR("Could not delete job from task queue {}: {}".format(jobId, retVal["Message"]))
         if retVal["Value"] == 0:
@@ -1017,6 +1235,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
             retVal = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn=connObj)
             if not retVal["OK"]:
                 return retVal
+            if self.__tqIndex:
+                self.__tqIndex.removeTaskQueue(tqId)
             self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
             self.log.info("Deleted empty and enabled TQ", tqId)
             return S_OK()
@@ -1045,6 +1265,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
         if not retVal["OK"]:
             return S_ERROR("Could not delete task queue {}: {}".format(tqId, retVal["Message"]))
         delTQ = retVal["Value"]
+        if self.__tqIndex:
+            self.__tqIndex.removeTaskQueue(tqId)
         sqlCmd = "DELETE FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s" % tqId
         retVal = self._update(sqlCmd, conn=connObj)
         if not retVal["OK"]:
@@ -1075,16 +1297,26 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
             return retVal
         return S_OK(retVal["Value"][0][0])
 
-    def retrieveTaskQueues(self, tqIdList=None):
+    def retrieveTaskQueues(self, tqIdList=None, includeEmpty=False):
         """
         Get all the task queues
+
+        :param list tqIdList: restrict to these task queues
+        :param bool includeEmpty: also return the task queues without jobs, and their Enabled flag
         """
         sqlSelectEntries = ["`tq_TaskQueues`.TQId", "`tq_TaskQueues`.Priority", "COUNT( `tq_Jobs`.TQId )"]
         sqlGroupEntries = ["`tq_TaskQueues`.TQId", "`tq_TaskQueues`.Priority"]
         for field in singleValueDefFields:
             sqlSelectEntries.append("`tq_TaskQueues`.%s" % field)
             sqlGroupEntries.append("`tq_TaskQueues`.%s" % field)
-        sqlCmd = "SELECT %s FROM `tq_TaskQueues`, `tq_Jobs`" % ", ".join(sqlSelectEntries)
+        if includeEmpty:
+            sqlSelectEntries.append("`tq_TaskQueues`.Enabled")
+            sqlGroupEntries.append("`tq_TaskQueues`.Enabled")
+            sqlCmd = "SELECT %s FROM `tq_TaskQueues` LEFT JOIN `tq_Jobs` ON `tq_TaskQueues`.TQId = `tq_Jobs`.TQId" % (
+                ", ".join(sqlSelectEntries)
+            )
+        else:
+            sqlCmd = "SELECT %s FROM `tq_TaskQueues`, `tq_Jobs`" % ", ".join(sqlSelectEntries)
         sqlTQCond = ""
         if tqIdList is not None:
             if not tqIdList:
@@ -1092,8 +1324,9 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
                 return S_OK({})
             else:
                 sqlTQCond += " AND `tq_TaskQueues`.TQId in ( %s )" % ", ".join([str(id_) for id_ in tqIdList])
-        sqlCmd = "{} WHERE `tq_TaskQueues`.TQId = `tq_Jobs`.TQId {} GROUP BY {}".format(
+        sqlCmd = "{} WHERE {} {} GROUP BY {}".format(
             sqlCmd,
+            "1 = 1" if includeEmpty else "`tq_TaskQueues`.TQId = `tq_Jobs`.TQId",
             sqlTQCond,
             ", ".join(sqlGroupEntries),
         )
@@ -1108,6 +1341,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
             record = record[3:]
             for iP, _ in enumerate(singleValueDefFields):
                 tqData[tqId][singleValueDefFields[iP]] = record[iP]
+            if includeEmpty:
+                tqData[tqId]["Enabled"] = record[len(singleValueDefFields)]
 
         tqNeedCleaning = False
         for field in multiValueDefFields:
@@ -1304,6 +1539,8 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
             tqList = ", ".join([str(tqId) for tqId in prioDict[prio]])
             updateSQL = f"UPDATE `tq_TaskQueues` SET Priority={prio:.4f} WHERE TQId in ( {tqList} )"
             self._update(updateSQL, conn=connObj)
+        if self.__tqIndex:
+            self.__tqIndex.setPriorities(tqDict)
         return S_OK()
 
     @staticmethod
@@ -14,6 +14,7 @@ from DIRAC.Core.Utilities.DEncode import ignoreEncodeWarning
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.Utilities.HeartBeatCoalescer import HeartBeatCoalescer
 from DIRAC.WorkloadManagementSystem.Utilities.JobStatusUtility import JobStatusUtility
 
 
@@ -51,6 +52,17 @@ class JobStateUpdateHandlerMixin:
 
         cls.jsu = JobStatusUtility(cls.jobDB, cls.jobLoggingDB, cls.elasticJobParametersDB)
 
+        # The heart beats can be written by batches, gathered during HeartBeatWindow seconds
+        cls.heartBeatCoalescer = None
+        heartBeatWindow = cls.srv_getCSOption("HeartBeatWindow", 0.0)
+        if heartBeatWindow > 0:
+            cls.heartBeatCoalescer = HeartBeatCoalescer(
+                cls.jobDB,
+                cls.elasticJobParametersDB,
+                window=heartBeatWindow,
+                maxBatchSize=cls.srv_getCSOption("HeartBeatMaxBatchSize", 1000),
+            )
+
         return S_OK()
 
     ###########################################################################
@@ -232,6 +244,9 @@ class JobStateUpdateHandlerMixin:
     def export_sendHeartBeat(cls, jobID, dynamicData, staticData):
         """Send a heart beat sign of life for a job jobID"""
 
+        if cls.heartBeatCoalescer:
+            return cls.heartBeatCoalescer.sendHeartBeat(int(jobID), dynamicData, staticData)
+
         result = cls.jobDB.setHeartBeatData(int(jobID), dynamicData)
         if not result["OK"]:
             cls.log.warn("Failed to set the heart beat data", f"for job {jobID} ")
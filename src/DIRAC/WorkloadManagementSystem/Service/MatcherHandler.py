@@ -43,6 +43,8 @@ class MatcherHandlerMixin:
             return S_ERROR("Can't connect to DB: %s" % excp)
 
         cls.limiter = Limiter(jobDB=cls.jobDB)
+        # Maximum number of jobs served by a single requestJobs call
+        cls.maxJobsPerMatch = cls.srv_getCSOption("MaxJobsPerMatch", 20)
 
         return S_OK()
 
@@ -53,7 +55,25 @@ class MatcherHandlerMixin:
         """Serve a job to the request of an agent which is the highest priority
         one matching the agent's site capacity
         """
+        return self.__match(resourceDescription)
 
+    ##############################################################################
+    types_requestJobs = [[str, dict], int]
+
+    def export_requestJobs(self, resourceDescription, numJobs):
+        """Serve up to numJobs jobs to the request of an agent, the highest priority
+        ones matching the agent's site capacity.
+
+        The number of jobs served is capped by the MaxJobsPerMatch option of the service.
+
+        :return: S_OK( list of dictionaries, one per job, as returned by requestJob )
+        """
+        if numJobs < 1:
+            return S_ERROR("The number of jobs to request has to be positive")
+        return self.__match(resourceDescription, min(numJobs, self.maxJobsPerMatch))
+
+    def __match(self, resourceDescription, numJobs=None):
+        """Select one job (numJobs is None) or a list of jobs with a Matcher"""
         credDict = self.getRemoteCredentials()
         pilotRef = resourceDescription.get("PilotReference", "Unknown")
 
@@ -67,7 +87,10 @@ class MatcherHandlerMixin:
                 opsHelper=opsHelper,
                 pilotRef=pilotRef,
             )
-            result = matcher.selectJob(resourceDescription, credDict)
+            if numJobs is None:
+                result = matcher.selectJob(resourceDescription, credDict)
+            else:
+                result = matcher.selectJobs(resourceDescription, credDict, numJobs)
         except RuntimeError as rte:
             self.log.error("Error requesting job for pilot", f"[{pilotRef}] {rte}")
             return S_ERROR("Error requesting job")
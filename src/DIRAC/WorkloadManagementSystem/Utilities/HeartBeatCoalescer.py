@@ -0,0 +1,162 @@
+"""Write-behind of the job heart beats, used by the JobStateUpdate service
+
+The heart beats received during a short window are written together: one UPDATE of the Jobs table,
+one INSERT of the heart beat logging and one bulk write of the job parameters for the whole batch,
+then one query for the status of the jobs and one for their pending commands.
+Each call still waits for the batch containing its heart beat to be written, and gets the same reply
+as if the heart beat had been processed alone.
+"""
+import datetime
+import threading
+
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.WorkloadManagementSystem.Client import JobStatus
+
+
+class _HeartBeat:
+    """A heart beat waiting to be written"""
+
+    def __init__(self, jobID, dynamicData, staticData):
+        self.jobID = int(jobID)
+        self.dynamicData = dynamicData
+        self.staticData = staticData
+        self.receptionTime = datetime.datetime.utcnow()
+        self.taken = False
+        self.result = None
+        self.written = threading.Event()
+
+
+class HeartBeatCoalescer:
+    """Write the heart beats of the jobs by batches
+
+    The caller of the first heart beat of a batch waits for the window, or for the batch to be full,
+    and then writes all the heart beats received in the meantime. The other callers wait for it.
+
+    :param jobDB: JobDB instance
+    :param elasticJobParametersDB: ElasticJobParametersDB instance, or None to store the parameters in the JobDB
+    :param float window: time during which the heart beats are gathered, in seconds
+    :param int maxBatchSize: maximum number of heart beats written together
+    """
+
+    def __init__(self, jobDB, elasticJobParametersDB=None, window=1.0, maxBatchSize=1000):
+        self.log = gLogger.getSubLogger(self.__class__.__name__)
+        self.jobDB = jobDB
+        self.elasticJobParametersDB = elasticJobParametersDB
+        self.window = window
+        self.maxBatchSize = max(1, maxBatchSize)
+
+        self.__lock = threading.Lock()
+        # Notified when the batch is full, or a batch is taken
+        self.__changed = threading.Condition(self.__lock)
+        self.__pending = []
+        self.__gathering = False
+
+    def sendHeartBeat(self, jobID, dynamicData, staticData):
+        """Write a heart beat sign of life for a job, with its batch
+
+        :param int jobID: job ID
+        :param dict dynamicData: heart beat data, logged in the HeartBeatLoggingInfo table
+        :param dict staticData: job parameters
+
+        :return: S_OK(dict of the commands sent to the job)/S_ERROR
+        """
+        heartBeat = _HeartBeat(jobID, dynamicData, staticData)
+        with self.__lock:
+            self.__pending.append(heartBeat)
+            if len(self.__pending) >= self.maxBatchSize:
+                self.__changed.notify_all()
+        while True:
+            with self.__lock:
+                while self.__gathering and not heartBeat.taken:
+                    self.__changed.wait()
+                if heartBeat.taken:
+                    break
+                # Start the next batch, and gather the heart beats arriving during the window
+                self.__gathering = True
+                self.__changed.wait_for(lambda: len(self.__pending) >= self.maxBatchSize, timeout=self.window)
+                batch = self.__pending[: self.maxBatchSize]
+                self.__pending = self.__pending[self.maxBatchSize :]
+                for pendingHeartBeat in batch:
+                    pendingHeartBeat.taken = True
+                self.__gathering = False
+                # One of the callers whose heart beat is left over starts the next batch
+                self.__changed.notify_all()
+            # The batch is written at once, even if the heart beat of this caller is left over
+            self.__writeBatch(batch)
+
+        heartBeat.written.wait()
+        return heartBeat.result
+
+    def __writeBatch(self, batch):
+        """Write a batch of heart beats, and wake up their callers with their replies"""
+        try:
+            results = self._writeHeartBeats(batch)
+        except Exception as e:  # pylint: disable=broad-except
+            self.log.exception("Failed to write the heart beats")
+            results = [S_ERROR(f"Failed to write the heart beat: {e!r}")] * len(batch)
+        for pendingHeartBeat, result in zip(batch, results):
+            pendingHeartBeat.result = result
+            pendingHeartBeat.written.set()
+
+    def _writeHeartBeats(self, heartBeats):
+        """Write a batch of heart beats, as JobStateUpdateHandler.export_sendHeartBeat does for one
+
+        :param list heartBeats: _HeartBeat instances
+
+        :return: list of the replies to the heart beats, in the same order
+        """
+        jobIDs = sorted({heartBeat.jobID for heartBeat in heartBeats})
+        self.log.verbose("Writing heart beats", f"of {len(jobIDs)} jobs")
+
+        result = self.jobDB.setHeartBeatsData(
+            [(heartBeat.jobID, heartBeat.dynamicData, heartBeat.receptionTime) for heartBeat in heartBeats]
+        )
+        if not result["OK"]:
+            self.log.warn("Failed to set the heart beat data", f"for {len(jobIDs)} jobs: {result['Message']}")
+
+        # The parameters sent last override the previous ones
+        jobsParameters = {}
+        for heartBeat in heartBeats:
+            if heartBeat.staticData:
+                jobsParameters.setdefault(heartBeat.jobID, {}).update(heartBeat.staticData)
+        jobsParameters = {jobID: list(parameters.items()) for jobID, parameters in jobsParameters.items()}
+        if jobsParameters:
+            if self.elasticJobParametersDB:
+                result = self.elasticJobParametersDB.setJobsParameters(jobsParameters)
+                if not result["OK"]:
+                    self.log.error("Failed to add Job Parameters to ElasticSearch", result["Message"])
+            else:
+                result = self.jobDB.setJobsParameters(jobsParameters)
+                if not result["OK"]:
+                    self.log.error("Failed to add Job Parameters to MySQL", result["Message"])
+
+        # Restore the Running status if necessary
+        result = self.jobDB.getJobsAttributes(jobIDs, ["Status"])
+        if not result["OK"]:
+            return [result] * len(heartBeats)
+        jobsStatus = result["Value"]
+
+        for jobID, attributes in jobsStatus.items():
+            if attributes["Status"] in (JobStatus.STALLED, JobStatus.MATCHED):
+                result = self.jobDB.setJobAttribute(
+                    jobID=jobID, attrName="Status", attrValue=JobStatus.RUNNING, update=True
+                )
+                if not result["OK"]:
+                    self.log.warn("Failed to restore the job status to Running")
+
+        jobsCommand = {}
+        result = self.jobDB.getJobsCommand(list(jobsStatus))
+        if result["OK"]:
+            jobsCommand = result["Value"]
+        for jobID, jobMessageDict in jobsCommand.items():
+            for key in jobMessageDict:
+                self.jobDB.setJobCommandStatus(jobID, key, "Sent")
+
+        results = []
+        for heartBeat in heartBeats:
+            if heartBeat.jobID not in jobsStatus:
+                results.append(S_ERROR(f"Job {heartBeat.jobID} not found"))
+            else:
+                # The commands are sent once, with the first heart beat of the job
+                results.append(S_OK(jobsCommand.pop(heartBeat.jobID, {})))
+        return results
@@ -0,0 +1,109 @@
+""" Test the write-behind of the job heart beats
+"""
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.WorkloadManagementSystem.Client import JobStatus
+from DIRAC.WorkloadManagementSystem.Utilities.HeartBeatCoalescer import HeartBeatCoalescer, _HeartBeat
+
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def jobDB():
+    jobDB = MagicMock()
+    jobDB.setHeartBeatsData.return_value = S_OK()
+    jobDB.setJobsParameters.return_value = S_OK()
+    jobDB.getJobsAttributes.side_effect = lambda jobIDs, _attrList: S_OK(
+        {jobID: {"Status": JobStatus.STALLED if jobID == 2 else JobStatus.RUNNING} for jobID in jobIDs if jobID < 10}
+    )
+    jobDB.getJobsCommand.side_effect = lambda jobIDs: S_OK({1: {"Kill": ""}} if 1 in jobIDs else {})
+    jobDB.setJobAttribute.return_value = S_OK()
+    jobDB.setJobCommandStatus.return_value = S_OK()
+    return jobDB
+
+
+def sendHeartBeats(coalescer, heartBeats):
+    """Send heart beats concurrently, and return their replies in the same order"""
+    replies = [None] * len(heartBeats)
+    started = threading.Barrier(len(heartBeats))
+
+    def send(index, jobID, staticData):
+        started.wait()
+        replies[index] = coalescer.sendHeartBeat(jobID, {"LoadAverage": 1.0}, staticData)
+
+    threads = [
+        threading.Thread(target=send, args=(index, jobID, staticData))
+        for index, (jobID, staticData) in enumerate(heartBeats)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return replies
+
+
+def test_batch(jobDB):
+    """The heart beats received during the window are written together, with the same replies as one by one"""
+    coalescer = HeartBeatCoalescer(jobDB, window=0.5)
+    heartBeats = [(1, {"Memory": "1"}), (2, {}), (1, {"CPU": "3"}), (3, {}), (42, {})]
+    replies = sendHeartBeats(coalescer, heartBeats)
+
+    assert jobDB.setHeartBeatsData.call_count == 1
+    assert len(jobDB.setHeartBeatsData.call_args.args[0]) == 5
+    jobDB.getJobsAttributes.assert_called_once_with([1, 2, 3, 42], ["Status"])
+    jobDB.setJobsParameters.assert_called_once()
+    jobsParameters = jobDB.setJobsParameters.call_args.args[0]
+    assert list(jobsParameters) == [1]
+    assert dict(jobsParameters[1]) == {"Memory": "1", "CPU": "3"}
+
+    # The stalled job is restored, and the command of the job is sent once
+    jobDB.setJobAttribute.assert_called_once_with(jobID=2, attrName="Status", attrValue=JobStatus.RUNNING, update=True)
+    jobDB.setJobCommandStatus.assert_called_once_with(1, "Kill", "Sent")
+    assert [reply["Value"] for reply in (replies[0], replies[2])] in ([{"Kill": ""}, {}], [{}, {"Kill": ""}])
+    assert replies[1] == replies[3] == S_OK({})
+    assert not replies[4]["OK"]
+    assert replies[4]["Message"] == "Job 42 not found"
+
+
+def test_maxBatchSize(jobDB):
+    """A full batch is written without waiting for the window, the heart beats left over form the next ones"""
+    coalescer = HeartBeatCoalescer(jobDB, window=60, maxBatchSize=4)
+    replies = sendHeartBeats(coalescer, [(jobID, {}) for jobID in range(1, 9)])
+
+    assert jobDB.setHeartBeatsData.call_count == 2
+    assert all(reply["OK"] for reply in replies)
+
+
+def test_leftOverGatherer(jobDB):
+    """The caller gathering a batch which its heart beat does not fit in writes this batch at once"""
+    coalescer = HeartBeatCoalescer(jobDB, window=2, maxBatchSize=2)
+    heartBeats = [_HeartBeat(jobID, {}, {}) for jobID in (1, 2)]
+    coalescer._HeartBeatCoalescer__pending.extend(heartBeats)  # pylint: disable=protected-access
+    thread = threading.Thread(target=coalescer.sendHeartBeat, args=(3, {}, {}))
+    thread.start()
+    assert all(heartBeat.written.wait(1) for heartBeat in heartBeats)
+    thread.join()
+    assert jobDB.setHeartBeatsData.call_count == 2
+
+
+def test_elasticParameters(jobDB):
+    """The parameters go to ElasticSearch when it is used"""
+    elasticJobParametersDB = MagicMock()
+    elasticJobParametersDB.setJobsParameters.return_value = S_OK()
+    coalescer = HeartBeatCoalescer(jobDB, elasticJobParametersDB, window=0)
+    assert coalescer.sendHeartBeat(3, {}, {"Memory": "1"}) == S_OK({})
+    elasticJobParametersDB.setJobsParameters.assert_called_once_with({3: [("Memory", "1")]})
+    jobDB.setJobsParameters.assert_not_called()
+
+
+def test_failure(jobDB):
+    """All the heart beats of a batch get the error if the status of the jobs can not be read"""
+    jobDB.getJobsAttributes.side_effect = None
+    jobDB.getJobsAttributes.return_value = S_ERROR("DB down")
+    coalescer = HeartBeatCoalescer(jobDB, window=0.2)
+    replies = sendHeartBeats(coalescer, [(1, {}), (2, {})])
+    assert [reply["Message"] for reply in replies] == ["DB down", "DB down"]
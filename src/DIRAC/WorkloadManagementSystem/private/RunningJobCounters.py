@@ -0,0 +1,100 @@
+""" In-memory counters of the jobs running at the sites with running limits, used by the Limiter
+    to build the negative matching conditions without querying the JobDB at each match.
+
+    The counters are seeded, and periodically reconciled, by the Limiter with one grouped query on the JobDB.
+    In between, they are incremented by the Matcher for the jobs it matches, and decremented by the JobDB
+    for the jobs leaving the running statuses. Both only see what happens in the current process:
+    what happens elsewhere is caught up at the next reconciliation.
+"""
+import threading
+import time
+
+from DIRAC.WorkloadManagementSystem.Client import JobStatus
+
+# Statuses of the jobs counted against the running limits
+countedStatuses = (JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED)
+
+
+class RunningJobCounters:
+    """Number of jobs in the counted statuses per site, attribute name and attribute value"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        # Held while the counters are (re)loaded from the DB
+        self.loadLock = threading.Lock()
+        self.__lastLoad = 0
+        # Site -> attribute name -> attribute value -> number of jobs
+        self.__counters = {}
+        # Attribute names counted, for all sites. Empty until the counters are loaded
+        self.attributes = []
+
+    def isStale(self, lifeTime):
+        """Do the counters need to be reconciled with the DB
+
+        :param int lifeTime: number of seconds after which the counters are stale
+        """
+        return time.time() - self.__lastLoad > lifeTime
+
+    def load(self, siteAttributes, counters):
+        """Replace the content of the counters
+
+        :param dict siteAttributes: site -> list of attribute names counted for this site
+        :param list counters: result of JobDB.getCounters grouped by Site and all the counted attributes,
+                              i.e. list of ( { 'Site': site, attName: attValue, ... }, number of jobs )
+        """
+        newCounters = {siteName: {attName: {} for attName in attNames} for siteName, attNames in siteAttributes.items()}
+        for attDict, count in counters:
+            for attName, attCounters in newCounters.get(attDict["Site"], {}).items():
+                attValue = attDict[attName]
+                attCounters[attValue] = attCounters.get(attValue, 0) + count
+        with self.__lock:
+            self.__counters = newCounters
+            self.attributes = sorted({attName for attNames in siteAttributes.values() for attName in attNames})
+            self.__lastLoad = time.time()
+
+    def getAttributes(self, siteName):
+        """Attribute names counted for a site, empty if the site is not counted"""
+        return list(self.__counters.get(siteName, {}))
+
+    def getCounters(self, siteName, attName):
+        """Get the counters of one attribute at a site
+
+        :return: dict attribute value -> number of jobs, None if the attribute is not counted for the site
+        """
+        with self.__lock:
+            attCounters = self.__counters.get(siteName, {}).get(attName)
+            return None if attCounters is None else dict(attCounters)
+
+    def __add(self, siteName, jobAttributes, delta):
+        """Add delta to the counters of a job. Needs to be called with the lock held"""
+        for attName, attCounters in self.__counters.get(siteName, {}).items():
+            attValue = jobAttributes.get(attName)
+            if attValue is not None:
+                attCounters[attValue] = max(attCounters.get(attValue, 0) + delta, 0)
+
+    def jobsMatched(self, siteName, jobsAttributes):
+        """Count jobs just matched at a site
+
+        :param str siteName: site where the jobs were matched
+        :param jobsAttributes: iterable of dicts with the counted attributes of each job
+        """
+        with self.__lock:
+            for jobAttributes in jobsAttributes:
+                self.__add(siteName, jobAttributes, 1)
+
+    def jobsStatusChanged(self, jobsAttributes, newStatuses):
+        """Discount the jobs leaving the counted statuses
+
+        The jobs entering them are counted by jobsMatched, which knows their new site.
+
+        :param dict jobsAttributes: job ID -> dict with Status, Site and the counted attributes before the change
+        :param dict newStatuses: job ID -> new status
+        """
+        with self.__lock:
+            for jobID, jobAttributes in jobsAttributes.items():
+                if jobAttributes.get("Status") in countedStatuses and newStatuses.get(jobID) not in countedStatuses:
+                    self.__add(jobAttributes.get("Site"), jobAttributes, -1)
+
+
+# Counters shared by all the Limiter and JobDB objects of the process
+gRunningJobCounters = RunningJobCounters()
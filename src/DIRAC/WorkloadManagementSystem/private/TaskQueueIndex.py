@@ -0,0 +1,305 @@
+""" In-memory index of the task queues, used by the TaskQueueDB to match resources without
+    building and running the (expensive) task queue matching SQL query.
+
+    The index holds the definition of every task queue (single and multi value fields, priority and
+    enabled counter), and inverted maps for the fields used to prune the candidates:
+    Site, GridCE, Platform, Tag and CPUTime segment.
+
+    It is rebuilt from the DB periodically (task queues may be created by other processes),
+    and kept coherent in between by the TaskQueueDB of this process.
+"""
+import random
+import string
+import threading
+import time
+
+from DIRAC import S_ERROR, S_OK
+from DIRAC.Core.Security import Properties
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+# Keep in sync with TaskQueueDB
+multiValueDefFields = ("Sites", "GridCEs", "BannedSites", "Platforms", "JobTypes", "Tags")
+# Match field -> task queue definition field
+multiValueMatchFields = {
+    "GridCE": "GridCEs",
+    "Site": "Sites",
+    "Platform": "Platforms",
+    "JobType": "JobTypes",
+    "Tag": "Tags",
+}
+# Fields for which an inverted map is kept
+indexedFields = ("Sites", "GridCEs", "Platforms", "Tags")
+# Minimum priority, see TaskQueueDB.TQ_MIN_SHARE
+minPriority = 0.001
+
+
+def _isAny(value):
+    """Check if a match value (string or list of strings) means "any" """
+    if isinstance(value, str):
+        value = [value]
+    table = str.maketrans("", "", string.punctuation)
+    return any(val.lower().translate(table) == "any" for val in value)
+
+
+def _asList(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class TaskQueueIndex:
+    """Inverted index of the task queues definitions"""
+
+    def __init__(self, lifeTime=300):
+        """c'tor
+
+        :param int lifeTime: number of seconds after which the index has to be reloaded from the DB
+        """
+        self.lifeTime = lifeTime
+        self.__lock = threading.Lock()
+        self.__lastLoad = 0
+        # TQId -> definition dict
+        self.__tqs = {}
+        # field -> value -> set of TQIds. The TQs without any value for the field are under the None key
+        self.__inverted = {field: {} for field in indexedFields}
+        # CPUTime -> set of TQIds
+        self.__cpuSegments = {}
+
+    def isStale(self):
+        """Does the index need to be reloaded from the DB"""
+        return time.time() - self.__lastLoad > self.lifeTime
+
+    def load(self, tqDefinitions):
+        """Replace the content of the index
+
+        :param dict tqDefinitions: TQId -> definition dict, with the keys OwnerDN, OwnerGroup, CPUTime,
+                                   Priority, Enabled and the multi value fields
+        """
+        tqs = {}
+        inverted = {field: {} for field in indexedFields}
+        cpuSegments = {}
+        for tqId, tqDef in tqDefinitions.items():
+            tqDef = self.__normalize(tqDef)
+            tqs[tqId] = tqDef
+            self.__indexTQ(tqId, tqDef, inverted, cpuSegments)
+        with self.__lock:
+            self.__tqs = tqs
+            self.__inverted = inverted
+            self.__cpuSegments = cpuSegments
+            self.__lastLoad = time.time()
+
+    @staticmethod
+    def __normalize(tqDef):
+        tqDef = dict(tqDef)
+        for field in multiValueDefFields:
+            tqDef[field] = frozenset(value for value in tqDef.get(field, []) if value.strip())
+        tqDef["Enabled"] = int(tqDef.get("Enabled", 0))
+        tqDef["Priority"] = float(tqDef.get("Priority", 1))
+        return tqDef
+
+    @staticmethod
+    def __indexTQ(tqId, tqDef, inverted, cpuSegments):
+        for field in indexedFields:
+            for value in tqDef[field] or (None,):
+                inverted[field].setdefault(value, set()).add(tqId)
+        cpuSegments.setdefault(tqDef["CPUTime"], set()).add(tqId)
+
+    @staticmethod
+    def __unindexTQ(tqId, tqDef, inverted, cpuSegments):
+        for field in indexedFields:
+            for value in tqDef[field] or (None,):
+                inverted[field].get(value, set()).discard(tqId)
+        cpuSegments.get(tqDef["CPUTime"], set()).discard(tqId)
+
+    def addTaskQueue(self, tqId, tqDef):
+        """Add (or replace) the definition of a task queue"""
+        tqDef = self.__normalize(tqDef)
+        with self.__lock:
+            if tqId in self.__tqs:
+                self.__unindexTQ(tqId, self.__tqs[tqId], self.__inverted, self.__cpuSegments)
+            self.__tqs[tqId] = tqDef
+            self.__indexTQ(tqId, tqDef, self.__inverted, self.__cpuSegments)
+
+    def removeTaskQueue(self, tqId):
+        """Remove a task queue from the index"""
+        with self.__lock:
+            tqDef = self.__tqs.pop(tqId, None)
+            if tqDef:
+                self.__unindexTQ(tqId, tqDef, self.__inverted, self.__cpuSegments)
+
+    def hasTaskQueue(self, tqId):
+        return tqId in self.__tqs
+
+    def updateEnabled(self, tqId, delta):
+        """Mirror of the `Enabled = Enabled +/- 1` update of the DB"""
+        with self.__lock:
+            if tqId in self.__tqs:
+                self.__tqs[tqId]["Enabled"] += delta
+
+    def enableAll(self):
+        with self.__lock:
+            for tqDef in self.__tqs.values():
+                tqDef["Enabled"] = 1
+
+    def setPriorities(self, prioDict):
+        """Update the priorities
+
+        :param dict prioDict: TQId -> priority
+        """
+        with self.__lock:
+            for tqId, prio in prioDict.items():
+                if tqId in self.__tqs:
+                    self.__tqs[tqId]["Priority"] = float(prio)
+
+    def __candidates(self, tqMatchDict):
+        """Prune the TQs using the inverted maps. Needs to be called with the lock held"""
+        candidates = None
+        if "CPUTime" in tqMatchDict:
+            cpuTime = max(_asList(tqMatchDict["CPUTime"]))
+            candidates = set()
+            for segment, tqIds in self.__cpuSegments.items():
+                if segment <= cpuTime:
+                    candidates |= tqIds
+        for matchField in ("Site", "GridCE", "Platform"):
+            fieldValue = tqMatchDict.get(matchField)
+            if not fieldValue or _isAny(fieldValue):
+                continue
+            inverted = self.__inverted[multiValueMatchFields[matchField]]
+            fieldCandidates = set(inverted.get(None, ()))
+            for value in _asList(fieldValue):
+                fieldCandidates |= inverted.get(value, set())
+            candidates = fieldCandidates if candidates is None else candidates & fieldCandidates
+        if candidates is None:
+            candidates = set(self.__tqs)
+        return candidates
+
+    def match(self, tqMatchDict, numQueuesToGet=1, negativeCond=None):
+        """Find the enabled task queues matching a resource description
+
+        This follows the semantics of the matching SQL query generated by the TaskQueueDB.
+        The task queues are sorted randomly, weighted by their priority.
+
+        :param dict tqMatchDict: resource description, with unescaped values
+        :param int numQueuesToGet: maximum number of task queues to return (0 for all of them)
+        :param negativeCond: dict or list of dicts of conditions that the task queues must not fulfil
+
+        :returns: S_OK( [ (TQId, OwnerDN, OwnerGroup) ] )
+        """
+        tagValues = tqMatchDict.get("Tag", [])
+        requiredTags = tqMatchDict.get("RequiredTag", [])
+        if isinstance(requiredTags, str):
+            requiredTags = [requiredTags]
+        if requiredTags and not _isAny(requiredTags):
+            if not set(requiredTags).issubset(set(_asList(tagValues))):
+                return S_ERROR("Wrong conditions")
+        else:
+            requiredTags = []
+
+        ownerConds = self.__getOwnerConditions(tqMatchDict)
+
+        with self.__lock:
+            candidates = self.__candidates(tqMatchDict)
+            matching = []
+            for tqId in candidates:
+                tqDef = self.__tqs[tqId]
+                if tqDef["Enabled"] < 1:
+                    continue
+                if not self.__matchTQ(tqDef, tqMatchDict, ownerConds, requiredTags):
+                    continue
+                if negativeCond and not self.__checkNegativeCond(tqDef, negativeCond):
+                    continue
+                matching.append((random.random() / max(tqDef["Priority"], minPriority), tqId, tqDef))
+
+        # Same as ORDER BY RAND() / Priority
+        matching.sort(key=lambda entry: entry[0])
+        if numQueuesToGet:
+            matching = matching[:numQueuesToGet]
+        return S_OK([(tqId, tqDef["OwnerDN"], tqDef["OwnerGroup"]) for _, tqId, tqDef in matching])
+
+    @staticmethod
+    def __getOwnerConditions(tqMatchDict):
+        """Build the owner conditions as a list of (OwnerDN or None, OwnerGroup or None) alternatives"""
+        if "OwnerDN" in tqMatchDict and "OwnerGroup" in tqMatchDict:
+            ownerConds = []
+            for group in _asList(tqMatchDict["OwnerGroup"]):
+                if Properties.JOB_SHARING in Registry.getPropertiesForGroup(group):
+                    ownerConds.append((None, group))
+                else:
+                    ownerConds.extend((dn, group) for dn in _asList(tqMatchDict["OwnerDN"]))
+            return [ownerConds]
+        # If not both are defined, each of them is a separate condition
+        return [
+            [(dn, None) for dn in _asList(tqMatchDict["OwnerDN"])] if "OwnerDN" in tqMatchDict else None,
+            [(None, group) for group in _asList(tqMatchDict["OwnerGroup"])] if "OwnerGroup" in tqMatchDict else None,
+        ]
+
+    @staticmethod
+    def __matchTQ(tqDef, tqMatchDict, ownerConds, requiredTags):
+        """Check a single task queue against the resource description"""
+        for ownerCond in ownerConds:
+            if ownerCond is None:
+                continue
+            if not any(
+                (dn is None or dn == tqDef["OwnerDN"]) and (group is None or group == tqDef["OwnerGroup"])
+                for dn, group in ownerCond
+            ):
+                return False
+
+        if "CPUTime" in tqMatchDict and not any(tqDef["CPUTime"] <= cpu for cpu in _asList(tqMatchDict["CPUTime"])):
+            return False
+
+        for matchField, tqField in multiValueMatchFields.items():
+            if matchField == "Tag":
+                # No Tag and no RequiredTag means that the TQ should not have any tag
+                if "Tag" not in tqMatchDict and "RequiredTag" not in tqMatchDict:
+                    tags = []
+                elif "Tag" not in tqMatchDict:
+                    continue
+                else:
+                    tags = _asList(tqMatchDict["Tag"])
+                    if _isAny(tags):
+                        continue
+                # All the TQ tags have to be provided by the resource
+                if not tqDef["Tags"].issubset(tags):
+                    return False
+                continue
+            fieldValue = tqMatchDict.get(matchField)
+            if not fieldValue or _isAny(fieldValue):
+                continue
+            if tqDef[tqField] and not any(value in tqDef[tqField] for value in _asList(fieldValue)):
+                return False
+            # In case of Site, check it's not in job banned sites
+            if matchField == "Site":
+                if not any(value not in tqDef["BannedSites"] for value in _asList(fieldValue)):
+                    return False
+
+        if requiredTags and not tqDef["Tags"].issuperset(requiredTags):
+            return False
+
+        # Resource banning conditions
+        for matchField, tqField in multiValueMatchFields.items():
+            bannedValue = tqMatchDict.get(f"Banned{matchField}")
+            if not bannedValue or _isAny(bannedValue):
+                continue
+            if not any(value not in tqDef[tqField] for value in _asList(bannedValue)):
+                return False
+        return True
+
+    @classmethod
+    def __checkNegativeCond(cls, tqDef, negativeCond):
+        """Negative conditions: a list of dicts is an OR of its dicts"""
+        if isinstance(negativeCond, (list, tuple)):
+            return any(cls.__checkNegativeDictCond(tqDef, condDict) for condDict in negativeCond)
+        return cls.__checkNegativeDictCond(tqDef, negativeCond)
+
+    @staticmethod
+    def __checkNegativeDictCond(tqDef, negativeCond):
+        """not ( cond1 and cond2 ) = ( not cond1 or not cond 2 )"""
+        for field, values in negativeCond.items():
+            if field in multiValueMatchFields:
+                if all(value not in tqDef[multiValueMatchFields[field]] for value in _asList(values)):
+                    return True
+            elif field in ("OwnerDN", "OwnerGroup", "CPUTime"):
+                if any(str(value) != str(tqDef[field]) for value in _asList(values)):
+                    return True
+        return False
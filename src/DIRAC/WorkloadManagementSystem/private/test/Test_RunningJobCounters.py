@@ -0,0 +1,70 @@
+""" Test the in-memory counters of running jobs used by the Limiter
+"""
+from DIRAC.WorkloadManagementSystem.private.RunningJobCounters import RunningJobCounters
+
+
+def loadedCounters():
+    counters = RunningJobCounters()
+    counters.load(
+        {"Site.A.ch": ["JobType", "Owner"], "Site.B.ch": ["JobType"]},
+        [
+            ({"Site": "Site.A.ch", "JobType": "User", "Owner": "alice"}, 2),
+            ({"Site": "Site.A.ch", "JobType": "User", "Owner": "bob"}, 3),
+            ({"Site": "Site.A.ch", "JobType": "MC", "Owner": "bob"}, 1),
+            ({"Site": "Site.B.ch", "JobType": "MC", "Owner": "bob"}, 4),
+            # Not a limited site
+            ({"Site": "Site.C.ch", "JobType": "MC", "Owner": "bob"}, 4),
+        ],
+    )
+    return counters
+
+
+def test_load():
+    counters = RunningJobCounters()
+    assert counters.isStale(60)
+    assert counters.attributes == []
+    assert counters.getCounters("Site.A.ch", "JobType") is None
+
+    counters = loadedCounters()
+    assert not counters.isStale(60)
+    assert counters.attributes == ["JobType", "Owner"]
+    assert counters.getAttributes("Site.A.ch") == ["JobType", "Owner"]
+    assert counters.getAttributes("Site.C.ch") == []
+    assert counters.getCounters("Site.A.ch", "JobType") == {"User": 5, "MC": 1}
+    assert counters.getCounters("Site.A.ch", "Owner") == {"alice": 2, "bob": 4}
+    assert counters.getCounters("Site.B.ch", "JobType") == {"MC": 4}
+    assert counters.getCounters("Site.B.ch", "Owner") is None
+    assert counters.getCounters("Site.C.ch", "JobType") is None
+
+
+def test_updates():
+    counters = loadedCounters()
+    counters.jobsMatched("Site.A.ch", [{"JobType": "MC", "Owner": "carol"}, {"JobType": "MC", "Owner": "bob"}])
+    counters.jobsMatched("Site.C.ch", [{"JobType": "MC"}])
+    assert counters.getCounters("Site.A.ch", "JobType") == {"User": 5, "MC": 3}
+    assert counters.getCounters("Site.A.ch", "Owner") == {"alice": 2, "bob": 5, "carol": 1}
+
+    counters.jobsStatusChanged(
+        {
+            1: {"Status": "Running", "Site": "Site.A.ch", "JobType": "User", "Owner": "alice"},
+            2: {"Status": "Matched", "Site": "Site.A.ch", "JobType": "MC", "Owner": "carol"},
+            # Still counted
+            3: {"Status": "Running", "Site": "Site.A.ch", "JobType": "User", "Owner": "bob"},
+            # Was not counted
+            4: {"Status": "Waiting", "Site": "Site.A.ch", "JobType": "User", "Owner": "bob"},
+            # Not counted site
+            5: {"Status": "Running", "Site": "Site.C.ch", "JobType": "MC", "Owner": "bob"},
+        },
+        {1: "Done", 2: "Rescheduled", 3: "Stalled", 4: "Matched", 5: "Failed"},
+    )
+    assert counters.getCounters("Site.A.ch", "JobType") == {"User": 4, "MC": 2}
+    assert counters.getCounters("Site.A.ch", "Owner") == {"alice": 1, "bob": 5, "carol": 0}
+
+    # The counters never go below 0
+    counters.jobsStatusChanged({1: {"Status": "Running", "Site": "Site.B.ch", "JobType": "User"}}, {1: "Done"})
+    assert counters.getCounters("Site.B.ch", "JobType") == {"MC": 4, "User": 0}
+
+    # Reconciliation replaces everything
+    counters.load({"Site.B.ch": ["JobType"]}, [])
+    assert counters.getCounters("Site.A.ch", "JobType") is None
+    assert counters.getCounters("Site.B.ch", "JobType") == {}
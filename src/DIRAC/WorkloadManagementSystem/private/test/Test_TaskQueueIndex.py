@@ -0,0 +1,85 @@
+""" Test the in-memory task queue index
+"""
+import pytest
+
+from DIRAC.WorkloadManagementSystem.private import TaskQueueIndex as moduleTested
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+DN1 = "/DC=org/CN=user1"
+DN2 = "/DC=org/CN=user2"
+
+tqDefinitions = {
+    1: {"OwnerDN": DN1, "OwnerGroup": "prod", "CPUTime": 3600, "Priority": 1.0, "Enabled": 1},
+    2: {"OwnerDN": DN1, "OwnerGroup": "prod", "CPUTime": 86400, "Priority": 1.0, "Enabled": 1, "Sites": ["Site1"]},
+    3: {"OwnerDN": DN2, "OwnerGroup": "user", "CPUTime": 360, "Priority": 1.0, "Enabled": 1, "Tags": ["MultiProc"]},
+    4: {"OwnerDN": DN2, "OwnerGroup": "user", "CPUTime": 360, "Priority": 1.0, "Enabled": 1, "BannedSites": ["Site1"]},
+    5: {"OwnerDN": DN2, "OwnerGroup": "user", "CPUTime": 360, "Priority": 1.0, "Enabled": 0},
+    6: {"OwnerDN": DN1, "OwnerGroup": "prod", "CPUTime": 360, "Priority": 1.0, "Enabled": 1, "Platforms": ["EL9"]},
+}
+
+
+@pytest.fixture
+def tqIndex(monkeypatch):
+    monkeypatch.setattr(moduleTested.Registry, "getPropertiesForGroup", lambda group: [])
+    index = TaskQueueIndex()
+    index.load(tqDefinitions)
+    return index
+
+
+def matchIds(index, matchDict, negativeCond=None):
+    result = index.match(matchDict, numQueuesToGet=0, negativeCond=negativeCond)
+    assert result["OK"], result
+    return sorted(tq[0] for tq in result["Value"])
+
+
+@pytest.mark.parametrize(
+    "matchDict, expected",
+    [
+        ({"CPUTime": 100000}, [1, 2, 4, 6]),
+        ({"CPUTime": 3600}, [1, 4, 6]),
+        ({"CPUTime": 100000, "Site": "Site1"}, [1, 2, 6]),
+        ({"CPUTime": 100000, "Site": "Site2"}, [1, 4, 6]),
+        ({"CPUTime": 100000, "Site": "ANY"}, [1, 2, 4, 6]),
+        ({"CPUTime": 100000, "Tag": ["MultiProc"]}, [1, 2, 3, 4, 6]),
+        ({"CPUTime": 100000, "Tag": ["MultiProc"], "RequiredTag": "MultiProc"}, [3]),
+        ({"CPUTime": 100000, "Platform": ["EL8"]}, [1, 2, 4]),
+        ({"CPUTime": 100000, "Platform": ["EL8", "EL9"]}, [1, 2, 4, 6]),
+        ({"CPUTime": 100000, "BannedSite": ["Site1"]}, [1, 4, 6]),
+        ({"CPUTime": 100000, "OwnerGroup": "prod"}, [1, 2, 6]),
+        ({"CPUTime": 100000, "OwnerGroup": "user", "OwnerDN": DN1}, []),
+        ({"CPUTime": 100000, "OwnerGroup": ["user", "prod"], "OwnerDN": DN1}, [1, 2, 6]),
+    ],
+)
+def test_match(tqIndex, matchDict, expected):
+    assert matchIds(tqIndex, matchDict) == expected
+
+
+def test_requiredTagNotProvided(tqIndex):
+    result = tqIndex.match({"CPUTime": 100000, "RequiredTag": "GPU"})
+    assert not result["OK"]
+
+
+def test_negativeCond(tqIndex):
+    assert matchIds(tqIndex, {"CPUTime": 100000}, negativeCond={"Site": ["Site1"]}) == [1, 4, 6]
+    assert matchIds(tqIndex, {"CPUTime": 100000}, negativeCond={"Site": "Site1", "OwnerGroup": ["prod"]}) == [1, 4, 6]
+    assert matchIds(tqIndex, {"CPUTime": 100000}, negativeCond={"OwnerGroup": ["prod"]}) == [4]
+
+
+def test_updates(tqIndex):
+    tqIndex.updateEnabled(1, -1)
+    assert matchIds(tqIndex, {"CPUTime": 3600}) == [4, 6]
+    tqIndex.updateEnabled(1, 1)
+    tqIndex.removeTaskQueue(4)
+    assert matchIds(tqIndex, {"CPUTime": 3600}) == [1, 6]
+    tqIndex.addTaskQueue(7, {"OwnerDN": DN1, "OwnerGroup": "prod", "CPUTime": 360, "Enabled": 1, "Sites": ["Site2"]})
+    assert matchIds(tqIndex, {"CPUTime": 3600, "Site": "Site2"}) == [1, 6, 7]
+    assert matchIds(tqIndex, {"CPUTime": 3600, "Site": "Site1"}) == [1, 6]
+    tqIndex.enableAll()
+    assert matchIds(tqIndex, {"CPUTime": 3600}) == [1, 5, 6, 7]
+
+
+def test_priorities(tqIndex):
+    tqIndex.setPriorities({1: 1000000.0, 6: 0.001})
+    result = tqIndex.match({"CPUTime": 3600}, numQueuesToGet=1)
+    assert result["OK"], result
+    assert result["Value"] == [(1, DN1, "prod")]
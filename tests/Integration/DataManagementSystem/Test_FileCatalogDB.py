@@ -1453,6 +1453,133 @@ class DirectoryUsageCase(FileCatalogDBTestCase):
 
         ###################
 
+    def test_directoryUsageVerification(self):
+        """The drift of the DirectoryUsage is corrected by the verification"""
+
+        # Only admin can run that, and the verification is for the FileManager usage tables
+        if not isAdmin or DATABASE_CONFIG["FileManager"] == "FileManagerPs":
+            return
+
+        d1 = "/usageTest/d1"
+        f1 = d1 + "/f1"
+        f1Size = 3000000000
+
+        ret = self.db.addSE("se1", credDict)
+        self.assertTrue(ret["OK"])
+        ret = self.db.createDirectory(d1, credDict)
+        self.assertTrue(ret["OK"])
+        ret = self.db.addFile(
+            {f1: {"PFN": "f1se1", "SE": "se1", "Size": f1Size, "GUID": "1004", "Checksum": "1"}}, credDict
+        )
+        self.assertTrue(ret["OK"])
+
+        # Nothing to correct
+        ret = self.db.verifyDirectoryUsage("/usageTest")
+        self.assertTrue(ret["OK"], ret)
+        self.assertEqual(ret["Value"], 0)
+
+        # Make the usage of d1 drift, for the logical and the physical usage
+        dirID = self.db.dtree.findDir(d1)["Value"]
+        ret = self.db._update(f"UPDATE FC_DirectoryUsage SET SESize=SESize+10, SEFiles=SEFiles+1 WHERE DirID={dirID}")
+        self.assertTrue(ret["OK"], ret)
+
+        ret = self.db.verifyDirectoryUsage(d1, recursive=False)
+        self.assertTrue(ret["OK"], ret)
+        self.assertEqual(ret["Value"], 2)
+        ret = self.getAndCompareDirectorySize(["/usageTest", d1])
+        val = ret["Value"]["Successful"]
+        self.assertEqual(self.getLogicalSize(val, d1), (1, f1Size))
+        self.assertEqual(self.getPhysicalSize(val, d1, "se1"), (1, f1Size))
+
+        # A missing entry of a parent is also restored
+        parentID = self.db.dtree.findDir("/usageTest")["Value"]
+        ret = self.db._update(f"DELETE FROM FC_DirectoryUsage WHERE DirID={parentID}")
+        self.assertTrue(ret["OK"], ret)
+
+        ret = self.db.verifyDirectoryUsage("/usageTest")
+        self.assertTrue(ret["OK"], ret)
+        self.assertEqual(ret["Value"], 2)
+        ret = self.getAndCompareDirectorySize(["/usageTest"])
+        self.assertEqual(self.getLogicalSize(ret["Value"]["Successful"], "/usageTest"), (1, f1Size))
+
+        ret = self.db.removeFile([f1], credDict)
+        self.assertTrue(ret["OK"])
+        ret = self.db.removeDirectory([d1, "/usageTest"], credDict)
+        self.assertTrue(ret["OK"])
+
+
+class DirectoryMetadataCase(FileCatalogDBTestCase):
+    metaDirs = {
+        "/metaTest/data": {"MetaTestType": "data"},
+        "/metaTest/data/run1": {"MetaTestRun": "1"},
+        "/metaTest/data/run1/raw": {"MetaTestStage": "raw"},
+        "/metaTest/data/run1/reco": {"MetaTestStage": "reco"},
+        "/metaTest/data/run2": {"MetaTestRun": "2"},
+        "/metaTest/data/run2/raw": {"MetaTestStage": "raw"},
+        "/metaTest/mc": {"MetaTestType": "mc"},
+    }
+
+    def setUp(self):
+        super().setUp()
+        for metaName in ("MetaTestType", "MetaTestRun", "MetaTestStage"):
+            result = self.db.dmeta.addMetadataField(metaName, "VARCHAR(128)", credDict)
+            self.assertTrue(result["OK"], result)
+        for path, metaDict in self.metaDirs.items():
+            result = self.db.dtree.makeDirectories(path, credDict)
+            self.assertTrue(result["OK"], result)
+            result = self.db.dmeta.setMetadata(path, metaDict, credDict)
+            self.assertTrue(result["OK"], result)
+
+    def tearDown(self):
+        for metaName in ("MetaTestType", "MetaTestRun", "MetaTestStage"):
+            self.db.dmeta.deleteMetadataField(metaName, credDict)
+        self.db.dtree.removeDirectory(sorted(self.metaDirs, reverse=True) + ["/metaTest"])
+
+    def findDirectories(self, queryDict):
+        result = self.db.dmeta.findDirectoriesByMetadata(queryDict, "/metaTest", credDict)
+        self.assertTrue(result["OK"], result)
+        return sorted(result["Value"].values())
+
+    def test_metadataQueries(self):
+        """Queries with several conditions, evaluated in a single query"""
+        self.assertEqual(
+            self.findDirectories({"MetaTestType": "data", "MetaTestStage": "raw"}),
+            ["/metaTest/data/run1/raw", "/metaTest/data/run2/raw"],
+        )
+        self.assertEqual(
+            self.findDirectories({"MetaTestStage": "raw", "MetaTestRun": "1"}), ["/metaTest/data/run1/raw"]
+        )
+        self.assertEqual(
+            self.findDirectories({"MetaTestType": "data", "MetaTestStage": "Missing"}),
+            ["/metaTest/data", "/metaTest/data/run1", "/metaTest/data/run2"],
+        )
+        self.assertEqual(self.findDirectories({"MetaTestType": "mc", "MetaTestStage": "raw"}), ["None"])
+
+        result = self.db.dmeta.getCompatibleMetadata({"MetaTestRun": "2"}, "/metaTest", credDict)
+        self.assertTrue(result["OK"], result)
+        self.assertEqual(result["Value"]["MetaTestStage"], ["raw"])
+
+    def test_metadataQueryCache(self):
+        """The cached results are invalidated by the changes of the metadata and of the directories"""
+        self.db.metaQueryCacheLifeTime = 60
+        try:
+            queryDict = {"MetaTestType": "data", "MetaTestStage": "raw"}
+            self.assertEqual(self.findDirectories(queryDict), ["/metaTest/data/run1/raw", "/metaTest/data/run2/raw"])
+
+            result = self.db.dmeta.setMetadata("/metaTest/data/run1/reco", {"MetaTestStage": "raw"}, credDict)
+            self.assertTrue(result["OK"], result)
+            self.assertEqual(
+                self.findDirectories(queryDict),
+                ["/metaTest/data/run1/raw", "/metaTest/data/run1/reco", "/metaTest/data/run2/raw"],
+            )
+
+            result = self.db.dtree.makeDirectories("/metaTest/data/run2/raw/sub", credDict)
+            self.assertTrue(result["OK"], result)
+            self.assertIn("/metaTest/data/run2/raw/sub", self.findDirectories(queryDict))
+            self.db.dtree.removeDirectory(["/metaTest/data/run2/raw/sub"])
+        finally:
+            self.db.metaQueryCacheLifeTime = 0
+
 
 def _makeTestSuite():
     # In Python 3 TestSuite cannot easily be re-used as the tests are cleaned up by default
@@ -1462,6 +1589,7 @@ def _makeTestSuite():
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ReplicaCase))
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DirectoryCase))
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DirectoryUsageCase))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DirectoryMetadataCase))
     return suite
 
 
@@ -11,7 +11,9 @@ from pytest import fixture
 
 from DIRAC.RequestManagementSystem.DB.RequestDB import RequestDB
 from DIRAC.RequestManagementSystem.DB.test.RMSTestScenari import (
+    test_concurrentLease,
     test_dirty,
+    test_lease,
     test_scheduled,
     test_stress,
     test_stressBulk,
@@ -16,6 +16,7 @@ import DIRAC
 
 DIRAC.initialize()  # Initialize configuration
 
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
 from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
 
 
@@ -1137,3 +1138,62 @@ def test_TQ():
 
     result = tqDB.deleteTaskQueueIfEmpty(tq)
     assert result["OK"]
+
+
+def test_matchWithIndex():
+    """The in-memory task queue index gives the same matches as the SQL query"""
+    gConfigurationData.setOptionInCFG("/Operations/Defaults/JobScheduling/UseTaskQueueIndex", "True")
+    try:
+        tqDefDict = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "CPUTime": 5000, "Sites": ["Site_1"]}
+        result = tqDB.insertJob(201, tqDefDict, 10)
+        assert result["OK"]
+        tqDefDict = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "CPUTime": 5000, "BannedSites": ["Site_1"]}
+        result = tqDB.insertJob(202, tqDefDict, 10)
+        assert result["OK"]
+
+        result = tqDB.matchAndGetJob({"CPUTime": 300000, "Site": "Site_2"})
+        assert result["OK"]
+        assert result["Value"]["matchFound"] is True
+        assert result["Value"]["jobId"] == 202
+
+        result = tqDB.matchAndGetJob({"CPUTime": 300000, "Site": "Site_1"})
+        assert result["OK"]
+        assert result["Value"]["matchFound"] is True
+        assert result["Value"]["jobId"] == 201
+
+        result = tqDB.matchAndGetJob({"CPUTime": 300000, "Site": "Site_1"})
+        assert result["OK"]
+        assert result["Value"]["matchFound"] is False
+    finally:
+        gConfigurationData.deleteOptionInCFG("/Operations/Defaults/JobScheduling/UseTaskQueueIndex")
+        tqDB.cleanOrphanedTaskQueues()
+
+
+def test_matchAndGetJobs():
+    """Several jobs are taken out of the task queues at once"""
+    tqDefDict = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "CPUTime": 5000}
+    for jobId in (301, 302, 303):
+        result = tqDB.insertJob(jobId, tqDefDict, 10)
+        assert result["OK"]
+    tqDefDict = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "CPUTime": 5000, "Sites": ["Site_1"]}
+    result = tqDB.insertJob(304, tqDefDict, 10)
+    assert result["OK"]
+
+    result = tqDB.matchAndGetJobs({"CPUTime": 300000, "Site": "Site_2"}, 2)
+    assert result["OK"]
+    assert result["Value"]["matchFound"] is True
+    firstJobs = {jobId for jobId, _tqId in result["Value"]["jobs"]}
+    assert len(firstJobs) == 2
+    assert firstJobs < {301, 302, 303}
+
+    # Jobs from several task queues
+    result = tqDB.matchAndGetJobs({"CPUTime": 300000, "Site": "Site_1"}, 10)
+    assert result["OK"]
+    assert {jobId for jobId, _tqId in result["Value"]["jobs"]} == {301, 302, 303, 304} - firstJobs
+
+    result = tqDB.matchAndGetJobs({"CPUTime": 300000, "Site": "Site_1"}, 10)
+    assert result["OK"]
+    assert result["Value"]["matchFound"] is False
+    assert result["Value"]["jobs"] == []
+
+    tqDB.cleanOrphanedTaskQueues()
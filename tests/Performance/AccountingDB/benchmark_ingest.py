@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+""" Compare the number of records per second inserted from the in table of the AccountingDB
+    one by one (previous behaviour) and in bundles aggregated per bucket.
+
+    It needs a local AccountingDB (which should of course be properly defined in the configuration),
+    in which it registers a temporary type with the definition of the Job type, filled with synthetic
+    records: DO NOT run it against a production DB.
+
+    Usage::
+
+      python benchmark_ingest.py [--records 20000] [--users 20] [--sites 50] [--bundle 100]
+"""
+import argparse
+import random
+import time
+
+import DIRAC
+
+DIRAC.initialize()  # Initialize configuration
+
+from DIRAC.AccountingSystem.Client.Types.Job import Job
+from DIRAC.AccountingSystem.DB.AccountingDB import AccountingDB, _getTableName
+from DIRAC.Core.Utilities import TimeUtilities
+
+TYPE_NAME = "Benchmark_Job"
+
+
+def generateRecords(nbRecords, nbUsers, nbSites):
+    """Job records of the last two days, sharing their keys as production jobs do"""
+    now = int(TimeUtilities.toEpoch())
+    records = []
+    for _ in range(nbRecords):
+        execTime = random.randint(60, 36000)
+        endTime = now - random.randint(0, 2 * 86400)
+        keys = [
+            f"user{random.randrange(nbUsers)}",
+            "prod",
+            "00001234",
+            "MCSimulation",
+            "unknown",
+            "Sim",
+            f"LCG.Site{random.randrange(nbSites)}.org",
+            "Done",
+            random.choice(["Execution Complete", "Application Finished With Errors"]),
+        ]
+        values = [int(execTime * 0.9), int(execTime * 9), execTime, 0, 1024**3, 0, 1, 0, 10000, 20000, 0]
+        records.append((TYPE_NAME, endTime - execTime, endTime, keys + values))
+    return records
+
+
+def queueRecords(acDB, records):
+    """Insert the records in the in table, return the tuples given to the insertion threads"""
+    now = TimeUtilities.toEpoch()
+    recordTuples = []
+    for typeName, startTime, endTime, valuesList in records:
+        result = acDB._AccountingDB__insertInQueueTable(typeName, startTime, endTime, valuesList)
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+        recordTuples.append((result["Value"], typeName, startTime, endTime, list(valuesList), now))
+    return recordTuples
+
+
+def insertOneByOne(acDB, recordTuples, _bundleSize):
+    """Previous behaviour: each record is inserted in its buckets, and deleted from the in table"""
+    for iD, typeName, startTime, endTime, valuesList, _ in recordTuples:
+        result = acDB.insertRecordDirectly(typeName, startTime, endTime, valuesList)
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+        acDB._update("DELETE FROM `{}` WHERE id={}".format(_getTableName("in", typeName), iD))
+
+
+def insertInBundles(acDB, recordTuples, bundleSize):
+    """Bundles of RecordsPerSlot records, as queued by loadPendingRecords"""
+    for index in range(0, len(recordTuples), bundleSize):
+        acDB._AccountingDB__insertFromINTable(recordTuples[index : index + bundleSize])
+
+
+def bucketsSummary(acDB):
+    """Totals of the buckets, to check that both modes give the same result"""
+    result = acDB._query(
+        "SELECT COUNT(*), ROUND(SUM(`entriesInBucket`)), ROUND(SUM(`ExecTime`)) FROM `%s`"
+        % _getTableName("bucket", TYPE_NAME)
+    )
+    if not result["OK"]:
+        raise RuntimeError(result["Message"])
+    return result["Value"][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000, help="Number of records to insert")
+    parser.add_argument("--users", type=int, default=20, help="Number of users")
+    parser.add_argument("--sites", type=int, default=50, help="Number of sites")
+    parser.add_argument("--bundle", type=int, default=100, help="Records per bundle (RecordsPerSlot)")
+    args = parser.parse_args()
+
+    acDB = AccountingDB()
+    job = Job()
+    result = acDB.registerType(TYPE_NAME, job.definitionKeyFields, job.definitionAccountingFields, job.bucketsLength)
+    if not result["OK"]:
+        raise RuntimeError(result["Message"])
+    try:
+        records = generateRecords(args.records, args.users, args.sites)
+        for name, insertFunction in (("one by one", insertOneByOne), ("bundles", insertInBundles)):
+            for tableType in ("type", "bucket"):
+                acDB._update("DELETE FROM `%s`" % _getTableName(tableType, TYPE_NAME))
+            recordTuples = queueRecords(acDB, records)
+            start = time.time()
+            insertFunction(acDB, recordTuples, args.bundle)
+            elapsed = time.time() - start
+            nbBuckets, entries, execTime = bucketsSummary(acDB)
+            print(
+                f"{name:>10}: {args.records / elapsed:10.1f} records/s "
+                f"({nbBuckets} buckets, {entries} entries, {execTime} s of ExecTime)"
+            )
+    finally:
+        acDB.deleteType(TYPE_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+""" Benchmark of the configuration lookups done by gConfig.getValue
+
+Compares the cached lookups of ``ConfigurationData`` with the previous implementation,
+which walked the CFG tree level by level, under the danger zone lock, at every call.
+The lookups are spread over a configuration of the size of a production one.
+
+Usage::
+
+  python benchmark_getValue.py [--lookups 200000] [--threads 1] [--repeat 3]
+"""
+import argparse
+import threading
+import time
+
+from diraccfg import CFG
+
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+
+
+class LegacyConfigurationData(ConfigurationData):
+    """Previous lookup logic: walk mergedCFG at every call"""
+
+    def extractOptionFromCFG(self, path, cfg=False, disableDangerZones=False):
+        return super().extractOptionFromCFG(path, cfg or self.mergedCFG, disableDangerZones)
+
+
+def generateCFG(nbSites=500, nbCEs=5):
+    """Resources section shaped like the one of a big VO"""
+    cfg = CFG()
+    for site in range(nbSites):
+        for ce in range(nbCEs):
+            cePath = f"Resources/Sites/LCG/LCG.Site{site}.org/CEs/ce{ce}.site{site}.org"
+            cfg.setOption(f"{cePath}/CEType", "HTCondorCE")
+            cfg.setOption(f"{cePath}/Queues/long/maxCPUTime", "2880")
+            cfg.setOption(f"{cePath}/Queues/long/SI00", "3000")
+    cfg.setOption("Operations/Defaults/JobScheduling/CheckJobLimits", "True")
+    return cfg
+
+
+def lookupPaths(nbLookups, nbSites=500, nbCEs=5):
+    """Paths looked up by the clients, with the usual hot spots"""
+    paths = []
+    for index in range(nbLookups):
+        site, ce = index % nbSites, index % nbCEs
+        if index % 3:
+            paths.append("/Operations/Defaults/JobScheduling/CheckJobLimits")
+        else:
+            paths.append(f"/Resources/Sites/LCG/LCG.Site{site}.org/CEs/ce{ce}.site{site}.org/Queues/long/maxCPUTime")
+    return paths
+
+
+def measure(confData, paths, nbThreads):
+    """Lookup all the paths in each thread, return the number of lookups per second"""
+
+    def lookupAll():
+        for path in paths:
+            confData.extractOptionFromCFG(path)
+
+    threads = [threading.Thread(target=lookupAll) for _ in range(nbThreads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(paths) * nbThreads / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200000, help="Number of lookups per thread")
+    parser.add_argument("--threads", type=int, default=1, help="Number of threads doing lookups")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of measurements per implementation")
+    args = parser.parse_args()
+
+    cfg = generateCFG()
+    paths = lookupPaths(args.lookups)
+    print(f"{args.lookups} lookups in {args.threads} thread(s)")
+    for name, confDataClass in (("legacy", LegacyConfigurationData), ("cached", ConfigurationData)):
+        confData = confDataClass(loadDefaultCFG=False)
+        confData.setRemoteCFG(cfg)
+        best = max(measure(confData, paths, args.threads) for _ in range(args.repeat))
+        print(f"{name:>10}: {best:12.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+""" Benchmark of the DISET transport encoding path
+
+Compares the streaming ``BaseTransport.sendData``/``receiveData`` with the previous
+implementation, which joined the whole encoded payload (twice) before sending it,
+and buffered the whole reply in a ``BytesIO`` before decoding it.
+
+Each measurement runs in a fresh process, so that the peak RSS is meaningful.
+
+Usage::
+
+  python benchmark_encoding.py [--lfns 100000] [--repeat 3] [--dencode]
+"""
+import argparse
+import multiprocessing
+import resource
+import socket
+import threading
+import time
+from io import BytesIO
+
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+from DIRAC.Core.Utilities import MixedEncode
+from DIRAC.Core.Utilities.ReturnValues import S_OK
+
+
+class LegacyTransport(PlainTransport):
+    """Transport reproducing the previous, non streaming, send/receive logic (keep alives excepted)"""
+
+    def sendData(self, uData, prefix=b""):
+        sCodedData = MixedEncode.encode(uData)
+        if isinstance(sCodedData, str):
+            sCodedData = sCodedData.encode()
+        dataToSend = b"".join([prefix, str(len(sCodedData)).encode(), b":", sCodedData])
+        for index in range(0, len(dataToSend), self.packetSize):
+            result = self._write(dataToSend[index : index + self.packetSize])
+            if not result["OK"]:
+                return result
+        return S_OK()
+
+    def receiveData(self, maxBufferSize=0, blockAfterKeepAlive=True, idleReceive=False):
+        while self.byteStream.find(b":", 0, 10) == -1:
+            self.byteStream += self._read(16384)["Value"]
+        iSeparatorPosition = self.byteStream.find(b":", 0, 10)
+        pkgSize = int(self.byteStream[:iSeparatorPosition])
+        pkgMem = BytesIO()
+        pkgMem.write(self.byteStream[iSeparatorPosition + 1 :])
+        readSize = pkgMem.tell()
+        while readSize < pkgSize:
+            rcvData = self._read(pkgSize - readSize, skipReadyCheck=True)["Value"]
+            readSize += len(rcvData)
+            pkgMem.write(rcvData)
+        self.byteStream = b""
+        return MixedEncode.decode(pkgMem.getvalue())[0]
+
+
+def generatePayload(nbLFNs):
+    """Reply shaped like a bulk FileCatalog answer"""
+    return S_OK(
+        {
+            "Successful": {
+                f"/vo/data/run{i // 1000:06d}/file_{i:08d}.raw": {
+                    "Size": 3 * 1024**3 + i,
+                    "Checksum": f"{i:08x}",
+                    "SE": ["SE-DISK-1", "SE-TAPE-1"],
+                }
+                for i in range(nbLFNs)
+            },
+            "Failed": {},
+        }
+    )
+
+
+def runOnce(transportClass, nbLFNs, queue):
+    """Send one payload through a socket pair and measure the throughput and the peak RSS"""
+    payload = generatePayload(nbLFNs)
+    baseRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    senderSocket, receiverSocket = socket.socketpair()
+    sender = transportClass(("", 0))
+    sender.oSocket = senderSocket
+    receiver = transportClass(("", 0))
+    receiver.oSocket = receiverSocket
+
+    start = time.time()
+    thread = threading.Thread(target=sender.sendData, args=(payload,))
+    thread.start()
+    received = receiver.receiveData()
+    thread.join()
+    elapsed = time.time() - start
+
+    assert received == payload
+    peakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peakRSS - baseRSS) / 1024.0))
+
+
+def measure(transportClass, nbLFNs):
+    """Run a measurement in a separate process"""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=runOnce, args=(transportClass, nbLFNs, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lfns", type=int, default=100000, help="Number of LFNs in the payload")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of measurements per implementation")
+    parser.add_argument("--dencode", action="store_true", help="Use DEncode instead of JSON")
+    args = parser.parse_args()
+
+    if args.dencode:
+        import os
+
+        os.environ["DIRAC_USE_JSON_ENCODE"] = "No"
+
+    print(f"Payload of {args.lfns} LFNs ({'DEncode' if args.dencode else 'JSON'})")
+    for name, transportClass in (("legacy", LegacyTransport), ("streaming", PlainTransport)):
+        results = [measure(transportClass, args.lfns) for _ in range(args.repeat)]
+        bestTime = min(res[0] for res in results)
+        peakRSS = max(res[1] for res in results)
+        print(f"{name:>10}: {args.lfns / bestTime:12.0f} LFNs/s, extra peak RSS {peakRSS:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
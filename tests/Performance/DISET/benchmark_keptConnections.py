@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+""" Benchmark of the RPC connections kept open between calls
+
+Measures the number of RPC calls per second made by a client to a local echo service:
+
+  * with a new connection for each call (full TCP and TLS handshakes)
+  * with a new connection for each call, resuming the TLS session (dips only)
+  * reusing the connection kept open by the service
+
+By default, the service uses the PlainTransport (dip). With ``--ssl``, it uses the M2SSLTransport (dips),
+with the given host certificate, which is also used by the client.
+
+Usage::
+
+  python benchmark_keptConnections.py [--calls 1000] [--ssl --ca <dir> --cert <pem> --key <pem>]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.TransportPool import getGlobalIdleTransportPool, getGlobalTransportPool
+from DIRAC.Core.DISET.private.Transports import M2SSLTransport
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+
+class EchoService(Service):
+    """Service answering its arguments, without handler nor authorization"""
+
+    def __init__(self):
+        self._name = "Test/Echo"
+        self._validNames = [self._name]
+        self._cfg = MagicMock()
+        self._cfg.getKeepConnectionTime.return_value = 10
+        self._lockManager = MagicMock()
+        self._transportPool = getGlobalTransportPool()
+        self._threadPool = ThreadPoolExecutor(4)
+        self._Service__maxFD = 0
+        self._Service__monitorLastStatsUpdate = time.time()
+        self.activityMonitoring = False
+
+    def _authorizeProposal(self, actionTuple, trid, credDict):
+        return S_OK()
+
+    def _instantiateHandler(self, trid, proposalTuple=None):
+        return S_OK(None)
+
+    def _executeAction(self, trid, proposalTuple, handlerObj):
+        args = self._transportPool.receive(trid)["Value"]
+        return self._transportPool.send(trid, S_OK(args))
+
+
+def serve(listener, service):
+    """Accept the connections and hand them to the service threads"""
+    while True:
+        result = listener.acceptConnection()
+        if result["OK"]:
+            service._threadPool.submit(service._processInThread, result["Value"])
+
+
+def measure(url, nbCalls, **kwargs):
+    """Make nbCalls RPCs, and return the number of calls per second"""
+    getGlobalIdleTransportPool().clear()
+    client = InnerRPCClient(url, **kwargs)
+    start = time.time()
+    for i in range(nbCalls):
+        result = client.executeRPC("echo", (i,))
+        assert result["OK"], result
+    return nbCalls / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="Number of calls per measurement")
+    parser.add_argument("--ssl", action="store_true", help="Use dips instead of dip")
+    parser.add_argument("--ca", help="CA directory (dips)")
+    parser.add_argument("--cert", help="Host certificate (dips)")
+    parser.add_argument("--key", help="Host key (dips)")
+    args = parser.parse_args()
+
+    if args.ssl:
+        gConfigurationData.setOptionInCFG("/DIRAC/Security/CALocation", args.ca)
+        gConfigurationData.setOptionInCFG("/DIRAC/Security/CertFile", args.cert)
+        gConfigurationData.setOptionInCFG("/DIRAC/Security/KeyFile", args.key)
+        listener = M2SSLTransport.SSLTransport(("", 0), bServerMode=True)
+        clientKwargs = {"useCertificates": True}
+    else:
+        listener = PlainTransport(("", 0), bServerMode=True)
+        clientKwargs = {}
+    assert listener.initAsServer()["OK"]
+    port = listener.getSocket().getsockname()[1]
+    url = f"{'dips' if args.ssl else 'dip'}://localhost:{port}/Test/Echo"
+    threading.Thread(target=serve, args=(listener, EchoService()), daemon=True).start()
+
+    print(f"{args.calls} calls to {url}")
+    if args.ssl:
+        # Sessions expiring straight away are never resumed
+        lifeTime = M2SSLTransport.SESSION_CACHE_LIFETIME
+        M2SSLTransport.SESSION_CACHE_LIFETIME = 0
+        callsPerSecond = measure(url, args.calls, keepConnection=False, **clientKwargs)
+        print(f"{'new connections':>28}: {callsPerSecond:8.0f} calls/s")
+        M2SSLTransport.SESSION_CACHE_LIFETIME = lifeTime
+        callsPerSecond = measure(url, args.calls, keepConnection=False, **clientKwargs)
+        print(f"{'resumed TLS sessions':>28}: {callsPerSecond:8.0f} calls/s")
+    else:
+        callsPerSecond = measure(url, args.calls, keepConnection=False, **clientKwargs)
+        print(f"{'new connections':>28}: {callsPerSecond:8.0f} calls/s")
+    callsPerSecond = measure(url, args.calls, **clientKwargs)
+    print(f"{'kept connections':>28}: {callsPerSecond:8.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
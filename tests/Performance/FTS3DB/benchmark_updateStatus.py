@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+""" Compare the time taken by FTS3DB.updateFileStatus to record the monitoring of an FTS job
+    with one transaction per file (previous behaviour) and with grouped bulk updates.
+
+    Each monitoring cycle changes the status of a fraction of the files of the job, as the
+    monitoring of a real job does, and gives the status of all of them.
+
+    It needs a local FTS3DB (which should of course be properly defined in the configuration),
+    in which it creates an operation with synthetic files: DO NOT run it against a production DB.
+
+    Usage::
+
+      python benchmark_updateStatus.py [--files 10000] [--cycles 5] [--changed 0.2]
+"""
+import argparse
+import random
+import time
+
+import DIRAC
+
+DIRAC.initialize()  # Initialize configuration
+
+from sqlalchemy import delete, update
+from sqlalchemy.sql.expression import and_
+
+from DIRAC.DataManagementSystem.Client.FTS3File import FTS3File
+from DIRAC.DataManagementSystem.Client.FTS3Job import FTS3Job
+from DIRAC.DataManagementSystem.Client.FTS3Operation import FTS3Operation, FTS3TransferOperation
+from DIRAC.DataManagementSystem.DB.FTS3DB import FTS3DB
+
+FTS_GUID = "benchmark-updateStatus"
+
+
+def updateFileByFile(fts3db, fileStatusDict, ftsGUID):
+    """Previous behaviour: one UPDATE and one transaction per file, whether it changed or not"""
+    for fileID, valueDict in fileStatusDict.items():
+        session = fts3db.dbSession()
+        try:
+            updateDict = {FTS3File.status: valueDict["status"], FTS3File.error: valueDict.get("error") or None}
+            session.execute(
+                update(FTS3File)
+                .where(
+                    and_(
+                        FTS3File.fileID == fileID,
+                        ~FTS3File.status.in_(FTS3File.FINAL_STATES),
+                        FTS3File.ftsGUID == ftsGUID,
+                    )
+                )
+                .values(updateDict)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+        finally:
+            session.close()
+    return DIRAC.S_OK()
+
+
+def createOperation(fts3db, nbFiles):
+    """Operation with one job of nbFiles files, all Submitted"""
+    operation = FTS3TransferOperation()
+    for i in range(nbFiles):
+        ftsFile = FTS3File()
+        ftsFile.lfn = f"/benchmark/fts3db/file{i}"
+        ftsFile.targetSE = "Benchmark-SE"
+        ftsFile.ftsGUID = FTS_GUID
+        ftsFile.status = "Submitted"
+        operation.ftsFiles.append(ftsFile)
+    job = FTS3Job()
+    job.ftsGUID = FTS_GUID
+    job.status = "Submitted"
+    operation.ftsJobs.append(job)
+    result = fts3db.persistOperation(operation)
+    if not result["OK"]:
+        raise RuntimeError(result["Message"])
+    opID = result["Value"]
+    operation = fts3db.getOperation(opID)["Value"]
+    return opID, sorted(ftsFile.fileID for ftsFile in operation.ftsFiles), operation.ftsJobs[0].jobID
+
+
+def generateCycles(fileIDs, nbCycles, changed):
+    """Status of all the files at each monitoring cycle: a fraction of them changes every time"""
+    current = {fileID: "Submitted" for fileID in fileIDs}
+    cycles = []
+    for _ in range(nbCycles):
+        for fileID in random.sample(fileIDs, int(len(fileIDs) * changed)):
+            if current[fileID] == "Submitted":
+                current[fileID] = "Active"
+            elif current[fileID] == "Active":
+                current[fileID] = random.choice(["Finished", "Failed"])
+        cycles.append(
+            {
+                fileID: {"status": status, "error": "Transfer failed" if status == "Failed" else ""}
+                for fileID, status in current.items()
+            }
+        )
+    return cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10000, help="Number of files in the job")
+    parser.add_argument("--cycles", type=int, default=5, help="Number of monitoring cycles")
+    parser.add_argument("--changed", type=float, default=0.2, help="Fraction of the files changing at each cycle")
+    args = parser.parse_args()
+
+    fts3db = FTS3DB(pool_size=1)
+    for name, updateFunction in (("file by file", updateFileByFile), ("bulk", FTS3DB.updateFileStatus)):
+        opID, fileIDs, jobID = createOperation(fts3db, args.files)
+        try:
+            elapsed = 0
+            for fileStatusDict in generateCycles(fileIDs, args.cycles, args.changed):
+                start = time.time()
+                result = updateFunction(fts3db, fileStatusDict, FTS_GUID)
+                if not result["OK"]:
+                    raise RuntimeError(result["Message"])
+                result = fts3db.updateJobStatus({jobID: {"status": "Active", "lastMonitor": True}})
+                if not result["OK"]:
+                    raise RuntimeError(result["Message"])
+                elapsed += time.time() - start
+            print(f"{name:>12}: {elapsed / args.cycles:8.3f} s per monitoring cycle of {args.files} files")
+        finally:
+            session = fts3db.dbSession()
+            session.execute(
+                delete(FTS3Operation)
+                .where(FTS3Operation.operationID == opID)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+""" Compare the ways of selecting all the subdirectories of a set of directories of the DirectoryLevelTree,
+    as done for each condition of a directory metadata query:
+
+    - walk down the tree with the Parent index, one query per level (getAllSubdirectoriesByID)
+    - self-join of the tree on the OR'ed LPATH conditions of all the levels (first single-query version)
+    - self-join on the LPATH prefix of each level of the parents, with the LPATH index (getAllSubdirectoriesRequest)
+
+    It needs a local FileCatalogDB with a DirectoryLevelTree (which should of course be properly defined
+    in the configuration), in which it creates a synthetic tree: DO NOT run it against a production DB.
+
+    Usage::
+
+      python benchmark_subdirectories.py [--depth 5] [--fanout 8] [--parents 20] [--parentLevel 3]
+"""
+import argparse
+import random
+import time
+
+import DIRAC
+
+DIRAC.initialize()  # Initialize configuration
+
+from DIRAC.DataManagementSystem.DB.FileCatalogComponents.DirectoryManager.DirectoryLevelTree import (
+    MAX_LEVELS,
+    DirectoryLevelTree,
+)
+from DIRAC.DataManagementSystem.DB.FileCatalogDB import FileCatalogDB
+
+TOP_DIR = "/benchmark-subdirectories"
+INSERT_BUNDLE = 1000
+
+
+def check(result):
+    if not result["OK"]:
+        raise RuntimeError(result["Message"])
+    return result["Value"]
+
+
+def populate(db, dtree, depth, fanout):
+    """Create a tree of depth levels of fanout subdirectories below TOP_DIR, return the DirIDs per level"""
+    topID = check(dtree.makeDir(TOP_DIR))
+    lpathColumns = ",".join("LPATH%d" % (i + 1) for i in range(MAX_LEVELS))
+    topPath = check(db._query(f"SELECT Level,{lpathColumns} FROM FC_DirectoryLevelTree WHERE DirID={topID}"))[0]
+    # DirID -> (DirName, Level, enumerated path)
+    parents = {topID: (TOP_DIR, topPath[0], list(topPath[1 : topPath[0] + 1]))}
+    dirIDsPerLevel = [[topID]]
+    for _ in range(depth):
+        rows = []
+        for parentID, (parentName, parentLevel, parentLPath) in parents.items():
+            for index in range(1, fanout + 1):
+                lpath = parentLPath + [index] + [0] * (MAX_LEVELS - parentLevel - 1)
+                rows.append(
+                    "('%s/d%d',%d,%d,%s)" % (parentName, index, parentID, parentLevel + 1, ",".join(map(str, lpath)))
+                )
+        for start in range(0, len(rows), INSERT_BUNDLE):
+            check(
+                db._update(
+                    f"INSERT INTO FC_DirectoryLevelTree (DirName,Parent,Level,{lpathColumns}) VALUES "
+                    + ",".join(rows[start : start + INSERT_BUNDLE])
+                )
+            )
+        parentIDs = ",".join(str(parentID) for parentID in parents)
+        children = check(
+            db._query(
+                f"SELECT DirID,DirName,Level,{lpathColumns} FROM FC_DirectoryLevelTree WHERE Parent IN ({parentIDs})"
+            )
+        )
+        parents = {row[0]: (row[1], row[2], list(row[3 : row[2] + 3])) for row in children}
+        dirIDsPerLevel.append(list(parents))
+    return dirIDsPerLevel
+
+
+def orLPathRequest(parentsRequest):
+    """Self-join on the OR'ed conditions of all the levels"""
+    lpathSelects = ["(P.Level<%d OR S.LPATH%d=P.LPATH%d)" % (i, i, i) for i in range(1, MAX_LEVELS + 1)]
+    req = "SELECT S.DirID FROM FC_DirectoryLevelTree AS P JOIN FC_DirectoryLevelTree AS S"
+    req += " ON S.Level>=P.Level AND %s" % " AND ".join(lpathSelects)
+    req += " WHERE P.DirID IN (%s)" % parentsRequest
+    return DIRAC.S_OK(req)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=5, help="Number of levels below the top directory")
+    parser.add_argument("--fanout", type=int, default=8, help="Number of subdirectories of each directory")
+    parser.add_argument(
+        "--parents", type=int, default=20, help="Number of directories whose subdirectories are selected"
+    )
+    parser.add_argument("--parentLevel", type=int, default=3, help="Level of these directories below the top one")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of selections of each kind")
+    args = parser.parse_args()
+
+    db = FileCatalogDB()
+    dtree = DirectoryLevelTree(db)
+    try:
+        dirIDsPerLevel = populate(db, dtree, args.depth, args.fanout)
+        nbDirs = sum(len(dirIDs) for dirIDs in dirIDsPerLevel)
+        nbTreeDirs = check(db._query("SELECT COUNT(*) FROM FC_DirectoryLevelTree"))[0][0]
+        print(f"{nbDirs} directories created, {nbTreeDirs} in the tree")
+
+        candidates = dirIDsPerLevel[min(args.parentLevel, args.depth)]
+        selections = [random.sample(candidates, min(args.parents, len(candidates))) for _ in range(args.repeat)]
+
+        def walk(parentIDs):
+            return parentIDs + check(dtree.getAllSubdirectoriesByID(parentIDs))
+
+        def request(getRequest):
+            def select(parentIDs):
+                parentsRequest = "SELECT DirID FROM FC_DirectoryLevelTree WHERE DirID IN (%s)" % ",".join(
+                    str(parentID) for parentID in parentIDs
+                )
+                return [row[0] for row in check(db._query(check(getRequest(parentsRequest))))]
+
+            return select
+
+        for name, select in (
+            ("Parent walk", walk),
+            ("OR'ed LPATH", request(orLPathRequest)),
+            ("LPATH prefix", request(dtree.getAllSubdirectoriesRequest)),
+        ):
+            elapsed = 0
+            for parentIDs in selections:
+                start = time.time()
+                subdirIDs = select(parentIDs)
+                elapsed += time.time() - start
+            print(f"{name:>12}: {elapsed / args.repeat:8.3f} s per selection of {len(subdirIDs)} directories")
+    finally:
+        check(db._update(f"DELETE FROM FC_DirectoryLevelTree WHERE DirName LIKE '{TOP_DIR}%'"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+""" Benchmark of the evaluation of a metadata query on many files
+
+Measures the time taken to apply a query to the metadata of random files:
+
+  * with a new MetaQuery for each file, the query being interpreted each time
+  * with the query compiled once, applied to the metadata dictionary of each file
+  * with the query compiled once, applied to a columnar batch of the metadata of all the files
+
+Usage::
+
+  python benchmark_evaluate.py [--files 1000000]
+"""
+import argparse
+import random
+import time
+
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+
+typeDict = {"Run": "INT", "Energy": "FLOAT", "Type": "VARCHAR(128)", "Version": "VARCHAR(128)"}
+queryDict = {
+    "Type": ["RAW", "DST"],
+    "Run": {">=": 1000, "<": 9000},
+    "Energy": {"!=": 6.5},
+    "Version": {"nin": ["v0", "v1"]},
+}
+
+
+def generateFiles(nbFiles):
+    """Metadata dictionaries of random files, some of them without Version"""
+    versions = ["v0", "v1", "v2", "v3", None]
+    return [
+        {
+            "Run": random.randint(0, 10000),
+            "Energy": random.choice([3.5, 6.5, 13.0]),
+            "Type": random.choice(["RAW", "DST", "SIM"]),
+            "Version": random.choice(versions),
+        }
+        for _ in range(nbFiles)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000000, help="Number of files")
+    args = parser.parse_args()
+
+    files = generateFiles(args.files)
+    print(f"Query {queryDict} on {args.files} files")
+
+    start = time.time()
+    expected = [MetaQuery(queryDict, typeDict).applyQuery(metadata)["Value"] for metadata in files]
+    print(f"{'MetaQuery per file':>28}: {time.time() - start:8.2f} s")
+
+    start = time.time()
+    predicate = MetaQuery(queryDict, typeDict).compileQuery()
+    result = [predicate(metadata)["Value"] for metadata in files]
+    print(f"{'compiled, per file':>28}: {time.time() - start:8.2f} s")
+    assert result == expected
+
+    columns = {field: [metadata[field] for metadata in files] for field in typeDict}
+    start = time.time()
+    result = MetaQuery(queryDict, typeDict).applyQueryToColumns(columns)["Value"]
+    print(f"{'compiled, columnar batch':>28}: {time.time() - start:8.2f} s")
+    assert result == expected
+    print(f"{sum(result)} files selected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+""" Compare the number of matches per second of the TaskQueueDB using the matching SQL query
+    and using the in-memory task queue index (JobScheduling/UseTaskQueueIndex).
+
+    It needs a local TaskQueueDB (which should of course be properly defined in the configuration),
+    and fills it with fake jobs: DO NOT run it against a production DB.
+
+    Usage::
+
+      python benchmark_matching.py [--jobs 20000] [--sites 50] [--matches 2000]
+"""
+import argparse
+import random
+import time
+
+import DIRAC
+
+DIRAC.initialize()  # Initialize configuration
+
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+
+INDEX_OPTION = "/Operations/Defaults/JobScheduling/UseTaskQueueIndex"
+FIRST_JOB_ID = 10000000
+
+
+def populate(tqDB, nbJobs, nbSites):
+    """Insert nbJobs jobs, spread over task queues with various requirements"""
+    sites = [f"LCG.Site{i}.org" for i in range(nbSites)]
+    platforms = ["EL7", "EL8", "EL9"]
+    for jobId in range(FIRST_JOB_ID, FIRST_JOB_ID + nbJobs):
+        tqDefDict = {
+            "OwnerDN": f"/DC=org/CN=user{jobId % 20}",
+            "OwnerGroup": random.choice(["prod", "user"]),
+            "CPUTime": random.choice([360, 3600, 86400]),
+        }
+        if random.random() < 0.5:
+            tqDefDict["Sites"] = random.sample(sites, 3)
+        if random.random() < 0.3:
+            tqDefDict["Platforms"] = [random.choice(platforms)]
+        if random.random() < 0.1:
+            tqDefDict["Tags"] = ["MultiProcessor"]
+        result = tqDB.insertJob(jobId, tqDefDict, random.randint(1, 10))
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+    return sites, platforms
+
+
+def benchmark(tqDB, nbMatches, sites, platforms):
+    """Match nbMatches resources, return the number of matches per second"""
+    start = time.time()
+    for _ in range(nbMatches):
+        resourceDict = {
+            "CPUTime": random.choice([3600, 86400, 200000]),
+            "Site": random.choice(sites),
+            "Platform": random.choice(platforms),
+            "Tag": random.choice([[], ["MultiProcessor"]]),
+        }
+        result = tqDB.matchAndGetJob(resourceDict)
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+    return nbMatches / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20000, help="Number of jobs to insert")
+    parser.add_argument("--sites", type=int, default=50, help="Number of sites")
+    parser.add_argument("--matches", type=int, default=2000, help="Number of matches per mode")
+    args = parser.parse_args()
+
+    tqDB = TaskQueueDB()
+    try:
+        for useIndex in ("False", "True"):
+            gConfigurationData.setOptionInCFG(INDEX_OPTION, useIndex)
+            sites, platforms = populate(tqDB, args.jobs, args.sites)
+            rate = benchmark(tqDB, args.matches, sites, platforms)
+            print(f"UseTaskQueueIndex={useIndex}: {rate:.1f} matches/s")
+            for jobId in range(FIRST_JOB_ID, FIRST_JOB_ID + args.jobs):
+                tqDB.deleteJob(jobId)
+            tqDB.cleanOrphanedTaskQueues()
+    finally:
+        gConfigurationData.deleteOptionInCFG(INDEX_OPTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+""" Measure the number of requests per second served by a local Tornado server,
+    to compare the throughput for various numbers of worker processes (/Systems/Tornado/<instance>/Processes).
+
+    It calls the echo method of a Tornado service from concurrent client processes,
+    with a payload large enough for the JSON encoding to be CPU bound.
+    Restart the server with another number of processes between runs, e.g. 1, 2, 4::
+
+      python benchmark_processes.py --url https://localhost:8443/Framework/TornadoUserProfileManager \\
+        [--clients 16] [--requests 200] [--size 10000]
+"""
+import argparse
+import time
+from multiprocessing import Pool
+
+import DIRAC
+
+DIRAC.initialize()  # Initialize configuration
+
+from DIRAC.Core.Tornado.Client.TornadoClient import TornadoClient
+
+
+def callEcho(url, nbRequests, size):
+    """Call echo nbRequests times from a new client, return the number of failures"""
+    client = TornadoClient(url)
+    payload = {f"key{i}": [i, str(i), float(i)] for i in range(size)}
+    failures = 0
+    for _ in range(nbRequests):
+        if not client.executeRPC("echo", payload)["OK"]:
+            failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL of a Tornado service")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent client processes")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per client")
+    parser.add_argument("--size", type=int, default=10000, help="Number of entries of the echoed dictionary")
+    args = parser.parse_args()
+
+    start = time.time()
+    with Pool(args.clients) as pool:
+        failures = sum(pool.starmap(callEcho, [(args.url, args.requests, args.size)] * args.clients))
+    elapsed = time.time() - start
+    nbRequests = args.clients * args.requests
+    print(f"{nbRequests} requests ({failures} failed) in {elapsed:.1f}s: {nbRequests / elapsed:.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()